@@ -9,3 +9,45 @@ TICKER_STOCKS = [
 ]
 START_YEAR=2022
 END_YEAR=2024
+
+# Context compaction of the group chat: the most recent messages are kept verbatim,
+# older messages are summarized in lines of up to CONTEXT_SUMMARY_CHARS characters
+CONTEXT_RECENT_MESSAGES = 8
+CONTEXT_SUMMARY_CHARS = 300
+DEFAULT_CONTEXT_TOKEN_BUDGET = 6000
+# Token budgets per agent name. The manager tracks every agent's final allocation, the selector only picks the next speaker.
+AGENT_CONTEXT_TOKEN_BUDGETS = {
+    "Manager": 10000,
+    "Red_Flags_Liquidity_Analyst": 8000,
+    "Selector": 4000,
+}
+
+# The four data analysts write their first analysis concurrently before the house debate starts
+PARALLEL_OPENING = True
+
+# The agents' fundamentals and news requests return only the data available at the end of the start year,
+# from point-in-time snapshots (see database/snapshots.py). Set SNAPSHOT_OFFLINE=true to replay runs from the snapshots only.
+POINT_IN_TIME_DATA = True
+
+# Root directory of the Parquet export of the cached fundamentals (see database/columnar_export.py)
+COLUMNAR_EXPORT_DIR = "cache_export"
+
+# Number of tickers the screener passes to the investment houses (see finance/screener.py)
+SCREENER_TOP_N = 5
+
+# Number of related companies the competitive analysis compares a ticker against (see finance/peer_group.py)
+PEER_GROUP_SIZE = 5
+
+# Rendered charts are memoized in this directory and served by the cache service (see utils/chart_service.py)
+CHART_CACHE_DIR = "chart_cache"
+CHART_SERVICE_URL = "http://localhost:8000"
+# Output directory of the batch rendering of the report charts (see utils/batch_charts.py)
+REPORT_CHARTS_DIR = "report_charts"
+
+# Number of competitions that run at the same time in the background of the app (see group_chats/competition.py);
+# the others wait in the queue. The page polls the progress of a run every JOB_POLL_SECONDS seconds.
+COMPETITION_WORKERS = 2
+JOB_POLL_SECONDS = 2
+# Number of worker processes of the job service (see group_chats/competition_workers.py): they run the competitions
+# submitted to POST /jobs from the persistent queue of the runs table. 0 disables the workers of the service.
+COMPETITION_PROCESS_WORKERS = 2
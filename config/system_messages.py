@@ -92,7 +92,8 @@ YOUR GOAL IS: to provide a buy recommendation for the given stock and determine
 Run this funcion: competitive_func
 and analyze the data using the following guidelines:
 
-1. Identify the competitors of the company you are analyzing.
+1. Identify the competitors of the company you are analyzing - competitive_func returns its peer group of related companies,
+   the peer median of every metric and the company's percentile among its peers (100 = best: highest margins, lowest positive multiples).
 
 2. Competitive Margin Comparison:
    - Compare margin metrics (gross, operating, and net) between the identified competitors in the same industry over different years.
@@ -101,6 +102,7 @@ and analyze the data using the following guidelines:
 3. Valuation Multipliers Analysis:
    - Identify competitors across years - use price_to_EBIT_ratio, ratios results.
    - Interpret these metrics to evaluate whether the company is undervalued or overvalued relative to its competitors.
+   - Compare the company with the peer median rather than with a single competitor, and cite its percentiles.
 
 4. Decision-Making Process:
    - First, identify the key competitor(s) based on margin and valuation metrics.
@@ -143,6 +145,7 @@ and analyze the data using the following guidelines:
 2. News Analysis:
    - Fetch news articles related to the company - use get_company_data results.
    - Analyze the news content to identify potential impacts on the company's stock performance and strategic direction.
+   - For more news on a specific topic, use search_company_news (a local archive, no API request), e.g. search_company_news("lawsuit", "AAPL").
 
 3. Qualitative Assessment process:
    - Combine business information and news analysis to evaluate the company's qualitative factors.
@@ -255,6 +258,7 @@ How to Engage in the Discussion:
 - Do NOT allow the team to ignore risks—force them to confront every weakness.
 - If an agent dismisses a risk, double down and make them justify their reasoning.
 - Use the search_agent to find data that supports your doubts and challenges the team's assumptions.
+- Before asking the search_agent, check the local news archive yourself with search_company_news(query, symbol) - it answers instantly.
 
 Your budget is {budget} and the ticker stocks you are analyzing include {tickers}.
 Your role is unique and critical, focuse on your analysis description as mentioned above.
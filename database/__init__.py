@@ -1 +1 @@
-from .api_utils import cached_api_request
\ No newline at end of file
+from .api_utils import cached_api_request, async_cached_api_request
\ No newline at end of file
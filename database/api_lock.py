@@ -0,0 +1,12 @@
+"""
+Pydantic model for the request body.
+
+Uses the BaseModel class from Pydantic to validate incoming request data against the model, 
+raise errors for missing/incorrect fields, and convert JSON into a Python object.
+"""
+from pydantic import BaseModel
+
+class APILock(BaseModel):
+    key: str
+    owner: str
+    ttl_seconds: float = 30
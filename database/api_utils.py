@@ -3,24 +3,41 @@ api_utils.py
 Utility functions for making API requests with caching
 using FastAPI routes for chacning API responses.
 """
-import requests
+import asyncio
+import hashlib
+import json
+import time
+import uuid
 from typing import Dict, Optional, Any
 import os
 from dotenv import load_dotenv
+from database.http_client import get_async_http_client, get_http_client
+from database.single_flight import SingleFlight
+from database import snapshots
+
+# Concurrent identical requests in this process wait on a single fetch
+_request_flight = SingleFlight()
+# How long a process may hold the lock row of a request before others fetch it themselves
+PROCESS_LOCK_TTL_SECONDS = 30
+PROCESS_LOCK_POLL_SECONDS = 0.5
 
 def cached_api_request(
-    url: str, 
+    url: str,
     api_key_name: Optional[str] = None,
     api_key_param: str = "apiKey",
     params: Dict[str, Any] = {},
     api_key_in_url: bool = False,
-    api_service_url: str = "http://localhost:8000"
+    api_service_url: str = "http://localhost:8000",
+    as_of: Optional[str] = None
 ) -> str:
     """
     Makes an API request with caching using the FastAPI routes.
     If the same request exists in the database, returns the cached response.
     Otherwise, makes the request and caches the response.
-    
+    Requests go through the shared HTTP client (pooled sessions, timeouts and retries).
+    Concurrent identical requests are coalesced into a single fetch. When API_CACHE_PROCESS_LOCK=true,
+    processes sharing the cache also coalesce through a lock row in the cache database.
+
     Args:
         url (str): The API endpoint URL
         api_key_name (Optional[str]): The name of the API key in the .env file (e.g., 'FMP_API_KEY', 'POLYGON_API_KEY')
@@ -28,19 +45,72 @@ def cached_api_request(
         params (Dict[str, Any]): Query parameters for the request (excluding the API key)
         api_key_in_url (bool): Whether the API key should be added to the URL directly (True) or in params (False)
         api_service_url (str): The base URL for the caching service
-    
+        as_of (Optional[str]): The as-of date (YYYY-MM-DD) of a point-in-time request: only the records available
+            on that date are returned, from the snapshot store when the request was already snapshotted
+
     Returns:
         str: The API response as a string
     """
+    if as_of:
+        # The snapshot is looked up before the API key is needed, so offline replays run without keys
+        return _request_flight.do(
+            (url, json.dumps(params, sort_keys=True), as_of), _fetch_snapshot,
+            url, api_key_name, api_key_param, params, api_key_in_url, api_service_url, as_of
+        )
+    url, request_params = _prepare_request(url, api_key_name, api_key_param, params, api_key_in_url)
+    flight_key = (url, json.dumps(params, sort_keys=True))
+    return _request_flight.do(flight_key, _fetch_with_cache, url, params, request_params, api_service_url)
+
+
+async def async_cached_api_request(
+    url: str,
+    api_key_name: Optional[str] = None,
+    api_key_param: str = "apiKey",
+    params: Dict[str, Any] = {},
+    api_key_in_url: bool = False,
+    api_service_url: str = "http://localhost:8000",
+    as_of: Optional[str] = None
+) -> str:
+    """
+    Async version of cached_api_request, for the async agent tools.
+    Cache lookups, upstream requests and cache writes go through the async HTTP client, so they never block the event loop.
+    Shares the in-flight requests with cached_api_request, so sync and async callers of the same URL fetch it once.
+
+    Args:
+        url (str): The API endpoint URL
+        api_key_name (Optional[str]): The name of the API key in the .env file (e.g., 'FMP_API_KEY', 'POLYGON_API_KEY')
+        api_key_param (str): The parameter name for the API key in the request (default: 'apiKey')
+        params (Dict[str, Any]): Query parameters for the request (excluding the API key)
+        api_key_in_url (bool): Whether the API key should be added to the URL directly (True) or in params (False)
+        api_service_url (str): The base URL for the caching service
+        as_of (Optional[str]): The as-of date (YYYY-MM-DD) of a point-in-time request: only the records available
+            on that date are returned, from the snapshot store when the request was already snapshotted
+
+    Returns:
+        str: The API response as a string
+    """
+    if as_of:
+        # The snapshot is looked up before the API key is needed, so offline replays run without keys
+        return await _request_flight.do_async(
+            (url, json.dumps(params, sort_keys=True), as_of), _afetch_snapshot,
+            url, api_key_name, api_key_param, params, api_key_in_url, api_service_url, as_of
+        )
+    url, request_params = _prepare_request(url, api_key_name, api_key_param, params, api_key_in_url)
+    flight_key = (url, json.dumps(params, sort_keys=True))
+    return await _request_flight.do_async(flight_key, _afetch_with_cache, url, params, request_params, api_service_url)
+
+
+def _prepare_request(url: str, api_key_name: Optional[str], api_key_param: str, params: Dict[str, Any], api_key_in_url: bool):
+    """Adds the API key to the URL or to the request params. Returns the URL and the request params."""
     load_dotenv()
     request_params = params.copy()
-    
+
     if api_key_name:
         api_key_value = os.getenv(api_key_name)
-        
+
         if not api_key_value:
             raise ValueError(f"API key '{api_key_name}' not found in environment variables")
-        
+
         if api_key_in_url:
             if "?" in url:
                 url = f"{url}&{api_key_param}={api_key_value}"
@@ -48,18 +118,121 @@ def cached_api_request(
                 url = f"{url}?{api_key_param}={api_key_value}"
         else:
             request_params[api_key_param] = api_key_value
-    
+
+    return url, request_params
+
+
+def _offline_snapshots() -> bool:
+    """Returns True when point-in-time requests must be served from the snapshot store only (SNAPSHOT_OFFLINE=true)."""
+    return os.getenv("SNAPSHOT_OFFLINE", "false").lower() == "true"
+
+
+def _fetch_snapshot(source_url: str, api_key_name: Optional[str], api_key_param: str, params: Dict[str, Any],
+                    api_key_in_url: bool, api_service_url: str, as_of: str) -> str:
+    """Returns the snapshot of the request for the as-of date, or snapshots the cached (or fetched) response."""
+    store = snapshots.get_snapshot_store()
+    snapshot = store.get(source_url, params, as_of)
+    if snapshot is not None:
+        return snapshot
+    if _offline_snapshots():
+        raise snapshots.SnapshotMissingError(f"No snapshot of {source_url} as of {as_of}")
+
+    url, request_params = _prepare_request(source_url, api_key_name, api_key_param, params, api_key_in_url)
+    flight_key = (url, json.dumps(params, sort_keys=True))
+    response_text = _request_flight.do(flight_key, _fetch_with_cache, url, params, request_params, api_service_url)
+    filtered = snapshots.point_in_time_filter(source_url, response_text, as_of)
+    if filtered is None:
+        return response_text
+    return store.put(source_url, params, as_of, filtered)
+
+
+async def _afetch_snapshot(source_url: str, api_key_name: Optional[str], api_key_param: str, params: Dict[str, Any],
+                           api_key_in_url: bool, api_service_url: str, as_of: str) -> str:
+    """Async version of _fetch_snapshot. The snapshot store is a local SQLite file, read in a worker thread."""
+    store = snapshots.get_snapshot_store()
+    snapshot = await asyncio.to_thread(store.get, source_url, params, as_of)
+    if snapshot is not None:
+        return snapshot
+    if _offline_snapshots():
+        raise snapshots.SnapshotMissingError(f"No snapshot of {source_url} as of {as_of}")
+
+    url, request_params = _prepare_request(source_url, api_key_name, api_key_param, params, api_key_in_url)
+    flight_key = (url, json.dumps(params, sort_keys=True))
+    response_text = await _request_flight.do_async(flight_key, _afetch_with_cache, url, params, request_params, api_service_url)
+    filtered = snapshots.point_in_time_filter(source_url, response_text, as_of)
+    if filtered is None:
+        return response_text
+    return await asyncio.to_thread(store.put, source_url, params, as_of, filtered)
+
+
+def _process_lock_payload(url: str, params: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+    """Returns the lock row of the request if cross-process coalescing is enabled, otherwise None."""
+    if os.getenv("API_CACHE_PROCESS_LOCK", "false").lower() != "true":
+        return None
+    return {
+        "key": hashlib.sha256(f"{url}|{json.dumps(params, sort_keys=True)}".encode()).hexdigest(),
+        "owner": uuid.uuid4().hex,
+        "ttl_seconds": PROCESS_LOCK_TTL_SECONDS
+    }
+
+
+def _fetch_with_cache(url: str, params: Dict[str, Any], request_params: Dict[str, Any], api_service_url: str) -> str:
+    """Returns the cached response of the request, or fetches and caches it."""
+    cached_response = _get_cached_response(url, params, api_service_url)
+    if cached_response is not None:
+        return cached_response
+
+    process_lock = _process_lock_payload(url, params)
+    if process_lock:
+        if _acquire_process_lock(process_lock, api_service_url):
+            # Another process may have cached the response between the cache check and the lock
+            cached_response = _get_cached_response(url, params, api_service_url)
+        else:
+            process_lock = None
+            cached_response = _wait_for_cached_response(url, params, api_service_url)
+
+    try:
+        if cached_response is not None:
+            return cached_response
+
+        # If not cached, make the actual API request
+        api_response = get_http_client().get(url, params=request_params)
+        response_text = api_response.text
+
+        # Cache the response using log_api_call endpoint
+        cache_payload = {
+            "params": params,
+            "url": url,
+            "response": response_text
+        }
+
+        try:
+            # Log the API call to cache it for future use
+            get_http_client().post(f"{api_service_url}/log_api_call", json=cache_payload, retries=0)
+        except Exception as e:
+            print(f"Error caching response: {str(e)}")
+            # Continue even if caching fails
+
+        return response_text
+    finally:
+        if process_lock:
+            _release_process_lock(process_lock, api_service_url)
+
+
+def _get_cached_response(url: str, params: Dict[str, Any], api_service_url: str) -> Optional[str]:
+    """Returns the cached response of the request, or None on a cache miss."""
     cache_request_payload = {
         "params": params,
         "url": url
     }
-    
+
     try:
-        cache_response = requests.post(
-            f"{api_service_url}/get_api_call", 
-            json=cache_request_payload
+        cache_response = get_http_client().post(
+            f"{api_service_url}/get_api_call",
+            json=cache_request_payload,
+            retries=0
         )
-        
+
         if cache_response.status_code == 200:
             # Cache hit
             cache_data = cache_response.json()
@@ -68,23 +241,118 @@ def cached_api_request(
                 return cache_data["data"][0]["response"]
     except Exception as e:
         print(f"Error checking cache: {str(e)}")
-    
-    # If not cached, make the actual API request
-    api_response = requests.get(url, params=request_params)
-    response_text = api_response.text
-    
-    # Cache the response using log_api_call endpoint
-    cache_payload = {
-        "params": params,
-        "url": url,
-        "response": response_text
-    }
-    
+    return None
+
+
+def _acquire_process_lock(process_lock: Dict[str, Any], api_service_url: str) -> bool:
+    """Acquires the lock row of the request. Fails open, so a cache service error never blocks the fetch."""
     try:
-        # Log the API call to cache it for future use
-        requests.post(f"{api_service_url}/log_api_call", json=cache_payload)
+        response = get_http_client().post(f"{api_service_url}/acquire_api_lock", json=process_lock, retries=0)
+        if response.status_code == 200:
+            return response.json().get("acquired", True)
     except Exception as e:
-        print(f"Error caching response: {str(e)}")
-        # Continue even if caching fails
-    
-    return response_text
+        print(f"Error acquiring API lock: {str(e)}")
+    return True
+
+
+def _release_process_lock(process_lock: Dict[str, Any], api_service_url: str):
+    try:
+        get_http_client().post(f"{api_service_url}/release_api_lock", json=process_lock, retries=0)
+    except Exception as e:
+        print(f"Error releasing API lock: {str(e)}")
+
+
+def _wait_for_cached_response(url: str, params: Dict[str, Any], api_service_url: str) -> Optional[str]:
+    """Polls the cache while another process holds the lock row, until the response is cached or the lock expires."""
+    deadline = time.monotonic() + PROCESS_LOCK_TTL_SECONDS
+    while time.monotonic() < deadline:
+        time.sleep(PROCESS_LOCK_POLL_SECONDS)
+        cached_response = _get_cached_response(url, params, api_service_url)
+        if cached_response is not None:
+            return cached_response
+    return None
+
+
+async def _afetch_with_cache(url: str, params: Dict[str, Any], request_params: Dict[str, Any], api_service_url: str) -> str:
+    """Async version of _fetch_with_cache."""
+    cached_response = await _aget_cached_response(url, params, api_service_url)
+    if cached_response is not None:
+        return cached_response
+
+    process_lock = _process_lock_payload(url, params)
+    if process_lock:
+        if await _aacquire_process_lock(process_lock, api_service_url):
+            cached_response = await _aget_cached_response(url, params, api_service_url)
+        else:
+            process_lock = None
+            cached_response = await _await_cached_response(url, params, api_service_url)
+
+    try:
+        if cached_response is not None:
+            return cached_response
+
+        api_response = await get_async_http_client().get(url, params=request_params)
+        response_text = api_response.text
+
+        cache_payload = {
+            "params": params,
+            "url": url,
+            "response": response_text
+        }
+
+        try:
+            await get_async_http_client().post(f"{api_service_url}/log_api_call", json=cache_payload, retries=0)
+        except Exception as e:
+            print(f"Error caching response: {str(e)}")
+
+        return response_text
+    finally:
+        if process_lock:
+            await _arelease_process_lock(process_lock, api_service_url)
+
+
+async def _aget_cached_response(url: str, params: Dict[str, Any], api_service_url: str) -> Optional[str]:
+    """Async version of _get_cached_response."""
+    try:
+        cache_response = await get_async_http_client().post(
+            f"{api_service_url}/get_api_call",
+            json={"params": params, "url": url},
+            retries=0
+        )
+
+        if cache_response.status_code == 200:
+            cache_data = cache_response.json()
+            if cache_data.get("data") and len(cache_data["data"]) > 0:
+                print(f"Using cached response for {url}")
+                return cache_data["data"][0]["response"]
+    except Exception as e:
+        print(f"Error checking cache: {str(e)}")
+    return None
+
+
+async def _aacquire_process_lock(process_lock: Dict[str, Any], api_service_url: str) -> bool:
+    try:
+        response = await get_async_http_client().post(f"{api_service_url}/acquire_api_lock", json=process_lock, retries=0)
+        if response.status_code == 200:
+            return response.json().get("acquired", True)
+    except Exception as e:
+        print(f"Error acquiring API lock: {str(e)}")
+    return True
+
+
+async def _arelease_process_lock(process_lock: Dict[str, Any], api_service_url: str):
+    try:
+        await get_async_http_client().post(f"{api_service_url}/release_api_lock", json=process_lock, retries=0)
+    except Exception as e:
+        print(f"Error releasing API lock: {str(e)}")
+
+
+async def _await_cached_response(url: str, params: Dict[str, Any], api_service_url: str) -> Optional[str]:
+    """Async version of _wait_for_cached_response."""
+    deadline = time.monotonic() + PROCESS_LOCK_TTL_SECONDS
+    while time.monotonic() < deadline:
+        await asyncio.sleep(PROCESS_LOCK_POLL_SECONDS)
+        cached_response = await _aget_cached_response(url, params, api_service_url)
+        if cached_response is not None:
+            return cached_response
+    return None
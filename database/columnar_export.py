@@ -0,0 +1,295 @@
+"""
+columnar_export.py
+Export of the cached fundamentals to typed columnar tables.
+The income statements, ratios, market caps and price histories cached in API_calls are JSON blobs; the export parses
+each cached response once and writes its records to Parquet files partitioned by ticker and year
+(<export_dir>/<dataset>/symbol=<ticker>/year=<year>/part-0.parquet). The id of the last exported API call is kept in
+the export_state table, so every update only parses the responses logged since the previous one, and the routes run
+an update after each logged call. read_dataset scans the partitions with the vectorized pyarrow readers.
+
+Usage (full or incremental export of the cache database):
+    python -m database.columnar_export
+"""
+import json
+import os
+import sqlite3
+import threading
+from collections import defaultdict
+from datetime import date, datetime
+from typing import Any, Dict, Iterable, List, Optional
+from urllib.parse import urlparse
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.dataset as ds
+import pyarrow.parquet as pq
+from config.app_constants import COLUMNAR_EXPORT_DIR
+from database.db import DB
+
+DB_NAME = "stock_trading.db"
+
+# Typed columns of each dataset: (column, source field, pyarrow type). symbol and year are partition keys, and call_id
+# is the API call a row was exported from, so a newer response of the same record replaces the older one.
+DATASETS = {
+    "income_statement": {
+        "path": "/api/v3/income-statement/",
+        "columns": [
+            ("date", "date", pa.date32()),
+            ("period", "period", pa.string()),
+            ("filing_date", "fillingDate", pa.date32()),
+            ("revenue", "revenue", pa.float64()),
+            ("cost_of_revenue", "costOfRevenue", pa.float64()),
+            ("gross_profit", "grossProfit", pa.float64()),
+            ("operating_income", "operatingIncome", pa.float64()),
+            ("ebitda", "ebitda", pa.float64()),
+            ("net_income", "netIncome", pa.float64()),
+            ("eps", "eps", pa.float64()),
+        ],
+    },
+    "ratios": {
+        "path": "/api/v3/ratios/",
+        "columns": [
+            ("date", "date", pa.date32()),
+            ("period", "period", pa.string()),
+            ("quick_ratio", "quickRatio", pa.float64()),
+            ("current_ratio", "currentRatio", pa.float64()),
+            ("gross_profit_margin", "grossProfitMargin", pa.float64()),
+            ("operating_profit_margin", "operatingProfitMargin", pa.float64()),
+            ("net_profit_margin", "netProfitMargin", pa.float64()),
+            ("price_earnings_ratio", "priceEarningsRatio", pa.float64()),
+            ("price_to_book_ratio", "priceToBookRatio", pa.float64()),
+            ("price_to_sales_ratio", "priceToSalesRatio", pa.float64()),
+            ("price_earnings_to_growth_ratio", "priceEarningsToGrowthRatio", pa.float64()),
+            ("debt_equity_ratio", "debtEquityRatio", pa.float64()),
+            ("return_on_equity", "returnOnEquity", pa.float64()),
+        ],
+    },
+    "market_cap": {
+        "path": "/api/v3/historical-market-capitalization/",
+        "columns": [
+            ("date", "date", pa.date32()),
+            ("market_cap", "marketCap", pa.float64()),
+        ],
+    },
+    "price_history": {
+        "path": "/api/v3/historical-price-full/",
+        "columns": [
+            ("date", "date", pa.date32()),
+            ("open", "open", pa.float64()),
+            ("high", "high", pa.float64()),
+            ("low", "low", pa.float64()),
+            ("close", "close", pa.float64()),
+            ("adj_close", "adjClose", pa.float64()),
+            ("volume", "volume", pa.float64()),
+        ],
+    },
+}
+
+# Rows of a partition are unique by these columns
+KEY_COLUMNS = ["date", "period"]
+
+_export_lock = threading.Lock()
+
+
+def dataset_schema(dataset: str) -> pa.Schema:
+    """Returns the schema of the files of a dataset (without the symbol and year partition keys)."""
+    columns = DATASETS[dataset]["columns"]
+    return pa.schema([(name, type_) for name, _, type_ in columns] + [("call_id", pa.int64())])
+
+
+def classify_url(url: str) -> Optional[tuple]:
+    """
+    Returns the dataset of an API url and its ticker, or None if it is not exported.
+
+    Returns:
+        Optional[tuple]: (dataset, ticker)
+    """
+    parsed = urlparse(url)
+    if not parsed.netloc.endswith("financialmodelingprep.com"):
+        return None
+    for dataset, spec in DATASETS.items():
+        if parsed.path.startswith(spec["path"]):
+            ticker = parsed.path[len(spec["path"]):].strip("/")
+            return (dataset, ticker.upper()) if ticker else None
+    return None
+
+
+def _convert(value: Any, type_: pa.DataType) -> Any:
+    if value is None or value == "":
+        return None
+    try:
+        if pa.types.is_date32(type_):
+            return date.fromisoformat(str(value)[:10])
+        if pa.types.is_floating(type_):
+            return float(value)
+        return str(value)
+    except (TypeError, ValueError):
+        return None
+
+
+def extract_rows(url: str, response_text: str) -> Optional[tuple]:
+    """
+    Parses a cached response into typed rows.
+
+    Args:
+        url (str): The url of the API call
+        response_text (str): The response body
+
+    Returns:
+        Optional[tuple]: (dataset, ticker, rows), each row a dict of the dataset's columns plus "year",
+        or None if the url is not exported or the response has no records
+    """
+    classified = classify_url(url)
+    if classified is None:
+        return None
+    dataset, ticker = classified
+    try:
+        data = json.loads(response_text)
+    except (TypeError, json.JSONDecodeError):
+        return None
+    records = data.get("historical", []) if dataset == "price_history" and isinstance(data, dict) else data
+    if not isinstance(records, list):
+        return None
+
+    rows = []
+    for record in records:
+        if not isinstance(record, dict):
+            continue
+        row = {name: _convert(record.get(field), type_) for name, field, type_ in DATASETS[dataset]["columns"]}
+        if row["date"] is None:
+            continue
+        # Fundamentals belong to their fiscal year, market data to its calendar year
+        fiscal_year = record.get("calendarYear")
+        row["year"] = int(fiscal_year) if str(fiscal_year or "").isdigit() else row["date"].year
+        rows.append(row)
+    return (dataset, ticker, rows) if rows else None
+
+
+def _partition_path(export_dir: str, dataset: str, symbol: str, year: int) -> str:
+    return os.path.join(export_dir, dataset, f"symbol={symbol}", f"year={year}", "part-0.parquet")
+
+
+def _write_partition(export_dir: str, dataset: str, symbol: str, year: int, rows: List[dict]) -> int:
+    """Merges rows into a partition file; a row replaces the existing row with the same key. Returns the row count."""
+    path = _partition_path(export_dir, dataset, symbol, year)
+    schema = dataset_schema(dataset)
+    merged = {}
+    if os.path.exists(path):
+        for row in pq.read_table(path, schema=schema).to_pylist():
+            merged[tuple(row.get(column) for column in KEY_COLUMNS)] = row
+    for row in sorted(rows, key=lambda row: row["call_id"]):
+        merged[tuple(row.get(column) for column in KEY_COLUMNS)] = {name: row.get(name) for name in schema.names}
+
+    table = pa.Table.from_pylist(sorted(merged.values(), key=lambda row: (row["date"], row.get("period") or "")), schema=schema)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    # Readers never see a half-written file, and the dataset scans skip the dot-prefixed temporary file
+    temporary_path = os.path.join(os.path.dirname(path), f".{os.path.basename(path)}.tmp")
+    pq.write_table(table, temporary_path)
+    os.replace(temporary_path, path)
+    return table.num_rows
+
+
+def _ensure_state_table(db: DB):
+    # Created here rather than in init_db, so the export also works on a cache database initialized elsewhere
+    db.execute(
+        "CREATE TABLE IF NOT EXISTS export_state (export_dir TEXT PRIMARY KEY, last_call_id INTEGER NOT NULL, updated_at DATETIME)"
+    )
+
+
+def export_new_responses(db: DB, export_dir: str = COLUMNAR_EXPORT_DIR, batch_size: int = 500) -> Dict[str, int]:
+    """
+    Exports the responses logged in API_calls since the previous export to the partitioned Parquet files.
+
+    Args:
+        db (DB): An open connection to the cache database
+        export_dir (str): The root directory of the exported datasets
+        batch_size (int): The number of API calls parsed per batch
+
+    Returns:
+        Dict[str, int]: The number of exported records per dataset
+    """
+    with _export_lock:
+        _ensure_state_table(db)
+        state = db.execute("SELECT last_call_id FROM export_state WHERE export_dir = ?", (export_dir,)).fetchone()
+        last_call_id = state[0] if state else 0
+        exported = defaultdict(int)
+
+        while True:
+            calls = db.execute(
+                "SELECT id, url, response FROM API_calls WHERE id > ? AND url LIKE '%financialmodelingprep.com%' ORDER BY id LIMIT ?",
+                (last_call_id, batch_size)
+            ).fetchall()
+            if not calls:
+                break
+            partitions = defaultdict(list)
+            for call_id, url, response in calls:
+                extracted = extract_rows(url, response)
+                if extracted is None:
+                    continue
+                dataset, ticker, rows = extracted
+                for row in rows:
+                    row["call_id"] = call_id
+                    partitions[(dataset, ticker, row["year"])].append(row)
+                exported[dataset] += len(rows)
+            for (dataset, ticker, year), rows in partitions.items():
+                _write_partition(export_dir, dataset, ticker, year, rows)
+
+            last_call_id = calls[-1][0]
+            db.execute(
+                "INSERT INTO export_state (export_dir, last_call_id, updated_at) VALUES (?, ?, ?) "
+                "ON CONFLICT(export_dir) DO UPDATE SET last_call_id = excluded.last_call_id, updated_at = excluded.updated_at",
+                (export_dir, last_call_id, datetime.utcnow().strftime("%Y-%m-%d %H:%M:%S"))
+            )
+            db.commit()
+        return dict(exported)
+
+
+def read_dataset(dataset: str, symbols: Optional[Iterable[str]] = None, years: Optional[Iterable[int]] = None,
+                 columns: Optional[List[str]] = None, export_dir: str = COLUMNAR_EXPORT_DIR) -> pa.Table:
+    """
+    Reads an exported dataset, scanning only the partitions of the given symbols and years.
+
+    Args:
+        dataset (str): One of DATASETS
+        symbols (Iterable[str], optional): The tickers to read
+        years (Iterable[int], optional): The years to read
+        columns (List[str], optional): The columns to read; symbol and year are always included
+        export_dir (str): The root directory of the exported datasets
+
+    Returns:
+        pa.Table: The rows, with the symbol and year columns. Empty if nothing was exported.
+    """
+    if dataset not in DATASETS:
+        raise ValueError(f"Unknown dataset '{dataset}'. Expected one of {', '.join(DATASETS)}")
+    partitioning = ds.partitioning(pa.schema([("symbol", pa.string()), ("year", pa.int32())]), flavor="hive")
+    schema = pa.unify_schemas([pa.schema([("symbol", pa.string()), ("year", pa.int32())]), dataset_schema(dataset)])
+    selected = ["symbol", "year"] + [column for column in (columns or dataset_schema(dataset).names) if column not in ("symbol", "year")]
+
+    root = os.path.join(export_dir, dataset)
+    if not os.path.isdir(root):
+        return schema.empty_table().select(selected)
+
+    filters = []
+    if symbols is not None:
+        filters.append(pc.field("symbol").isin([symbol.strip().upper() for symbol in symbols]))
+    if years is not None:
+        filters.append(pc.field("year").isin([int(year) for year in years]))
+    expression = None
+    for condition in filters:
+        expression = condition if expression is None else expression & condition
+
+    files = ds.dataset(root, format="parquet", partitioning=partitioning, schema=schema, exclude_invalid_files=True)
+    return files.to_table(columns=selected, filter=expression)
+
+
+def export_cache(db_name: str = DB_NAME, export_dir: str = COLUMNAR_EXPORT_DIR) -> Dict[str, int]:
+    """Exports the responses of the cache database logged since the previous export."""
+    db = DB(sqlite3, db_name, timeout=30)
+    try:
+        return export_new_responses(db, export_dir)
+    finally:
+        db.close()
+
+
+if __name__ == "__main__":
+    for dataset, count in export_cache().items():
+        print(f"{dataset}: {count} records exported")
@@ -0,0 +1,245 @@
+"""
+document_store.py
+Full-text store of the news articles and business descriptions in the cached API responses.
+The responses are cached in API_calls as JSON blobs; when a response is logged, classify_url recognizes the Polygon
+ticker-details and news endpoints and extract_documents turns the response into one document per article or description,
+indexed by ticker and publish date in an FTS5 table. The agents can then search the growing local news corpus
+without any new Polygon or Google request.
+"""
+import json
+import re
+import sqlite3
+from datetime import datetime
+from typing import List, Optional
+from urllib.parse import urlparse
+from database.db import DB
+from database.init_db import init_db
+from database.fts import SNIPPET_TOKENS, fts_query
+
+DB_NAME = "stock_trading.db"
+
+# Document kinds
+KIND_NEWS = "news"
+KIND_DESCRIPTION = "description"
+
+TICKER_DETAILS_PATH = re.compile(r"^/v3/reference/tickers/(?P<ticker>[^/]+)$")
+NEWS_PATH = re.compile(r"^/v2/reference/news$")
+
+
+def classify_url(url: str) -> Optional[str]:
+    """
+    Returns the kind of documents in the response of an API url, or None if it has no documents.
+
+    Args:
+        url (str): The url of the API call, with or without query string
+
+    Returns:
+        Optional[str]: KIND_NEWS, KIND_DESCRIPTION or None
+    """
+    parsed = urlparse(url)
+    if not parsed.netloc.endswith("polygon.io"):
+        return None
+    if NEWS_PATH.match(parsed.path):
+        return KIND_NEWS
+    if TICKER_DETAILS_PATH.match(parsed.path):
+        return KIND_DESCRIPTION
+    return None
+
+
+def extract_documents(url: str, params: Optional[dict], response_text: str) -> List[dict]:
+    """
+    Extracts the documents of a cached API response.
+
+    Args:
+        url (str): The url of the API call
+        params (dict, optional): The params of the API call
+        response_text (str): The response body
+
+    Returns:
+        List[dict]: One document per (article, ticker) or description, with kind, doc_key, ticker, title, body,
+        source, url and published keys. Empty if the url has no documents or the response can't be parsed.
+    """
+    kind = classify_url(url)
+    if kind is None:
+        return []
+    try:
+        data = json.loads(response_text)
+    except (TypeError, json.JSONDecodeError):
+        return []
+    if not isinstance(data, dict):
+        return []
+
+    if kind == KIND_DESCRIPTION:
+        details = data.get("results") or {}
+        if not isinstance(details, dict) or not details.get("description"):
+            return []
+        ticker = details.get("ticker") or TICKER_DETAILS_PATH.match(urlparse(url).path).group("ticker")
+        return [{
+            "kind": KIND_DESCRIPTION,
+            "doc_key": ticker.upper(),
+            "ticker": ticker.upper(),
+            "title": details.get("name", ticker.upper()),
+            "body": details["description"],
+            "source": "Polygon ticker details",
+            "url": details.get("homepage_url", ""),
+            "published": details.get("list_date", ""),
+        }]
+
+    documents = []
+    requested_ticker = (params or {}).get("ticker")
+    for article in data.get("results") or []:
+        if not isinstance(article, dict) or not (article.get("title") or article.get("description")):
+            continue
+        tickers = article.get("tickers") or ([requested_ticker] if requested_ticker else [])
+        for ticker in dict.fromkeys(str(ticker).upper() for ticker in tickers):
+            documents.append({
+                "kind": KIND_NEWS,
+                "doc_key": article.get("id") or article.get("article_url") or article.get("title"),
+                "ticker": ticker,
+                "title": article.get("title", ""),
+                "body": article.get("description", ""),
+                "source": (article.get("publisher") or {}).get("name", ""),
+                "url": article.get("article_url", ""),
+                "published": article.get("published_utc", ""),
+            })
+    return documents
+
+
+def index_documents(db: DB, documents: List[dict]) -> int:
+    """
+    Adds documents to the store, ignoring the ones already indexed. Does not commit.
+
+    Args:
+        db (DB): An open database connection
+        documents (List[dict]): Documents from extract_documents
+
+    Returns:
+        int: The number of new documents
+    """
+    if not documents:
+        return 0
+    indexed_at = datetime.utcnow().strftime("%Y-%m-%d %H:%M:%S")
+    cursor = db.cursor
+    cursor.executemany(
+        """
+        INSERT OR IGNORE INTO documents (kind, doc_key, ticker, title, body, source, url, published, indexed_at)
+        VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+        """,
+        [
+            (doc["kind"], doc["doc_key"], doc["ticker"], doc["title"], doc["body"], doc["source"], doc["url"], doc["published"], indexed_at)
+            for doc in documents
+        ]
+    )
+    # rowcount counts the inserted rows only, not the ignored duplicates or the rows written by the FTS triggers
+    return cursor.rowcount
+
+
+def index_api_response(db: DB, url: str, params: Optional[dict], response_text: str) -> int:
+    """Extracts and indexes the documents of a cached API response. Does not commit."""
+    return index_documents(db, extract_documents(url, params, response_text))
+
+
+class DocumentStore:
+    def __init__(self, db_name: str = DB_NAME):
+        """
+        Args:
+            db_name (str): The SQLite database file
+        """
+        self.db_name = db_name
+        init_db(db_name)
+
+    def _connect(self) -> DB:
+        return DB(sqlite3, self.db_name, timeout=30)
+
+    def backfill(self) -> int:
+        """
+        Indexes the documents of the responses cached before the store existed.
+
+        Returns:
+            int: The number of new documents
+        """
+        db = self._connect()
+        try:
+            added = 0
+            rows = db.execute("SELECT url, params, response FROM API_calls WHERE url LIKE '%polygon.io%'").fetchall()
+            for url, params, response in rows:
+                try:
+                    params = json.loads(params) if params else {}
+                except json.JSONDecodeError:
+                    params = {}
+                added += index_api_response(db, url, params if isinstance(params, dict) else {}, response)
+            db.commit()
+            return added
+        finally:
+            db.close()
+
+    def search(self, query: str, ticker: Optional[str] = None, kind: Optional[str] = None,
+               published_before: Optional[str] = None, limit: int = 5) -> List[dict]:
+        """
+        Returns the documents most relevant to a query, best first.
+
+        Args:
+            query (str): The query in natural language
+            ticker (str, optional): Only documents about this ticker
+            kind (str, optional): KIND_NEWS or KIND_DESCRIPTION
+            published_before (str, optional): Only documents published up to this date (YYYY-MM-DD). Descriptions
+                without a date are always included.
+            limit (int): Maximum number of documents
+
+        Returns:
+            List[dict]: The documents with their kind, ticker, title, body, source, url, published date,
+            a snippet around the matched words and the BM25 score (lower is more relevant)
+        """
+        match = fts_query(query)
+        if not match:
+            return []
+        sql = f"""
+            SELECT documents.kind, documents.ticker, documents.title, documents.body, documents.source, documents.url,
+                   documents.published, snippet(documents_fts, 1, '', '', ' ... ', {SNIPPET_TOKENS}) AS snippet,
+                   bm25(documents_fts) AS score
+            FROM documents_fts JOIN documents ON documents.id = documents_fts.rowid
+            WHERE documents_fts MATCH ?
+            """
+        params = [match]
+        if ticker:
+            sql += " AND documents.ticker = ?"
+            params.append(ticker.strip().upper())
+        if kind:
+            sql += " AND documents.kind = ?"
+            params.append(kind)
+        if published_before:
+            # Dates are ISO strings, so the end of the day sorts after every timestamp of that day
+            sql += " AND (documents.published = '' OR documents.published <= ?)"
+            params.append(f"{published_before}T23:59:59Z")
+        sql += " ORDER BY score LIMIT ?"
+        params.append(limit)
+
+        db = self._connect()
+        try:
+            cursor = db.execute(sql, tuple(params))
+            columns = [column[0] for column in cursor.description]
+            return [dict(zip(columns, row)) for row in cursor.fetchall()]
+        finally:
+            db.close()
+
+    def count(self, ticker: Optional[str] = None) -> int:
+        """Returns the number of documents, optionally about one ticker."""
+        db = self._connect()
+        try:
+            if ticker:
+                return db.execute("SELECT COUNT(*) FROM documents WHERE ticker = ?", (ticker.strip().upper(),)).fetchone()[0]
+            return db.execute("SELECT COUNT(*) FROM documents").fetchone()[0]
+        finally:
+            db.close()
+
+
+_document_store = None
+
+
+def get_document_store() -> DocumentStore:
+    """Returns the document store of the application database, with the responses cached before it existed indexed."""
+    global _document_store
+    if _document_store is None:
+        _document_store = DocumentStore()
+        _document_store.backfill()
+    return _document_store
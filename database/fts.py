@@ -0,0 +1,33 @@
+"""
+fts.py
+Helpers of the SQLite FTS5 searches over the discussions (run_store.py) and the documents (document_store.py).
+This module has no project imports, so both stores can use it without importing each other.
+"""
+import re
+
+# Maximum tokens of a search snippet
+SNIPPET_TOKENS = 48
+# Words that don't help to rank messages
+STOP_WORDS = {
+    "a", "an", "and", "are", "as", "at", "be", "by", "did", "do", "does", "for", "from", "how", "in", "is", "it", "of",
+    "on", "or", "the", "their", "this", "to", "was", "were", "what", "when", "which", "who", "why", "with",
+}
+
+
+def fts_query(text: str) -> str:
+    """
+    Turns a natural-language question into an FTS5 query that matches any of its words.
+    Words are quoted, so FTS5 operators and punctuation in the question are ignored, and BM25 ranks
+    the messages that contain more (and rarer) words first.
+
+    Args:
+        text (str): The question, e.g. "how did the Solid_Analyst justify the allocation"
+
+    Returns:
+        str: The FTS5 query, or an empty string if the question has no searchable words
+    """
+    words = []
+    for word in re.findall(r"[A-Za-z0-9]+", text.lower()):
+        if word not in STOP_WORDS and word not in words:
+            words.append(word)
+    return " OR ".join(f'"{word}"' for word in words)
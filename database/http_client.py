@@ -0,0 +1,274 @@
+"""
+http_client.py
+Managed HTTP clients for the upstream APIs (FMP, Polygon, Google) and the caching service.
+HttpClient keeps one pooled keep-alive session per API host (FMP, Polygon, Google and the caching service), and a few
+least recently used sessions for other hosts, such as the pages of search results. AsyncHttpClient keeps one pooled
+httpx.AsyncClient per event loop, for the async agent tools. Both apply connect/read timeouts to every request,
+and retry 429/5xx responses and connection errors with jittered exponential backoff that respects Retry-After.
+Every attempt to a rate-limited provider first waits for a token from the upstream scheduler (rate_limiter.py).
+
+Configuration (.env):
+    HTTP_CONNECT_TIMEOUT - seconds to establish a connection (default: 5)
+    HTTP_READ_TIMEOUT - seconds to wait for the response (default: 30)
+    HTTP_MAX_RETRIES - retries after the first attempt (default: 3)
+    HTTP_BACKOFF_BASE - base delay of the exponential backoff in seconds (default: 0.5)
+    HTTP_BACKOFF_MAX - maximum delay between retries in seconds (default: 30)
+"""
+import os
+import random
+import threading
+import time
+import weakref
+import asyncio
+from collections import OrderedDict
+from datetime import datetime, timezone
+from email.utils import parsedate_to_datetime
+from typing import Dict, Optional, Tuple
+from urllib.parse import urlsplit
+import httpx
+import requests
+from dotenv import load_dotenv
+from requests.adapters import HTTPAdapter
+from database.rate_limiter import PROVIDER_HOSTS, get_upstream_scheduler
+
+RETRY_STATUS_CODES = {429, 500, 502, 503, 504}
+# Hosts whose sessions are kept for the life of the process: the upstream APIs and the caching service
+POOLED_HOSTS = set(PROVIDER_HOSTS) | {"localhost", "127.0.0.1"}
+# Sessions kept for the other hosts, the least recently used is dropped first
+OTHER_HOSTS_MAX_SESSIONS = 8
+
+
+def _env_number(name: str, default: float) -> float:
+    """Reads a numeric setting from the environment, falling back to the default if it is missing or invalid."""
+    value = os.getenv(name)
+    try:
+        return float(value) if value is not None else default
+    except ValueError:
+        print(f"Invalid value for {name}: {value}. Using {default}.")
+        return default
+
+
+class _RetryingClient:
+    """Timeouts and retry policy shared by the sync and async clients."""
+    def __init__(self, connect_timeout: float = 5, read_timeout: float = 30, max_retries: int = 3,
+                 backoff_base: float = 0.5, backoff_max: float = 30, pool_maxsize: int = 10):
+        """
+        Args:
+            connect_timeout (float): Seconds to establish a connection
+            read_timeout (float): Seconds to wait for the response
+            max_retries (int): Retries after the first attempt on 429/5xx responses and connection errors
+            backoff_base (float): Base delay of the exponential backoff in seconds
+            backoff_max (float): Maximum delay between retries in seconds
+            pool_maxsize (int): Maximum number of kept-alive connections per host
+        """
+        self.timeout = (connect_timeout, read_timeout)
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.pool_maxsize = pool_maxsize
+
+    @classmethod
+    def from_env(cls):
+        """Creates a client configured from the environment variables."""
+        load_dotenv()
+        return cls(
+            connect_timeout=_env_number("HTTP_CONNECT_TIMEOUT", 5),
+            read_timeout=_env_number("HTTP_READ_TIMEOUT", 30),
+            max_retries=int(_env_number("HTTP_MAX_RETRIES", 3)),
+            backoff_base=_env_number("HTTP_BACKOFF_BASE", 0.5),
+            backoff_max=_env_number("HTTP_BACKOFF_MAX", 30),
+        )
+
+    def retry_delay(self, attempt: int, response=None) -> float:
+        """
+        Returns the delay before the next attempt: the Retry-After header if the server sent one,
+        otherwise a full-jitter exponential backoff.
+
+        Args:
+            attempt (int): The number of the failed attempt, starting from 0
+            response (requests.Response | httpx.Response, optional): The failed response, if any
+        """
+        retry_after = response.headers.get("Retry-After") if response is not None else None
+        if retry_after:
+            try:
+                return min(float(retry_after), self.backoff_max)
+            except ValueError:
+                try:
+                    retry_at = parsedate_to_datetime(retry_after)
+                    return min(max((retry_at - datetime.now(timezone.utc)).total_seconds(), 0), self.backoff_max)
+                except (TypeError, ValueError):
+                    pass
+        return random.uniform(0, min(self.backoff_max, self.backoff_base * (2 ** attempt)))
+
+
+class HttpClient(_RetryingClient):
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._sessions: Dict[str, requests.Session] = {}
+        self._other_sessions: "OrderedDict[str, requests.Session]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def _new_session(self, host: str) -> requests.Session:
+        session = requests.Session()
+        session.mount(host, HTTPAdapter(pool_connections=1, pool_maxsize=self.pool_maxsize))
+        return session
+
+    def session(self, url: str) -> requests.Session:
+        """
+        Returns the session of the URL's host, creating it on first use.
+        The sessions of the API hosts are kept; only the OTHER_HOSTS_MAX_SESSIONS most recently used other hosts are.
+        A dropped session is not closed, since a request may still use it: its connections close once it is collected.
+        """
+        parts = urlsplit(url)
+        host = f"{parts.scheme}://{parts.netloc}"
+        with self._lock:
+            if parts.hostname in POOLED_HOSTS:
+                session = self._sessions.get(host)
+                if session is None:
+                    session = self._sessions[host] = self._new_session(host)
+                return session
+
+            session = self._other_sessions.get(host)
+            if session is None:
+                session = self._other_sessions[host] = self._new_session(host)
+                if len(self._other_sessions) > OTHER_HOSTS_MAX_SESSIONS:
+                    self._other_sessions.popitem(last=False)
+            else:
+                self._other_sessions.move_to_end(host)
+            return session
+
+    def request(self, method: str, url: str, retries: Optional[int] = None,
+                timeout: Optional[Tuple[float, float]] = None, **kwargs) -> requests.Response:
+        """
+        Sends a request through the host's pooled session, retrying 429/5xx responses and connection errors.
+
+        Args:
+            method (str): The HTTP method
+            url (str): The request URL
+            retries (int, optional): Overrides the number of retries (e.g. 0 for non-idempotent calls)
+            timeout (tuple, optional): Overrides the (connect, read) timeouts
+            **kwargs: Passed to requests.Session.request (params, json, headers...)
+
+        Returns:
+            requests.Response: The last response. Raises the last exception if no response was received.
+        """
+        retries = self.max_retries if retries is None else retries
+        session = self.session(url)
+
+        for attempt in range(retries + 1):
+            get_upstream_scheduler().acquire(url)
+            try:
+                response = session.request(method, url, timeout=timeout or self.timeout, **kwargs)
+            except (requests.exceptions.ConnectionError, requests.exceptions.Timeout) as e:
+                if attempt == retries:
+                    raise
+                print(f"Request to {urlsplit(url).netloc} failed ({e.__class__.__name__}), retrying...")
+                time.sleep(self.retry_delay(attempt))
+                continue
+
+            if response.status_code not in RETRY_STATUS_CODES or attempt == retries:
+                return response
+            print(f"Request to {urlsplit(url).netloc} returned {response.status_code}, retrying...")
+            time.sleep(self.retry_delay(attempt, response))
+
+    def get(self, url: str, **kwargs) -> requests.Response:
+        return self.request("GET", url, **kwargs)
+
+    def post(self, url: str, **kwargs) -> requests.Response:
+        return self.request("POST", url, **kwargs)
+
+    def close(self):
+        """Closes all the pooled sessions."""
+        with self._lock:
+            for session in list(self._sessions.values()) + list(self._other_sessions.values()):
+                session.close()
+            self._sessions.clear()
+            self._other_sessions.clear()
+
+
+class AsyncHttpClient(_RetryingClient):
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        # httpx.AsyncClient connections belong to the event loop that opened them
+        self._clients = weakref.WeakKeyDictionary()
+
+    def client(self) -> httpx.AsyncClient:
+        """Returns the pooled client of the running event loop, creating it on first use."""
+        loop = asyncio.get_running_loop()
+        client = self._clients.get(loop)
+        if client is None or client.is_closed:
+            client = httpx.AsyncClient(limits=httpx.Limits(max_keepalive_connections=self.pool_maxsize))
+            self._clients[loop] = client
+        return client
+
+    async def request(self, method: str, url: str, retries: Optional[int] = None,
+                      timeout: Optional[Tuple[float, float]] = None, **kwargs) -> httpx.Response:
+        """
+        Async version of HttpClient.request.
+
+        Args:
+            method (str): The HTTP method
+            url (str): The request URL
+            retries (int, optional): Overrides the number of retries (e.g. 0 for non-idempotent calls)
+            timeout (tuple, optional): Overrides the (connect, read) timeouts
+            **kwargs: Passed to httpx.AsyncClient.request (params, json, headers...)
+
+        Returns:
+            httpx.Response: The last response. Raises the last exception if no response was received.
+        """
+        retries = self.max_retries if retries is None else retries
+        connect_timeout, read_timeout = timeout or self.timeout
+        client = self.client()
+
+        for attempt in range(retries + 1):
+            await get_upstream_scheduler().acquire_async(url)
+            try:
+                response = await client.request(
+                    method, url, timeout=httpx.Timeout(read_timeout, connect=connect_timeout), **kwargs
+                )
+            except httpx.TransportError as e:
+                if attempt == retries:
+                    raise
+                print(f"Request to {urlsplit(url).netloc} failed ({e.__class__.__name__}), retrying...")
+                await asyncio.sleep(self.retry_delay(attempt))
+                continue
+
+            if response.status_code not in RETRY_STATUS_CODES or attempt == retries:
+                return response
+            print(f"Request to {urlsplit(url).netloc} returned {response.status_code}, retrying...")
+            await asyncio.sleep(self.retry_delay(attempt, response))
+
+    async def get(self, url: str, **kwargs) -> httpx.Response:
+        return await self.request("GET", url, **kwargs)
+
+    async def post(self, url: str, **kwargs) -> httpx.Response:
+        return await self.request("POST", url, **kwargs)
+
+    async def aclose(self):
+        """Closes the pooled client of the running event loop."""
+        client = self._clients.pop(asyncio.get_running_loop(), None)
+        if client is not None:
+            await client.aclose()
+
+
+_http_client = None
+_async_http_client = None
+_http_client_lock = threading.Lock()
+
+
+def get_http_client() -> HttpClient:
+    """Returns the process-wide HTTP client, so every caller shares the same connection pools."""
+    global _http_client
+    with _http_client_lock:
+        if _http_client is None:
+            _http_client = HttpClient.from_env()
+        return _http_client
+
+
+def get_async_http_client() -> AsyncHttpClient:
+    """Returns the process-wide async HTTP client, so every coroutine of a loop shares the same connection pool."""
+    global _async_http_client
+    with _http_client_lock:
+        if _async_http_client is None:
+            _async_http_client = AsyncHttpClient.from_env()
+        return _async_http_client
@@ -17,4 +17,73 @@ def init_db(db_name: str):
         "timestamp": "DATETIME DEFAULT CURRENT_TIMESTAMP"
     })
 
+    # Lock rows used to coalesce identical upstream requests across processes
+    table.create_table("API_locks", {
+        "key": "TEXT PRIMARY KEY",
+        "owner": "TEXT NOT NULL",
+        "expires_at": "REAL NOT NULL"
+    })
+
+    # Token buckets of the upstream quotas, shared by the processes (see rate_limiter.py)
+    table.create_table("API_rate_buckets", {
+        "provider": "TEXT PRIMARY KEY",
+        "tokens": "REAL NOT NULL",
+        "updated_at": "REAL NOT NULL"
+    })
+
+    # Discussion runs: one row per analysis, with the messages of both houses and the judges
+    table.create_table("runs", {
+        "run_id": "TEXT PRIMARY KEY",
+        "stocks": "TEXT NOT NULL",
+        "budget": "REAL",
+        "start_year": "INTEGER",
+        "end_year": "INTEGER",
+        "status": "TEXT NOT NULL DEFAULT 'running'",
+        "created_at": "DATETIME DEFAULT CURRENT_TIMESTAMP",
+        "finished_at": "DATETIME"
+    })
+    table.create_table("run_messages", {
+        "id": "INTEGER PRIMARY KEY AUTOINCREMENT",
+        "run_id": "TEXT NOT NULL REFERENCES runs(run_id)",
+        "house_id": "INTEGER NOT NULL",
+        "seq": "INTEGER NOT NULL",
+        "role": "TEXT NOT NULL",
+        "content": "TEXT NOT NULL",
+        "tokens": "INTEGER NOT NULL",
+        "created_at": "DATETIME DEFAULT CURRENT_TIMESTAMP"
+    })
+    table.create_index("idx_run_messages_run_house", "run_messages", ["run_id", "house_id", "seq"])
+    table.create_index("idx_run_messages_run_role", "run_messages", ["run_id", "role"])
+    table.create_index("idx_runs_created_at", "runs", ["created_at"])
+    # Full-text index of the messages, for the judges' retrieval over the discussions
+    table.create_fts_table("run_messages_fts", "run_messages", ["content"])
+
+    # News articles and business descriptions extracted from the cached API responses
+    table.create_table("documents", {
+        "id": "INTEGER PRIMARY KEY AUTOINCREMENT",
+        "kind": "TEXT NOT NULL",
+        "doc_key": "TEXT NOT NULL",
+        "ticker": "TEXT NOT NULL",
+        "title": "TEXT NOT NULL",
+        "body": "TEXT NOT NULL",
+        "source": "TEXT",
+        "url": "TEXT",
+        "published": "TEXT NOT NULL DEFAULT ''",
+        "indexed_at": "DATETIME DEFAULT CURRENT_TIMESTAMP"
+    })
+    table.create_index("idx_documents_key", "documents", ["kind", "doc_key", "ticker"], unique=True)
+    table.create_index("idx_documents_ticker_published", "documents", ["ticker", "published"])
+    table.create_fts_table("documents_fts", "documents", ["title", "body"])
+
+    # Point-in-time snapshots of the API responses: the records available on each as-of date
+    table.create_table("snapshots", {
+        "id": "INTEGER PRIMARY KEY AUTOINCREMENT",
+        "url": "TEXT NOT NULL",
+        "params": "TEXT NOT NULL",
+        "as_of": "TEXT NOT NULL",
+        "response": "TEXT NOT NULL",
+        "created_at": "DATETIME DEFAULT CURRENT_TIMESTAMP"
+    })
+    table.create_index("idx_snapshots_key", "snapshots", ["url", "params", "as_of"], unique=True)
+
     db.close()
\ No newline at end of file
@@ -0,0 +1,15 @@
+"""
+Pydantic model for the request body.
+
+Uses the BaseModel class from Pydantic to validate incoming request data against the model, 
+raise errors for missing/incorrect fields, and convert JSON into a Python object.
+"""
+from pydantic import BaseModel
+from typing import List
+from config.app_constants import BUDGET, END_YEAR, START_YEAR
+
+class JobSpec(BaseModel):
+    stocks: List[str]
+    budget: float = BUDGET
+    start_year: int = START_YEAR
+    end_year: int = END_YEAR
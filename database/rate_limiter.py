@@ -0,0 +1,331 @@
+"""
+rate_limiter.py
+Central scheduler for the upstream API quotas.
+Every provider (FMP, Polygon, Google) has a token bucket refilled at its requests-per-minute quota.
+The buckets are rows of the cache database (API_rate_buckets, next to the API_locks table), so the app, the caching
+service and the competition worker processes share one quota per provider instead of one each.
+Within a process, requests wait in a per-provider priority queue, so interactive discussion calls are served before
+prefetch traffic, and the queue depth of each provider is exposed as a metric.
+
+Configuration (.env):
+    FMP_REQUESTS_PER_MINUTE (default: 300)
+    POLYGON_REQUESTS_PER_MINUTE (default: 5, the free tier)
+    GOOGLE_REQUESTS_PER_MINUTE (default: 100)
+"""
+import asyncio
+import heapq
+import itertools
+import os
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Callable, Dict, Optional
+from urllib.parse import urlsplit
+from dotenv import load_dotenv
+from database.db import DB
+from database.init_db import init_db
+
+DB_NAME = "stock_trading.db"
+
+# Priority classes, lower is served first
+INTERACTIVE = 0
+PREFETCH = 1
+PRIORITY_NAMES = {INTERACTIVE: "interactive", PREFETCH: "prefetch"}
+
+PROVIDER_HOSTS = {
+    "financialmodelingprep.com": "fmp",
+    "api.polygon.io": "polygon",
+    "customsearch.googleapis.com": "google",
+}
+DEFAULT_REQUESTS_PER_MINUTE = {
+    "fmp": 300,
+    "polygon": 5,
+    "google": 100,
+}
+# Upper bound of a waiter's sleep, so waiters re-check the queue when the head changes
+MAX_WAIT_SECONDS = 0.25
+
+_request_priority: ContextVar[int] = ContextVar("request_priority", default=INTERACTIVE)
+
+
+@contextmanager
+def request_priority(priority: int):
+    """Sets the priority class of the upstream requests made in this context (thread or asyncio task)."""
+    token = _request_priority.set(priority)
+    try:
+        yield
+    finally:
+        _request_priority.reset(token)
+
+
+def provider_for_url(url: str) -> Optional[str]:
+    """Returns the rate-limited provider of the URL, or None for hosts without a quota (e.g. the caching service)."""
+    return PROVIDER_HOSTS.get(urlsplit(url).hostname or "")
+
+
+class TokenBucket:
+    def __init__(self, rate_per_second: float, capacity: float, clock: Callable[[], float] = time.monotonic):
+        """
+        Args:
+            rate_per_second (float): Tokens added per second
+            capacity (float): Maximum number of tokens, i.e. the allowed burst
+            clock (Callable): Monotonic clock, injectable for tests
+        """
+        self.rate_per_second = rate_per_second
+        self.capacity = capacity
+        self.clock = clock
+        self.tokens = capacity
+        self.updated_at = clock()
+
+    def _refill(self):
+        now = self.clock()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated_at) * self.rate_per_second)
+        self.updated_at = now
+
+    def try_acquire(self) -> bool:
+        """Takes a token if one is available. Not thread-safe, callers hold the scheduler lock."""
+        self._refill()
+        if self.tokens >= 1:
+            self.tokens -= 1
+            return True
+        return False
+
+    def time_until_available(self) -> float:
+        """Returns the seconds until a token is available."""
+        self._refill()
+        return max(0.0, (1 - self.tokens) / self.rate_per_second)
+
+    def available(self) -> float:
+        """Returns the tokens available now."""
+        self._refill()
+        return self.tokens
+
+
+class SharedTokenBucket:
+    def __init__(self, provider: str, rate_per_second: float, capacity: float, db_name: str = DB_NAME,
+                 clock: Callable[[], float] = time.time):
+        """
+        Token bucket stored in the API_rate_buckets table, shared by every process using the database.
+
+        Args:
+            provider (str): The provider of the bucket, the key of its row
+            rate_per_second (float): Tokens added per second
+            capacity (float): Maximum number of tokens, i.e. the allowed burst
+            db_name (str): The SQLite database file
+            clock (Callable): Wall clock, the same in every process; injectable for tests
+        """
+        self.provider = provider
+        self.rate_per_second = rate_per_second
+        self.capacity = capacity
+        self.db_name = db_name
+        self.clock = clock
+        init_db(db_name)
+        db = self._connect()
+        db.execute(
+            "INSERT OR IGNORE INTO API_rate_buckets (provider, tokens, updated_at) VALUES (?, ?, ?)",
+            (provider, capacity, clock())
+        )
+        db.commit()
+        db.close()
+
+    def _connect(self) -> DB:
+        return DB(sqlite3, self.db_name, timeout=30)
+
+    def _refilled(self, tokens: float, updated_at: float, now: float) -> float:
+        return min(self.capacity, tokens + max(0.0, now - updated_at) * self.rate_per_second)
+
+    def _available(self, db: DB, now: float) -> float:
+        tokens, updated_at = db.execute(
+            "SELECT tokens, updated_at FROM API_rate_buckets WHERE provider = ?", (self.provider,)
+        ).fetchone()
+        return self._refilled(tokens, updated_at, now)
+
+    def available(self) -> float:
+        """Returns the tokens available now."""
+        db = self._connect()
+        tokens = self._available(db, self.clock())
+        db.close()
+        return tokens
+
+    def try_acquire(self) -> bool:
+        """
+        Takes a token if one is available. The refill and the take are one UPDATE, atomic across processes.
+        An empty bucket is only read, so waiting requests don't take the database's write lock.
+        """
+        now = self.clock()
+        db = self._connect()
+        if self._available(db, now) < 1:
+            db.close()
+            return False
+        cursor = db.execute(
+            """
+            UPDATE API_rate_buckets
+            SET tokens = MIN(:capacity, tokens + MAX(0, :now - updated_at) * :rate) - 1, updated_at = MAX(updated_at, :now)
+            WHERE provider = :provider AND MIN(:capacity, tokens + MAX(0, :now - updated_at) * :rate) >= 1
+            """,
+            {"capacity": self.capacity, "now": now, "rate": self.rate_per_second, "provider": self.provider}
+        )
+        acquired = cursor.rowcount == 1
+        db.commit()
+        db.close()
+        return acquired
+
+    def time_until_available(self) -> float:
+        """Returns the seconds until a token is available."""
+        return max(0.0, (1 - self.available()) / self.rate_per_second)
+
+
+class UpstreamScheduler:
+    def __init__(self, requests_per_minute: Dict[str, float], clock: Callable[[], float] = time.monotonic,
+                 db_name: Optional[str] = None):
+        """
+        Args:
+            requests_per_minute (dict): The quota of each provider
+            clock (Callable): Monotonic clock of the in-process buckets, injectable for tests
+            db_name (str, optional): The database of the shared buckets. Without it the buckets are kept in memory,
+                and the quotas apply to this process only.
+        """
+        if db_name:
+            self._buckets = {
+                provider: SharedTokenBucket(provider, rate / 60, capacity=max(1, rate), db_name=db_name)
+                for provider, rate in requests_per_minute.items()
+            }
+        else:
+            self._buckets = {
+                provider: TokenBucket(rate / 60, capacity=max(1, rate), clock=clock)
+                for provider, rate in requests_per_minute.items()
+            }
+        # The shared buckets are read and written in the database, which the async path does in a worker thread
+        self._shared = bool(db_name)
+        self._queues = {provider: [] for provider in requests_per_minute}
+        self._counter = itertools.count()
+        self._condition = threading.Condition()
+
+    @classmethod
+    def from_env(cls, db_name: str = DB_NAME) -> "UpstreamScheduler":
+        """Creates a scheduler with the quotas from the environment variables, sharing its buckets through the database."""
+        load_dotenv()
+        requests_per_minute = {}
+        for provider, default in DEFAULT_REQUESTS_PER_MINUTE.items():
+            value = os.getenv(f"{provider.upper()}_REQUESTS_PER_MINUTE")
+            try:
+                requests_per_minute[provider] = float(value) if value else default
+            except ValueError:
+                print(f"Invalid value for {provider.upper()}_REQUESTS_PER_MINUTE: {value}. Using {default}.")
+                requests_per_minute[provider] = default
+        return cls(requests_per_minute, db_name=db_name)
+
+    def _enqueue(self, provider: str, priority: int):
+        ticket = (priority, next(self._counter))
+        with self._condition:
+            heapq.heappush(self._queues[provider], ticket)
+        return ticket
+
+    def _try_take(self, provider: str, ticket) -> float:
+        """
+        Takes a token if the ticket is at the head of the queue. Returns 0 on success, otherwise the seconds to wait.
+        Only the head of the queue uses the bucket, and outside the lock, so the database I/O of the shared buckets
+        doesn't block the other threads queueing or leaving.
+        """
+        with self._condition:
+            at_head = self._queues[provider][0] == ticket
+        if not at_head:
+            return MAX_WAIT_SECONDS
+        bucket = self._buckets[provider]
+        if bucket.try_acquire():
+            self._cancel(provider, ticket)
+            return 0
+        return min(max(bucket.time_until_available(), 0.001), MAX_WAIT_SECONDS)
+
+    def _cancel(self, provider: str, ticket):
+        with self._condition:
+            queue = self._queues[provider]
+            if ticket in queue:
+                queue.remove(ticket)
+                heapq.heapify(queue)
+                self._condition.notify_all()
+
+    def acquire(self, url: str, priority: Optional[int] = None):
+        """
+        Blocks until the URL's provider has a token for this request. Hosts without a quota return immediately.
+
+        Args:
+            url (str): The request URL
+            priority (int, optional): INTERACTIVE or PREFETCH. Defaults to the priority of the current context.
+        """
+        provider = provider_for_url(url)
+        if provider not in self._buckets:
+            return
+        ticket = self._enqueue(provider, _request_priority.get() if priority is None else priority)
+        try:
+            while True:
+                wait = self._try_take(provider, ticket)
+                if not wait:
+                    return
+                with self._condition:
+                    self._condition.wait(wait)
+        except BaseException:
+            self._cancel(provider, ticket)
+            raise
+
+    async def acquire_async(self, url: str, priority: Optional[int] = None):
+        """Async version of acquire, waits without blocking the event loop. The shared buckets are used in a worker thread."""
+        provider = provider_for_url(url)
+        if provider not in self._buckets:
+            return
+        ticket = self._enqueue(provider, _request_priority.get() if priority is None else priority)
+        try:
+            while True:
+                if self._shared:
+                    wait = await asyncio.to_thread(self._try_take, provider, ticket)
+                else:
+                    wait = self._try_take(provider, ticket)
+                if not wait:
+                    return
+                await asyncio.sleep(wait)
+        except BaseException:
+            self._cancel(provider, ticket)
+            raise
+
+    def queue_depth(self, provider: Optional[str] = None) -> int:
+        """Returns the number of requests waiting for a token, for one provider or for all of them."""
+        with self._condition:
+            if provider:
+                return len(self._queues.get(provider, []))
+            return sum(len(queue) for queue in self._queues.values())
+
+    def stats(self) -> Dict[str, dict]:
+        """
+        Returns the available tokens of every provider, shared by all the processes with shared buckets,
+        and the queue depth per priority class of the requests waiting in this process.
+        """
+        with self._condition:
+            queues = {provider: list(queue) for provider, queue in self._queues.items()}
+        result = {}
+        for provider, queue in queues.items():
+            bucket = self._buckets[provider]
+            result[provider] = {
+                "requests_per_minute": bucket.rate_per_second * 60,
+                "tokens_available": round(bucket.available(), 2),
+                "queue_depth": len(queue),
+                "queued_by_priority": {
+                    name: sum(1 for priority, _ in queue if priority == level)
+                    for level, name in PRIORITY_NAMES.items()
+                },
+            }
+        return result
+
+
+_scheduler = None
+_scheduler_lock = threading.Lock()
+
+
+def get_upstream_scheduler() -> UpstreamScheduler:
+    """Returns the process-wide scheduler, shared by the sync and async HTTP clients. Its buckets are shared across processes."""
+    global _scheduler
+    with _scheduler_lock:
+        if _scheduler is None:
+            _scheduler = UpstreamScheduler.from_env()
+        return _scheduler
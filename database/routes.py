@@ -1,30 +1,70 @@
 """
 routes.py - FastAPI routes for logging and retrieving API calls
 """
+import asyncio
+import time
+from contextlib import asynccontextmanager
 from datetime import datetime, timedelta
-from fastapi import FastAPI, HTTPException
-from starlette.status import HTTP_200_OK, HTTP_400_BAD_REQUEST, HTTP_500_INTERNAL_SERVER_ERROR
+from typing import Optional
+from fastapi import BackgroundTasks, FastAPI, Header, HTTPException
+from fastapi.responses import FileResponse, RedirectResponse, StreamingResponse
+from starlette.status import HTTP_200_OK, HTTP_400_BAD_REQUEST, HTTP_404_NOT_FOUND, HTTP_500_INTERNAL_SERVER_ERROR
 from database.table_methods import TableMethods
 from database.db import DB
 import sqlite3
 from database.api_call import APICall
 from database.get_api_call_request import GetAPICallRequest
+from database.api_lock import APILock
+from database.rate_limiter import get_upstream_scheduler
+from database.document_store import index_api_response
+from database import columnar_export
+from database import run_store
+from database.job_spec import JobSpec
+from finance.point_in_time import RunContext
+from config.app_constants import COLUMNAR_EXPORT_DIR, COMPETITION_PROCESS_WORKERS, JOB_POLL_SECONDS
+from group_chats.competition_workers import CompetitionWorkerPool
+from utils import chart_service
 import json
 
 from database.api_call import APICall
 from database.get_api_call_request import GetAPICallRequest
 
 
-app = FastAPI()
+# Worker processes of the job service, running the competitions submitted to POST /jobs
+worker_pool = CompetitionWorkerPool()
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """Starts the competition workers with the service, and stops them on shutdown."""
+    if COMPETITION_PROCESS_WORKERS > 0:
+        worker_pool.start()
+    yield
+    await asyncio.to_thread(worker_pool.stop)
+
+
+app = FastAPI(lifespan=lifespan)
 
 def get_db():
     return DB(sqlite3, 'stock_trading.db')
 
+def export_columnar():
+    """Exports the fundamentals logged since the previous export to the Parquet datasets."""
+    db = get_db()
+    try:
+        columnar_export.export_new_responses(db, COLUMNAR_EXPORT_DIR)
+    except Exception as e:
+        print(f"Failed to export the cached fundamentals: {e}")
+    finally:
+        db.close()
+
+
 @app.post("/log_api_call")
-def log_api_call(api_call: APICall):
+def log_api_call(api_call: APICall, background_tasks: BackgroundTasks):
     """
     RESTful endpoint to log an API call.
     Takes in the API call data, validates it, and saves it to the database.
+    Fundamentals are exported to the Parquet datasets after the response is sent.
     """
     ...
     if api_call.url == "" or api_call.url is None:
@@ -48,7 +88,16 @@ def log_api_call(api_call: APICall):
 
         table_methods.insert_to_table("API_calls", data_to_insert)
         db.commit()
+        # News and descriptions in the response are indexed for the offline search; a failure doesn't lose the cached call
+        try:
+            index_api_response(db, api_call.url, api_call.params, api_call.response)
+            db.commit()
+        except Exception as e:
+            print(f"Failed to index documents of {api_call.url}: {e}")
+            db.rollback()
         db.close()
+        if columnar_export.classify_url(api_call.url):
+            background_tasks.add_task(export_columnar)
         return {"data": data_to_insert, "status_code": HTTP_200_OK}
 
     except Exception as e:
@@ -92,4 +141,184 @@ def get_api_call(request: GetAPICallRequest):
         raise HTTPException(
             status_code=HTTP_500_INTERNAL_SERVER_ERROR,
             detail=f"Failed to get API call: {str(e)}"
-        )
\ No newline at end of file
+        )
+
+
+@app.post("/acquire_api_lock")
+def acquire_api_lock(lock: APILock):
+    """
+    RESTful endpoint to acquire the lock row of an upstream request.
+    Only one owner can hold a key until it releases it or the lock expires,
+    so processes sharing the cache fetch each URL once.
+    """
+    if not lock.key or not lock.owner:
+        raise HTTPException(
+            status_code=HTTP_400_BAD_REQUEST,
+            detail="Missing required fields: 'key', 'owner'"
+        )
+    try:
+        db = get_db()
+        now = time.time()
+        db.execute("DELETE FROM API_locks WHERE key = ? AND expires_at < ?", (lock.key, now))
+        cursor = db.execute(
+            "INSERT OR IGNORE INTO API_locks (key, owner, expires_at) VALUES (?, ?, ?)",
+            (lock.key, lock.owner, now + lock.ttl_seconds)
+        )
+        acquired = cursor.rowcount == 1
+        db.commit()
+        db.close()
+        return {"acquired": acquired, "status_code": HTTP_200_OK}
+
+    except Exception as e:
+        raise HTTPException(
+            status_code=HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=f"Failed to acquire API lock: {str(e)}"
+        )
+
+
+@app.post("/release_api_lock")
+def release_api_lock(lock: APILock):
+    """
+    RESTful endpoint to release a lock row held by the given owner.
+    """
+    try:
+        db = get_db()
+        cursor = db.execute("DELETE FROM API_locks WHERE key = ? AND owner = ?", (lock.key, lock.owner))
+        released = cursor.rowcount == 1
+        db.commit()
+        db.close()
+        return {"released": released, "status_code": HTTP_200_OK}
+
+    except Exception as e:
+        raise HTTPException(
+            status_code=HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=f"Failed to release API lock: {str(e)}"
+        )
+
+
+@app.get("/upstream_scheduler")
+def upstream_scheduler_stats():
+    """
+    RESTful endpoint to monitor the upstream rate limits: the available tokens per provider, shared by every process
+    using the cache database, and the queue depth of the requests waiting in the service process.
+    """
+    return {"data": get_upstream_scheduler().stats(), "status_code": HTTP_200_OK}
+
+
+@app.get("/charts/company_comparison/{symbol}")
+def company_comparison_chart(symbol: str, competitor: Optional[str] = None, start_year: Optional[int] = None, end_year: Optional[int] = None):
+    """
+    RESTful endpoint to render (or reuse) the chart comparing a company with a competitor or its peer median,
+    with the data as of the end of the start year. Redirects to the memoized image.
+    """
+    try:
+        years = list(range(start_year, end_year + 1)) if start_year and end_year else None
+        context = RunContext.for_years(start_year, end_year) if years else None
+        chart_id = chart_service.get_chart_service().company_comparison(symbol.upper(), competitor.upper() if competitor else None, years, context)
+    except Exception as e:
+        raise HTTPException(
+            status_code=HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=f"Failed to render the chart: {str(e)}"
+        )
+    return RedirectResponse(f"/charts/{chart_id}.png")
+
+
+@app.get("/charts/{chart_id}.png")
+def get_chart(chart_id: str):
+    """
+    RESTful endpoint to serve a rendered chart. A chart id is the hash of its key, so its image never changes.
+    """
+    path = chart_service.get_chart_service().path(chart_id)
+    if path is None:
+        raise HTTPException(status_code=HTTP_404_NOT_FOUND, detail="Chart not found")
+    return FileResponse(path, media_type="image/png", headers={"Cache-Control": "public, max-age=31536000, immutable"})
+
+
+@app.post("/jobs")
+def submit_job(spec: JobSpec):
+    """
+    RESTful endpoint to submit a competition of both investment houses and the judges.
+    The job is queued in the runs table and run by the worker processes. Returns the job id, the id of its run.
+    """
+    stocks = [symbol.strip().upper() for symbol in spec.stocks if symbol.strip()]
+    if not stocks:
+        raise HTTPException(
+            status_code=HTTP_400_BAD_REQUEST,
+            detail="Missing required field: 'stocks'"
+        )
+    if spec.end_year < spec.start_year:
+        raise HTTPException(
+            status_code=HTTP_400_BAD_REQUEST,
+            detail="'end_year' must not be before 'start_year'"
+        )
+    try:
+        job_id = run_store.get_run_store().create_run(stocks, spec.budget, spec.start_year, spec.end_year, status="queued")
+    except Exception as e:
+        raise HTTPException(
+            status_code=HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=f"Failed to submit the job: {str(e)}"
+        )
+    return {"data": {"job_id": job_id, "status": "queued"}, "status_code": HTTP_200_OK}
+
+
+@app.get("/jobs")
+def list_jobs(limit: int = 20):
+    """
+    RESTful endpoint to list the most recent jobs with their status, newest first.
+    """
+    return {"data": run_store.get_run_store().list_runs(limit), "status_code": HTTP_200_OK}
+
+
+@app.get("/jobs/{job_id}")
+def get_job(job_id: str):
+    """
+    RESTful endpoint to get the status of a job, with its message and token totals.
+    """
+    job = run_store.get_run_store().get_run(job_id)
+    if job is None:
+        raise HTTPException(status_code=HTTP_404_NOT_FOUND, detail="Job not found")
+    return {"data": job, "status_code": HTTP_200_OK}
+
+
+def sse_event(event: str, data: dict, event_id: Optional[int] = None) -> str:
+    """Formats a server-sent event."""
+    lines = [f"id: {event_id}"] if event_id is not None else []
+    lines += [f"event: {event}", f"data: {json.dumps(data)}"]
+    return "\n".join(lines) + "\n\n"
+
+
+async def stream_job_events(job_id: str, after_id: int = 0):
+    """
+    Yields the events of a job, polling the run store every JOB_POLL_SECONDS seconds until the job is finished:
+    a "message" event per stored message after after_id, and a "status" event when the status changes.
+    """
+    store = run_store.get_run_store()
+    status = None
+    while True:
+        # The status is read first: the messages of a finished run are all stored before it finishes
+        job = await asyncio.to_thread(store.get_run, job_id)
+        while True:
+            messages = await asyncio.to_thread(store.get_messages_after, job_id, after_id)
+            for message in messages:
+                after_id = message["id"]
+                yield sse_event("message", message, after_id)
+            if not messages:
+                break
+        if job["status"] != status:
+            status = job["status"]
+            yield sse_event("status", {"job_id": job_id, "status": status})
+        if status not in run_store.ACTIVE_STATUSES:
+            return
+        await asyncio.sleep(JOB_POLL_SECONDS)
+
+
+@app.get("/jobs/{job_id}/events")
+def job_events(job_id: str, last_event_id: Optional[str] = Header(None)):
+    """
+    RESTful endpoint to stream the progress of a job as server-sent events, until the job is finished.
+    The id of a message event is the id of the message, so a reconnecting client resumes after the Last-Event-ID.
+    """
+    if run_store.get_run_store().get_run(job_id) is None:
+        raise HTTPException(status_code=HTTP_404_NOT_FOUND, detail="Job not found")
+    after_id = int(last_event_id) if last_event_id and last_event_id.isdigit() else 0
+    return StreamingResponse(stream_job_events(job_id, after_id), media_type="text/event-stream", headers={"Cache-Control": "no-cache"})
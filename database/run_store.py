@@ -0,0 +1,272 @@
+"""
+run_store.py
+Persistent store of the discussion runs in SQLite.
+Every analysis gets a run id, and each message of the houses and of the judges is stored as a row with its role,
+timestamp and token count. The (run, house) and (run, role) indexes let the judges fetch only the messages they need,
+the FTS5 index ranks messages by relevance to a question (BM25), and concurrent runs don't overwrite each other.
+"""
+import sqlite3
+import uuid
+from datetime import datetime
+from typing import List, Optional, Sequence
+from database.db import DB
+from database.fts import SNIPPET_TOKENS, fts_query
+from database.init_db import init_db
+from database.tokens import count_tokens
+
+DB_NAME = "stock_trading.db"
+# house_id of the judges' discussion
+JUDGES_HOUSE_ID = 0
+# Status of the runs that have not finished yet: queued runs wait for a worker (see group_chats/competition_workers.py)
+ACTIVE_STATUSES = ("queued", "running")
+class RunStore:
+    def __init__(self, db_name: str = DB_NAME):
+        """
+        Args:
+            db_name (str): The SQLite database file
+        """
+        self.db_name = db_name
+        init_db(db_name)
+        db = self._connect()
+        # WAL lets the runs of several sessions write while the judges read
+        db.execute("PRAGMA journal_mode=WAL")
+        db.close()
+
+    def _connect(self) -> DB:
+        return DB(sqlite3, self.db_name, timeout=30)
+
+    def create_run(self, stocks: List[str], budget: float = None, start_year: int = None, end_year: int = None,
+                   status: str = "running") -> str:
+        """
+        Creates a run.
+
+        Args:
+            stocks (List[str]): The stock symbols of the analysis
+            budget (float): The investment budget
+            start_year (int): The start year of the investment
+            end_year (int): The end year of the judgement
+            status (str): "running", or "queued" for a run that waits for a worker
+
+        Returns:
+            str: The run id
+        """
+        run_id = uuid.uuid4().hex
+        db = self._connect()
+        try:
+            db.execute(
+                "INSERT INTO runs (run_id, stocks, budget, start_year, end_year, status, created_at) VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (run_id, ",".join(symbol.strip() for symbol in stocks), budget, start_year, end_year, status, _now())
+            )
+            db.commit()
+        finally:
+            db.close()
+        return run_id
+
+    def start_run(self, run_id: str) -> bool:
+        """
+        Claims a queued run for a worker and marks it as running.
+
+        Returns:
+            bool: True if the run was queued and is now claimed, False if another worker claimed it first
+        """
+        db = self._connect()
+        try:
+            # The conditional update is atomic, so a run is claimed by exactly one worker
+            cursor = db.execute("UPDATE runs SET status = 'running' WHERE run_id = ? AND status = 'queued'", (run_id,))
+            db.commit()
+            return cursor.rowcount == 1
+        finally:
+            db.close()
+
+    def claim_next_run(self) -> Optional[dict]:
+        """Claims the oldest queued run for a worker. Returns the run, or None if the queue is empty."""
+        while True:
+            queued = self._fetch("SELECT * FROM runs WHERE status = 'queued' ORDER BY created_at, rowid LIMIT 1", [])
+            if not queued:
+                return None
+            if self.start_run(queued[0]["run_id"]):
+                return dict(queued[0], status="running")
+
+    def finish_run(self, run_id: str, status: str = "completed"):
+        """Marks the run as finished with the given status (e.g. completed or failed)."""
+        db = self._connect()
+        try:
+            db.execute("UPDATE runs SET status = ?, finished_at = ? WHERE run_id = ?", (status, _now(), run_id))
+            db.commit()
+        finally:
+            db.close()
+
+    def add_messages(self, run_id: str, house_id: int, messages: List[dict]) -> int:
+        """
+        Appends messages of a house (or of the judges) to the run, in one transaction.
+
+        Args:
+            run_id (str): The run id
+            house_id (int): The investment house (1 or 2), or JUDGES_HOUSE_ID
+            messages (List[dict]): The messages, with "role" and "content" keys
+
+        Returns:
+            int: The number of stored messages
+        """
+        db = self._connect()
+        try:
+            cursor = db.execute("SELECT COALESCE(MAX(seq), 0) FROM run_messages WHERE run_id = ? AND house_id = ?", (run_id, house_id))
+            seq = cursor.fetchone()[0]
+            rows = []
+            for message in messages:
+                content = str(message.get("content", ""))
+                seq += 1
+                rows.append((run_id, house_id, seq, message.get("role", "Unknown"), content, count_tokens(content), _now()))
+            db.cursor.executemany(
+                "INSERT INTO run_messages (run_id, house_id, seq, role, content, tokens, created_at) VALUES (?, ?, ?, ?, ?, ?, ?)",
+                rows
+            )
+            db.commit()
+            return len(rows)
+        except Exception:
+            db.rollback()
+            raise
+        finally:
+            db.close()
+
+    def get_messages(self, run_id: str, house_id: Optional[int] = None, role: Optional[str] = None, limit: Optional[int] = None) -> List[dict]:
+        """
+        Returns the messages of a run in order, optionally of one house and one agent.
+
+        Args:
+            run_id (str): The run id
+            house_id (int, optional): The investment house, or JUDGES_HOUSE_ID
+            role (str, optional): The agent name
+            limit (int, optional): Maximum number of messages
+
+        Returns:
+            List[dict]: The messages with their house_id, seq, role, content, tokens and created_at
+        """
+        query = "SELECT house_id, seq, role, content, tokens, created_at FROM run_messages WHERE run_id = ?"
+        params = [run_id]
+        if house_id is not None:
+            query += " AND house_id = ?"
+            params.append(house_id)
+        if role is not None:
+            query += " AND role = ?"
+            params.append(role)
+        query += " ORDER BY house_id, seq"
+        if limit is not None:
+            query += " LIMIT ?"
+            params.append(limit)
+        return self._fetch(query, params)
+
+    def get_messages_after(self, run_id: str, after_id: int = 0, limit: int = 100) -> List[dict]:
+        """
+        Returns the messages of a run stored after a message, in the order they were stored.
+        Used to stream the progress of a run: the id of the last message received is passed back to get the next ones.
+
+        Args:
+            run_id (str): The run id
+            after_id (int): The id of the last message received, 0 for the first messages
+            limit (int): Maximum number of messages
+
+        Returns:
+            List[dict]: The messages with their id, house_id, seq, role, content, tokens and created_at
+        """
+        return self._fetch(
+            "SELECT id, house_id, seq, role, content, tokens, created_at FROM run_messages WHERE run_id = ? AND id > ? ORDER BY id LIMIT ?",
+            [run_id, after_id, limit]
+        )
+
+    def search_messages(self, run_id: str, query: str, house_id: Optional[int] = None, role: Optional[str] = None,
+                        exclude_roles: Sequence[str] = (), limit: int = 5) -> List[dict]:
+        """
+        Returns the messages of a run most relevant to a question, best first.
+
+        Args:
+            run_id (str): The run id
+            query (str): The question in natural language
+            house_id (int, optional): The investment house, or JUDGES_HOUSE_ID
+            role (str, optional): The agent name
+            exclude_roles (Sequence[str]): Roles to leave out, e.g. the "user" task
+            limit (int): Maximum number of messages
+
+        Returns:
+            List[dict]: The messages with their house_id, seq, role, content, tokens, a snippet around the matched words
+            and the BM25 score (lower is more relevant)
+        """
+        match = fts_query(query)
+        if not match:
+            return []
+        sql = f"""
+            SELECT run_messages.house_id, run_messages.seq, run_messages.role, run_messages.content, run_messages.tokens,
+                   snippet(run_messages_fts, 0, '', '', ' ... ', {SNIPPET_TOKENS}) AS snippet,
+                   bm25(run_messages_fts) AS score
+            FROM run_messages_fts JOIN run_messages ON run_messages.id = run_messages_fts.rowid
+            WHERE run_messages_fts MATCH ? AND run_messages.run_id = ?
+            """
+        params = [match, run_id]
+        if house_id is not None:
+            sql += " AND run_messages.house_id = ?"
+            params.append(house_id)
+        if role is not None:
+            sql += " AND run_messages.role = ?"
+            params.append(role)
+        if exclude_roles:
+            sql += f" AND run_messages.role NOT IN ({', '.join('?' for _ in exclude_roles)})"
+            params.extend(exclude_roles)
+        sql += " ORDER BY score LIMIT ?"
+        params.append(limit)
+        return self._fetch(sql, params)
+
+    def get_roles(self, run_id: str) -> List[str]:
+        """Returns the names of the agents that spoke in the run."""
+        return [row["role"] for row in self._fetch("SELECT DISTINCT role FROM run_messages WHERE run_id = ? ORDER BY role", [run_id])]
+
+    def get_run(self, run_id: str) -> Optional[dict]:
+        """Returns the run with its message and token totals, or None if it does not exist."""
+        runs = self._fetch(
+            """
+            SELECT runs.*, COUNT(run_messages.id) AS message_count, COALESCE(SUM(run_messages.tokens), 0) AS total_tokens
+            FROM runs LEFT JOIN run_messages ON run_messages.run_id = runs.run_id
+            WHERE runs.run_id = ? GROUP BY runs.run_id
+            """,
+            [run_id]
+        )
+        return runs[0] if runs else None
+
+    def list_runs(self, limit: int = 20) -> List[dict]:
+        """Returns the most recent runs, newest first."""
+        return self._fetch("SELECT * FROM runs ORDER BY created_at DESC, rowid DESC LIMIT ?", [limit])
+
+    def latest_run_id(self) -> Optional[str]:
+        """Returns the id of the most recent run, or None if there is none."""
+        runs = self.list_runs(limit=1)
+        return runs[0]["run_id"] if runs else None
+
+    def _fetch(self, query: str, params: list) -> List[dict]:
+        db = self._connect()
+        try:
+            cursor = db.execute(query, tuple(params))
+            columns = [column[0] for column in cursor.description]
+            return [dict(zip(columns, row)) for row in cursor.fetchall()]
+        finally:
+            db.close()
+
+
+def _now() -> str:
+    return datetime.utcnow().strftime("%Y-%m-%d %H:%M:%S.%f")
+
+
+_run_store = None
+
+
+def get_run_store() -> RunStore:
+    """Returns the run store of the application database."""
+    global _run_store
+    if _run_store is None:
+        _run_store = RunStore()
+    return _run_store
+
+
+def init_run_store(db_name: str) -> RunStore:
+    """Points the run store of the process at a database file, e.g. in a worker process. Returns the run store."""
+    global _run_store
+    _run_store = RunStore(db_name)
+    return _run_store
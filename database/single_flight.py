@@ -0,0 +1,124 @@
+"""
+single_flight.py
+Request coalescing for concurrent identical calls.
+The first caller of a key (the leader) runs the function, every concurrent caller
+with the same key waits for the leader and receives the same result (or exception).
+Works for threads (do) and asyncio tasks (do_async), and both can wait on the same flight.
+"""
+import asyncio
+import threading
+from typing import Any, Awaitable, Callable, Dict, Hashable
+
+
+class _Call:
+    """A single in-flight call and the callers waiting for it."""
+    def __init__(self):
+        self.done = threading.Event()
+        self.value = None
+        self.error = None
+        self.waiters = []  # (loop, future) pairs of asyncio waiters
+
+    def add_async_waiter(self) -> asyncio.Future:
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        self.waiters.append((loop, future))
+        return future
+
+    def finish(self, value: Any = None, error: BaseException = None):
+        self.value = value
+        self.error = error
+        self.done.set()
+        for loop, future in self.waiters:
+            loop.call_soon_threadsafe(_resolve, future)
+
+    def result(self) -> Any:
+        if self.error is not None:
+            raise self.error
+        return self.value
+
+
+def _resolve(future: asyncio.Future):
+    if not future.done():
+        future.set_result(None)
+
+
+class SingleFlight:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._calls: Dict[Hashable, _Call] = {}
+
+    def _join(self, key: Hashable):
+        """Returns the call for the key and whether the caller is its leader."""
+        call = self._calls.get(key)
+        if call is not None:
+            return call, False
+        call = _Call()
+        self._calls[key] = call
+        return call, True
+
+    def _leave(self, key: Hashable, call: _Call, value: Any = None, error: BaseException = None):
+        with self._lock:
+            del self._calls[key]
+        call.finish(value, error)
+
+    def in_flight(self) -> int:
+        """Returns the number of keys currently being fetched."""
+        with self._lock:
+            return len(self._calls)
+
+    def do(self, key: Hashable, fn: Callable[..., Any], *args, **kwargs) -> Any:
+        """
+        Runs fn once for all the concurrent callers of the same key.
+
+        Args:
+            key (Hashable): Identifies identical calls
+            fn (Callable): The function to run if no call with the same key is in flight
+            *args, **kwargs: Arguments for fn
+
+        Returns:
+            The result of the leader's call
+        """
+        with self._lock:
+            call, leader = self._join(key)
+
+        if not leader:
+            call.done.wait()
+            return call.result()
+
+        try:
+            value = fn(*args, **kwargs)
+        except BaseException as e:
+            self._leave(key, call, error=e)
+            raise
+        self._leave(key, call, value=value)
+        return value
+
+    async def do_async(self, key: Hashable, fn: Callable[..., Awaitable[Any]], *args, **kwargs) -> Any:
+        """
+        Async version of do: awaits fn once for all the concurrent callers of the same key,
+        including callers waiting on the same key from other threads.
+
+        Args:
+            key (Hashable): Identifies identical calls
+            fn (Callable): The coroutine function to await if no call with the same key is in flight
+            *args, **kwargs: Arguments for fn
+
+        Returns:
+            The result of the leader's call
+        """
+        with self._lock:
+            call, leader = self._join(key)
+            if not leader:
+                waiter = call.add_async_waiter()
+
+        if not leader:
+            await waiter
+            return call.result()
+
+        try:
+            value = await fn(*args, **kwargs)
+        except BaseException as e:
+            self._leave(key, call, error=e)
+            raise
+        self._leave(key, call, value=value)
+        return value
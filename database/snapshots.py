@@ -0,0 +1,173 @@
+"""
+snapshots.py
+Point-in-time snapshots of the fundamentals and news responses.
+The providers return the latest (restated) data whatever the analysis year, so a snapshot keeps, for an as-of date,
+only the records that were available on that date: statements by filing date, ratios by period end plus a reporting
+lag, market caps and prices by date, and news by publish date. Snapshots are stored in SQLite keyed by url, params and
+as-of date, and the first snapshot of a key is never replaced, so a replayed run sees exactly the same data without
+any network call.
+"""
+import json
+import sqlite3
+from datetime import date, timedelta
+from typing import Any, Dict, Optional
+from urllib.parse import urlparse
+from database.db import DB
+from database.init_db import init_db
+
+DB_NAME = "stock_trading.db"
+
+# Ratios have no filing date: they are available this many days after the end of their period
+REPORTING_LAG_DAYS = 90
+
+
+class SnapshotMissingError(LookupError):
+    """Raised in offline mode when a request has no snapshot for the as-of date."""
+
+
+def cutoff_date(start_year: int) -> str:
+    """Returns the as-of date of a run: the last day of its start year (YYYY-MM-DD)."""
+    return f"{start_year}-12-31"
+
+
+def _lagged(period_end: str, days: int = REPORTING_LAG_DAYS) -> str:
+    return (date.fromisoformat(period_end[:10]) + timedelta(days=days)).isoformat()
+
+
+def _statement_available(record: dict) -> Optional[str]:
+    """Returns the date a financial statement was public: its filing date, or its period end plus the reporting lag."""
+    filed = record.get("fillingDate") or record.get("acceptedDate")
+    if filed:
+        return str(filed)[:10]
+    return _lagged(record["date"]) if record.get("date") else None
+
+
+def _ratio_available(record: dict) -> Optional[str]:
+    return _lagged(record["date"]) if record.get("date") else None
+
+
+def _dated(record: dict) -> Optional[str]:
+    return str(record["date"])[:10] if record.get("date") else None
+
+
+def _published(record: dict) -> Optional[str]:
+    return str(record["published_utc"])[:10] if record.get("published_utc") else None
+
+
+# (url path prefix, date of availability of a record) of the FMP endpoints that return a list of dated records
+FMP_LIST_ENDPOINTS = [
+    ("/api/v3/income-statement/", _statement_available),
+    ("/api/v3/balance-sheet-statement/", _statement_available),
+    ("/api/v3/cash-flow-statement/", _statement_available),
+    ("/api/v3/ratios/", _ratio_available),
+    ("/api/v3/key-metrics/", _ratio_available),
+    ("/api/v3/historical-market-capitalization/", _dated),
+]
+
+
+def point_in_time_filter(url: str, response_text: str, as_of: str) -> Optional[str]:
+    """
+    Keeps the records of an API response that were available on the as-of date.
+    Records without a date, and responses of endpoints without dated records (e.g. related companies), are kept as is.
+
+    Args:
+        url (str): The url of the API call, without the API key
+        response_text (str): The response body
+        as_of (str): The as-of date (YYYY-MM-DD)
+
+    Returns:
+        Optional[str]: The filtered response, or None if the response is an error or can't be parsed, and
+        must not be snapshotted
+    """
+    try:
+        data = json.loads(response_text)
+    except (TypeError, json.JSONDecodeError):
+        return None
+    if isinstance(data, dict) and (data.get("Error Message") or data.get("status") in ("ERROR", "NOT_AUTHORIZED", "NOT_FOUND")):
+        return None
+
+    def keep(record: Any, available) -> bool:
+        if not isinstance(record, dict):
+            return True
+        available_on = available(record)
+        return available_on is None or available_on <= as_of
+
+    path = urlparse(url).path
+    if urlparse(url).netloc.endswith("financialmodelingprep.com"):
+        if path.startswith("/api/v3/historical-price-full/") and isinstance(data, dict):
+            data["historical"] = [record for record in data.get("historical", []) if keep(record, _dated)]
+        for prefix, available in FMP_LIST_ENDPOINTS:
+            if path.startswith(prefix) and isinstance(data, list):
+                data = [record for record in data if keep(record, available)]
+    elif path == "/v2/reference/news" and isinstance(data, dict):
+        data["results"] = [record for record in data.get("results") or [] if keep(record, _published)]
+        data["count"] = len(data["results"])
+    return json.dumps(data)
+
+
+class SnapshotStore:
+    def __init__(self, db_name: str = DB_NAME):
+        """
+        Args:
+            db_name (str): The SQLite database file
+        """
+        self.db_name = db_name
+        init_db(db_name)
+
+    def _connect(self) -> DB:
+        return DB(sqlite3, self.db_name, timeout=30)
+
+    @staticmethod
+    def _key(params: Optional[Dict[str, Any]]) -> str:
+        return json.dumps(params or {}, sort_keys=True)
+
+    def get(self, url: str, params: Optional[Dict[str, Any]], as_of: str) -> Optional[str]:
+        """Returns the snapshot of the request for the as-of date, or None if there is none."""
+        db = self._connect()
+        try:
+            row = db.execute(
+                "SELECT response FROM snapshots WHERE url = ? AND params = ? AND as_of = ?", (url, self._key(params), as_of)
+            ).fetchone()
+            return row[0] if row else None
+        finally:
+            db.close()
+
+    def put(self, url: str, params: Optional[Dict[str, Any]], as_of: str, response_text: str) -> str:
+        """
+        Stores the snapshot of the request for the as-of date, unless one exists.
+
+        Returns:
+            str: The stored snapshot, which is the existing one if the request was already snapshotted
+        """
+        db = self._connect()
+        try:
+            db.execute(
+                "INSERT OR IGNORE INTO snapshots (url, params, as_of, response) VALUES (?, ?, ?, ?)",
+                (url, self._key(params), as_of, response_text)
+            )
+            db.commit()
+            row = db.execute(
+                "SELECT response FROM snapshots WHERE url = ? AND params = ? AND as_of = ?", (url, self._key(params), as_of)
+            ).fetchone()
+            return row[0]
+        finally:
+            db.close()
+
+    def as_of_dates(self) -> list:
+        """Returns the as-of dates with snapshots, oldest first."""
+        db = self._connect()
+        try:
+            return [row[0] for row in db.execute("SELECT DISTINCT as_of FROM snapshots ORDER BY as_of").fetchall()]
+        finally:
+            db.close()
+
+
+_snapshot_store = None
+
+
+def get_snapshot_store() -> SnapshotStore:
+    """Returns the snapshot store of the application database."""
+    global _snapshot_store
+    if _snapshot_store is None:
+        _snapshot_store = SnapshotStore()
+    return _snapshot_store
@@ -43,6 +43,88 @@ class TableMethods:
             self.db.rollback()  # Rollback to maintain database integrity
 
 
+    def create_index(self, index_name: str, table_name: str, columns: list, unique: bool = False):
+        """
+        Create an index on columns of a table in the database.
+
+        Args:
+            index_name (str): The name of the index to create.
+            table_name (str): The name of the indexed table.
+            columns (list): The indexed column names, in order.
+            unique (bool, optional): Whether the indexed values must be unique. Defaults to False.
+        """
+        if not columns:
+            raise Exception("Error creating index: No columns provided.")
+        if not index_name or not table_name:
+            raise Exception("Error creating index: No index or table name provided.")
+        try:
+            index_schema = f"""
+            CREATE {"UNIQUE " if unique else ""}INDEX IF NOT EXISTS {index_name}
+            ON {table_name} ({", ".join(columns)});
+            """
+
+            self.db.execute(index_schema)
+            self.db.commit()
+
+        except Exception as e:
+            print(f"Error creating index '{index_name}': {e}")
+            self.db.rollback()  # Rollback to maintain database integrity
+
+
+    def create_fts_table(self, table_name: str, content_table: str, columns: list, content_rowid: str = "id", tokenize: str = "porter unicode61"):
+        """
+        Create an SQLite FTS5 full-text index over columns of a table, kept in sync with triggers.
+        The index stores no copy of the text (external content), and rows that existed before it was created are indexed.
+
+        Args:
+            table_name (str): The name of the full-text table to create.
+            content_table (str): The name of the indexed table.
+            columns (list): The indexed text column names.
+            content_rowid (str, optional): The integer primary key of the indexed table. Defaults to "id".
+            tokenize (str, optional): The FTS5 tokenizer. Defaults to "porter unicode61" (stemmed words).
+        """
+        if not columns:
+            raise Exception("Error creating full-text table: No columns provided.")
+        if not table_name or not content_table:
+            raise Exception("Error creating full-text table: No table name provided.")
+        try:
+            exists = self.db.execute(
+                "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = ?", (table_name,)
+            ).fetchone()
+
+            column_list = ", ".join(columns)
+            new_values = ", ".join(f"new.{column}" for column in columns)
+            old_values = ", ".join(f"old.{column}" for column in columns)
+            self.db.execute(f"""
+            CREATE VIRTUAL TABLE IF NOT EXISTS {table_name} USING fts5(
+                {column_list}, content='{content_table}', content_rowid='{content_rowid}', tokenize='{tokenize}'
+            );
+            """)
+            self.db.execute(f"""
+            CREATE TRIGGER IF NOT EXISTS {table_name}_ai AFTER INSERT ON {content_table} BEGIN
+                INSERT INTO {table_name} (rowid, {column_list}) VALUES (new.{content_rowid}, {new_values});
+            END;
+            """)
+            self.db.execute(f"""
+            CREATE TRIGGER IF NOT EXISTS {table_name}_ad AFTER DELETE ON {content_table} BEGIN
+                INSERT INTO {table_name} ({table_name}, rowid, {column_list}) VALUES ('delete', old.{content_rowid}, {old_values});
+            END;
+            """)
+            self.db.execute(f"""
+            CREATE TRIGGER IF NOT EXISTS {table_name}_au AFTER UPDATE ON {content_table} BEGIN
+                INSERT INTO {table_name} ({table_name}, rowid, {column_list}) VALUES ('delete', old.{content_rowid}, {old_values});
+                INSERT INTO {table_name} (rowid, {column_list}) VALUES (new.{content_rowid}, {new_values});
+            END;
+            """)
+            if not exists:
+                self.db.execute(f"INSERT INTO {table_name} ({table_name}) VALUES ('rebuild')")
+            self.db.commit()
+
+        except Exception as e:
+            print(f"Error creating full-text table '{table_name}': {e}")
+            self.db.rollback()  # Rollback to maintain database integrity
+
+
     def insert_to_table(self, table_name: str, columns: dict):
         """
         Insert a row into a table in the database.
@@ -0,0 +1,22 @@
+"""
+tokens.py
+Token counting for the prompts and the stored discussions.
+"""
+_encoding = None
+
+
+def count_tokens(text: str) -> int:
+    """
+    Counts the tokens of the text with the tiktoken encoding of the OpenAI models,
+    or estimates them (4 characters per token) if the encoding is unavailable.
+    """
+    global _encoding
+    if _encoding is None:
+        try:
+            import tiktoken
+            _encoding = tiktoken.get_encoding("cl100k_base")
+        except Exception:
+            _encoding = False
+    if _encoding:
+        return len(_encoding.encode(text, disallowed_special=()))
+    return len(text) // 4 + 1
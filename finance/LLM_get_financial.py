@@ -2,25 +2,24 @@
 LLM_get_financial.py - Functions for the Analyst agents
 """
 import json
-from database.api_utils import cached_api_request
+from typing import Optional
+from database.api_utils import async_cached_api_request, cached_api_request
 
-def quick_ratio(symbol: str, year: int) -> str:
-    """
-    Fetches the Quick Ratio (TTM) for the given company ticker using FMP API.
 
-    Args:
-        ticker (str): The stock ticker symbol
+def _quick_ratio_request(symbol: str, as_of: Optional[str] = None) -> dict:
+    """Returns the cached_api_request arguments of the annual ratios of the given symbol."""
+    return {
+        "url": f"https://financialmodelingprep.com/api/v3/ratios/{symbol}",
+        "api_key_name": "FMP_API_KEY",
+        "api_key_param": "apikey",
+        "api_key_in_url": True,
+        "params": {"period": "annual"},
+        "as_of": as_of
+    }
 
-    Returns:
-        str: The Quick Ratio as a string, or an error message if unavailable
-    """
-    response_text = cached_api_request(
-        url=f"https://financialmodelingprep.com/api/v3/ratios/{symbol}",
-        api_key_name="FMP_API_KEY",
-        api_key_param="apikey",
-        api_key_in_url=True,
-        params={"period": "annual"}
-    )
+
+def _select_quick_ratio(response_text: str, year: int) -> str:
+    """Returns the quick ratio of the given year from the API response, or an error message."""
     try:
         data = json.loads(response_text)
         if data:
@@ -35,23 +34,40 @@ def quick_ratio(symbol: str, year: int) -> str:
         return f"Failed to parse API response as JSON."
 
 
-def get_related_companies(symbol: str, n: int = 1) -> list:
+def quick_ratio(symbol: str, year: int, as_of: Optional[str] = None) -> str:
     """
-    Fetch up to n related tickers for the given ticker from Polygon.io.
+    Fetches the Quick Ratio (TTM) for the given company ticker using FMP API.
 
-    Args: ticker: The stock symbol for which related tickers are requested (e.g., "AAPL")
-            n: The maximum number of related tickers to return
-            api_key: Your Polygon.io API key
+    Args:
+        ticker (str): The stock ticker symbol
+        as_of (str, optional): The as-of date of the data (YYYY-MM-DD), None for the latest data
 
-    Return: A list of related ticker symbols
+    Returns:
+        str: The Quick Ratio as a string, or an error message if unavailable
     """
-    response_text = cached_api_request(
-        url=f"https://api.polygon.io/v1/related-companies/{symbol}",
-        api_key_name="POLYGON_API_KEY",
-        api_key_in_url=False,
-        api_key_param="apiKey"
-    )
- 
+    response_text = cached_api_request(**_quick_ratio_request(symbol, as_of))
+    return _select_quick_ratio(response_text, year)
+
+
+async def quick_ratio_async(symbol: str, year: int, as_of: Optional[str] = None) -> str:
+    """Async version of quick_ratio."""
+    response_text = await async_cached_api_request(**_quick_ratio_request(symbol, as_of))
+    return _select_quick_ratio(response_text, year)
+
+
+def _related_companies_request(symbol: str, as_of: Optional[str] = None) -> dict:
+    """Returns the cached_api_request arguments of the related companies of the given symbol."""
+    return {
+        "url": f"https://api.polygon.io/v1/related-companies/{symbol}",
+        "api_key_name": "POLYGON_API_KEY",
+        "api_key_in_url": False,
+        "api_key_param": "apiKey",
+        "as_of": as_of
+    }
+
+
+def _select_related_companies(response_text: str, n: int) -> list:
+    """Returns the first n related tickers from the API response."""
     try:
         data = json.loads(response_text)
         top_n_competitors = []
@@ -65,3 +81,24 @@ def get_related_companies(symbol: str, n: int = 1) -> list:
         raise RuntimeError(f"Failed to parse Polygon.io API response as JSON")
     except Exception as e:
         raise RuntimeError(f"Error processing Polygon.io API response: {str(e)}")
+
+
+def get_related_companies(symbol: str, n: int = 1, as_of: Optional[str] = None) -> list:
+    """
+    Fetch up to n related tickers for the given ticker from Polygon.io.
+
+    Args: ticker: The stock symbol for which related tickers are requested (e.g., "AAPL")
+            n: The maximum number of related tickers to return
+            api_key: Your Polygon.io API key
+            as_of: The as-of date of the data (YYYY-MM-DD), None for the latest data
+
+    Return: A list of related ticker symbols
+    """
+    response_text = cached_api_request(**_related_companies_request(symbol, as_of))
+    return _select_related_companies(response_text, n)
+
+
+async def get_related_companies_async(symbol: str, n: int = 1, as_of: Optional[str] = None) -> list:
+    """Async version of get_related_companies."""
+    response_text = await async_cached_api_request(**_related_companies_request(symbol, as_of))
+    return _select_related_companies(response_text, n)
@@ -2,59 +2,75 @@
 LLM_get_qualitive.py - Functions for the qualitive Analyst agents
 """
 import json
-import streamlit as st
+from typing import Optional
 from config.app_constants import START_YEAR
-from database.api_utils import cached_api_request
+from database.api_utils import async_cached_api_request, cached_api_request
+from finance.point_in_time import RunContext
+from database import document_store
 
-def extract_business_info(symbol: str) -> dict:
-    """
-    Extracts strategic elements from company information using Polygon.io.
 
-    args:
-        company_ticker (str): The stock ticker symbol
+def _business_info_request(symbol: str, as_of: Optional[str] = None) -> dict:
+    """Returns the cached_api_request arguments of the ticker details of the given symbol, as of the given date."""
+    return {
+        "url": f"https://api.polygon.io/v3/reference/tickers/{symbol}",
+        "api_key_name": "POLYGON_API_KEY",
+        "api_key_in_url": True,
+        "api_key_param": "apiKey",
+        # Polygon returns the ticker details as they were on the given date
+        "params": {"date": as_of} if as_of else {},
+        "as_of": as_of
+    }
 
-    returns:
-        dict: A dictionary containing a business summary of the company
-    """
-    response_text = cached_api_request(
-        url=f"https://api.polygon.io/v3/reference/tickers/{symbol}",
-        api_key_name="POLYGON_API_KEY",
-        api_key_in_url=True,
-        api_key_param="apiKey"
-    )
-    
+
+def _select_business_info(response_text: str) -> str:
+    """Returns the business description from the API response as a JSON string."""
     try:
         data = json.loads(response_text)
         result = {
             "businessDescription": data.get("results", {}).get("description", "No description available")
         }
-        return json.dumps(result) 
+        return json.dumps(result)
     except json.JSONDecodeError:
         return json.dumps({"error": "Failed to parse API response as JSON"})
     except Exception as e:
         return json.dumps({"error": f"Error processing API response: {str(e)}"})
 
 
-def get_company_data(symbol: str, limit: int = 2) -> dict:
+def extract_business_info(symbol: str, as_of: Optional[str] = None) -> dict:
     """
-    Fetches recent news articles related to a company using Polygon.io API.
+    Extracts strategic elements from company information using Polygon.io.
 
-    Args:
-        ticker (str): The stock ticker symbol
-        limit (int): The number of articles to retrieve (default: 2)
+    args:
+        company_ticker (str): The stock ticker symbol
+        as_of (str, optional): The as-of date of the data (YYYY-MM-DD), None for the latest data
 
-    Returns:
-        dict: A dictionary containing news articles related to the company
+    returns:
+        dict: A dictionary containing a business summary of the company
     """
-    start_year = st.session_state.get("START_YEAR", START_YEAR)
-    response_text = cached_api_request(
-        url=f"https://api.polygon.io/v2/reference/news?published_utc={start_year}",
-        api_key_name="POLYGON_API_KEY",
-        api_key_in_url=True,
-        api_key_param="apiKey",
-        params={"ticker": symbol, "limit": limit}
-    )
+    response_text = cached_api_request(**_business_info_request(symbol, as_of))
+    return _select_business_info(response_text)
+
+
+async def extract_business_info_async(symbol: str, as_of: Optional[str] = None) -> dict:
+    """Async version of extract_business_info."""
+    response_text = await async_cached_api_request(**_business_info_request(symbol, as_of))
+    return _select_business_info(response_text)
+
+
+def _company_news_request(symbol: str, limit: int, year: int, as_of: Optional[str] = None) -> dict:
+    """Returns the cached_api_request arguments of the news of the given symbol, published in the given year."""
+    return {
+        "url": f"https://api.polygon.io/v2/reference/news?published_utc={year}",
+        "api_key_name": "POLYGON_API_KEY",
+        "api_key_in_url": True,
+        "api_key_param": "apiKey",
+        "params": {"ticker": symbol, "limit": limit},
+        "as_of": as_of
+    }
 
+
+def _select_company_news(response_text: str) -> str:
+    """Returns the news articles from the API response as a JSON string."""
     try:
         data = json.loads(response_text)
         news = data.get("results", [])
@@ -68,10 +84,57 @@ def get_company_data(symbol: str, limit: int = 2) -> dict:
                 "Source": article.get("publisher", {}).get("name", "Unknown source"),
                 "URL": article.get("article_url", "No URL available")
             }
-        
+
         return json.dumps(articles_info)
     except json.JSONDecodeError:
         return json.dumps({"error": "Failed to parse API response as JSON"})
     except Exception as e:
         return json.dumps({"error": f"Error processing API response: {str(e)}"})
 
+
+def get_company_data(symbol: str, limit: int = 2, year: int = START_YEAR, as_of: Optional[str] = None) -> dict:
+    """
+    Fetches recent news articles related to a company using Polygon.io API.
+
+    Args:
+        ticker (str): The stock ticker symbol
+        limit (int): The number of articles to retrieve (default: 2)
+        year (int): The year the articles were published in, the start year of the run
+        as_of (str, optional): The as-of date of the data (YYYY-MM-DD), None for the latest data
+
+    Returns:
+        dict: A dictionary containing news articles related to the company
+    """
+    response_text = cached_api_request(**_company_news_request(symbol, limit, year, as_of))
+    return _select_company_news(response_text)
+
+
+async def get_company_data_async(symbol: str, limit: int = 2, year: int = START_YEAR, as_of: Optional[str] = None) -> dict:
+    """Async version of get_company_data."""
+    response_text = await async_cached_api_request(**_company_news_request(symbol, limit, year, as_of))
+    return _select_company_news(response_text)
+
+
+def search_company_news(context: RunContext, query: str, symbol: str = None, limit: int = 5) -> str:
+    """
+    Searches the local archive of news articles and business descriptions, without any API request.
+    The archive grows with every news and ticker-details response fetched by the app, and only documents
+    published up to the end of the start year are returned.
+    The agents' tool is bound to the context of their run (see InitAgents).
+
+    Args:
+        context (RunContext): The run, whose start year limits the documents
+        query (str): What to look for, e.g. "supply chain problems" or "lawsuit"
+        symbol (str, optional): Only documents about this stock ticker symbol
+        limit (int): The maximum number of documents to return (default: 5)
+
+    Returns:
+        str: One "- date SYMBOL title (source): text" line per document, most relevant first
+    """
+    documents = document_store.get_document_store().search(query, ticker=symbol, published_before=f"{context.start_year}-12-31", limit=limit)
+    if not documents:
+        return f"No archived news found for '{query}'."
+    return "\n".join(
+        f"- {doc['published'][:10] or 'undated'} {doc['ticker']} {doc['title']} ({doc['source']}): {doc['snippet']}"
+        for doc in documents
+    )
@@ -1,95 +1,30 @@
 """
 agents_functions.py
-This file contains wrapper functions that the agents will use to interact with the finance module. 
-These functions will be called by the agents to get financial data and perform analysis.
+This file contains the sync batch of the metrics the agents' tools are built on, used by the pages and the charts.
+The agents' tools themselves are the async functions of async_agents_functions.py.
 """
-from config.app_constants import START_YEAR
-from finance.LLM_get_financial import get_related_companies
-from finance.LLM_get_qualitative import extract_business_info, get_company_data
-from finance.profit_margin import calculate_profit_margins
-from finance.profit_multipliers import price_to_EBIT_ratio, ratios
-from typing import List
-import streamlit as st
+from finance.metrics_batch import MetricsBatch
+from finance.profit_margin import profit_margins_batch
+from finance.profit_multipliers import price_to_EBIT_batch, ratios_batch
+from typing import List, Optional
 
-def historical_func(symbols: list, years: List[int]):
-    """
-    receives a list of symbols and a list of years and returns a dictionary with the historical data for each symbol
-
-    Args:
-        symbols (List): symbols to get historical data for
-        years (List): years to get historical data for
-
-    returns:
-        results: dictionary with the historical data for each symbol
-    """
-    results = {}
 
-    for symbol in symbols:
-        results[symbol] = {}
-        for year in years:
-            results[symbol][year] = {                
-                "profit_margins": calculate_profit_margins(symbol, year),
-                "price_to_EBIT_ratio": price_to_EBIT_ratio(symbol, year),
-                "ratios": ratios(symbol, year),
-            }
-
-    return results
-
-
-def competative_func(symbol: str, years: List[int]):
+def batch_metrics(symbols: list, years: List[int], margins: bool = True, as_of: Optional[str] = None) -> MetricsBatch:
     """
-    Receives a symbol and a list of years and returns a dictionary with the competitive data for the symbol.
+    Computes the margins and valuation multipliers of every symbol and year at once.
 
     Args:
-        symbol (str): symbol to get competitive data for
-        years (List): years to get competitive data for
+        symbols (List): symbols to compute the metrics for
+        years (List): years to compute the metrics for
+        margins (bool): whether to compute the profit margins too
+        as_of (str, optional): The as-of date of the data (YYYY-MM-DD), None for the latest data
 
     Returns:
-        results: dictionary with the competitive data for the symbol
-    """
-    results = {}
-    related_companies = get_related_companies(symbol)
-    
-    if not related_companies:
-        results[symbol] = {"error": "No related companies found"}
-        return results  # Return early if no competitors are found
-
-    related_company = related_companies[0]
-    results[related_company] = {}
-    results[symbol] = {}
-
-    for year in years:
-        results[related_company][year] = {
-            "price_to_EBIT_ratio": price_to_EBIT_ratio(related_company, year),
-            "ratios": ratios(related_company, year),
-        }
-
-        results[symbol][year] = {
-            "price_to_EBIT_ratio": price_to_EBIT_ratio(symbol, year),
-            "ratios": ratios(symbol, year),
-        }
-
-    return results
-
-
-def qualitative_func(symbols: list, year: int = st.session_state.get("START_YEAR", START_YEAR)):
+        MetricsBatch: one (symbols, years) matrix per metric, NaN for the missing values
     """
-    receives a list of symbols and returns a dictionary with the qualitative data for each symbol
-
-    Args:
-        symbols (List): symbols to get qualitative data for
-        year (int): year to get qualitative data for
-    
-    returns:
-        results: dictionary with the qualitative data for each symbol
-    """
-    results = {}
-
-    for symbol in symbols:
-        results[symbol] = {
-            "business_info": extract_business_info(symbol),
-            "company_data": get_company_data(symbol, year),
-        }
-
-    return results
+    symbols, years = list(symbols), list(years)
+    values = dict(profit_margins_batch(symbols, years, as_of)) if margins else {}
+    values["price_to_ebit"] = price_to_EBIT_batch(symbols, years, as_of)
+    values.update(ratios_batch(symbols, years, as_of))
+    return MetricsBatch(symbols, years, values)
 
@@ -0,0 +1,105 @@
+"""
+async_agents_functions.py
+The wrapper functions the agents use as tools to get financial data and perform analysis.
+They return the typed results of tool_results.py, whose text rendering is what the agents receive,
+and they fetch all their data concurrently through the async cache, without blocking the event loop of the group chat.
+The tools take the RunContext of their run first; InitAgents binds it, so the model passes only the symbols and years.
+"""
+import asyncio
+from typing import List, Optional
+from config.app_constants import PEER_GROUP_SIZE
+from finance.LLM_get_financial import get_related_companies_async, quick_ratio_async
+from finance.LLM_get_qualitative import extract_business_info_async, get_company_data_async
+from finance.metrics_batch import MetricsBatch
+from finance.peer_group import peer_group_result
+from finance.point_in_time import RunContext
+from finance.profit_margin import profit_margins_batch_async
+from finance.profit_multipliers import price_to_EBIT_batch_async, ratios_batch_async
+from finance.tool_results import CompanyProfile, CompetitiveResult, HistoricalResult, QualitativeResult, QuickRatioResult
+
+
+async def batch_metrics(symbols: list, years: List[int], margins: bool = True, as_of: Optional[str] = None) -> MetricsBatch:
+    """Async version of agents_functions.batch_metrics. Every request is made concurrently."""
+    symbols, years = list(symbols), list(years)
+    margin_values, price_to_EBIT, year_ratios = await asyncio.gather(
+        profit_margins_batch_async(symbols, years, as_of) if margins else asyncio.sleep(0, {}),
+        price_to_EBIT_batch_async(symbols, years, as_of),
+        ratios_batch_async(symbols, years, as_of),
+    )
+    return MetricsBatch(symbols, years, {**margin_values, "price_to_ebit": price_to_EBIT, **year_ratios})
+
+
+async def quick_ratio(context: RunContext, symbol: str, year: int) -> QuickRatioResult:
+    """
+    Fetches the Quick Ratio (TTM) for the given company ticker using FMP API.
+
+    Args:
+        context (RunContext): The run, whose as-of date limits the data
+        symbol (str): The stock ticker symbol
+        year (int): The year of the quick ratio
+
+    Returns:
+        QuickRatioResult: The Quick Ratio, or an error message if unavailable
+    """
+    return QuickRatioResult.from_tool_value(symbol, year, await quick_ratio_async(symbol, year, context.as_of))
+
+
+async def historical_func(context: RunContext, symbols: list, years: List[int]) -> HistoricalResult:
+    """
+    receives a list of symbols and a list of years and returns the historical data for each symbol
+
+    Args:
+        context (RunContext): The run, whose as-of date limits the data
+        symbols (List): symbols to get historical data for
+        years (List): years to get historical data for
+
+    returns:
+        HistoricalResult: margins and valuation multipliers, one row per symbol and year
+    """
+    return HistoricalResult((await batch_metrics(symbols, years, as_of=context.as_of)).rows())
+
+
+async def competative_func(context: RunContext, symbol: str, years: List[int]) -> CompetitiveResult:
+    """
+    Receives a symbol and a list of years and returns the competitive data for the symbol.
+
+    Args:
+        context (RunContext): The run, whose as-of date limits the data
+        symbol (str): symbol to get competitive data for
+        years (List): years to get competitive data for
+
+    Returns:
+        CompetitiveResult: margins and valuation multipliers of the symbol and of its top related companies, one row per
+        company and year, with the peer medians and the symbol's percentiles among its peers
+    """
+    related_companies = [company for company in await get_related_companies_async(symbol, n=PEER_GROUP_SIZE + 1, as_of=context.as_of) if company != symbol][:PEER_GROUP_SIZE]
+
+    if not related_companies:
+        return CompetitiveResult(symbol, error="No related companies found")  # Return early if no competitors are found
+
+    # The peers are fetched together with the symbol, in parallel
+    batch = await batch_metrics([symbol] + related_companies, years, as_of=context.as_of)
+
+    return peer_group_result(symbol, batch)
+
+
+async def qualitative_func(context: RunContext, symbols: list) -> QualitativeResult:
+    """
+    receives a list of symbols and returns the qualitative data for each symbol, with the news of the start year of the run
+
+    Args:
+        context (RunContext): The run, whose start year and as-of date limit the data
+        symbols (List): symbols to get qualitative data for
+
+    returns:
+        QualitativeResult: business description and recent news of each symbol
+    """
+    values = await asyncio.gather(*[
+        asyncio.gather(extract_business_info_async(symbol, context.as_of), get_company_data_async(symbol, year=context.start_year, as_of=context.as_of))
+        for symbol in symbols
+    ])
+
+    return QualitativeResult([
+        CompanyProfile.from_tool_values(symbol, business_info, company_data)
+        for symbol, (business_info, company_data) in zip(symbols, values)
+    ])
@@ -4,9 +4,8 @@ functions for the profit judge of a stock in a defined period.
 """
 import json
 from datetime import datetime
-import streamlit as st
-from config.app_constants import START_YEAR, END_YEAR
 from database.api_utils import cached_api_request
+from finance.point_in_time import RunContext
 
 def get_historical_data(stock_symbol):
     """
@@ -68,11 +67,13 @@ def find_closest_price(historical_data, target_date):
     return None
 
 
-def judge_profit(stock: str, money_invested: float):
+def judge_profit(context: RunContext, stock: str, money_invested: float):
     """
-    Judge the profit of a stock in a defined period.
+    Judge the profit of a stock in a defined period: from the end of the start year to the end of the end year of the run.
+    The judges' tool is bound to the context of their run (see InitJudgeAgent).
 
     Args:
+        context: RunContext: the run, whose start and end years define the period
         stock: str: the stock symbol
         money_invested: float: the amount of money invested in the stock
 
@@ -84,10 +85,8 @@ def judge_profit(stock: str, money_invested: float):
     if not historical_data:
         raise ValueError(f"Could not retrieve historical data for {stock}")
     
-    start_year = st.session_state.get("START_YEAR", START_YEAR)
-    end_year = st.session_state.get("END_YEAR", END_YEAR)
-    start_date = f"{start_year}-12-31"
-    end_date = f"{end_year}-12-31"
+    start_date = f"{context.start_year}-12-31"
+    end_date = f"{context.end_year}-12-31"
     
     start_stock_price = find_closest_price(historical_data, start_date)
     end_stock_price = find_closest_price(historical_data, end_date)
@@ -0,0 +1,106 @@
+"""
+metrics_batch.py
+Vectorized margins and valuation multipliers of several symbols and years.
+The batch variants of profit_margin.py and profit_multipliers.py fetch each symbol's statements once, instead of once
+per (symbol, year), and return one float matrix per metric (rows are the symbols, columns the years), with NaN for the
+missing values. MetricsBatch gathers them, and converts back to the MetricsRow of the scalar tools.
+"""
+import json
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+from typing import Callable, Dict, List, Optional, Sequence
+import numpy as np
+from finance.tool_results import METRIC_COLUMNS, MetricsRow
+
+# Concurrent requests of the sync batch variants
+FETCH_WORKERS = 8
+
+
+def fetch_parallel(fetch: Callable[..., str], requests: List[dict]) -> List[str]:
+    """
+    Calls fetch(**request) for every request on a thread pool, as the prefetch does.
+
+    Args:
+        fetch (Callable): The cached request function, usually cached_api_request
+        requests (List[dict]): The keyword arguments of each call
+
+    Returns:
+        List[str]: The responses, in the order of the requests
+    """
+    if len(requests) <= 1:
+        return [fetch(**request) for request in requests]
+    with ThreadPoolExecutor(max_workers=min(FETCH_WORKERS, len(requests))) as executor:
+        return list(executor.map(lambda request: fetch(**request), requests))
+
+
+def year_matrix(response_text: str, years: Sequence[int], fields: Sequence[str]) -> np.ndarray:
+    """
+    Parses the yearly records of an API response into a float matrix.
+
+    Args:
+        response_text (str): A JSON list of records with a calendarYear
+        years (Sequence[int]): The years of the columns
+        fields (Sequence[str]): The record fields of the rows
+
+    Returns:
+        np.ndarray: A (len(fields), len(years)) matrix, NaN where the year or the value is missing.
+        As in the scalar tools, the first record of a year is used.
+    """
+    matrix = np.full((len(fields), len(years)), np.nan)
+    columns = {str(year): index for index, year in enumerate(years)}
+    try:
+        records = json.loads(response_text)
+        if not isinstance(records, list):
+            return matrix
+        filled = set()
+        for record in records:
+            column = columns.get(str(record.get("calendarYear")))
+            if column is None or column in filled:
+                continue
+            filled.add(column)
+            for row, name in enumerate(fields):
+                value = record.get(name)
+                if isinstance(value, (int, float)) and not isinstance(value, bool):
+                    matrix[row, column] = value
+    except json.JSONDecodeError:
+        print("Failed to parse API response as JSON")
+    except Exception as e:
+        print(f"Error processing API response: {str(e)}")
+    return matrix
+
+
+def rank_keys(values: np.ndarray, higher_is_better: bool) -> np.ndarray:
+    """
+    Returns keys that sort values from the worst to the best. NaN stays NaN.
+    For multiples (lower is better), negative values mean losses and rank below every positive value.
+    """
+    if higher_is_better:
+        return values
+    with np.errstate(invalid="ignore"):
+        return np.where(np.isnan(values), np.nan, np.where(values > 0, -values, -np.inf))
+
+
+def _value(value: float) -> Optional[float]:
+    return None if np.isnan(value) else float(value)
+
+
+@dataclass
+class MetricsBatch:
+    symbols: List[str]
+    years: List[int]
+    # MetricsRow attribute -> (len(symbols), len(years)) matrix
+    values: Dict[str, np.ndarray] = field(default_factory=dict)
+
+    def get(self, metric: str) -> np.ndarray:
+        """Returns the matrix of a metric, all NaN if it was not computed."""
+        return self.values.get(metric, np.full((len(self.symbols), len(self.years)), np.nan))
+
+    def row(self, symbol: str, year: int) -> MetricsRow:
+        i, j = self.symbols.index(symbol), self.years.index(year)
+        return MetricsRow(symbol, year, **{
+            attribute: _value(self.values[attribute][i, j]) for attribute, _ in METRIC_COLUMNS if attribute in self.values
+        })
+
+    def rows(self) -> List[MetricsRow]:
+        """Returns one row per symbol and year, symbols first, as the scalar tools do."""
+        return [self.row(symbol, year) for symbol in self.symbols for year in self.years]
@@ -0,0 +1,99 @@
+"""
+peer_group.py - Relative valuation of a company against its peer group
+The company and its top related companies are fetched in one MetricsBatch (see metrics_batch.py), then the peer
+median and the company's percentile among its peers are computed for every metric and year in one vectorized pass.
+Higher margins and lower (positive) multiples rank better, as in the screener.
+"""
+from typing import List, Tuple
+import numpy as np
+from finance.metrics_batch import MetricsBatch, rank_keys
+from finance.tool_results import CompetitiveResult, MetricsRow
+
+# (MetricsRow attribute, higher is better)
+PEER_METRICS = [
+    ("gross_margin", True),
+    ("operating_margin", True),
+    ("net_margin", True),
+    ("price_to_ebit", False),
+    ("price_to_earning", False),
+    ("price_to_book", False),
+    ("price_earnings_to_growth", False),
+    ("price_to_sales", False),
+]
+
+
+def peer_medians(values: np.ndarray) -> np.ndarray:
+    """
+    Returns the peer median of every metric and year.
+
+    Args:
+        values (np.ndarray): A (metrics, companies, years) array, the company first and its peers after it
+
+    Returns:
+        np.ndarray: A (metrics, years) array, NaN where no peer has a value
+    """
+    peers = values[:, 1:]
+    medians = np.full((values.shape[0], values.shape[2]), np.nan)
+    available = (~np.isnan(peers)).any(axis=1)
+    # nanmedian warns on all-NaN slices, so only the slices with a value are computed
+    medians[available] = np.nanmedian(np.moveaxis(peers, 1, -1)[available], axis=-1)
+    return medians
+
+
+def peer_percentiles(values: np.ndarray, higher_is_better: np.ndarray) -> np.ndarray:
+    """
+    Returns the percentile of the company among its peers for every metric and year: the share of the peers it
+    ranks above, ties counting half.
+
+    Args:
+        values (np.ndarray): A (metrics, companies, years) array, the company first and its peers after it
+        higher_is_better (np.ndarray): A boolean per metric
+
+    Returns:
+        np.ndarray: A (metrics, years) array of percentiles in [0, 100], 100 being the best, NaN where the company or every peer has no value
+    """
+    keys = np.where(higher_is_better[:, None, None], values, rank_keys(values, False))
+    company, peers = keys[:, :1], keys[:, 1:]
+    with np.errstate(invalid="ignore"):
+        beaten = (peers < company).sum(axis=1) + 0.5 * (peers == company).sum(axis=1)
+        counts = (~np.isnan(peers)).sum(axis=1)
+        percentiles = beaten / np.where(counts == 0, np.nan, counts) * 100
+    return np.where(np.isnan(company[:, 0]), np.nan, percentiles)
+
+
+def compare_with_peers(batch: MetricsBatch) -> Tuple[List[MetricsRow], List[MetricsRow]]:
+    """
+    Computes the peer medians and the company's percentiles of a batch whose first symbol is the company.
+
+    Returns:
+        tuple: (medians, percentiles) - one MetricsRow per year each, named "peer median" and "percentile"
+    """
+    metrics = [attribute for attribute, _ in PEER_METRICS]
+    values = np.stack([batch.get(metric) for metric in metrics])
+    medians = peer_medians(values)
+    percentiles = peer_percentiles(values, np.array([higher for _, higher in PEER_METRICS]))
+
+    def rows(name: str, table: np.ndarray) -> List[MetricsRow]:
+        return [
+            MetricsRow(name, year, **{metric: None if np.isnan(table[i, j]) else float(table[i, j]) for i, metric in enumerate(metrics)})
+            for j, year in enumerate(batch.years)
+        ]
+
+    return rows("peer median", medians), rows("percentile", percentiles)
+
+
+def peer_group_result(symbol: str, batch: MetricsBatch) -> CompetitiveResult:
+    """
+    Builds the competitive result of a company from the batch of the company and its peers.
+
+    Args:
+        symbol (str): The company, the first symbol of the batch
+        batch (MetricsBatch): The metrics of the company and its peers
+
+    Returns:
+        CompetitiveResult: The metrics of every company, the peer medians and the company's percentiles
+    """
+    peers = batch.symbols[1:]
+    medians, percentiles = compare_with_peers(batch)
+    return CompetitiveResult(symbol, peers[0] if peers else None, batch.rows(), peers=peers,
+                             peer_medians=medians, percentiles=percentiles)
@@ -0,0 +1,38 @@
+"""
+point_in_time.py - The as-of date of the agents' data requests
+"""
+from dataclasses import dataclass
+from typing import Optional
+import streamlit as st
+from config.app_constants import POINT_IN_TIME_DATA, START_YEAR
+from database.snapshots import cutoff_date
+
+
+@dataclass(frozen=True)
+class RunContext:
+    """
+    The period of a run. The agents' tools are bound to the context of their run (see InitAgents and InitJudgeAgent),
+    since they run in worker threads and processes where the session state of the app is not available.
+    """
+    start_year: int
+    end_year: int
+    # The as-of date of the run's data requests (YYYY-MM-DD), None when point-in-time data is disabled
+    as_of: Optional[str] = None
+
+    @classmethod
+    def for_years(cls, start_year: int, end_year: int) -> "RunContext":
+        """Returns the context of a run over the given years, as of the end of the start year."""
+        return cls(start_year, end_year, cutoff_date(start_year) if POINT_IN_TIME_DATA else None)
+
+
+def as_of_date() -> Optional[str]:
+    """
+    Returns the as-of date of the data shown by the pages of the app: AS_OF_DATE of the session, or the end of the start year.
+    Only call it from the script thread of a page; the competitions use the as-of date of their RunContext.
+
+    Returns:
+        Optional[str]: The date (YYYY-MM-DD), or None when point-in-time data is disabled
+    """
+    if not POINT_IN_TIME_DATA:
+        return None
+    return st.session_state.get("AS_OF_DATE") or cutoff_date(st.session_state.get("START_YEAR", START_YEAR))
@@ -0,0 +1,235 @@
+"""
+prefetch.py
+Bulk warm-up of the API cache for a universe of tickers.
+Every dataset is fetched through the same functions the agents' tools use,
+so the cached entries match the requests made later in the group chat.
+
+Usage (the caching service from Main.py must be running):
+    python -m finance.prefetch AAPL MSFT NVDA --start-year 2022 --end-year 2024
+"""
+import argparse
+import json
+import sys
+import threading
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from typing import Dict, List, Optional
+import requests
+from config.app_constants import PEER_GROUP_SIZE, TICKER_STOCKS, START_YEAR, END_YEAR
+from database.rate_limiter import PREFETCH, request_priority
+from finance.LLM_get_financial import get_related_companies
+from finance.LLM_get_qualitative import extract_business_info, get_company_data
+from finance.judge_profit import get_historical_data
+from finance.point_in_time import RunContext
+from finance.profit_margin import fetch_income_statement
+from finance.profit_multipliers import market_cap, price_to_EBIT_ratio, ratios
+
+DATASETS = [
+    "income_statement",
+    "ratios",
+    "market_cap",
+    "price_history",
+    "related_companies",
+    "ticker_details",
+    "news",
+]
+
+# Datasets used by the tools of the first speakers: liquidity, historical margin, competitive and qualitative analysts
+DISCUSSION_DATASETS = ["income_statement", "ratios", "market_cap", "related_companies", "ticker_details", "news"]
+# Datasets used by competative_func for the related companies
+COMPETITOR_DATASETS = ["income_statement", "ratios", "market_cap"]
+# The analysts usually request the start year and the years before it
+SPECULATIVE_YEARS_BACK = 2
+
+
+def _fetch_income_statement(symbol: str, years: List[int], context: RunContext) -> bool:
+    return any(fetch_income_statement(symbol, year, context.as_of) for year in years)
+
+
+def _fetch_ratios(symbol: str, years: List[int], context: RunContext) -> bool:
+    return any([ratios(symbol, year, context.as_of) for year in years])
+
+
+def _fetch_market_cap(symbol: str, years: List[int], context: RunContext) -> bool:
+    covered = False
+    for year in years:
+        # price_to_EBIT_ratio requests the market cap of each year and the 10 years income statement. Its ratio is
+        # None without EBIT, so the coverage is judged by the market cap itself, read back from the cache.
+        price_to_EBIT_ratio(symbol, year, context.as_of)
+        covered = market_cap(symbol, year, context.as_of) is not None or covered
+    return covered
+
+
+def _fetch_price_history(symbol: str, years: List[int], context: RunContext) -> bool:
+    data = get_historical_data(symbol)
+    return bool(data and data.get("historical"))
+
+
+def _fetch_related_companies(symbol: str, years: List[int], context: RunContext) -> bool:
+    return bool(get_related_companies(symbol, as_of=context.as_of))
+
+
+def _fetch_ticker_details(symbol: str, years: List[int], context: RunContext) -> bool:
+    return "error" not in json.loads(extract_business_info(symbol, context.as_of))
+
+
+def _fetch_news(symbol: str, years: List[int], context: RunContext) -> bool:
+    # The news tool requests the articles of the start year of the run
+    articles = json.loads(get_company_data(symbol, year=context.start_year, as_of=context.as_of))
+    return bool(articles) and "error" not in articles
+
+
+_FETCHERS = {
+    "income_statement": _fetch_income_statement,
+    "ratios": _fetch_ratios,
+    "market_cap": _fetch_market_cap,
+    "price_history": _fetch_price_history,
+    "related_companies": _fetch_related_companies,
+    "ticker_details": _fetch_ticker_details,
+    "news": _fetch_news,
+}
+
+
+def _prefetch_dataset(dataset: str, symbol: str, years: List[int], context: RunContext,
+                      stop: Optional[threading.Event] = None) -> bool:
+    if stop is not None and stop.is_set():
+        return False
+    try:
+        # Prefetch traffic yields the provider quotas to the discussions' tool calls
+        with request_priority(PREFETCH):
+            return _FETCHERS[dataset](symbol, years, context)
+    except Exception as e:
+        print(f"Error prefetching {dataset} for {symbol}: {str(e)}")
+        return False
+
+
+def prefetch_tickers(symbols: List[str], start_year: int, end_year: int, datasets: List[str] = None, max_workers: int = 8,
+                     context: Optional[RunContext] = None, stop: Optional[threading.Event] = None) -> Dict[str, Dict[str, bool]]:
+    """
+    Populates the API cache concurrently with all the data the agents need for the given tickers and years.
+
+    Args:
+        symbols (List[str]): The stock ticker symbols to prefetch
+        start_year (int): The first year of the range
+        end_year (int): The last year of the range (inclusive)
+        datasets (List[str], optional): Subset of DATASETS to prefetch. Defaults to all of them.
+        max_workers (int): The number of concurrent fetches
+        context (RunContext, optional): The run the cache is warmed for, a run over the range of years by default
+        stop (threading.Event, optional): Once set, the fetches not started yet are cancelled and left out of the coverage
+
+    Returns:
+        dict: coverage per symbol and dataset - True if data was returned, False otherwise
+    """
+    datasets = datasets or DATASETS
+    unknown = [dataset for dataset in datasets if dataset not in _FETCHERS]
+    if unknown:
+        raise ValueError(f"Unknown datasets: {unknown}. Choose from {DATASETS}")
+
+    context = context or RunContext.for_years(start_year, end_year)
+    years = list(range(start_year, end_year + 1))
+    coverage = {symbol: {} for symbol in symbols}
+
+    executor = ThreadPoolExecutor(max_workers=max_workers)
+    try:
+        futures = {}
+        for symbol in symbols:
+            for dataset in datasets:
+                if stop is not None and stop.is_set():
+                    break
+                futures[executor.submit(_prefetch_dataset, dataset, symbol, years, context, stop)] = (symbol, dataset)
+        for future in as_completed(futures):
+            if stop is not None and stop.is_set():
+                break
+            symbol, dataset = futures[future]
+            coverage[symbol][dataset] = future.result()
+    finally:
+        # The fetches in progress finish their current request; the pending ones never start
+        executor.shutdown(wait=False, cancel_futures=True)
+
+    return coverage
+
+
+def prefetch_discussion_data(symbols: List[str], context: RunContext, stop: Optional[threading.Event] = None) -> Dict[str, Dict[str, bool]]:
+    """
+    Speculatively warms the cache with the tool data of the first speakers of an investment house discussion,
+    including the peer group returned by get_related_companies, which is what competative_func compares against.
+
+    Args:
+        symbols (List[str]): The stock ticker symbols of the discussion
+        context (RunContext): The run of the discussion, whose start year is the given start year for the investment
+        stop (threading.Event, optional): Set when the discussion returns, to stop the requests that are not sent yet
+
+    Returns:
+        dict: coverage per symbol and dataset, including the competitors
+    """
+    symbols = [symbol.strip() for symbol in symbols if symbol.strip()]
+    first_year = context.start_year - SPECULATIVE_YEARS_BACK
+    coverage = prefetch_tickers(symbols, first_year, context.start_year, datasets=DISCUSSION_DATASETS, context=context, stop=stop)
+
+    competitors = []
+    for symbol in symbols:
+        if stop is not None and stop.is_set():
+            return coverage
+        try:
+            competitors.extend(related for related in get_related_companies(symbol, n=PEER_GROUP_SIZE, as_of=context.as_of) if related not in symbols)
+        except Exception as e:
+            print(f"Error prefetching the competitor of {symbol}: {str(e)}")
+
+    if competitors:
+        coverage.update(prefetch_tickers(list(dict.fromkeys(competitors)), first_year, context.start_year, datasets=COMPETITOR_DATASETS, context=context, stop=stop))
+    return coverage
+
+
+def format_coverage_report(coverage: Dict[str, Dict[str, bool]]) -> str:
+    """
+    Formats the coverage returned by prefetch_tickers as a fixed-width table.
+
+    Args:
+        coverage (dict): coverage per symbol and dataset
+
+    Returns:
+        str: the coverage report
+    """
+    datasets = [dataset for dataset in DATASETS if any(dataset in row for row in coverage.values())]
+    width = max([len("symbol")] + [len(symbol) for symbol in coverage])
+    lines = [" ".join(["symbol".ljust(width)] + [dataset.ljust(len(dataset)) for dataset in datasets])]
+
+    covered = 0
+    for symbol, row in coverage.items():
+        cells = ["ok".ljust(len(dataset)) if row.get(dataset) else "-".ljust(len(dataset)) for dataset in datasets]
+        lines.append(" ".join([symbol.ljust(width)] + cells))
+        covered += sum(1 for dataset in datasets if row.get(dataset))
+
+    total = len(coverage) * len(datasets)
+    percentage = (covered / total) * 100 if total else 0.0
+    lines.append(f"Coverage: {covered}/{total} ({percentage:.1f}%)")
+    return "\n".join(lines)
+
+
+def is_cache_service_running(api_service_url: str = "http://localhost:8000") -> bool:
+    """Checks if the FastAPI caching service is reachable."""
+    try:
+        return requests.get(f"{api_service_url}/docs", timeout=5).status_code == 200
+    except requests.exceptions.RequestException:
+        return False
+
+
+def main(argv: List[str] = None):
+    parser = argparse.ArgumentParser(description="Warm the API cache for a list of tickers.")
+    parser.add_argument("symbols", nargs="*", default=TICKER_STOCKS, help="Ticker symbols to prefetch")
+    parser.add_argument("--start-year", type=int, default=START_YEAR)
+    parser.add_argument("--end-year", type=int, default=END_YEAR)
+    parser.add_argument("--datasets", nargs="+", choices=DATASETS, default=DATASETS)
+    parser.add_argument("--workers", type=int, default=8)
+    args = parser.parse_args(argv)
+
+    if not is_cache_service_running():
+        print("The caching service is not running. Start it with `python Main.py` before prefetching.")
+        sys.exit(1)
+
+    symbols = [symbol.strip().upper() for symbol in args.symbols if symbol.strip()]
+    coverage = prefetch_tickers(symbols, args.start_year, args.end_year, args.datasets, args.workers)
+    print(format_coverage_report(coverage))
+
+
+if __name__ == "__main__":
+    main()
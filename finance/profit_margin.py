@@ -1,26 +1,34 @@
 """
     profit_margin.py - Functions to calculate profit margins for a company ticker symbol.
 """
+import asyncio
 import json
-from database.api_utils import cached_api_request
+from typing import Dict, List, Optional, Sequence
+import numpy as np
+from database.api_utils import async_cached_api_request, cached_api_request
+from finance.metrics_batch import fetch_parallel, year_matrix
 
-def fetch_income_statement(symbol: str, year: int) -> dict: 
-    """
-    Fetches the income statement data for the given company ticker and year using the FMP API.
+# (margin, income statement field) of the batch variants
+MARGIN_FIELDS = [
+    ("gross_margin", "grossProfit"),
+    ("operating_margin", "operatingIncome"),
+    ("net_margin", "netIncome"),
+]
 
-    Args:
-        symbol (str): The stock ticker symbol
-        year (int): The year for which the income statement data is requested
 
-    Returns:
-        dict: dictionary containing the income statement data for the given year
-    """
-    response_text = cached_api_request(
-        url=f"https://financialmodelingprep.com/api/v3/income-statement/{symbol}",
-        api_key_name="FMP_API_KEY",
-        api_key_param="apikey",
-        api_key_in_url=True
-    )
+def _income_statement_request(symbol: str, as_of: Optional[str] = None) -> dict:
+    """Returns the cached_api_request arguments of the income statement of the given symbol."""
+    return {
+        "url": f"https://financialmodelingprep.com/api/v3/income-statement/{symbol}",
+        "api_key_name": "FMP_API_KEY",
+        "api_key_param": "apikey",
+        "api_key_in_url": True,
+        "as_of": as_of
+    }
+
+
+def _select_income_statement(response_text: str, year: int) -> dict:
+    """Returns the income statement of the given year from the API response, or None."""
     try:
         data = json.loads(response_text)
         for dict in data:
@@ -35,18 +43,30 @@ def fetch_income_statement(symbol: str, year: int) -> dict:
         return None
 
 
-def calculate_profit_margins(symbol: str, year: int) -> dict:
+def fetch_income_statement(symbol: str, year: int, as_of: Optional[str] = None) -> dict:
     """
-    Calculates the profit margins for the given company ticker and year using the FMP API.
+    Fetches the income statement data for the given company ticker and year using the FMP API.
 
     Args:
         symbol (str): The stock ticker symbol
-        year (int): The year for which the profit margins are calculated
+        year (int): The year for which the income statement data is requested
+        as_of (str, optional): The as-of date of the data (YYYY-MM-DD), None for the latest data
 
     Returns:
-        dict: dictionary containing the profit margins for the given year
+        dict: dictionary containing the income statement data for the given year
     """
-    data = fetch_income_statement(symbol, year)
+    response_text = cached_api_request(**_income_statement_request(symbol, as_of))
+    return _select_income_statement(response_text, year)
+
+
+async def fetch_income_statement_async(symbol: str, year: int, as_of: Optional[str] = None) -> dict:
+    """Async version of fetch_income_statement."""
+    response_text = await async_cached_api_request(**_income_statement_request(symbol, as_of))
+    return _select_income_statement(response_text, year)
+
+
+def _profit_margins(data: dict):
+    """Computes the profit margins of an income statement."""
     if data:
         revenue = data.get('revenue')
         gross_profit = data.get('grossProfit')
@@ -67,3 +87,55 @@ def calculate_profit_margins(symbol: str, year: int) -> dict:
         else:
             return {"error": "Revenue is zero or undefined."}
     return {"error": "No data available for the given symbol and year."}
+
+
+def calculate_profit_margins(symbol: str, year: int, as_of: Optional[str] = None) -> dict:
+    """
+    Calculates the profit margins for the given company ticker and year using the FMP API.
+
+    Args:
+        symbol (str): The stock ticker symbol
+        year (int): The year for which the profit margins are calculated
+        as_of (str, optional): The as-of date of the data (YYYY-MM-DD), None for the latest data
+
+    Returns:
+        dict: dictionary containing the profit margins for the given year
+    """
+    return _profit_margins(fetch_income_statement(symbol, year, as_of))
+
+
+async def calculate_profit_margins_async(symbol: str, year: int, as_of: Optional[str] = None) -> dict:
+    """Async version of calculate_profit_margins."""
+    return _profit_margins(await fetch_income_statement_async(symbol, year, as_of))
+
+
+def _profit_margins_matrix(response_texts: List[str], years: Sequence[int]) -> Dict[str, np.ndarray]:
+    """Computes the profit margins of every symbol and year from the income statement API responses, one per symbol."""
+    fields = ["revenue"] + [name for _, name in MARGIN_FIELDS]
+    statements = np.stack([year_matrix(text, years, fields) for text in response_texts]) if response_texts else np.full((0, len(fields), len(years)), np.nan)
+    # As in _profit_margins: undefined without revenue, and a zero profit is reported as unavailable
+    statements[statements == 0] = np.nan
+    revenue = statements[:, 0]
+    return {margin: statements[:, row] / revenue * 100 for row, (margin, _) in enumerate(MARGIN_FIELDS, start=1)}
+
+
+def profit_margins_batch(symbols: Sequence[str], years: Sequence[int], as_of: Optional[str] = None) -> Dict[str, np.ndarray]:
+    """
+    Batch variant of calculate_profit_margins: the income statements are fetched once per symbol, in parallel.
+
+    Args:
+        symbols (Sequence[str]): The stock ticker symbols
+        years (Sequence[int]): The years for which the profit margins are calculated
+        as_of (str, optional): The as-of date of the data (YYYY-MM-DD), None for the latest data
+
+    Returns:
+        Dict[str, np.ndarray]: gross_margin, operating_margin and net_margin in %, each a (symbols, years) matrix with NaN for the missing values
+    """
+    response_texts = fetch_parallel(cached_api_request, [_income_statement_request(symbol, as_of) for symbol in symbols])
+    return _profit_margins_matrix(response_texts, years)
+
+
+async def profit_margins_batch_async(symbols: Sequence[str], years: Sequence[int], as_of: Optional[str] = None) -> Dict[str, np.ndarray]:
+    """Async version of profit_margins_batch. The symbols are fetched concurrently."""
+    response_texts = await asyncio.gather(*[async_cached_api_request(**_income_statement_request(symbol, as_of)) for symbol in symbols])
+    return _profit_margins_matrix(list(response_texts), years)
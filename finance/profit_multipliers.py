@@ -1,36 +1,70 @@
 """
 profit_multipliers.py - Functions to calculate profit multipliers for a company ticker symbol.
 """
+import asyncio
 import json
-from database.api_utils import cached_api_request
+from typing import Dict, List, Optional, Sequence
+import numpy as np
+from database.api_utils import async_cached_api_request, cached_api_request
+from finance.metrics_batch import fetch_parallel, year_matrix
 
+# (MetricsRow attribute, ratios field) of the batch variant of ratios
+RATIO_FIELDS = [
+    ("price_to_earning", "priceEarningsRatio"),
+    ("price_to_book", "priceToBookRatio"),
+    ("price_earnings_to_growth", "priceEarningsToGrowthRatio"),
+    ("price_to_sales", "priceToSalesRatio"),
+]
 
-def price_to_EBIT_ratio(symbol: str, year: int ) -> str:
-    """
-    Calculate the Price/EBIT ratio for a given company symbol using FMP API.
 
-    Args:
-        symbol (str): The stock ticker symbol (e.g., 'AAPL')
-        yesr (int): The fiscal year for which to calculate the ratio
-
-    Returns:
-        str: The Price/EBIT ratio, or None if data is unavailable
-    """
-    ebit = None 
-    market_cap = None
-    # Fetch market capitalization
-    market_cap_response_text = cached_api_request(
-        url=f"https://financialmodelingprep.com/api/v3/historical-market-capitalization/{symbol}",
-        api_key_name="FMP_API_KEY",
-        api_key_param="apikey",
-        api_key_in_url=True,
-        params={
+def _market_cap_request(symbol: str, year: int, as_of: Optional[str] = None) -> dict:
+    """Returns the cached_api_request arguments of the market capitalization of the given symbol and year."""
+    return {
+        "url": f"https://financialmodelingprep.com/api/v3/historical-market-capitalization/{symbol}",
+        "api_key_name": "FMP_API_KEY",
+        "api_key_param": "apikey",
+        "api_key_in_url": True,
+        "params": {
             "limit": 1,
             "from": f"{year}-01-01",
             "to": f"{year}-12-31"
-        }
-    )
-    
+        },
+        "as_of": as_of
+    }
+
+
+def _ebit_request(symbol: str, as_of: Optional[str] = None) -> dict:
+    """Returns the cached_api_request arguments of the annual income statements used for EBIT."""
+    return {
+        "url": f"https://financialmodelingprep.com/api/v3/income-statement/{symbol}",
+        "api_key_name": "FMP_API_KEY",
+        "api_key_param": "apikey",
+        "api_key_in_url": True,
+        "params": {
+            "limit": 10,
+            "period": "annual"
+        },
+        "as_of": as_of
+    }
+
+
+def _ratios_request(symbol: str, as_of: Optional[str] = None) -> dict:
+    """Returns the cached_api_request arguments of the annual ratios of the given symbol."""
+    return {
+        "url": f"https://financialmodelingprep.com/api/v3/ratios/{symbol}",
+        "api_key_name": "FMP_API_KEY",
+        "api_key_param": "apikey",
+        "api_key_in_url": True,
+        "params": {"period": "annual"},
+        "as_of": as_of
+    }
+
+
+def _price_to_EBIT(market_cap_response_text: str, income_statement_response_text: str, year: int) -> str:
+    """Computes the Price/EBIT ratio of the given year from the market cap and income statement API responses."""
+    ebit = None
+    market_cap = None
+
     try:
         market_cap_data = json.loads(market_cap_response_text)
         if market_cap_data and len(market_cap_data) > 0:
@@ -42,18 +76,6 @@ def price_to_EBIT_ratio(symbol: str, year: int ) -> str:
         print(f"Error processing market cap API response: {str(e)}")
         return None
 
-    # Fetch EBIT
-    income_statement_response_text = cached_api_request(
-        url=f"https://financialmodelingprep.com/api/v3/income-statement/{symbol}",
-        api_key_name="FMP_API_KEY",
-        api_key_param="apikey",
-        api_key_in_url=True,
-        params={
-            "limit": 10,
-            "period": "annual"
-        }
-    )
-    
     try:
         income_statement_data = json.loads(income_statement_response_text)
         for dict in income_statement_data:
@@ -76,28 +98,52 @@ def price_to_EBIT_ratio(symbol: str, year: int ) -> str:
         return None
 
 
-def ratios(symbol: str, year:int) -> dict:  
+def market_cap(symbol: str, year: int, as_of: Optional[str] = None) -> Optional[float]:
     """
-    return all the ratios for a given company symbol: 
-    - Price/Earnings ratio
-    - Price/Book ratio
-    - PEG ratio
-    - Price/Sales ratio
+    Fetches the market capitalization of a company in a given year using FMP API.
 
     Args:
-        symbol (str): Company ticker symbol (e.g., 'AAPL')
-        
+        symbol (str): The stock ticker symbol (e.g., 'AAPL')
+        year (int): The year of the market capitalization
+        as_of (str, optional): The as-of date of the data (YYYY-MM-DD), None for the latest data
+
     Returns:
-        float | None: The Price/Earnings ratio or None if data is unavailable
+        float: The market capitalization, or None if data is unavailable
+    """
+    value = _market_cap(cached_api_request(**_market_cap_request(symbol, year, as_of)))
+    return None if np.isnan(value) else value
+
+
+def price_to_EBIT_ratio(symbol: str, year: int, as_of: Optional[str] = None) -> str:
     """
-    response_text = cached_api_request(
-        url=f"https://financialmodelingprep.com/api/v3/ratios/{symbol}",
-        api_key_name="FMP_API_KEY",
-        api_key_param="apikey",
-        api_key_in_url=True,
-        params={"period": "annual"}
+    Calculate the Price/EBIT ratio for a given company symbol using FMP API.
+
+    Args:
+        symbol (str): The stock ticker symbol (e.g., 'AAPL')
+        yesr (int): The fiscal year for which to calculate the ratio
+        as_of (str, optional): The as-of date of the data (YYYY-MM-DD), None for the latest data
+
+    Returns:
+        str: The Price/EBIT ratio, or None if data is unavailable
+    """
+    # Fetch market capitalization
+    market_cap_response_text = cached_api_request(**_market_cap_request(symbol, year, as_of))
+    # Fetch EBIT
+    income_statement_response_text = cached_api_request(**_ebit_request(symbol, as_of))
+    return _price_to_EBIT(market_cap_response_text, income_statement_response_text, year)
+
+
+async def price_to_EBIT_ratio_async(symbol: str, year: int, as_of: Optional[str] = None) -> str:
+    """Async version of price_to_EBIT_ratio. The market cap and the income statement are fetched concurrently."""
+    market_cap_response_text, income_statement_response_text = await asyncio.gather(
+        async_cached_api_request(**_market_cap_request(symbol, year, as_of)),
+        async_cached_api_request(**_ebit_request(symbol, as_of))
     )
-    
+    return _price_to_EBIT(market_cap_response_text, income_statement_response_text, year)
+
+
+def _select_ratios(response_text: str, year: int) -> dict:
+    """Returns the ratios of the given year from the API response as a JSON string, or None."""
     try:
         data = json.loads(response_text)
         if data:
@@ -121,3 +167,105 @@ def ratios(symbol: str, year:int) -> dict:
     except Exception as e:
         print(f"Error processing API response: {str(e)}")
         return None
+
+
+def ratios(symbol: str, year:int, as_of: Optional[str] = None) -> dict:
+    """
+    return all the ratios for a given company symbol:
+    - Price/Earnings ratio
+    - Price/Book ratio
+    - PEG ratio
+    - Price/Sales ratio
+
+    Args:
+        symbol (str): Company ticker symbol (e.g., 'AAPL')
+        as_of (str, optional): The as-of date of the data (YYYY-MM-DD), None for the latest data
+
+    Returns:
+        float | None: The Price/Earnings ratio or None if data is unavailable
+    """
+    response_text = cached_api_request(**_ratios_request(symbol, as_of))
+    return _select_ratios(response_text, year)
+
+
+async def ratios_async(symbol: str, year: int, as_of: Optional[str] = None) -> dict:
+    """Async version of ratios."""
+    response_text = await async_cached_api_request(**_ratios_request(symbol, as_of))
+    return _select_ratios(response_text, year)
+
+
+def _market_cap(response_text: str) -> float:
+    """Returns the market cap of a market cap API response, or NaN."""
+    try:
+        data = json.loads(response_text)
+        value = data[0].get('marketCap') if isinstance(data, list) and data else None
+        return float(value) if value is not None else np.nan
+    except json.JSONDecodeError:
+        print("Failed to parse market cap API response as JSON")
+    except Exception as e:
+        print(f"Error processing market cap API response: {str(e)}")
+    return np.nan
+
+
+def _price_to_EBIT_matrix(market_cap_response_texts: List[str], income_statement_response_texts: List[str],
+                          years: Sequence[int]) -> np.ndarray:
+    """Computes the Price/EBIT ratios from the market cap responses of each symbol and year (symbol-major) and the income statements of each symbol."""
+    shape = (len(income_statement_response_texts), len(years))
+    market_caps = np.array([_market_cap(text) for text in market_cap_response_texts], dtype=float).reshape(shape)
+    ebit = np.array([year_matrix(text, years, ["operatingIncome"])[0] for text in income_statement_response_texts], dtype=float).reshape(shape)
+    return market_caps / np.where(ebit == 0, np.nan, ebit)
+
+
+def price_to_EBIT_batch(symbols: Sequence[str], years: Sequence[int], as_of: Optional[str] = None) -> np.ndarray:
+    """
+    Batch variant of price_to_EBIT_ratio: the income statements are fetched once per symbol, in parallel.
+
+    Args:
+        symbols (Sequence[str]): The stock ticker symbols
+        years (Sequence[int]): The fiscal years
+        as_of (str, optional): The as-of date of the data (YYYY-MM-DD), None for the latest data
+
+    Returns:
+        np.ndarray: The (symbols, years) matrix of Price/EBIT ratios, NaN where the data is unavailable
+    """
+    market_cap_response_texts = fetch_parallel(cached_api_request, [_market_cap_request(symbol, year, as_of) for symbol in symbols for year in years])
+    income_statement_response_texts = fetch_parallel(cached_api_request, [_ebit_request(symbol, as_of) for symbol in symbols])
+    return _price_to_EBIT_matrix(market_cap_response_texts, income_statement_response_texts, years)
+
+
+async def price_to_EBIT_batch_async(symbols: Sequence[str], years: Sequence[int], as_of: Optional[str] = None) -> np.ndarray:
+    """Async version of price_to_EBIT_batch. Every request is made concurrently."""
+    market_cap_response_texts, income_statement_response_texts = await asyncio.gather(
+        asyncio.gather(*[async_cached_api_request(**_market_cap_request(symbol, year, as_of)) for symbol in symbols for year in years]),
+        asyncio.gather(*[async_cached_api_request(**_ebit_request(symbol, as_of)) for symbol in symbols])
+    )
+    return _price_to_EBIT_matrix(market_cap_response_texts, income_statement_response_texts, years)
+
+
+def _ratios_matrix(response_texts: List[str], years: Sequence[int]) -> Dict[str, np.ndarray]:
+    """Returns the ratios of every symbol and year from the ratios API responses, one per symbol."""
+    fields = [name for _, name in RATIO_FIELDS]
+    matrix = np.stack([year_matrix(text, years, fields) for text in response_texts]) if response_texts else np.full((0, len(fields), len(years)), np.nan)
+    return {attribute: matrix[:, row] for row, (attribute, _) in enumerate(RATIO_FIELDS)}
+
+
+def ratios_batch(symbols: Sequence[str], years: Sequence[int], as_of: Optional[str] = None) -> Dict[str, np.ndarray]:
+    """
+    Batch variant of ratios: the ratios are fetched once per symbol, in parallel.
+
+    Args:
+        symbols (Sequence[str]): The stock ticker symbols
+        years (Sequence[int]): The fiscal years
+        as_of (str, optional): The as-of date of the data (YYYY-MM-DD), None for the latest data
+
+    Returns:
+        Dict[str, np.ndarray]: price_to_earning, price_to_book, price_earnings_to_growth and price_to_sales,
+        each a (symbols, years) matrix with NaN for the missing values
+    """
+    return _ratios_matrix(fetch_parallel(cached_api_request, [_ratios_request(symbol, as_of) for symbol in symbols]), years)
+
+
+async def ratios_batch_async(symbols: Sequence[str], years: Sequence[int], as_of: Optional[str] = None) -> Dict[str, np.ndarray]:
+    """Async version of ratios_batch. The symbols are fetched concurrently."""
+    response_texts = await asyncio.gather(*[async_cached_api_request(**_ratios_request(symbol, as_of)) for symbol in symbols])
+    return _ratios_matrix(list(response_texts), years)
@@ -0,0 +1,251 @@
+"""
+screener.py - Cross-sectional screener of the locally cached fundamentals
+Ranks a universe of tickers with the metrics of the analysts' tools (the profit margins of profit_margin.py, and the
+Price/EBIT and valuation ratios of profit_multipliers.py), computed with numpy over the Parquet export of the cache,
+so only the top tickers are debated by the investment houses.
+Higher margins and lower (positive) multiples rank better; each metric is ranked as a percentile across the universe
+and the score is the mean of the available percentiles.
+
+Usage (ranks the tickers exported by python -m database.columnar_export):
+    python -m finance.screener --year 2022 --top 10
+"""
+import argparse
+from dataclasses import dataclass, field
+from typing import Dict, Iterable, List, Optional
+import numpy as np
+import pyarrow as pa
+import pyarrow.compute as pc
+from config.app_constants import COLUMNAR_EXPORT_DIR
+from database.columnar_export import read_dataset
+from database.snapshots import REPORTING_LAG_DAYS
+from finance.metrics_batch import rank_keys
+from finance.tool_results import format_table
+
+# (metric, higher is better) in the order of the report
+SCREEN_METRICS = [
+    ("gross_margin", True),
+    ("operating_margin", True),
+    ("net_margin", True),
+    ("price_to_EBIT", False),
+    ("price_to_earning", False),
+    ("price_to_book", False),
+    ("price_to_sales", False),
+]
+# Tickers with fewer metrics are not ranked
+MIN_METRICS = 3
+
+
+@dataclass
+class ScreenRow:
+    symbol: str
+    score: float
+    metrics: Dict[str, float] = field(default_factory=dict)
+
+
+@dataclass
+class ScreenResult:
+    year: int
+    universe_size: int
+    rows: List[ScreenRow] = field(default_factory=list)
+
+    def symbols(self) -> List[str]:
+        return [row.symbol for row in self.rows]
+
+    def __str__(self) -> str:
+        if not self.rows:
+            return f"No ticker of the universe ({self.universe_size}) has enough cached data for {self.year}."
+        headers = ["rank", "symbol", "score"] + [metric for metric, _ in SCREEN_METRICS]
+        table = [
+            [str(rank), row.symbol, f"{row.score:.2f}"] + [
+                "-" if np.isnan(row.metrics[metric]) else f"{row.metrics[metric]:.2f}" for metric, _ in SCREEN_METRICS
+            ]
+            for rank, row in enumerate(self.rows, start=1)
+        ]
+        return f"Top {len(self.rows)} of {self.universe_size} tickers ({self.year})\n" + format_table(headers, table)
+
+
+def _latest_per_symbol(symbols: np.ndarray, dates: np.ndarray, universe: np.ndarray) -> np.ndarray:
+    """Returns, for each ticker of the (sorted) universe, the index of its latest row, or -1 if it has none."""
+    positions = np.full(len(universe), -1)
+    if len(symbols) == 0:
+        return positions
+    order = np.lexsort((dates, symbols))
+    # The last row of each ticker in (symbol, date) order is its latest
+    last = order[np.r_[symbols[order][1:] != symbols[order][:-1], True]]
+    found = np.searchsorted(universe, symbols[last])
+    in_universe = (found < len(universe)) & (universe[np.minimum(found, len(universe) - 1)] == symbols[last])
+    positions[found[in_universe]] = last[in_universe]
+    return positions
+
+
+def _dates(table, name: str) -> np.ndarray:
+    """Returns a date column as a datetime64[D] array, with NaT for the missing dates."""
+    return table.column(name).to_numpy(zero_copy_only=False).astype("datetime64[D]")
+
+
+def _annual(table):
+    """Keeps the fiscal-year rows (rows without a period are annual requests too)."""
+    return table.filter(pc.fill_null(pc.equal(table.column("period"), "FY"), True))
+
+
+def _column(table, name: str) -> np.ndarray:
+    """Returns a numeric column as a float array, with NaN for the missing values."""
+    return table.column(name).to_numpy(zero_copy_only=False).astype(float)
+
+
+def _aligned(values: np.ndarray, positions: np.ndarray) -> np.ndarray:
+    aligned = np.full(len(positions), np.nan)
+    aligned[positions >= 0] = values[positions[positions >= 0]]
+    return aligned
+
+
+def _available(table, available_on: np.ndarray, as_of: Optional[str]):
+    """Keeps the rows available on the as-of date."""
+    if as_of is None or table.num_rows == 0:
+        return table
+    return table.filter(pa.array(available_on <= np.datetime64(as_of)))
+
+
+def _fiscal_years(income, universe: np.ndarray, year: int) -> np.ndarray:
+    """Returns, for each ticker of the universe, its latest fiscal year with a statement, or year - 1 if it has none."""
+    fiscal_years = np.full(len(universe), year - 1)
+    if income.num_rows == 0:
+        return fiscal_years
+    symbols = income.column("symbol").to_numpy(zero_copy_only=False).astype(object)
+    years = income.column("year").to_numpy(zero_copy_only=False).astype(int)
+    np.maximum.at(fiscal_years, np.searchsorted(universe, symbols), years)
+    return fiscal_years
+
+
+def _in_fiscal_year(table, universe: np.ndarray, fiscal_years: np.ndarray):
+    """Keeps the rows of each ticker's fiscal year."""
+    if table.num_rows == 0:
+        return table
+    positions = np.searchsorted(universe, table.column("symbol").to_numpy(zero_copy_only=False).astype(object))
+    in_universe = positions < len(universe)
+    years = table.column("year").to_numpy(zero_copy_only=False).astype(int)
+    keep = in_universe & (years == fiscal_years[np.minimum(positions, len(universe) - 1)])
+    return table.filter(pa.array(keep))
+
+
+def compute_metrics(year: int, symbols: Optional[Iterable[str]] = None, as_of: Optional[str] = None,
+                    export_dir: str = COLUMNAR_EXPORT_DIR) -> tuple:
+    """
+    Computes the screen metrics of every ticker of the universe for a fiscal year.
+    With an as-of date, each ticker uses its latest fiscal year published on that date: a company with a December
+    fiscal year files its statements of the year in the next one, so its previous fiscal year is used.
+
+    Args:
+        year (int): The fiscal year of the fundamentals
+        symbols (Iterable[str], optional): The universe. Every exported ticker if not given.
+        as_of (str, optional): Only data available on this date (YYYY-MM-DD), as in the point-in-time snapshots
+        export_dir (str): The root directory of the exported datasets
+
+    Returns:
+        tuple: (universe, metrics) - the sorted tickers and a dict of metric name to a float array aligned with them
+    """
+    symbols = [symbol.strip().upper() for symbol in symbols if symbol.strip()] if symbols is not None else None
+    years = [year - 1, year] if as_of is not None else [year]
+    income = read_dataset("income_statement", symbols, years, ["date", "period", "filing_date", "revenue", "gross_profit",
+                                                                  "operating_income", "net_income"], export_dir)
+    income = _annual(income)
+    # As in the snapshots: statements are available from their filing date, or after the reporting lag
+    filed = _dates(income, "filing_date")
+    lag = np.timedelta64(REPORTING_LAG_DAYS, "D")
+    income = _available(income, np.where(np.isnat(filed), _dates(income, "date") + lag, filed), as_of)
+
+    ratios = read_dataset("ratios", symbols, years, ["date", "period", "price_earnings_ratio", "price_to_book_ratio",
+                                                        "price_to_sales_ratio"], export_dir)
+    ratios = _annual(ratios)
+    ratios = _available(ratios, _dates(ratios, "date") + lag, as_of)
+
+    market_cap = read_dataset("market_cap", symbols, years, ["date", "market_cap"], export_dir)
+    market_cap = _available(market_cap, _dates(market_cap, "date"), as_of)
+
+    if symbols is not None:
+        universe = np.unique(np.array(symbols, dtype=object))
+    else:
+        universe = np.unique(np.concatenate([
+            table.column("symbol").to_numpy(zero_copy_only=False) for table in (income, ratios, market_cap)
+        ]).astype(object))
+
+    if as_of is not None:
+        fiscal_years = _fiscal_years(income, universe, year)
+        income, ratios, market_cap = (_in_fiscal_year(table, universe, fiscal_years) for table in (income, ratios, market_cap))
+
+    def rows_of(table):
+        return _latest_per_symbol(table.column("symbol").to_numpy(zero_copy_only=False).astype(object), _dates(table, "date"), universe)
+
+    income_rows, ratio_rows, market_cap_rows = rows_of(income), rows_of(ratios), rows_of(market_cap)
+    revenue = _aligned(_column(income, "revenue"), income_rows)
+    operating_income = _aligned(_column(income, "operating_income"), income_rows)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        # As in profit_margin.py: percentages of the revenue, undefined without revenue
+        revenue = np.where(revenue == 0, np.nan, revenue)
+        metrics = {
+            "gross_margin": _aligned(_column(income, "gross_profit"), income_rows) / revenue * 100,
+            "operating_margin": operating_income / revenue * 100,
+            "net_margin": _aligned(_column(income, "net_income"), income_rows) / revenue * 100,
+            # As in profit_multipliers.py: the market cap over the operating income (EBIT), undefined for a zero EBIT
+            "price_to_EBIT": _aligned(_column(market_cap, "market_cap"), market_cap_rows) / np.where(operating_income == 0, np.nan, operating_income),
+            "price_to_earning": _aligned(_column(ratios, "price_earnings_ratio"), ratio_rows),
+            "price_to_book": _aligned(_column(ratios, "price_to_book_ratio"), ratio_rows),
+            "price_to_sales": _aligned(_column(ratios, "price_to_sales_ratio"), ratio_rows),
+        }
+    return universe, metrics
+
+
+def percentile_ranks(values: np.ndarray, higher_is_better: bool) -> np.ndarray:
+    """
+    Ranks values as percentiles in [0, 1], 1 being the best (see rank_keys). NaN stays NaN.
+    """
+    ranks = np.full(len(values), np.nan)
+    valid = ~np.isnan(values)
+    if valid.sum() == 0:
+        return ranks
+    keys = rank_keys(values[valid], higher_is_better)
+    order = keys.argsort(kind="stable").argsort(kind="stable")
+    ranks[valid] = order / max(valid.sum() - 1, 1)
+    return ranks
+
+
+def screen(year: int, top_n: int = 10, symbols: Optional[Iterable[str]] = None, as_of: Optional[str] = None,
+           export_dir: str = COLUMNAR_EXPORT_DIR) -> ScreenResult:
+    """
+    Ranks the universe and returns its top tickers.
+
+    Args:
+        year (int): The fiscal year of the fundamentals, usually the start year of the analysis
+        top_n (int): The number of tickers to return
+        symbols (Iterable[str], optional): The universe. Every exported ticker if not given.
+        as_of (str, optional): Only data available on this date (YYYY-MM-DD), of each ticker's latest published fiscal year
+        export_dir (str): The root directory of the exported datasets
+
+    Returns:
+        ScreenResult: The top tickers, best first, with their score and metrics
+    """
+    universe, metrics = compute_metrics(year, symbols, as_of, export_dir)
+    if len(universe) == 0:
+        return ScreenResult(year, 0)
+    ranks = np.vstack([percentile_ranks(metrics[metric], higher) for metric, higher in SCREEN_METRICS])
+    counts = (~np.isnan(ranks)).sum(axis=0)
+    with np.errstate(invalid="ignore"):
+        scores = np.where(counts >= MIN_METRICS, np.nansum(ranks, axis=0) / np.maximum(counts, 1), np.nan)
+
+    ranked = np.flatnonzero(~np.isnan(scores))
+    # Best score first, ties by symbol
+    ranked = ranked[np.lexsort((universe[ranked].astype(str), -scores[ranked]))][:top_n]
+    rows = [
+        ScreenRow(str(universe[i]), float(scores[i]), {metric: float(metrics[metric][i]) for metric, _ in SCREEN_METRICS})
+        for i in ranked
+    ]
+    return ScreenResult(year, len(universe), rows)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Rank the cached tickers by margins and multiples.")
+    parser.add_argument("symbols", nargs="*", help="The universe (default: every exported ticker)")
+    parser.add_argument("--year", type=int, required=True)
+    parser.add_argument("--top", type=int, default=10)
+    args = parser.parse_args()
+    print(screen(args.year, args.top, args.symbols or None))
@@ -0,0 +1,259 @@
+"""
+tool_results.py
+Typed results of the agents' tools.
+autogen converts a tool's return value to text with str() (pydantic models are dumped to JSON instead),
+so str() of every result here is its compact rendering: one fixed-width row per symbol and year,
+instead of JSON strings nested in dicts and escaped again by the tool call.
+"""
+import json
+from dataclasses import dataclass, field
+from typing import Any, Dict, List, Optional
+
+MISSING = "-"
+
+
+def _number(value: Any) -> Optional[float]:
+    """Converts a tool value (number or numeric string) to a float, or None if unavailable."""
+    try:
+        return float(value) if value is not None else None
+    except (TypeError, ValueError):
+        return None
+
+
+def _as_dict(value: Any) -> Dict[str, Any]:
+    """Parses a tool value that may be a JSON string, a dict or None."""
+    if isinstance(value, dict):
+        return value
+    if isinstance(value, str):
+        try:
+            parsed = json.loads(value)
+            return parsed if isinstance(parsed, dict) else {}
+        except json.JSONDecodeError:
+            return {}
+    return {}
+
+
+def _format_number(value: Optional[float]) -> str:
+    return MISSING if value is None else f"{value:.2f}"
+
+
+def format_table(headers: List[str], rows: List[List[str]]) -> str:
+    """
+    Formats rows as a fixed-width text table.
+
+    Args:
+        headers (List[str]): The column names
+        rows (List[List[str]]): The formatted cells of each row
+
+    Returns:
+        str: The table, one line per row
+    """
+    widths = [max([len(header)] + [len(row[i]) for row in rows]) for i, header in enumerate(headers)]
+    lines = [" ".join(header.ljust(width) for header, width in zip(headers, widths)).rstrip()]
+    for row in rows:
+        lines.append(" ".join(cell.ljust(width) for cell, width in zip(row, widths)).rstrip())
+    return "\n".join(lines)
+
+
+@dataclass
+class QuickRatioResult:
+    symbol: str
+    year: int
+    quick_ratio: Optional[float] = None
+    error: Optional[str] = None
+
+    @classmethod
+    def from_tool_value(cls, symbol: str, year: int, value: str) -> "QuickRatioResult":
+        """Builds the result from the string returned by quick_ratio (a number or an error message)."""
+        quick_ratio = _number(value)
+        if quick_ratio is None:
+            return cls(symbol, year, error=value if value and value != "None" else "No quick ratio available.")
+        return cls(symbol, year, quick_ratio)
+
+    def __str__(self) -> str:
+        if self.error:
+            return f"{self.symbol} {self.year} quick ratio: {self.error}"
+        return f"{self.symbol} {self.year} quick ratio: {self.quick_ratio:.2f}"
+
+
+# (attribute, column header) of the metrics of a symbol and year
+METRIC_COLUMNS = [
+    ("gross_margin", "gross%"),
+    ("operating_margin", "oper%"),
+    ("net_margin", "net%"),
+    ("price_to_ebit", "P/EBIT"),
+    ("price_to_earning", "P/E"),
+    ("price_to_book", "P/B"),
+    ("price_earnings_to_growth", "PEG"),
+    ("price_to_sales", "P/S"),
+]
+
+
+@dataclass
+class MetricsRow:
+    symbol: str
+    year: int
+    gross_margin: Optional[float] = None
+    operating_margin: Optional[float] = None
+    net_margin: Optional[float] = None
+    price_to_ebit: Optional[float] = None
+    price_to_earning: Optional[float] = None
+    price_to_book: Optional[float] = None
+    price_earnings_to_growth: Optional[float] = None
+    price_to_sales: Optional[float] = None
+
+    @classmethod
+    def from_tool_values(cls, symbol: str, year: int, profit_margins: Any = None, price_to_EBIT: Any = None, ratios: Any = None) -> "MetricsRow":
+        """Builds the row from the values returned by calculate_profit_margins, price_to_EBIT_ratio and ratios."""
+        margins = _as_dict(profit_margins)
+        year_ratios = _as_dict(ratios)
+        return cls(
+            symbol=symbol,
+            year=year,
+            gross_margin=_number(margins.get("Gross Profit Margin (%)")),
+            operating_margin=_number(margins.get("Operating Profit Margin (%)")),
+            net_margin=_number(margins.get("Net Profit Margin (%)")),
+            price_to_ebit=_number(price_to_EBIT),
+            price_to_earning=_number(year_ratios.get("price_to_earning")),
+            price_to_book=_number(year_ratios.get("price_to_book")),
+            price_earnings_to_growth=_number(year_ratios.get("price_earnings_to_growth")),
+            price_to_sales=_number(year_ratios.get("price_to_sales_ratio")),
+        )
+
+    def is_empty(self) -> bool:
+        return all(getattr(self, attribute) is None for attribute, _ in METRIC_COLUMNS)
+
+
+def format_metrics(rows: List[MetricsRow]) -> str:
+    """Formats metric rows as a table, leaving out the columns without any value."""
+    columns = [(attribute, header) for attribute, header in METRIC_COLUMNS
+               if any(getattr(row, attribute) is not None for row in rows)]
+    headers = ["symbol", "year"] + [header for _, header in columns]
+    cells = [
+        [row.symbol, str(row.year)] + [_format_number(getattr(row, attribute)) for attribute, _ in columns]
+        for row in rows
+    ]
+    return format_table(headers, cells)
+
+
+@dataclass
+class HistoricalResult:
+    rows: List[MetricsRow] = field(default_factory=list)
+
+    def symbols(self) -> List[str]:
+        return list(dict.fromkeys(row.symbol for row in self.rows))
+
+    def row(self, symbol: str, year: int) -> Optional[MetricsRow]:
+        return next((row for row in self.rows if row.symbol == symbol and row.year == year), None)
+
+    def __str__(self) -> str:
+        if not self.rows:
+            return "No historical data requested."
+        if all(row.is_empty() for row in self.rows):
+            return "No historical data available for the given symbols and years."
+        return format_metrics(self.rows)
+
+
+@dataclass
+class CompetitiveResult:
+    symbol: str
+    competitor: Optional[str] = None
+    rows: List[MetricsRow] = field(default_factory=list)
+    error: Optional[str] = None
+    # The peer group (see peer_group.py): the related companies, the peer median and the symbol's percentile
+    # among its peers (100 = best) of each year
+    peers: List[str] = field(default_factory=list)
+    peer_medians: List[MetricsRow] = field(default_factory=list)
+    percentiles: List[MetricsRow] = field(default_factory=list)
+
+    def symbols(self) -> List[str]:
+        return list(dict.fromkeys([self.symbol] + [row.symbol for row in self.rows]))
+
+    def row(self, symbol: str, year: int) -> Optional[MetricsRow]:
+        return next((row for row in self.rows if row.symbol == symbol and row.year == year), None)
+
+    def __str__(self) -> str:
+        if self.error:
+            return f"{self.symbol}: {self.error}"
+        title = f"{self.symbol} vs {', '.join(self.peers or [str(self.competitor)])}"
+        if all(row.is_empty() for row in self.rows):
+            return f"{title}: no valuation data available for the given years."
+        if not self.peer_medians:
+            return f"{title}\n{format_metrics(self.rows)}"
+        return f"{title}\n{format_metrics(self.rows)}\n\nPeer median and {self.symbol} percentile among its peers (100 = best)\n" \
+               f"{format_metrics(self.peer_medians + self.percentiles)}"
+
+
+@dataclass
+class Article:
+    title: str
+    published: str = ""
+    source: str = ""
+    description: str = ""
+
+
+@dataclass
+class CompanyProfile:
+    symbol: str
+    description: Optional[str] = None
+    articles: List[Article] = field(default_factory=list)
+    error: Optional[str] = None
+
+    @classmethod
+    def from_tool_values(cls, symbol: str, business_info: Any, company_data: Any) -> "CompanyProfile":
+        """Builds the profile from the values returned by extract_business_info and get_company_data."""
+        info = _as_dict(business_info)
+        news = _as_dict(company_data)
+        errors = [value["error"] for value in (info, news) if "error" in value]
+        articles = [
+            Article(
+                title=article.get("Title", ""),
+                published=article.get("Published Date", "")[:10],
+                source=article.get("Source", ""),
+                description=article.get("Description", ""),
+            )
+            for key, article in news.items() if key != "error" and isinstance(article, dict)
+        ]
+        return cls(symbol, info.get("businessDescription"), articles, "; ".join(errors) or None)
+
+    def __str__(self) -> str:
+        lines = [f"{self.symbol}: {self.description or 'No description available'}"]
+        for article in self.articles:
+            lines.append(f"- {article.published} {article.title} ({article.source}): {article.description}")
+        if self.error:
+            lines.append(f"error: {self.error}")
+        return "\n".join(lines)
+
+
+@dataclass
+class QualitativeResult:
+    companies: List[CompanyProfile] = field(default_factory=list)
+
+    def symbols(self) -> List[str]:
+        return [company.symbol for company in self.companies]
+
+    def __str__(self) -> str:
+        if not self.companies:
+            return "No qualitative data requested."
+        return "\n\n".join(str(company) for company in self.companies)
+
+
+@dataclass
+class SearchResult:
+    title: str
+    link: str
+    snippet: str = ""
+    body: str = ""
+
+
+@dataclass
+class SearchResults:
+    results: List[SearchResult] = field(default_factory=list)
+
+    def __str__(self) -> str:
+        if not self.results:
+            return "No search results found."
+        return "\n\n".join(
+            f"{index}. {result.title} ({result.link})\n{result.snippet}\n{result.body}".rstrip()
+            for index, result in enumerate(self.results, start=1)
+        )
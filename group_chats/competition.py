@@ -0,0 +1,160 @@
+"""
+competition.py
+Runs the competition (both investment houses, then the judges) as a background job, off the Streamlit script thread.
+The job id is the id of its run: each message is stored in the run store as it arrives, so the page polls the progress
+of a run from the database, a browser refresh reopens it by id, and the runs of several sessions queue on a shared
+pool of COMPETITION_WORKERS threads instead of blocking each other.
+"""
+import asyncio
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor
+from concurrent.futures import TimeoutError as FutureTimeoutError
+from typing import Callable, Dict, List, Optional
+from config.app_constants import COMPETITION_WORKERS
+from database import run_store
+from finance.point_in_time import RunContext
+from group_chats.group_chat import init_investment_house_discussion
+from group_chats.group_chat_judges import init_judges_discussion
+from group_chats.init_agents import InitAgents
+from group_chats.init_judge_agents import InitJudgeAgent
+
+HOUSE_NAMES = ["Investment House 1", "Investment House 2"]
+
+
+def message_saver(run_id: str, house_id: int) -> Callable[[dict], None]:
+    """Returns the on_message callback of a discussion: it stores each message in the run, skipping the final TaskResult entry."""
+    def save(message: dict):
+        if not str(message.get("content", "")).startswith("TaskResult("):
+            run_store.get_run_store().add_messages(run_id, house_id, [message])
+    return save
+
+
+async def run_competition(run_id: str, stocks: List[str], budget: float, start_year: int, end_year: int) -> dict:
+    """
+    Runs the discussions of both houses and of the judges, and stores their messages under the run id as they arrive.
+    The agents are created for the run, with their tools bound to its run id and years, so concurrent runs don't share
+    their conversations or their data.
+
+    Args:
+        run_id (str): The run id
+        stocks (List[str]): The stock symbols to analyze
+        budget (float): The investment budget
+        start_year (int): The start year of the investment
+        end_year (int): The end year of the judgement
+
+    Returns:
+        dict: The result of the judges' discussion
+    """
+    context = RunContext.for_years(start_year, end_year)
+    summaries = []
+    for house_id, name in enumerate(HOUSE_NAMES, start=1):
+        result = await init_investment_house_discussion(
+            InitAgents(context), stocks, budget, name, start_year, on_message=message_saver(run_id, house_id)
+        )
+        summaries.append(result['summary'])
+
+    return await init_judges_discussion(
+        InitJudgeAgent(run_id, context), stocks, budget, HOUSE_NAMES, start_year, end_year, "\n\n".join(summaries),
+        on_message=message_saver(run_id, run_store.JUDGES_HOUSE_ID)
+    )
+
+
+def run_competition_job(run_id: str, stocks: List[str], budget: float, start_year: int, end_year: int) -> str:
+    """
+    Claims a queued competition and runs it in the calling worker thread.
+
+    Returns:
+        str: The final status of the run, completed or failed, or its current status if a worker of the job service
+        (see competition_workers.py) claimed it first
+    """
+    store = run_store.get_run_store()
+    if not store.start_run(run_id):
+        return store.get_run(run_id)["status"]
+    return execute_run(run_id, stocks, budget, start_year, end_year)
+
+
+def execute_run(run_id: str, stocks: List[str], budget: float, start_year: int, end_year: int) -> str:
+    """
+    Runs a claimed competition on its own event loop, and marks the run as finished.
+
+    Returns:
+        str: The final status of the run, completed or failed
+    """
+    store = run_store.get_run_store()
+    try:
+        asyncio.run(run_competition(run_id, stocks, budget, start_year, end_year))
+    except Exception as e:
+        print(f"Error in the competition {run_id}: {str(e)}")
+        store.finish_run(run_id, status="failed")
+        return "failed"
+    store.finish_run(run_id)
+    return "completed"
+
+
+class CompetitionJobs:
+    def __init__(self, max_workers: int = COMPETITION_WORKERS):
+        """
+        Args:
+            max_workers (int): The number of competitions that run at the same time; the others wait in the queue
+        """
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="competition")
+        self._jobs: Dict[str, Future] = {}
+        self._lock = threading.Lock()
+
+    def submit(self, stocks: List[str], budget: float, start_year: int, end_year: int) -> str:
+        """
+        Queues a competition.
+
+        Args:
+            stocks (List[str]): The stock symbols to analyze
+            budget (float): The investment budget
+            start_year (int): The start year of the investment
+            end_year (int): The end year of the judgement
+
+        Returns:
+            str: The job id, the id of the run of the competition
+        """
+        symbols = [symbol.strip().upper() for symbol in stocks if symbol.strip()]
+        run_id = run_store.get_run_store().create_run(symbols, budget, start_year, end_year, status="queued")
+        with self._lock:
+            self._jobs[run_id] = self._executor.submit(run_competition_job, run_id, symbols, budget, start_year, end_year)
+        return run_id
+
+    def is_active(self, run_id: str) -> bool:
+        """Returns True if the competition is queued or running in this process."""
+        with self._lock:
+            future = self._jobs.get(run_id)
+        return future is not None and not future.done()
+
+    def wait(self, run_id: str, timeout: Optional[float] = None) -> Optional[str]:
+        """
+        Waits for a competition of this process to finish.
+
+        Returns:
+            Optional[str]: The final status of the run, or None if the job is unknown or still running after the timeout
+        """
+        with self._lock:
+            future = self._jobs.get(run_id)
+        if future is None:
+            return None
+        try:
+            return future.result(timeout)
+        except FutureTimeoutError:
+            return None
+
+    def shutdown(self, wait: bool = True):
+        """Stops the worker threads once the queued competitions are done."""
+        self._executor.shutdown(wait=wait)
+
+
+_competition_jobs = None
+_competition_jobs_lock = threading.Lock()
+
+
+def get_competition_jobs() -> CompetitionJobs:
+    """Returns the job manager shared by all the sessions of the app."""
+    global _competition_jobs
+    with _competition_jobs_lock:
+        if _competition_jobs is None:
+            _competition_jobs = CompetitionJobs()
+    return _competition_jobs
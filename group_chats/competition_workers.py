@@ -0,0 +1,140 @@
+"""
+competition_workers.py
+Pool of worker processes that run the competitions of the job service (the /jobs endpoints of database/routes.py).
+The queue is the runs table: a job is a run created as queued, so the queue survives a restart of the service.
+Each worker claims the oldest queued run (an atomic update, so a run is claimed once, also against the threads of the
+Streamlit app and the workers of other instances sharing the database) and runs its house and judge discussions on
+its own event loop. A service runs COMPETITION_PROCESS_WORKERS competitions at the same time.
+
+Usage (the workers without the API):
+    python -m group_chats.competition_workers --workers 4
+"""
+import argparse
+import multiprocessing
+import time
+from typing import List, Optional
+from config.app_constants import COMPETITION_PROCESS_WORKERS, JOB_POLL_SECONDS
+from database import run_store
+from group_chats import competition
+
+
+def work(stop_event, poll_seconds: float = JOB_POLL_SECONDS, current_run=None) -> int:
+    """
+    Runs the queued competitions one at a time, until the stop event is set.
+
+    Args:
+        stop_event: A threading or multiprocessing Event; the competition in progress finishes before the worker stops
+        poll_seconds (float): The wait between two checks of an empty queue
+        current_run: Optional shared character array that holds the id of the run in progress, read by the pool
+
+    Returns:
+        int: The number of competitions run
+    """
+    store = run_store.get_run_store()
+    count = 0
+    while not stop_event.is_set():
+        run = store.claim_next_run()
+        if run is None:
+            stop_event.wait(poll_seconds)
+            continue
+        if current_run is not None:
+            current_run.value = run["run_id"].encode()
+        competition.execute_run(run["run_id"], run["stocks"].split(","), run["budget"], run["start_year"], run["end_year"])
+        if current_run is not None:
+            current_run.value = b""
+        count += 1
+    return count
+
+
+def _worker_main(db_name: str, stop_event, current_run, poll_seconds: float):
+    """Entry point of a worker process."""
+    run_store.init_run_store(db_name)
+    try:
+        work(stop_event, poll_seconds, current_run)
+    except KeyboardInterrupt:
+        pass
+
+
+class CompetitionWorkerPool:
+    def __init__(self, workers: int = COMPETITION_PROCESS_WORKERS, db_name: str = run_store.DB_NAME,
+                 poll_seconds: float = JOB_POLL_SECONDS):
+        """
+        Args:
+            workers (int): The number of worker processes, the number of competitions run at the same time
+            db_name (str): The SQLite database file of the runs
+            poll_seconds (float): The wait of an idle worker between two checks of the queue
+        """
+        self.workers = workers
+        self.db_name = db_name
+        self.poll_seconds = poll_seconds
+        self._stop_event = None
+        self._processes = []
+
+    def start(self):
+        """Starts the worker processes."""
+        if self._processes:
+            return
+        # Spawned workers do not inherit the threads and locks of the parent (the Streamlit and FastAPI threads)
+        context = multiprocessing.get_context("spawn")
+        self._stop_event = context.Event()
+        for i in range(self.workers):
+            current_run = context.Array("c", 64)
+            process = context.Process(
+                target=_worker_main, args=(self.db_name, self._stop_event, current_run, self.poll_seconds),
+                name=f"competition-worker-{i + 1}", daemon=True
+            )
+            process.start()
+            self._processes.append((process, current_run))
+
+    def alive(self) -> int:
+        """Returns the number of running worker processes."""
+        return sum(process.is_alive() for process, _ in self._processes)
+
+    def stop(self, timeout: Optional[float] = 10) -> List[str]:
+        """
+        Stops the worker processes. Each one finishes its competition in progress within the timeout, or is terminated.
+        Runs cut short are not requeued, since their messages are partly stored.
+
+        Args:
+            timeout (float, optional): The time to wait for the workers, None to wait for their competitions
+
+        Returns:
+            List[str]: The ids of the runs whose worker was terminated; they are marked as interrupted
+        """
+        if not self._processes:
+            return []
+        self._stop_event.set()
+        deadline = time.monotonic() + timeout if timeout is not None else None
+        interrupted = []
+        for process, current_run in self._processes:
+            process.join(None if deadline is None else max(0, deadline - time.monotonic()))
+            if process.is_alive():
+                process.terminate()
+                process.join()
+            # A worker clears its run once finished, so a run left here was cut short (terminated or Ctrl+C)
+            if current_run.value:
+                interrupted.append(current_run.value.decode())
+        store = run_store.RunStore(self.db_name)
+        for run_id in interrupted:
+            store.finish_run(run_id, status="interrupted")
+        self._processes = []
+        return interrupted
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Run the queued competitions of the job service on worker processes.")
+    parser.add_argument("--workers", type=int, default=COMPETITION_PROCESS_WORKERS)
+    parser.add_argument("--db", default=run_store.DB_NAME)
+    args = parser.parse_args()
+
+    pool = CompetitionWorkerPool(args.workers, args.db)
+    pool.start()
+    print(f"{args.workers} competition workers started. Press Ctrl+C to stop.")
+    try:
+        while pool.alive():
+            time.sleep(1)
+    except KeyboardInterrupt:
+        pass
+    finally:
+        interrupted = pool.stop()
+        print(f"Workers stopped, {len(interrupted)} runs interrupted")
@@ -0,0 +1,203 @@
+"""
+consensus.py
+Structured decision extraction and consensus detection for the house discussion.
+extract_allocations parses the budget percentage an agent recommends for each stock from its message,
+and ConsensusTermination stops the group chat as soon as all the required agents recommend the same allocation,
+instead of waiting for the manager to say TERMINATE or for the message cap.
+"""
+import re
+from typing import Dict, List, Optional, Sequence
+from autogen_agentchat.base import TerminatedException, TerminationCondition
+from autogen_agentchat.messages import BaseAgentEvent, BaseChatMessage, StopMessage
+
+# Key of the allocation when the message does not name a stock
+ALL_STOCKS = "ALL"
+
+# Words that state an allocation, as asked in the agents' system messages ("allocation as percentage from the budget").
+# A line with one of them and no percentage is a header for the percentages listed below it.
+ALLOCATION_LINE_PATTERN = re.compile(
+    r"allocat|budget|final (?:decision|recommendation|percentage)|portfolio weight", re.IGNORECASE
+)
+# A percentage is a vote when it follows one of these words in its clause ("I recommend 15%", "Allocation: 20%"),
+# or is "% of the budget", unless a metric or a limit comes in between
+VOTE_PATTERN = re.compile(
+    r"recommend|allocat|invest|suggest|propos|final (?:decision|percentage)|portfolio weight", re.IGNORECASE
+)
+BUDGET_SHARE_PATTERN = re.compile(r"^\s*of (?:the |our |my )?(?:total )?budget", re.IGNORECASE)
+METRIC_PATTERN = re.compile(r"margin|ratio|growth|return|yield|revenue|income|earnings|\beps\b|p/e|multiple|cagr", re.IGNORECASE)
+# Limits such as "should not exceed 30%" or "at most 30%" bound the allocation, they don't state it
+LIMIT_PATTERN = re.compile(
+    r"exceed|at most|at least|no more than|no less than|up to|\bcap|\bmax(?:imum)?\b|\bmin(?:imum)?\b|\blimit|"
+    r"\bbelow\b|\babove\b|\bunder\b|\bover\b",
+    re.IGNORECASE
+)
+PERCENTAGE_PATTERN = re.compile(r"(?<![\d.])(\d{1,3}(?:\.\d+)?)\s*%")
+# Ranges such as "10%-20%" or "10 to 20%" are proposals, not decisions
+RANGE_PATTERN = re.compile(r"\d+(?:\.\d+)?\s*%?\s*(?:-|–|to)\s*\d+(?:\.\d+)?\s*%")
+# Sentences, and the clauses of a sentence, e.g. "I allocate 20% to AAPL and 10% to MSFT"
+SENTENCE_SEPARATOR = re.compile(r"(?<=[.!?])\s+")
+CLAUSE_SEPARATOR = re.compile(r"[,;]|\band\b", re.IGNORECASE)
+# What is left of a clause that only lists a stock and its percentage, e.g. " 10% to MSFT" or " MSFT: 10%"
+LISTING_FILLER_PATTERN = re.compile(r"\b(?:to|for|in|into|of)\b|[^\w]+", re.IGNORECASE)
+
+
+def _named_symbols(text: str, symbols: Sequence[str]) -> List[str]:
+    return [symbol for symbol in symbols if re.search(rf"\b{re.escape(symbol)}\b", text, re.IGNORECASE)]
+
+
+def _is_listing(clause: str, symbols: Sequence[str]) -> bool:
+    """Returns whether the clause holds only stocks and percentages, which continue the allocation of the sentence."""
+    rest = PERCENTAGE_PATTERN.sub(" ", clause)
+    for symbol in symbols:
+        rest = re.sub(rf"\b{re.escape(symbol)}\b", " ", rest, flags=re.IGNORECASE)
+    return not LISTING_FILLER_PATTERN.sub("", rest)
+
+
+def _votes(clause: str, in_allocation: bool) -> List[float]:
+    """
+    Returns the percentages of the clause that state an allocation.
+
+    Args:
+        clause (str): The clause
+        in_allocation (bool): Whether the clause is listed under an allocation header or after an allocation
+    """
+    votes = []
+    for match in PERCENTAGE_PATTERN.finditer(clause):
+        value = float(match.group(1))
+        prefix = clause[:match.start()]
+        if value > 100 or LIMIT_PATTERN.search(prefix):
+            continue
+        verbs = list(VOTE_PATTERN.finditer(prefix))
+        if verbs and not METRIC_PATTERN.search(prefix[verbs[-1].end():]):
+            votes.append(value)
+        elif BUDGET_SHARE_PATTERN.match(clause[match.end():]) and not METRIC_PATTERN.search(prefix):
+            votes.append(value)
+        elif in_allocation and not METRIC_PATTERN.search(prefix):
+            votes.append(value)
+    return votes
+
+
+def extract_allocations(text: str, symbols: Sequence[str] = ()) -> Dict[str, float]:
+    """
+    Extracts the budget percentage recommended for each stock from an agent's message.
+    A percentage counts only after a recommend or allocate verb in its clause, as a share of the budget, or listed under
+    an allocation header or after an allocation in the same sentence. Metrics such as margins and limits such as
+    "should not exceed 30%" are ignored, and the last statement wins.
+    Clauses naming one stock each are separate votes: "I allocate 20% to AAPL and 10% to MSFT" votes for both stocks.
+
+    Args:
+        text (str): The message content
+        symbols (Sequence[str]): The stock symbols of the discussion
+
+    Returns:
+        Dict[str, float]: The allocation percentage per symbol. With a single symbol, or for clauses that name no symbol,
+        the key is the symbol named by the sentence, or the symbol of the discussion (or ALL_STOCKS if there are several).
+    """
+    symbols = [symbol.strip().upper() for symbol in symbols if symbol.strip()]
+    default_key = symbols[0] if len(symbols) == 1 else ALL_STOCKS
+    allocations = {}
+
+    in_section = False
+    for line in text.splitlines():
+        if not line.strip():
+            in_section = False
+            continue
+        # A header such as "**Allocation:**" applies to the percentages on the following lines
+        if ALLOCATION_LINE_PATTERN.search(line) and not PERCENTAGE_PATTERN.search(line):
+            in_section = True
+            continue
+        for sentence in SENTENCE_SEPARATOR.split(line):
+            if RANGE_PATTERN.search(sentence):
+                continue
+            sentence_named = _named_symbols(sentence, symbols)
+            sentence_key = sentence_named[0] if len(sentence_named) == 1 else default_key
+            in_allocation = False
+            for clause in CLAUSE_SEPARATOR.split(sentence):
+                votes = _votes(clause, in_section or in_allocation and _is_listing(clause, symbols))
+                in_allocation = bool(votes)
+                named = _named_symbols(clause, symbols)
+                if not votes or len(named) > 1:
+                    continue
+                allocations[named[0] if named else sentence_key] = votes[-1]
+    return allocations
+
+
+def agreed_allocation(allocations: Dict[str, Dict[str, float]], sources: Sequence[str], tolerance: float = 0.0) -> Optional[Dict[str, float]]:
+    """
+    Returns the allocation all the sources agree on, or None if one has not voted or they disagree.
+
+    Args:
+        allocations (Dict[str, Dict[str, float]]): The latest allocation per symbol of each agent
+        sources (Sequence[str]): The agents that must agree
+        tolerance (float): Maximum difference in percentage points between allocations considered equal
+
+    Returns:
+        Optional[Dict[str, float]]: The allocation of the first source if all agree, otherwise None
+    """
+    if not sources or any(source not in allocations for source in sources):
+        return None
+    reference = allocations[sources[0]]
+    for source in sources[1:]:
+        allocation = allocations[source]
+        if allocation.keys() != reference.keys():
+            return None
+        if any(abs(allocation[key] - reference[key]) > tolerance for key in reference):
+            return None
+    return reference
+
+
+class ConsensusTermination(TerminationCondition):
+    """
+    Terminate the conversation when all the required agents recommend the same allocation.
+    The latest allocation of each agent is kept across turns, so agents may change their mind during the debate.
+
+    Args:
+        sources (Sequence[str]): The agents that must agree
+        symbols (Sequence[str]): The stock symbols of the discussion
+        tolerance (float): Maximum difference in percentage points between allocations considered equal
+    """
+
+    def __init__(self, sources: Sequence[str], symbols: Sequence[str] = (), tolerance: float = 0.0):
+        self._sources = list(sources)
+        self._symbols = list(symbols)
+        self._tolerance = tolerance
+        self._allocations: Dict[str, Dict[str, float]] = {}
+        self._terminated = False
+
+    @property
+    def terminated(self) -> bool:
+        return self._terminated
+
+    @property
+    def tolerance(self) -> float:
+        return self._tolerance
+
+    @property
+    def allocations(self) -> Dict[str, Dict[str, float]]:
+        """The latest allocations of each required agent that has given one."""
+        return dict(self._allocations)
+
+    def consensus(self) -> Optional[Dict[str, float]]:
+        """Returns the agreed allocation if all the required agents agree, otherwise None."""
+        return agreed_allocation(self._allocations, self._sources, self._tolerance)
+
+    async def __call__(self, messages: Sequence[BaseAgentEvent | BaseChatMessage]) -> StopMessage | None:
+        if self._terminated:
+            raise TerminatedException("Termination condition has already been reached")
+        for message in messages:
+            if not isinstance(message, BaseChatMessage) or message.source not in self._sources:
+                continue
+            allocation = extract_allocations(message.to_text(), self._symbols)
+            if allocation:
+                self._allocations.setdefault(message.source, {}).update(allocation)
+
+        consensus = self.consensus()
+        if consensus is None:
+            return None
+        self._terminated = True
+        agreed = ", ".join(f"{symbol}: {percentage:g}%" for symbol, percentage in consensus.items())
+        return StopMessage(content=f"Consensus reached: {agreed}", source="ConsensusTermination")
+
+    async def reset(self) -> None:
+        self._terminated = False
+        self._allocations = {}
@@ -0,0 +1,131 @@
+"""
+context_compaction.py
+Model context that keeps the prompt of every agent bounded during a long group chat.
+The task and the most recent turns are kept verbatim, older turns (including tool calls and tool results)
+are replaced by a rolling summary of one short line per message, and the result is trimmed to a per-agent token budget.
+Without it every agent and the selector receive the full, growing history on every turn.
+"""
+from typing import List, Optional
+from autogen_core.model_context import ChatCompletionContext
+from autogen_core.models import AssistantMessage, FunctionExecutionResultMessage, LLMMessage, SystemMessage, UserMessage
+from config.app_constants import (AGENT_CONTEXT_TOKEN_BUDGETS, CONTEXT_RECENT_MESSAGES, CONTEXT_SUMMARY_CHARS,
+                                  DEFAULT_CONTEXT_TOKEN_BUDGET)
+from database.tokens import count_tokens
+
+SUMMARY_SOURCE = "Discussion_Summary"
+
+
+def message_text(message: LLMMessage) -> str:
+    """Returns the text of a model message, including tool calls and tool results."""
+    if isinstance(message, FunctionExecutionResultMessage):
+        return "\n".join(result.content for result in message.content)
+    content = message.content
+    if isinstance(content, str):
+        return content
+    if isinstance(message, AssistantMessage):
+        return "\n".join(f"{call.name}({call.arguments})" for call in content)
+    return " ".join(part for part in content if isinstance(part, str))
+
+
+def count_message_tokens(messages: List[LLMMessage]) -> int:
+    """Counts the tokens of the messages, with a small overhead per message for the role and name."""
+    return sum(count_tokens(message_text(message)) + 4 for message in messages)
+
+
+def summarize_message(message: LLMMessage, max_chars: int = CONTEXT_SUMMARY_CHARS) -> str:
+    """Returns a one-line digest of the message: its speaker and the beginning of its text."""
+    if isinstance(message, FunctionExecutionResultMessage):
+        speaker = "tool result"
+    elif isinstance(message, AssistantMessage) and not isinstance(message.content, str):
+        speaker = f"{message.source} called"
+    else:
+        speaker = getattr(message, "source", "system")
+    text = " ".join(message_text(message).split())
+    if len(text) > max_chars:
+        text = text[:max_chars].rsplit(" ", 1)[0] + " ..."
+    return f"- {speaker}: {text}"
+
+
+class CompactingChatCompletionContext(ChatCompletionContext):
+    def __init__(self, token_budget: int = DEFAULT_CONTEXT_TOKEN_BUDGET, recent_messages: int = CONTEXT_RECENT_MESSAGES,
+                 summary_chars: int = CONTEXT_SUMMARY_CHARS, initial_messages: Optional[List[LLMMessage]] = None):
+        """
+        Args:
+            token_budget (int): Maximum tokens of the messages returned to the agent (the system message is not included)
+            recent_messages (int): Number of most recent messages kept verbatim
+            summary_chars (int): Maximum characters of each line of the summary
+            initial_messages (List[LLMMessage], optional): The initial messages
+        """
+        super().__init__(initial_messages)
+        if token_budget <= 0 or recent_messages <= 0:
+            raise ValueError("token_budget and recent_messages must be greater than 0.")
+        self.token_budget = token_budget
+        self.recent_messages = recent_messages
+        self.summary_chars = summary_chars
+        self._digests = {}
+
+    def _digest(self, index: int) -> str:
+        """Returns the summary line of the message, computed once per message."""
+        if index not in self._digests:
+            self._digests[index] = summarize_message(self._messages[index], self.summary_chars)
+        return self._digests[index]
+
+    def _recent_start(self, start: int) -> int:
+        """Moves the start of the recent window back so a tool result is never separated from its call."""
+        while 0 < start < len(self._messages) and isinstance(self._messages[start], FunctionExecutionResultMessage):
+            start -= 1
+        return start
+
+    def _skip_tool_results(self, start: int) -> int:
+        """Moves the start of the recent window forward past tool results whose call was summarized."""
+        while start < len(self._messages) and isinstance(self._messages[start], FunctionExecutionResultMessage):
+            start += 1
+        return start
+
+    def _compose(self, head: List[LLMMessage], start: int, first_summarized: int) -> List[LLMMessage]:
+        """Builds the task, the summary of the messages before start, and the recent messages."""
+        omitted = first_summarized - len(head)
+        lines = ([f"- ({omitted} earlier messages omitted)"] if omitted else [])
+        lines += [self._digest(i) for i in range(first_summarized, start)]
+        summary = []
+        if lines:
+            summary = [UserMessage(content="Summary of the earlier discussion:\n" + "\n".join(lines), source=SUMMARY_SOURCE)]
+        return head + summary + self._messages[start:]
+
+    async def get_messages(self) -> List[LLMMessage]:
+        """Returns the task, a summary of the older turns and the recent turns, within the token budget."""
+        messages = self._messages
+        if len(messages) <= self.recent_messages + 1 and count_message_tokens(messages) <= self.token_budget:
+            return list(messages)
+
+        # The first message is the task of the discussion, which every agent needs
+        head_size = 1 if messages and isinstance(messages[0], (UserMessage, SystemMessage)) else 0
+        head = messages[:head_size]
+        start = self._recent_start(max(head_size, len(messages) - self.recent_messages))
+        first_summarized = head_size
+        result = self._compose(head, start, first_summarized)
+
+        # Over budget: shrink the verbatim window first, then drop the oldest summary lines
+        while count_message_tokens(result) > self.token_budget:
+            next_start = self._skip_tool_results(start + 1)
+            if next_start < len(messages):
+                start = next_start
+            elif first_summarized < start:
+                first_summarized += 1
+            else:
+                break
+            result = self._compose(head, start, first_summarized)
+        return result
+
+    async def clear(self) -> None:
+        await super().clear()
+        self._digests = {}
+
+    async def load_state(self, state) -> None:
+        await super().load_state(state)
+        self._digests = {}
+
+
+def context_for_agent(agent_name: str) -> CompactingChatCompletionContext:
+    """Returns a compacting model context with the token budget configured for the agent."""
+    return CompactingChatCompletionContext(token_budget=AGENT_CONTEXT_TOKEN_BUDGETS.get(agent_name, DEFAULT_CONTEXT_TOKEN_BUDGET))
@@ -0,0 +1,137 @@
+"""
+decision_record.py
+Structured final decision of an investment house.
+The record is updated with every message of the discussion while it streams: the latest allocation of each key agent
+and an excerpt of its rationale. Its text rendering is what the judges receive, instead of a summary of the whole transcript.
+"""
+import re
+from dataclasses import dataclass, field
+from statistics import median
+from typing import Dict, List, Optional
+from group_chats.consensus import agreed_allocation, extract_allocations
+
+RATIONALE_CHARS = 200
+# Sentences that carry the reasoning of a recommendation
+RATIONALE_PATTERN = re.compile(r"recommend|because|due to|therefore|given|suggest", re.IGNORECASE)
+
+
+def rationale_excerpt(text: str, max_chars: int = RATIONALE_CHARS) -> str:
+    """
+    Returns the sentence of the message that explains the recommendation, or its first sentence.
+
+    Args:
+        text (str): The message content
+        max_chars (int): Maximum characters of the excerpt
+
+    Returns:
+        str: The excerpt, without markdown markers
+    """
+    plain = " ".join(re.sub(r"[*#_`>]+", " ", text).split())
+    sentences = [sentence.strip() for sentence in re.split(r"(?<=[.!?])\s+", plain) if sentence.strip()]
+    if not sentences:
+        return ""
+    excerpt = next((sentence for sentence in sentences if RATIONALE_PATTERN.search(sentence)), sentences[0])
+    if len(excerpt) > max_chars:
+        excerpt = excerpt[:max_chars].rsplit(" ", 1)[0] + " ..."
+    return excerpt
+
+
+@dataclass
+class AgentVote:
+    agent: str
+    allocations: Dict[str, float]
+    rationale: str
+    turn: int
+
+
+@dataclass
+class DecisionRecord:
+    house: str
+    symbols: List[str]
+    budget: float
+    voters: List[str]
+    manager: Optional[str] = None
+    # Maximum difference in percentage points between votes considered equal, the one of the ConsensusTermination
+    tolerance: float = 0.0
+    votes: Dict[str, AgentVote] = field(default_factory=dict)
+    manager_note: str = ""
+    message_count: int = 0
+    stop_reason: Optional[str] = None
+
+    def update(self, source: str, content: str):
+        """
+        Records a message of the discussion.
+
+        Args:
+            source (str): The agent that sent the message
+            content (str): The message content
+        """
+        self.message_count += 1
+        if source in self.voters:
+            allocations = extract_allocations(content, self.symbols)
+            if allocations:
+                previous = self.votes[source].allocations if source in self.votes else {}
+                self.votes[source] = AgentVote(source, {**previous, **allocations}, rationale_excerpt(content), self.message_count)
+        elif source == self.manager:
+            self.manager_note = rationale_excerpt(content)
+
+    def keys(self) -> List[str]:
+        """Returns the stocks with at least one vote, in the order of the discussion's symbols."""
+        voted = {key for vote in self.votes.values() for key in vote.allocations}
+        ordered = [symbol for symbol in self.symbols if symbol in voted]
+        return ordered + sorted(voted - set(ordered))
+
+    def agreed_allocations(self) -> Optional[Dict[str, float]]:
+        """Returns the allocation every voter agrees on within the tolerance, as ConsensusTermination does, otherwise None."""
+        votes = {agent: vote.allocations for agent, vote in self.votes.items()}
+        return agreed_allocation(votes, self.voters, self.tolerance)
+
+    def is_consensus(self) -> bool:
+        """Returns True if every voter gave the same allocation for every stock, within the tolerance."""
+        return self.agreed_allocations() is not None
+
+    def final_allocations(self) -> Dict[str, float]:
+        """Returns the allocation percentage of each stock: the agreed one, or the median of the latest votes."""
+        agreed = self.agreed_allocations()
+        if agreed is not None:
+            return {key: agreed[key] for key in self.keys()}
+        allocations = {}
+        for key in self.keys():
+            values = [vote.allocations[key] for vote in self.votes.values() if key in vote.allocations]
+            allocations[key] = median(values)
+        return allocations
+
+    def to_dict(self) -> dict:
+        return {
+            "house": self.house,
+            "symbols": self.symbols,
+            "budget": self.budget,
+            "final_allocations": self.final_allocations(),
+            "consensus": self.is_consensus(),
+            "votes": {agent: {"allocations": vote.allocations, "rationale": vote.rationale} for agent, vote in self.votes.items()},
+            "manager_note": self.manager_note,
+            "message_count": self.message_count,
+            "stop_reason": self.stop_reason,
+        }
+
+    def __str__(self) -> str:
+        lines = [f"{self.house} - {', '.join(self.symbols)} (budget ${self.budget:,.2f}, {self.message_count} messages)"]
+        final = self.final_allocations()
+        if final:
+            how = "consensus of all key agents" if self.is_consensus() else f"median of {len(self.votes)} of {len(self.voters)} votes, no consensus"
+            allocations = ", ".join(f"{key} {value:g}% (${self.budget * value / 100:,.2f})" for key, value in final.items())
+            lines.append(f"Final allocation: {allocations} - {how}")
+        else:
+            lines.append("Final allocation: no allocation was given")
+        for agent in self.voters:
+            vote = self.votes.get(agent)
+            if vote:
+                allocations = ", ".join(f"{key} {value:g}%" for key, value in vote.allocations.items())
+                lines.append(f"- {agent}: {allocations} - {vote.rationale}")
+            else:
+                lines.append(f"- {agent}: no allocation")
+        if self.manager_note:
+            lines.append(f"Manager: {self.manager_note}")
+        if self.stop_reason:
+            lines.append(f"Stopped: {self.stop_reason}")
+        return "\n".join(lines)
@@ -3,15 +3,24 @@ group_chat.py
 This file contains the code for the group chat functionality of the Investment House discussion.
 """
 import asyncio
+import threading
+from typing import Callable
 from autogen_agentchat.conditions import MaxMessageTermination, TextMentionTermination
 from autogen_agentchat.teams import SelectorGroupChat
-from autogen_agentchat.messages import TextMessage
-from autogen_core import AgentId
+from autogen_agentchat.base import TaskResult
+from autogen_agentchat.messages import BaseChatMessage, TextMessage
+from autogen_core import AgentId, CancellationToken
 from autogen_ext.models.openai import OpenAIChatCompletionClient
+from group_chats.consensus import ConsensusTermination
+from group_chats.context_compaction import context_for_agent
+from group_chats.decision_record import DecisionRecord
 from group_chats.init_agents import InitAgents
+from group_chats.speaking_plan import FINAL_ROUND_PATTERN, SpeakingPhase, SpeakingPlanSelector
+from finance.judge_profit import get_historical_data
+from finance.prefetch import prefetch_discussion_data
+from config.app_constants import PARALLEL_OPENING
 from dotenv import load_dotenv
 import streamlit as st
-import requests
 import datetime
 import os
 import io
@@ -21,7 +30,8 @@ from autogen_agentchat.messages import (
     ToolCallExecutionEvent
 )
 
-async def init_investment_house_discussion(init_agents: InitAgents, stocks_symbol: list[str], budget: float, name: str, start_year: int, chat_placeholder):
+async def init_investment_house_discussion(init_agents: InitAgents, stocks_symbol: list[str], budget: float, name: str, start_year: int, chat_placeholder=None,
+                                           parallel_opening: bool = PARALLEL_OPENING, on_message: Callable[[dict], None] = None):
     """
     Initiates a discussion between all agents in the investment house 
     until a consensus is reached.
@@ -32,10 +42,12 @@ async def init_investment_house_discussion(init_agents: InitAgents, stocks_symbo
         budget (float): Budget for the investment.
         name (str): Name of the investment house.
         start_year (int): The given start year for the investment.
-        chat_placeholder: Placeholder for displaying chat messages in Streamlit.
+        chat_placeholder: Placeholder for displaying chat messages in Streamlit, None when the discussion runs in a background job.
+        parallel_opening (bool): Run the first analysis of the four data analysts concurrently before the group chat starts.
+        on_message (Callable[[dict], None]): Called with each message as it arrives, e.g. to store it in the run store.
 
     Returns:
-        dict: A summary of the final decision and key discussion points.
+        dict: The decision record (allocation and votes of the key agents), its text rendering as the summary, and the discussion.
     """
     load_dotenv()
     api_key_open_AI = os.getenv('OPENAI_API_KEY')
@@ -56,7 +68,8 @@ async def init_investment_house_discussion(init_agents: InitAgents, stocks_symbo
     
     text_termination = TextMentionTermination("TERMINATE")
     max_messages = MaxMessageTermination(max_messages=40)
-    termination = text_termination | max_messages
+    consensus = ConsensusTermination(sources=key_agent_names(init_agents), symbols=stocks_symbol)
+    termination = text_termination | max_messages | consensus
     
     selector_prompt = """You are a coordinator of a financial analysis discussion.
     - The following roles are available: {roles}.
@@ -94,111 +107,200 @@ async def init_investment_house_discussion(init_agents: InitAgents, stocks_symbo
         termination_condition=termination,
         selector_prompt=selector_prompt,
         allow_repeated_speaker=True,
-        max_selector_attempts=10
+        max_selector_attempts=10,
+        model_context=context_for_agent("Selector"),
+        selector_func=house_speaking_plan(init_agents)
     )
 
-    
-    dict_symbol_price = StockPrice(stocks_symbol, start_year)
-
-
-    initial_message = f"""Let's analyze {stocks_symbol} for a potential investment of ${budget:,.2f}.
-    Liquidity Analyst, start by presenting your analysis of liquidity.  
-    Historical Margin Analyst, speak after the Liquidity Analyst and provide an analysis of historical margin trends.  
-    Competitive Margin Analyst, speak after the Historical Analyst and add insights on competitive positioning.  
-    Qualitative Analyst, present your insights on qualitative factors after the Competitive Margin Analyst.    
-    Red Flags Agent, you should identify potential risks and weaknesses only after the team has completed their analyses.  
-    red_flags_agent_liquidity, you should identify potential risks and problems with the analysis
-    solid_agent, you should exposing all potential dangers, uncertainties, and red flags associated with any investment decision.
-    Pro_Investment_agent, you should emphasizes that inaction is the biggest financial risk
-    Search Agent, you only respond to requests from the Red Flags Agent, red_flags_agent_liquidity,solid_agent,Pro_Investment_agent — provide any information they ask for to help assess risks and concerns.  
-    Manager, ensure all perspectives are considered and facilitate a consensus on whether to invest and how much.  
-
-    After all perspectives were presented once, each analyst must respond to another analyst (1-2) they agree or disagree with. Debate before continuing.
-    You may only engage in one or two rounds of response to another agent unless specifically asked to continue (don't allow getting stuck in a loop).
-    
-    Each agent should:  
-    - Respond to each other when challenging perspectives.  
-    - Execute only their designated function calls and analyze the data accordingly.  
-    - Return a final decision and the recommended investment amount (percentage of the budget).
+    # Warm the cache with the first speakers' tool data while the first LLM turns are generating
+    stop_prefetch = threading.Event()
+    prefetch_task = asyncio.create_task(asyncio.to_thread(prefetch_discussion_data, stocks_symbol, init_agents.context, stop_prefetch))
+    prefetch_task.add_done_callback(log_prefetch_failure)
 
-    The Manager Agent should:
-    - Ensure that ALL 8 KEY AGENTS (liquidity_agent, historical_margin_multiplier_analyst, competative_margin_multiplier_analyst, qualitative_analyst, red_flags_agent, red_flags_agent_liquidity, solid_agent, Pro_Investment_agent) explicitly provide their final percentage recommendation.
-    - Track which agents have provided their final investment percentage and which haven't.
-    - Only conclude and finish the discussion when all 8 key agents have provided their final decision AND they all agree on the same percentage.
+    try:
+        dict_symbol_price = await asyncio.to_thread(StockPrice, stocks_symbol, start_year)
 
-    The current prices of {stocks_symbol} are {dict_symbol_price}.  
-    Please base your analyses on data up to and including {start_year}."""
 
+        initial_message = f"""Let's analyze {stocks_symbol} for a potential investment of ${budget:,.2f}.
+        Liquidity Analyst, start by presenting your analysis of liquidity.  
+        Historical Margin Analyst, speak after the Liquidity Analyst and provide an analysis of historical margin trends.  
+        Competitive Margin Analyst, speak after the Historical Analyst and add insights on competitive positioning.  
+        Qualitative Analyst, present your insights on qualitative factors after the Competitive Margin Analyst.    
+        Red Flags Agent, you should identify potential risks and weaknesses only after the team has completed their analyses.  
+        red_flags_agent_liquidity, you should identify potential risks and problems with the analysis
+        solid_agent, you should exposing all potential dangers, uncertainties, and red flags associated with any investment decision.
+        Pro_Investment_agent, you should emphasizes that inaction is the biggest financial risk
+        Search Agent, you only respond to requests from the Red Flags Agent, red_flags_agent_liquidity,solid_agent,Pro_Investment_agent — provide any information they ask for to help assess risks and concerns.  
+        Manager, ensure all perspectives are considered and facilitate a consensus on whether to invest and how much.  
 
-    chat_key = "house1_messages" if name == "Investment House 1" else "house2_messages"
+        After all perspectives were presented once, each analyst must respond to another analyst (1-2) they agree or disagree with. Debate before continuing.
+        You may only engage in one or two rounds of response to another agent unless specifically asked to continue (don't allow getting stuck in a loop).
     
-    if chat_key not in st.session_state:
-        st.session_state[chat_key] = []
+        Each agent should:  
+        - Respond to each other when challenging perspectives.  
+        - Execute only their designated function calls and analyze the data accordingly.  
+        - Return a final decision and the recommended investment amount (percentage of the budget).
 
-    chat_messages = st.session_state[chat_key] 
-    print("\nStarting conversation:")
+        The Manager Agent should:
+        - Ensure that ALL 8 KEY AGENTS (liquidity_agent, historical_margin_multiplier_analyst, competative_margin_multiplier_analyst, qualitative_analyst, red_flags_agent, red_flags_agent_liquidity, solid_agent, Pro_Investment_agent) explicitly provide their final percentage recommendation.
+        - Track which agents have provided their final investment percentage and which haven't.
+        - Only conclude and finish the discussion when all 8 key agents have provided their final decision AND they all agree on the same percentage.
 
-    messages = []
-    async for event in team.run_stream(task=initial_message):
-        # Skip system-generated messages (function calls, tool execution logs)
-        if isinstance(event, (ModelClientStreamingChunkEvent, ToolCallRequestEvent, ToolCallExecutionEvent)):
-            continue  # Ignore tool execution events
+        The current prices of {stocks_symbol} are {dict_symbol_price}.  
+        Please base your analyses on data up to and including {start_year}."""
 
-        agent_name = getattr(event, "source", "Unknown Agent")
-        if isinstance(agent_name, AgentId):  
-            agent_name = agent_name.type
 
-        message_content = getattr(event, "content", str(event))
+        chat_messages = []
+        print("\nStarting conversation:")
+
+        task = initial_message
+        if parallel_opening:
+            task_message = TextMessage(content=initial_message, source="user")
+            task = [task_message] + await run_parallel_opening(opening_analysts(init_agents), task_message)
+
+        decision_record = DecisionRecord(
+            house=name,
+            symbols=stocks_symbol,
+            budget=budget,
+            voters=key_agent_names(init_agents),
+            manager=init_agents.manager_agent.name,
+            tolerance=consensus.tolerance
+        )
+        async for event in team.run_stream(task=task):
+            # Skip system-generated messages (function calls, tool execution logs)
+            if isinstance(event, (ModelClientStreamingChunkEvent, ToolCallRequestEvent, ToolCallExecutionEvent)):
+                continue  # Ignore tool execution events
 
-        messages.append(message_content)
+            agent_name = getattr(event, "source", "Unknown Agent")
+            if isinstance(agent_name, AgentId):  
+                agent_name = agent_name.type
 
-        # Format the message
-        chat_messages.append({"role": agent_name, "content": message_content}) 
+            message_content = getattr(event, "content", str(event))
+
+            # Record each agent's latest allocation while the discussion streams
+            if isinstance(event, BaseChatMessage) and agent_name != "user":
+                decision_record.update(agent_name, event.to_text())
+            elif isinstance(event, TaskResult):
+                decision_record.stop_reason = event.stop_reason
+
+            # Format the message
+            message = {"role": agent_name, "content": message_content}
+            chat_messages.append(message)
+            if on_message:
+                on_message(message)
       
-        if "TaskResult" in message_content:
-            continue 
+            if "TaskResult" in message_content or chat_placeholder is None:
+                continue 
         
-        with chat_placeholder.container():
-            for msg in chat_messages:
-                with st.chat_message("assistant"):  
-                    st.write(f"**{msg.get('role', 'Unknown Agent')}**")  
-                    st.markdown(msg.get("content", ""))
+            with chat_placeholder.container():
+                for msg in chat_messages:
+                    with st.chat_message("assistant"):  
+                        st.write(f"**{msg.get('role', 'Unknown Agent')}**")  
+                        st.markdown(msg.get("content", ""))
 
-        await asyncio.sleep(0.1)  # Allow UI to update smoothly
+            await asyncio.sleep(0.1)  # Allow UI to update smoothly
 
-    try:
-        summary_message = TextMessage(
-            content=f"Summarize this discussion:\n{messages} and conclude a final investment decision.", 
-            source="user"
-        )
-        
-        summary_response = await init_agents.summary_agent.on_messages(
-            [summary_message], 
-            None  
-        )
- 
- 
-        if hasattr(summary_response, 'chat_message') and hasattr(summary_response.chat_message, 'content'):
-            summary_text = summary_response.chat_message.content
-            chat_messages.append({"role": "Summary Agent", "content": summary_text})
-            return {
-                "summary": summary_response.chat_message.content,
-                "full_discussion": chat_messages  # list of messages
-            }
-        else:
-            return {
-                "summary": "Summary not available.",
-                "full_discussion": chat_messages
-            }
-                
-    except Exception as e:
-        print(f"Error generating summary: {e}")
-        error_message = f"The discussion about {stocks_symbol} included multiple messages from the team. A formal summary could not be generated due to a technical issue."
+        summary_text = str(decision_record)
+        message = {"role": "Decision Record", "content": summary_text}
+        chat_messages.append(message)
+        if on_message:
+            on_message(message)
         return {
-            "summary": error_message,
-            "full_discussion": chat_messages
+            "summary": summary_text,
+            "decision_record": decision_record,
+            "full_discussion": chat_messages  # list of messages
         }
-    
+    finally:
+        # The data is only a cache warm-up: a prefetch still running when the discussion returns sends no more requests,
+        # and is not waited for
+        stop_prefetch.set()
+        if not prefetch_task.done():
+            prefetch_task.cancel()
+
+
+def log_prefetch_failure(task: asyncio.Task):
+    """Prints the error of a failed prefetch task. The agents then fetch their data themselves."""
+    if not task.cancelled() and task.exception() is not None:
+        print(f"Error prefetching the discussion data: {task.exception()}")
+
+
+def opening_analysts(init_agents: InitAgents) -> list:
+    """Returns the data analysts whose first analysis depends only on the task and their own tool."""
+    return [
+        init_agents.liquidity_agent,
+        init_agents.historical_margin_multiplier_agent,
+        init_agents.competative_margin_multiplier_agent,
+        init_agents.qualitative_agent,
+    ]
+
+
+async def run_parallel_opening(agents: list, task_message: TextMessage) -> list:
+    """
+    Runs the first analysis of the given agents concurrently.
+    Their messages are passed to the group chat with the task, so the debate starts with the whole opening in the transcript.
+
+    Parameters:
+        agents (list): The agents of the opening phase.
+        task_message (TextMessage): The task of the discussion.
+
+    Returns:
+        list: The opening messages, in the order of the agents. An agent that failed is left out and speaks in the group chat.
+    """
+    responses = await asyncio.gather(
+        *[agent.on_messages([task_message], CancellationToken()) for agent in agents],
+        return_exceptions=True
+    )
+
+    opening_messages = []
+    for agent, response in zip(agents, responses):
+        if isinstance(response, Exception):
+            print(f"Error in the opening analysis of {agent.name}: {response}")
+            continue
+        opening_messages.append(response.chat_message)
+
+    # The group chat sends the task and the opening messages to every participant, including these agents
+    await asyncio.gather(*[agent.on_reset(CancellationToken()) for agent in agents])
+    return opening_messages
+
+
+def key_agent_names(init_agents: InitAgents) -> list[str]:
+    """Returns the names of the 8 key agents that must each give a final percentage, in the final round order."""
+    return [
+        init_agents.liquidity_agent.name,
+        init_agents.historical_margin_multiplier_agent.name,
+        init_agents.competative_margin_multiplier_agent.name,
+        init_agents.qualitative_agent.name,
+        init_agents.red_flags_agent.name,
+        init_agents.red_flags_agent_liquidity.name,
+        init_agents.pro_investment_agent.name,
+        init_agents.solid_agent.name,
+    ]
+
+
+def house_speaking_plan(init_agents: InitAgents) -> SpeakingPlanSelector:
+    """
+    Returns the speaking plan of the investment house discussion, the order spelled out in the selector prompt.
+    The LLM selector only decides on search requests and on the debate after each round.
+
+    Parameters:
+        init_agents: Object containing all initialized agents.
+
+    Returns:
+        SpeakingPlanSelector: The selector function of the group chat.
+    """
+    key_agents = key_agent_names(init_agents)
+    opening = SpeakingPhase(order=key_agents[:6] + [
+        init_agents.solid_agent.name,
+        init_agents.pro_investment_agent.name,
+        init_agents.manager_agent.name,
+    ])
+    final_round = SpeakingPhase(
+        order=key_agents,
+        trigger_source=init_agents.manager_agent.name,
+        trigger_pattern=FINAL_ROUND_PATTERN,
+    )
+    return SpeakingPlanSelector(phases=[opening, final_round], open_decision_responders=[init_agents.search_agent.name])
+
 
 def StockPrice(symbols: list[str], start_year: int):
     """
@@ -211,26 +313,15 @@ def StockPrice(symbols: list[str], start_year: int):
     Returns:
     dict: A dictionary with symbols as keys and lists of closing prices as values.
     """
-    load_dotenv()
-    api_key = os.getenv('FMP_API_KEY')
-    if not api_key:
-        raise ValueError("API key not found. Please set the 'FMP_API_KEY' environment variable.")
-    
-    base_url = "https://financialmodelingprep.com/api/v3/historical-price-full"
-    headers = {'Content-Type': 'application/json'}
     res = {}
 
     for stock_symbol in symbols:
-        url = f"{base_url}/{stock_symbol}?apikey={api_key}"
-        response = requests.get(url, headers=headers)
-        
-        if response.status_code == 200:
-            data = response.json()
-            if 'historical' in data:
-                for record in data['historical']:
-                    record_date = datetime.datetime.strptime(record['date'], '%Y-%m-%d')
-                    if record_date.year == start_year:
-                        res[stock_symbol] = record['close']
-                        break
+        data = get_historical_data(stock_symbol)
+        if data and 'historical' in data:
+            for record in data['historical']:
+                record_date = datetime.datetime.strptime(record['date'], '%Y-%m-%d')
+                if record_date.year == start_year:
+                    res[stock_symbol] = record['close']
+                    break
     
     return res
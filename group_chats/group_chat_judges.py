@@ -4,6 +4,7 @@ This module contains functions to compare and judge the final decisions of inves
 """
 import os
 import asyncio
+from typing import Callable
 from autogen_core import AgentId
 import streamlit as st
 from autogen_agentchat.conditions import MaxMessageTermination, TextMentionTermination
@@ -12,6 +13,7 @@ from autogen_agentchat.messages import TextMessage
 from autogen_ext.models.openai import OpenAIChatCompletionClient
 from dotenv import load_dotenv
 from group_chats.init_judge_agents import InitJudgeAgent
+from group_chats.speaking_plan import SpeakingPhase, SpeakingPlanSelector
 from autogen_agentchat.messages import (
     ModelClientStreamingChunkEvent,
     ToolCallRequestEvent,
@@ -19,7 +21,8 @@ from autogen_agentchat.messages import (
 )
 
 
-async def init_judges_discussion(init_judges: InitJudgeAgent, stocks_symbol: list[str], budget: float, names: list[str], start_year: int, end_year: int, summary: str, chat_placeholder):
+async def init_judges_discussion(init_judges: InitJudgeAgent, stocks_symbol: list[str], budget: float, names: list[str], start_year: int, end_year: int, summary: str, chat_placeholder=None,
+                                 on_message: Callable[[dict], None] = None):
     """
     Initiates a discussion between all judges in the investment house 
     until a consensus is reached.
@@ -31,7 +34,9 @@ async def init_judges_discussion(init_judges: InitJudgeAgent, stocks_symbol: lis
         names [str]: Names of the investment houses.
         start_year (int): The given start year for the investment.
         end_year (int): The end year to use for the judgement.
-        summary (str): A summary of the final decision and key discussion points made by the investment houses.
+        summary (str): The decision records of the investment houses.
+        chat_placeholder: Placeholder for displaying chat messages in Streamlit, None when the discussion runs in a background job.
+        on_message (Callable[[dict], None]): Called with each message as it arrives, e.g. to store it in the run store.
 
     Returns:
         dict: A summary of the final decision verdict for each investment house.
@@ -78,7 +83,8 @@ async def init_judges_discussion(init_judges: InitJudgeAgent, stocks_symbol: lis
         termination_condition=termination,
         selector_prompt=selector_prompt,
         allow_repeated_speaker=True,
-        max_selector_attempts=10
+        max_selector_attempts=10,
+        selector_func=judges_speaking_plan(init_judges)
     )
 
     initial_message = f"""Welcome to the final judgement discussion for the investment houses: {names}.
@@ -87,7 +93,8 @@ async def init_judges_discussion(init_judges: InitJudgeAgent, stocks_symbol: lis
     The budget for the investment was for both houses: {budget}.
     The money was invested is: {budget} multiplied by the percentage that was allocated to the stock by the investment house.
     The given start year was: {start_year}.
-    Extract the final decisions of both houses from the summary massage: {summary}.
+    The final decisions of both houses (allocation per stock, and the vote and rationale of each key agent):
+    {summary}
     The end year you can use for your judgement is: {end_year}.
     
     Your judging team includes:
@@ -104,11 +111,7 @@ async def init_judges_discussion(init_judges: InitJudgeAgent, stocks_symbol: lis
     Let's begin the discussion!
     """
     
-    # Use session state to track messages
-    if "judges_chat" not in st.session_state:
-        st.session_state["judges_chat"] = []
-
-    chat_messages = st.session_state["judges_chat"]
+    chat_messages = []
 
 
     print("\nStarting conversation:")
@@ -130,10 +133,13 @@ async def init_judges_discussion(init_judges: InitJudgeAgent, stocks_symbol: lis
 
         messages.append(message_content)
 
-        # Store message in session state
-        chat_messages.append({"role": agent_name, "content": message_content})
+        # Store the message and pass it on as it arrives
+        message = {"role": agent_name, "content": message_content}
+        chat_messages.append(message)
+        if on_message:
+            on_message(message)
 
-        if "TaskResult" in message_content:
+        if "TaskResult" in message_content or chat_placeholder is None:
             continue 
         
         # Display messages dynamically
@@ -175,4 +181,25 @@ async def init_judges_discussion(init_judges: InitJudgeAgent, stocks_symbol: lis
         return {
             "summary": error_message,
             "full_discussion": chat_messages
-        }
\ No newline at end of file
+        }
+
+
+def judges_speaking_plan(init_judges: InitJudgeAgent) -> SpeakingPlanSelector:
+    """
+    Returns the speaking plan of the judges discussion: manager -> decision_quality_judge -> profit_judge -> web_surfer -> manager.
+    The LLM selector only decides after the plan is complete.
+
+    Parameters:
+        init_judges: Object containing all initialized judges.
+
+    Returns:
+        SpeakingPlanSelector: The selector function of the group chat.
+    """
+    order = [
+        init_judges.manager_judge.name,
+        init_judges.decision_quality_judge.name,
+        init_judges.profit_judge.name,
+        init_judges.web_surfer_judge.name,
+        init_judges.manager_judge.name,
+    ]
+    return SpeakingPlanSelector(phases=[SpeakingPhase(order=order)], open_decision_pattern=None)
@@ -3,20 +3,42 @@ init_agents.py
 This module contains the InitAgents class that initializes all the agents required for the group chat.
 """
 
+import functools
+import inspect
 import os
+import re
+from typing import Callable
 from dotenv import load_dotenv
 from config.system_messages import SYS_MSG_MANAGER_CONFIG, SYS_MSG_PRO_INVEST, SYS_MSG_SOLID_AGENT, SYS_RED_FLAGS_AGENT_LIQUIDITY, SYSTEM_MSG_COMPETATIVE_MARGIN_MULTIPLIER_CONFIG, SYSTEM_MSG_HISTORICAL_MARGIN_MULTIPLIER_CONFIG, SYSTEM_MSG_LIQUIDITY_CONFIG, SYSTEM_MSG_QUALITATIVE_CONFIG, SYS_MSG_PRO_INVEST,SYS_MSG_RED_FLAGS
-from finance.LLM_get_financial import quick_ratio
-from finance.agents_functions import competative_func, historical_func, qualitative_func
+from finance.async_agents_functions import competative_func, historical_func, qualitative_func, quick_ratio
+from finance.LLM_get_qualitative import search_company_news
+from finance.point_in_time import RunContext
 from autogen_agentchat.agents import AssistantAgent
 from autogen_ext.models.openai import OpenAIChatCompletionClient
-from utils.search import google_search
+from utils.async_search import google_search
 from autogen_core.tools import FunctionTool
+from group_chats.context_compaction import context_for_agent
+
+
+def tool_description(func: Callable) -> str:
+    """Returns the docstring of a run tool without the line of its bound first argument, which the model cannot pass."""
+    bound = next(iter(inspect.signature(func).parameters))
+    return re.sub(rf"^[ \t]*{re.escape(bound)} \(.*\n", "", inspect.getdoc(func) or "", count=1, flags=re.MULTILINE)
+
+
+def run_tool(func: Callable, context: RunContext, description: str = None) -> FunctionTool:
+    """Returns the tool of a function whose first argument is the RunContext, bound to the given run: the model passes only the other arguments."""
+    return FunctionTool(functools.partial(func, context), name=func.__name__, description=description or tool_description(func))
 
 
 class InitAgents():
-    def __init__(self):
+    def __init__(self, context: RunContext):
+        """
+        Args:
+            context (RunContext): The run of the house; its years and as-of date are bound to the agents' tools
+        """
         load_dotenv()
+        self.context = context
 
         api_key_open_AI = os.getenv('OPENAI_API_KEY')
         self.gpt4o_mini_model_client = OpenAIChatCompletionClient(
@@ -64,12 +86,18 @@ class InitAgents():
   
 
         # Internet search: The company's financial reports on SEC Edgar or the Investor Relations section of the company's website.
-        google_search_tool = FunctionTool(
-            google_search, description="Search Google for information, returns results with a snippet and body content"
+        google_search_tool = run_tool(
+            google_search, context, description="Search Google for information, returns results with a snippet and body content"
+        )
+
+        news_archive_tool = run_tool(
+            search_company_news, context,
+            description="Search the local archive of company news and business descriptions (no API request), optionally for one stock symbol"
         )
 
         self.manager_agent = AssistantAgent(
             name="Manager",
+            model_context=context_for_agent("Manager"),
             model_client=self.gpt_turbo_model_client,
             description="Guides the discussion and ensures all perspectives are considered.",
             system_message=SYS_MSG_MANAGER_CONFIG,
@@ -78,8 +106,9 @@ class InitAgents():
         
         self.liquidity_agent = AssistantAgent(
             name="Liquidity_Analyst",
+            model_context=context_for_agent("Liquidity_Analyst"),
             model_client=self.gpt4o_mini_model_client,
-            tools=[quick_ratio],
+            tools=[run_tool(quick_ratio, context)],
             description="Analyzes liquidity ratios for companies.",
             system_message=SYSTEM_MSG_LIQUIDITY_CONFIG,
             reflect_on_tool_use=True 
@@ -87,8 +116,9 @@ class InitAgents():
         
         self.historical_margin_multiplier_agent = AssistantAgent(
             name="Historical_Margin_Multiplier_Analyst",
+            model_context=context_for_agent("Historical_Margin_Multiplier_Analyst"),
             model_client=self.gpt4o_mini_model_client,
-            tools=[historical_func],
+            tools=[run_tool(historical_func, context)],
             description="Analyzes historical profit margins and valuation multiples.",
             system_message=SYSTEM_MSG_HISTORICAL_MARGIN_MULTIPLIER_CONFIG,
             reflect_on_tool_use=True 
@@ -96,8 +126,9 @@ class InitAgents():
 
         self.competative_margin_multiplier_agent = AssistantAgent(
             name="Competative_Margin_Multiplier_Analyst",
+            model_context=context_for_agent("Competative_Margin_Multiplier_Analyst"),
             model_client=self.gpt4o_mini_model_client,
-            tools=[competative_func],
+            tools=[run_tool(competative_func, context)],
             description="Analyzes competitive positioning and relative valuation.",
             system_message=SYSTEM_MSG_COMPETATIVE_MARGIN_MULTIPLIER_CONFIG,
             reflect_on_tool_use=True 
@@ -105,8 +136,9 @@ class InitAgents():
 
         self.qualitative_agent = AssistantAgent(
             name="Qualitative_Analyst",
+            model_context=context_for_agent("Qualitative_Analyst"),
             model_client=self.gpt4o_model_client,
-            tools=[qualitative_func],
+            tools=[run_tool(qualitative_func, context), news_archive_tool],
             description="Analyzes qualitative factors about the company.",
             system_message=SYSTEM_MSG_QUALITATIVE_CONFIG,
             reflect_on_tool_use=True 
@@ -114,13 +146,17 @@ class InitAgents():
 
         self.red_flags_agent = AssistantAgent(
             name="Red_Flags_Analyst",
+            model_context=context_for_agent("Red_Flags_Analyst"),
             model_client=self.gpt4o_mini_model_client,
+            tools=[news_archive_tool],
             description="Identifies potential risks and problems with the analysis.",
-            system_message=SYS_MSG_RED_FLAGS
+            system_message=SYS_MSG_RED_FLAGS,
+            reflect_on_tool_use=True
         )
 
         self.red_flags_agent_liquidity = AssistantAgent(
             name="Red_Flags_Liquidity_Analyst",
+            model_context=context_for_agent("Red_Flags_Liquidity_Analyst"),
             model_client=self.gemini_model_client,
             description="Identifies potential risks and problems with the analysis.",
             system_message=SYS_RED_FLAGS_AGENT_LIQUIDITY,
@@ -129,6 +165,7 @@ class InitAgents():
                     
         self.solid_agent = AssistantAgent(
             name="Solid_Analyst",
+            model_context=context_for_agent("Solid_Analyst"),
             model_client=self.gpt4o_mini_model_client,
             description="An ultra-cautious risk analyst dedicated to exposing all potential dangers, uncertainties, and red flags associated with any investment decision.",
             system_message=SYS_MSG_SOLID_AGENT
@@ -136,6 +173,7 @@ class InitAgents():
 
         self.pro_investment_agent = AssistantAgent(
             name="Pro_Investment_Analyst",
+            model_context=context_for_agent("Pro_Investment_Analyst"),
             model_client=self.gpt4o_mini_model_client,
             description="A bold and aggressive investment strategist who strongly advocates for taking calculated risks. This agent actively debates against overly cautious approaches, pushes for seizing investment opportunities, and emphasizes that inaction is the biggest financial risk.",
             system_message=SYS_MSG_PRO_INVEST
@@ -143,17 +181,10 @@ class InitAgents():
 
         self.search_agent = AssistantAgent(
             name="Google_Search_Analyst",
+            model_context=context_for_agent("Google_Search_Analyst"),
             model_client=self.gpt4o_mini_model_client,
             tools=[google_search_tool],
             description="Search Google for information, returns top 2 results with a snippet and body content.",
             system_message="You are a helpful AI assistant. You are getting tasks only from the red_flags_agent and solve tasks using your tools.",
             reflect_on_tool_use=True 
         )
-
-        self.summary_agent = AssistantAgent(
-            name="Summary_Analyst",
-            model_client=self.gemini_model_client,
-            description="Provides a final summary of the discussion and consensus reached.",
-            system_message="Provide the consensus that the agents have reached and a short summary on the final decision.",
-            reflect_on_tool_use=False
-        )
\ No newline at end of file
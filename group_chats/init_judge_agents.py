@@ -2,17 +2,25 @@
 init_judge_agents.py
 This module contains the judge agents for the investment house competition.
 """
+import functools
 import os
 from autogen_agentchat.agents import AssistantAgent
 from dotenv import load_dotenv
 from finance.judge_profit import judge_profit
-from utils.judges_functions import google_search, get_investment_house_discussion
+from finance.point_in_time import RunContext
+from group_chats.init_agents import run_tool
+from utils.judges_functions import google_search, get_investment_house_discussion, search_investment_house_discussion
 from autogen_ext.models.openai import OpenAIChatCompletionClient
 from config.system_messages_judges import SYS_MSG_DECISION_QUALITY_JUDGE, SYS_MSG_MANAGER_JUDGE, SYS_MSG_PROFIT_JUDGE, SYS_MSG_SUMMARY_JUDGE, SYS_MSG_WEBSURFER_JUDGE
 from autogen_core.tools import FunctionTool
 
 class InitJudgeAgent():
-    def __init__(self):
+    def __init__(self, run_id: str, context: RunContext):
+        """
+        Args:
+            run_id (str): The run the judges evaluate; their discussion tools read only the messages of this run
+            context (RunContext): The years of the run, bound to the profit and search tools
+        """
         load_dotenv()
         api_key_open_AI = os.getenv('OPENAI_API_KEY')
         self.gpt4o_mini_model_client = OpenAIChatCompletionClient(
@@ -33,18 +41,25 @@ class InitJudgeAgent():
             temperature=0.3,
         )
 
-        google_search_tool = FunctionTool(
-            google_search, description="Search Google for information, returns results with a snippet and body content"
+        google_search_tool = run_tool(
+            google_search, context, description="Search Google for information, returns results with a snippet and body content"
         )
 
-        judge_profit_tool = FunctionTool(
-            judge_profit, description="Calculate the profit of a stock in a defined period."
+        judge_profit_tool = run_tool(
+            judge_profit, context, description="Calculate the profit of a stock in a defined period."
         )
 
+        # The run id is bound to the discussion tools: the model passes only the house, agent or question
         get_discussion_tool = FunctionTool(
-            get_investment_house_discussion,
+            functools.partial(get_investment_house_discussion, run_id),
             name="get_investment_house_discussion", 
-            description="Returns the full internal discussion of an investment house (1 or 2)."
+            description="Returns the internal discussion of an investment house (1 or 2), optionally only the messages of one agent (e.g. Liquidity_Analyst)."
+        )
+
+        search_discussion_tool = FunctionTool(
+            functools.partial(search_investment_house_discussion, run_id),
+            name="search_investment_house_discussion",
+            description="Searches the internal discussions of the investment houses and returns the passages most relevant to a question, e.g. 'how did the Solid_Analyst justify the allocation'. Optionally limited to one house (1 or 2)."
         )
         
         self.manager_judge = AssistantAgent(
@@ -76,7 +91,7 @@ class InitJudgeAgent():
         self.decision_quality_judge = AssistantAgent(
             name="Decision_Quality_Judge",
             model_client=self.gpt4o_model_client,
-            tools=[get_discussion_tool],
+            tools=[search_discussion_tool, get_discussion_tool],
             description="Judges the completeness and quality of the decision-making process in each investment house.",
             system_message=SYS_MSG_DECISION_QUALITY_JUDGE,
             reflect_on_tool_use=True
@@ -0,0 +1,105 @@
+"""
+speaking_plan.py
+Rule-based speaker selection for the group chats.
+A speaking plan is a list of phases, each with a fixed order of speakers. SpeakingPlanSelector is passed to
+SelectorGroupChat as selector_func: while a phase has a next speaker it is returned without any model call,
+and only open decisions (a request for a search, or the debate after a phase is complete) return None,
+which makes SelectorGroupChat fall back to the LLM selector.
+"""
+import re
+from collections import Counter
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional, Sequence
+from autogen_agentchat.messages import BaseAgentEvent, BaseChatMessage
+
+# Messages asking another agent to search are open decisions: the LLM selector picks who answers them
+SEARCH_REQUEST_PATTERN = r"search[_ ]agent|google[_ ]search|\bsearch (?:for|the web|online)\b|\blook (?:it |this |that )?up\b"
+# The manager's call for every agent's final allocation
+FINAL_ROUND_PATTERN = r"\bfinal (?:decision|recommendation|percentage|allocation)s?\b"
+
+
+@dataclass
+class SpeakingPhase:
+    """
+    A fixed speaking order. A triggered phase starts at the first trigger message only: it is not restarted by later ones.
+
+    Attributes:
+        order (List[str]): The agent names, in speaking order
+        trigger_source (str, optional): The agent whose message starts the phase. None for the opening phase.
+        trigger_pattern (str, optional): A regex the trigger message must match (case-insensitive)
+    """
+    order: List[str]
+    trigger_source: Optional[str] = None
+    trigger_pattern: Optional[str] = None
+
+    def is_triggered_by(self, message: BaseChatMessage) -> bool:
+        if self.trigger_source is None or message.source != self.trigger_source:
+            return False
+        return self.trigger_pattern is None or re.search(self.trigger_pattern, message.to_text(), re.IGNORECASE) is not None
+
+
+@dataclass
+class SpeakingPlanSelector:
+    """
+    Selector function that follows a speaking plan.
+
+    Attributes:
+        phases (List[SpeakingPhase]): The phases. The first phase without a trigger starts the chat.
+        open_decision_pattern (str, optional): A regex that marks the last message as an open decision, for the LLM selector
+        open_decision_responders (List[str]): Agents whose messages are never open decisions (e.g. the search agent, whose results mention searching)
+    """
+    phases: List[SpeakingPhase]
+    open_decision_pattern: Optional[str] = SEARCH_REQUEST_PATTERN
+    open_decision_responders: List[str] = field(default_factory=list)
+    # The index of each started triggered phase -> the index of the first message after its trigger
+    _started: Dict[int, int] = field(default_factory=dict, init=False, repr=False)
+    # The number of messages already checked for triggers
+    _scanned: int = field(default=0, init=False, repr=False)
+
+    def _current_phase(self, messages: List[BaseChatMessage]):
+        """Returns the latest started phase and the messages sent since it started."""
+        # A shorter thread is a new chat (e.g. after a reset): the phases start over
+        if len(messages) < self._scanned:
+            self._started.clear()
+            self._scanned = 0
+        for index in range(self._scanned, len(messages)):
+            for phase_index, phase in enumerate(self.phases):
+                if phase_index not in self._started and phase.is_triggered_by(messages[index]):
+                    self._started[phase_index] = index + 1
+        self._scanned = len(messages)
+
+        if self._started:
+            phase_index, start = max(self._started.items(), key=lambda item: item[1])
+            return self.phases[phase_index], messages[start:]
+        for phase in self.phases:
+            if phase.trigger_source is None:
+                return phase, messages
+        return None, messages
+
+    def next_speaker(self, thread: Sequence[BaseAgentEvent | BaseChatMessage]) -> Optional[str]:
+        """
+        Returns the next speaker of the plan, or None when the LLM selector should decide.
+
+        Args:
+            thread: The messages and events of the group chat so far
+        """
+        messages = [message for message in thread if isinstance(message, BaseChatMessage) and message.source != "user"]
+        if messages and self.open_decision_pattern and messages[-1].source not in self.open_decision_responders:
+            if re.search(self.open_decision_pattern, messages[-1].to_text(), re.IGNORECASE):
+                return None
+
+        phase, phase_messages = self._current_phase(messages)
+        if phase is None:
+            return None
+        # The next speaker is the first agent of the order who has not spoken yet in this phase,
+        # so agents answering off the plan (e.g. the search agent) or out of order don't stall it
+        spoken = Counter(message.source for message in phase_messages)
+        for name in phase.order:
+            if spoken[name]:
+                spoken[name] -= 1
+            else:
+                return name
+        return None
+
+    def __call__(self, thread: Sequence[BaseAgentEvent | BaseChatMessage]) -> Optional[str]:
+        return self.next_speaker(thread)
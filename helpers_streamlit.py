@@ -2,16 +2,15 @@
 helper functions for streamlit app and fastapi app 
 """
 import threading
-import asyncio
 import time
 import requests
 import uvicorn
 import socket
 import psutil
 import streamlit as st
+from config.app_constants import JOB_POLL_SECONDS
 from database.routes import app
-from group_chats.group_chat import init_investment_house_discussion
-from group_chats.group_chat_judges import init_judges_discussion
+from database.run_store import ACTIVE_STATUSES, JUDGES_HOUSE_ID, get_run_store
 
 # init fastapi server
 def is_fastapi_running():
@@ -61,74 +60,38 @@ def start_fastapi_server():
     wait_for_fastapi()
 
 
-# init streamlit session state
-def initialize_session_state():
-    """Ensures all session state variables are initialized."""
-    st.session_state.setdefault("house1_messages", [])
-    st.session_state.setdefault("house2_messages", [])
-    st.session_state.setdefault("judges_messages", [])
-
-                    
-async def run_analysis(stocks, investment_budget, start_year, end_year, house1_chat, house2_chat, judges_chat, investment_house1, investment_house2, judges):
-    """Runs AI analysis asynchronously with better UI updates."""
-    st.session_state.house1_messages = []
-    st.session_state.house2_messages = []
-    st.session_state.judges_messages = []
-    
-    with house1_chat:
-        st.write("Investment House 1 analysis in progress...")
-    
-    with house2_chat:
-        st.write("Investment House 2 analysis in progress...")
-    
-    with judges_chat:
-        st.write("Judges panel will evaluate after houses complete their analysis...")
-    
-    house1_result = await init_investment_house_discussion(
-        investment_house1, 
-        stocks.split(","), 
-        investment_budget, 
-        "Investment House 1", 
-        start_year,
-        house1_chat  
-    )
-    save_discussion_to_file(1, house1_result['full_discussion'])
-
-    house2_result = await init_investment_house_discussion(
-        investment_house2, 
-        stocks.split(","), 
-        investment_budget, 
-        "Investment House 2", 
-        start_year,
-        house2_chat
-    )
-    save_discussion_to_file(2, house2_result['full_discussion']) 
-
-    judge_summary = f"House 1: {house1_result['summary']}\n\nHouse 2: {house2_result['summary']}"
-
-
-    judges_result = await init_judges_discussion(
-        judges, 
-        stocks.split(","), 
-        investment_budget, 
-        ["Investment House 1", "Investment House 2"], 
-        start_year, 
-        end_year, 
-        judge_summary,
-        judges_chat 
-    )
-    
-def save_discussion_to_file(house_id: int, messages: list[dict]):
-    filename = f"house{house_id}_discussion.txt"
-    with open(filename, "w", encoding="utf-8") as f:
-        for msg in messages:
-            role = msg.get("role", "Unknown")
-            content = msg.get("content", "")
-            f.write(f"[{role}]: {content}\n\n")
-
-
-def start_analysis_thread(stocks, investment_budget, start_year, end_year, house1_chat, house2_chat, judges_chat, Investment_house1, Investment_house2, judges):
-    """Starts AI analysis in a separate thread."""
-    loop = asyncio.new_event_loop()
-    asyncio.set_event_loop(loop)
-    loop.run_until_complete(run_analysis(stocks, investment_budget, start_year, end_year, house1_chat, house2_chat, judges_chat, Investment_house1, Investment_house2, judges))
\ No newline at end of file
+# show the competition runs
+def show_run(run_id: str):
+    """
+    Shows the status and the discussions of a competition run.
+    While the run is queued or running, its progress is polled from the run store every JOB_POLL_SECONDS seconds,
+    by rerunning only this part of the page.
+    """
+    run = get_run_store().get_run(run_id)
+    if run is None:
+        st.warning(f"Run {run_id} not found.")
+        return
+    active = run["status"] in ACTIVE_STATUSES
+    st.fragment(run_every=JOB_POLL_SECONDS if active else None)(show_run_progress)(run_id, active)
+
+
+def show_run_progress(run_id: str, active: bool):
+    """Shows the status of a run and the messages of both houses and of the judges stored so far."""
+    store = get_run_store()
+    run = store.get_run(run_id)
+    if active and run["status"] not in ACTIVE_STATUSES:
+        # The run is finished: rerun the page to stop polling
+        st.rerun()
+
+    st.caption(f"Run {run_id} - {run['status']} - {run['message_count']} messages")
+    messages = store.get_messages(run_id)
+    tabs = st.tabs(["🏠 Investment House 1", "🏠 Investment House 2", "⚖️ Judges Panel"])
+    headers = ["Investment House 1 Analysis", "Investment House 2 Analysis", "Judges Panel Verdict"]
+    for tab, header, house_id in zip(tabs, headers, [1, 2, JUDGES_HOUSE_ID]):
+        with tab:
+            st.header(header)
+            for msg in messages:
+                if msg["house_id"] == house_id:
+                    with st.chat_message("assistant"):
+                        st.write(f"**{msg['role']}**")
+                        st.markdown(msg["content"])
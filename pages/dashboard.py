@@ -0,0 +1,93 @@
+"""
+dashboard.py - Streamlit page for exploring the tickers: margins and multiples, peer groups and price history.
+The data comes from utils/dashboard_data.py through st.cache_data, keyed by the data version of the tickers, so the
+reruns of the page redraw from memory; the charts are drawn client-side from compact arrays.
+"""
+import streamlit as st
+from config.app_constants import END_YEAR, START_YEAR, TICKER_STOCKS
+from helpers_streamlit import start_fastapi_server
+from utils import dashboard_data
+
+start_fastapi_server()
+
+st.set_page_config(page_title="Ticker Dashboard", page_icon="📊", layout="wide")
+st.title("📊 Ticker Dashboard")
+
+
+# data_version is only part of the cache key: a new cached response of one of the tickers invalidates their entries
+@st.cache_data(show_spinner="Loading the margins and multiples...", max_entries=64)
+def cached_metrics(symbols: tuple, years: tuple, data_version: str):
+    return dashboard_data.load_metrics(list(symbols), list(years))
+
+
+@st.cache_data(show_spinner="Loading the peer group...", max_entries=64)
+def cached_peer_group(symbol: str, years: tuple, data_version: str):
+    return dashboard_data.load_peer_group(symbol, list(years))
+
+
+@st.cache_data(show_spinner="Loading the price history...", max_entries=256)
+def cached_price_history(symbol: str, start_year: int, end_year: int, data_version: str):
+    return dashboard_data.load_price_history(symbol, start_year, end_year)
+
+
+st.sidebar.header("Tickers")
+tickers = st.sidebar.text_input("Stock Ticker(s)", st.session_state.get("TICKER_STOCKS", ", ".join(TICKER_STOCKS)), key="dashboard_tickers")
+symbols = list(dict.fromkeys(symbol.strip().upper() for symbol in tickers.split(",") if symbol.strip()))
+start_year, end_year = st.sidebar.slider(
+    "Years", min_value=2000, max_value=2025,
+    value=(st.session_state.get("START_YEAR", START_YEAR), st.session_state.get("END_YEAR", END_YEAR))
+)
+years = tuple(range(start_year, end_year + 1))
+
+if st.sidebar.button("🔄 Reload data"):
+    # Explicit invalidation, e.g. after the cache database was replaced
+    cached_metrics.clear()
+    cached_peer_group.clear()
+    cached_price_history.clear()
+
+if not symbols:
+    st.info("Enter one or more tickers in the sidebar.")
+    st.stop()
+
+comparison_tab, peers_tab, prices_tab = st.tabs(["📈 Comparison", "👥 Peer group", "💹 Price history"])
+
+with comparison_tab:
+    metrics = cached_metrics(tuple(symbols), years, dashboard_data.data_version(symbols))
+    metric = st.selectbox("Metric", list(dashboard_data.METRIC_LABELS), format_func=dashboard_data.METRIC_LABELS.get)
+    year = st.select_slider("Year", options=list(years), value=years[-1]) if len(years) > 1 else years[0]
+
+    left, right = st.columns(2)
+    with left:
+        st.subheader(f"{dashboard_data.METRIC_LABELS[metric]} in {year}")
+        st.bar_chart(dashboard_data.metrics_frame(metrics, symbols, list(years), year)[dashboard_data.METRIC_LABELS[metric]])
+    with right:
+        st.subheader(f"{dashboard_data.METRIC_LABELS[metric]} over the years")
+        st.line_chart(dashboard_data.metric_history_frame(metrics, metric, symbols, list(years)))
+    st.dataframe(dashboard_data.metrics_frame(metrics, symbols, list(years), year), use_container_width=True)
+
+with peers_tab:
+    symbol = st.selectbox("Ticker", symbols, key="dashboard_peer_symbol")
+    peer_group = cached_peer_group(symbol, years, dashboard_data.data_version([symbol]))
+    if peer_group is None:
+        st.warning(f"No related companies found for {symbol}.")
+    else:
+        st.caption(f"Peers: {', '.join(peer_group['peers'])}")
+        st.subheader(f"{symbol} percentile among its peers (100 = best)")
+        st.bar_chart(peer_group["percentiles"].T)
+        st.subheader("Peer median")
+        st.dataframe(peer_group["medians"], use_container_width=True)
+        st.subheader("Peers")
+        st.dataframe(peer_group["metrics"], use_container_width=True)
+
+with prices_tab:
+    rebase = st.checkbox("Rebase to 100", value=len(symbols) > 1)
+    prices = {}
+    for symbol in symbols:
+        history = cached_price_history(symbol, start_year, end_year, dashboard_data.data_version([symbol]))
+        if history is not None:
+            prices[symbol] = history
+    if prices:
+        st.line_chart(dashboard_data.price_frame(prices, rebase))
+    missing = [symbol for symbol in symbols if symbol not in prices]
+    if missing:
+        st.warning(f"No price history for {', '.join(missing)} between {start_year} and {end_year}.")
@@ -2,20 +2,16 @@ import streamlit as st
 from database.init_db import init_db
 from helpers_streamlit import (
     start_fastapi_server,
-    start_analysis_thread,
-    initialize_session_state
+    show_run
 )
-import group_chats.init_agents as init_agents
-import group_chats.init_judge_agents as init_judge_agents
-from config.app_constants import BUDGET, TICKER_STOCKS, START_YEAR, END_YEAR
+from config.app_constants import BUDGET, TICKER_STOCKS, START_YEAR, END_YEAR, SCREENER_TOP_N
+from finance.point_in_time import as_of_date
+from finance.screener import screen
+from group_chats.competition import get_competition_jobs
 
 init_db("stock_trading.db")
 start_fastapi_server()
 
-Investment_house1 = init_agents.InitAgents()
-Investment_house2 = init_agents.InitAgents()
-judges = init_judge_agents.InitJudgeAgent()
-
 # Setup Streamlit Page
 st.set_page_config(page_title="Investment Analysis", page_icon="📈", layout="wide")
 st.title("📊 Investment Houses Competition")
@@ -42,8 +38,6 @@ st.markdown(
 )
 
 
-initialize_session_state()
-
 if "BUDGET" not in st.session_state:
     st.session_state["BUDGET"] = BUDGET
 
@@ -67,24 +61,31 @@ st.session_state["START_YEAR"] = st.sidebar.number_input(
 st.session_state["END_YEAR"] = st.sidebar.number_input(
     "Evaluation End Year", min_value=st.session_state["START_YEAR"], max_value=2025, value=st.session_state["END_YEAR"]
 )
-start_analysis = st.button("🚀 Start Analysis")
-
 
-tab1, tab2, tab3 = st.tabs(["🏠 Investment House 1", "🏠 Investment House 2", "⚖️ Judges Panel"])
+st.sidebar.header("Screener")
+use_screener = st.sidebar.checkbox("Preselect the top tickers of a universe", value=False)
+if use_screener:
+    screener_universe = st.sidebar.text_area("Universe (comma separated, empty for every cached ticker)", "")
+    screener_top_n = st.sidebar.number_input("Top N", min_value=1, max_value=50, value=SCREENER_TOP_N)
 
-# Display placeholders for chat discussions
-with tab1:
-    st.header("Investment House 1 Analysis")
-    house1_chat = st.empty()
-
-with tab2:
-    st.header("Investment House 2 Analysis")
-    house2_chat = st.empty()
+start_analysis = st.button("🚀 Start Analysis")
 
-with tab3:
-    st.header("Judges Panel Verdict")
-    judges_chat = st.empty()
 
 # Start Analysis
+if start_analysis and use_screener:
+    # Only the top tickers of the universe are debated by the houses
+    universe = [symbol for symbol in screener_universe.split(",") if symbol.strip()] or None
+    screen_result = screen(st.session_state["START_YEAR"], screener_top_n, universe, as_of=as_of_date())
+    st.sidebar.text(str(screen_result))
+    if not screen_result.rows:
+        st.error("The screener found no ticker with enough cached data. Prefetch and export the universe first.")
+        st.stop()
+    st.session_state["TICKER_STOCKS"] = ", ".join(screen_result.symbols())
+
 if start_analysis:
-    start_analysis_thread(st.session_state["TICKER_STOCKS"], st.session_state["BUDGET"], st.session_state["START_YEAR"], st.session_state["END_YEAR"], house1_chat, house2_chat, judges_chat, Investment_house1, Investment_house2, judges)
\ No newline at end of file
+    # The competition runs in the background; its run id in the URL reopens it after a browser refresh
+    run_id = get_competition_jobs().submit(st.session_state["TICKER_STOCKS"].split(","), st.session_state["BUDGET"], st.session_state["START_YEAR"], st.session_state["END_YEAR"])
+    st.query_params["run"] = run_id
+
+if "run" in st.query_params:
+    show_run(st.query_params["run"])
\ No newline at end of file
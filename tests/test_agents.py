@@ -11,15 +11,16 @@ from unittest.mock import MagicMock
 from autogen_agentchat.messages import TextMessage
 from autogen_core import CancellationToken
 from group_chats.init_agents import InitAgents
+from finance.point_in_time import RunContext
 from finance.LLM_get_financial import quick_ratio
-from finance.agents_functions import competative_func, historical_func, qualitative_func
+from finance.async_agents_functions import competative_func, historical_func, qualitative_func
 from autogen_core.tools import FunctionTool
 
 
 @pytest.fixture
 def agents():
     """Fixture to initialize agents before running tests."""
-    return InitAgents()
+    return InitAgents(RunContext.for_years(2022, 2024))
 
 
 @pytest.mark.parametrize("agent_attr,expected_name,expected_tool_functions", [
@@ -40,7 +41,7 @@ def test_agents_initialization(agents, agent_attr, expected_name, expected_tool_
     agent_tool_names = []
     for tool in agent._tools:
         if isinstance(tool, FunctionTool):
-            agent_tool_names.append(tool._func.__name__)
+            agent_tool_names.append(tool.name)
         else:
             agent_tool_names.append(tool.__name__)
 
@@ -7,19 +7,22 @@ This test suite covers:
 2. API Calls: Validates that requests are made when responses are not cached.
 3. API Key Handling: Checks the correct behavior when API keys are required.
 4. Error Handling: Tests how the function responds to missing API keys, cache service failures, and API service failures.
+5. Request Coalescing: Checks that concurrent identical requests make a single upstream request.
 
 Mocking is used to prevent actual HTTP requests.
 """
+import time
 import pytest
 import requests
-from unittest.mock import patch
+from concurrent.futures import ThreadPoolExecutor
+from unittest.mock import Mock, patch
 from database.api_utils import cached_api_request
 
 def test_cached_response():
     """Test if the function returns cached response when available."""
     mock_cache_response = {"data": [{"response": "Cached API Response"}]}
     
-    with patch("requests.post") as mock_post:
+    with patch("database.http_client.HttpClient.post") as mock_post:
         mock_post.return_value.status_code = 200
         mock_post.return_value.json.return_value = mock_cache_response
         
@@ -32,7 +35,7 @@ def test_api_call_when_not_cached():
     mock_cache_response = {"data": []}  # Cache miss
     mock_api_response = "Live API Response"
     
-    with patch("requests.post") as mock_post, patch("requests.get") as mock_get:
+    with patch("database.http_client.HttpClient.post") as mock_post, patch("database.http_client.HttpClient.get") as mock_get:
         mock_post.return_value.status_code = 200
         mock_post.return_value.json.return_value = mock_cache_response
         
@@ -52,7 +55,7 @@ def test_missing_api_key():
 
 def test_api_key_in_url():
     """Test if function correctly appends API key to URL when required."""
-    with patch("os.getenv", return_value="FAKE_KEY"), patch("requests.post") as mock_post, patch("requests.get") as mock_get:
+    with patch("os.getenv", return_value="FAKE_KEY"), patch("database.http_client.HttpClient.post") as mock_post, patch("database.http_client.HttpClient.get") as mock_get:
         mock_post.return_value.status_code = 200
         mock_post.return_value.json.return_value = {"data": []}  # Cache miss
         mock_get.return_value.status_code = 200
@@ -65,7 +68,7 @@ def test_api_key_in_url():
 
 def test_cache_service_down():
     """Test if function handles cache service failure gracefully."""
-    with patch("requests.post", side_effect=requests.RequestException("Cache service error")), patch("requests.get") as mock_get:
+    with patch("database.http_client.HttpClient.post", side_effect=requests.RequestException("Cache service error")), patch("database.http_client.HttpClient.get") as mock_get:
         mock_get.return_value.status_code = 200
         mock_get.return_value.text = "API Response"
         
@@ -76,9 +79,40 @@ def test_cache_service_down():
 
 def test_api_service_down():
     """Test if function gracefully handles API service failure."""
-    with patch("requests.post") as mock_post, patch("requests.get", side_effect=requests.RequestException("API request failed")):
+    with patch("database.http_client.HttpClient.post") as mock_post, patch("database.http_client.HttpClient.get", side_effect=requests.RequestException("API request failed")):
         mock_post.return_value.status_code = 200
         mock_post.return_value.json.return_value = {"data": []}  # Cache miss
         
         with pytest.raises(requests.RequestException, match="API request failed"):
             cached_api_request("http://example.com/api", api_key_name=None)
+
+def test_concurrent_identical_requests_fetch_once():
+    """Test that concurrent identical requests on a cold cache make a single upstream request."""
+    def slow_get(*args, **kwargs):
+        time.sleep(0.2)
+        return Mock(status_code=200, text="API Response")
+
+    with patch("database.http_client.HttpClient.post") as mock_post, patch("database.http_client.HttpClient.get", side_effect=slow_get) as mock_get:
+        mock_post.return_value.status_code = 200
+        mock_post.return_value.json.return_value = {"data": []}  # Cache miss
+
+        with ThreadPoolExecutor(max_workers=4) as executor:
+            responses = list(executor.map(lambda _: cached_api_request("http://example.com/api", api_key_name=None), range(4)))
+
+        assert responses == ["API Response"] * 4
+        mock_get.assert_called_once()
+
+def test_process_lock_held_by_another_process():
+    """Test that a request waits for the cached response when another process holds its lock row."""
+    cache_miss = Mock(status_code=200, json=Mock(return_value={"data": []}))
+    lock_taken = Mock(status_code=200, json=Mock(return_value={"acquired": False}))
+    cache_hit = Mock(status_code=200, json=Mock(return_value={"data": [{"response": "Fetched By Other Process"}]}))
+
+    with patch.dict("os.environ", {"API_CACHE_PROCESS_LOCK": "true"}), \
+         patch("database.api_utils.PROCESS_LOCK_POLL_SECONDS", 0), \
+         patch("database.http_client.HttpClient.post", side_effect=[cache_miss, lock_taken, cache_hit]), \
+         patch("database.http_client.HttpClient.get") as mock_get:
+        response = cached_api_request("http://example.com/api", api_key_name=None)
+
+    assert response == "Fetched By Other Process"
+    mock_get.assert_not_called()
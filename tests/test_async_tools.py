@@ -0,0 +1,138 @@
+"""
+test_async_tools.py
+This module contains the unit tests for the async agent tools and the async cached request.
+The async cache and HTTP client are mocked, and the async tools are checked against the sync tools
+on the same API responses.
+"""
+import asyncio
+import json
+import pytest
+from unittest.mock import AsyncMock, Mock, patch
+from database.api_utils import async_cached_api_request
+from finance import async_agents_functions
+from finance.agents_functions import batch_metrics
+from finance.point_in_time import RunContext
+from finance.tool_results import HistoricalResult
+from group_chats.init_agents import run_tool
+
+INCOME_STATEMENTS = json.dumps([
+    {"calendarYear": "2022", "revenue": 1000, "grossProfit": 400, "operatingIncome": 200, "netIncome": 100},
+    {"calendarYear": "2023", "revenue": 2000, "grossProfit": 900, "operatingIncome": 500, "netIncome": 300},
+])
+MARKET_CAP = json.dumps([{"marketCap": 10000}])
+RATIOS = json.dumps([
+    {"calendarYear": "2022", "quickRatio": 1.2, "priceEarningsRatio": 20, "priceToBookRatio": 3, "priceEarningsToGrowthRatio": 1.5, "priceToSalesRatio": 4},
+    {"calendarYear": "2023", "quickRatio": 1.4, "priceEarningsRatio": 25, "priceToBookRatio": 3.5, "priceEarningsToGrowthRatio": 1.1, "priceToSalesRatio": 5},
+])
+RELATED = json.dumps({"results": [{"ticker": "MSFT"}, {"ticker": "GOOGL"}]})
+# The run the tools are bound to
+CONTEXT = RunContext(2022, 2024, as_of="2023-12-31")
+
+
+def fake_response(url, **kwargs):
+    """Returns the mocked API response of the given endpoint."""
+    if "historical-market-capitalization" in url:
+        return MARKET_CAP
+    if "income-statement" in url:
+        return INCOME_STATEMENTS
+    if "ratios" in url:
+        return RATIOS
+    if "related-companies" in url:
+        return RELATED
+    return "{}"
+
+
+@pytest.fixture
+def mock_async_cache():
+    """Fixture to mock the async cached request in every finance module."""
+    mock = AsyncMock(side_effect=fake_response)
+    modules = ["finance.profit_margin", "finance.profit_multipliers", "finance.LLM_get_financial", "finance.LLM_get_qualitative"]
+    patches = [patch(f"{module}.async_cached_api_request", mock) for module in modules]
+    for p in patches:
+        p.start()
+    yield mock
+    for p in patches:
+        p.stop()
+
+
+@pytest.fixture
+def mock_sync_cache():
+    """Fixture to mock the sync cached request in every finance module."""
+    mock = Mock(side_effect=fake_response)
+    modules = ["finance.profit_margin", "finance.profit_multipliers", "finance.LLM_get_financial", "finance.LLM_get_qualitative"]
+    patches = [patch(f"{module}.cached_api_request", mock) for module in modules]
+    for p in patches:
+        p.start()
+    yield mock
+    for p in patches:
+        p.stop()
+
+
+@pytest.mark.asyncio
+async def test_async_historical_func_matches_sync(mock_async_cache, mock_sync_cache):
+    """Test that historical_func returns the same results as the sync batch of the pages."""
+    async_result = await async_agents_functions.historical_func(CONTEXT, ["AAPL"], [2022, 2023])
+    sync_result = HistoricalResult(batch_metrics(["AAPL"], [2022, 2023], as_of=CONTEXT.as_of).rows())
+    assert async_result == sync_result
+    assert async_result.row("AAPL", 2023).gross_margin == 45.0
+
+
+@pytest.mark.asyncio
+async def test_async_quick_ratio(mock_async_cache):
+    """Test the async quick_ratio tool."""
+    assert (await async_agents_functions.quick_ratio(CONTEXT, "AAPL", 2022)).quick_ratio == 1.2
+    assert (await async_agents_functions.quick_ratio(CONTEXT, "AAPL", 2019)).error == "No data found for the specified year."
+    # The data is requested as of the date of the run
+    assert {call.kwargs["as_of"] for call in mock_async_cache.call_args_list} == {"2023-12-31"}
+
+
+@pytest.mark.asyncio
+async def test_async_competative_func(mock_async_cache):
+    """Test that the async competative_func compares the symbol with its related companies."""
+    result = await async_agents_functions.competative_func(CONTEXT, "AAPL", [2022])
+    assert set(result.symbols()) == {"AAPL", "MSFT", "GOOGL"}
+    assert result.row("MSFT", 2022).price_to_ebit == 50.0
+
+
+@pytest.mark.asyncio
+async def test_async_tool_names():
+    """Test that the async tools keep the names used in the agents' system messages."""
+    names = [async_agents_functions.quick_ratio.__name__, async_agents_functions.historical_func.__name__,
+             async_agents_functions.competative_func.__name__, async_agents_functions.qualitative_func.__name__]
+    assert names == ["quick_ratio", "historical_func", "competative_func", "qualitative_func"]
+    assert asyncio.iscoroutinefunction(async_agents_functions.historical_func)
+
+
+@pytest.mark.asyncio
+async def test_async_cached_request_cache_hit():
+    """Test that the async cached request returns the cached response without an upstream request."""
+    cache_hit = Mock(status_code=200, json=Mock(return_value={"data": [{"response": "Cached API Response"}]}))
+    with patch("database.http_client.AsyncHttpClient.post", AsyncMock(return_value=cache_hit)), \
+         patch("database.http_client.AsyncHttpClient.get", AsyncMock()) as mock_get:
+        response = await async_cached_api_request("http://example.com/api", api_key_name=None)
+    assert response == "Cached API Response"
+    mock_get.assert_not_called()
+
+
+@pytest.mark.asyncio
+async def test_async_cached_request_coalesces():
+    """Test that concurrent identical async requests on a cold cache make a single upstream request."""
+    cache_miss = Mock(status_code=200, json=Mock(return_value={"data": []}))
+
+    async def slow_get(*args, **kwargs):
+        await asyncio.sleep(0.1)
+        return Mock(status_code=200, text="API Response")
+
+    with patch("database.http_client.AsyncHttpClient.post", AsyncMock(return_value=cache_miss)), \
+         patch("database.http_client.AsyncHttpClient.get", AsyncMock(side_effect=slow_get)) as mock_get:
+        responses = await asyncio.gather(*[async_cached_api_request("http://example.com/api", api_key_name=None) for _ in range(4)])
+    assert responses == ["API Response"] * 4
+    mock_get.assert_called_once()
+
+
+def test_run_tool_description():
+    """Test that the tool description documents the model's arguments only, not the bound RunContext."""
+    tool = run_tool(async_agents_functions.historical_func, CONTEXT)
+    assert "RunContext" not in tool.description
+    assert "symbols (List): symbols to get historical data for" in tool.description
+    assert list(tool.schema["parameters"]["properties"]) == ["symbols", "years"]
@@ -0,0 +1,64 @@
+"""
+test_batch_charts.py
+This module contains the unit tests for the batch rendering of the report charts:
+the data of the charts is loaded once per symbol, and the charts are drawn from it in worker processes
+with the object-oriented Figure API, without any further fetch.
+Each test writes its images to a temporary directory.
+"""
+import json
+import os
+import numpy as np
+import pytest
+from unittest.mock import Mock
+from finance.point_in_time import RunContext
+from utils import batch_charts, chart_figures, visualization_functions
+from utils.batch_charts import ChartJob, load_chart_jobs, render_charts
+from utils.chart_figures import ComparisonData, QualitativeData, render_chart
+
+BUSINESS_INFO = json.dumps({"businessDescription": "Designs and sells phones, computers and wearables worldwide. Runs services."})
+
+
+def comparison(symbol: str) -> ComparisonData:
+    margins = np.array([[[40.0, 35.0]], [[30.0, 20.0]], [[25.0, np.nan]]]).reshape(3, 2, 1)
+    valuations = np.array([[[20.0, 18.0]], [[4.0, 3.0]], [[np.nan, 5.0]], [[15.0, 12.0]]]).reshape(4, 2, 1)
+    return ComparisonData(symbol, "Peer median (3)", [2022], margins, valuations)
+
+
+def test_render_charts_in_worker_processes(tmp_path):
+    """Test that the charts are written by the worker pool, and a failing chart does not stop the others."""
+    jobs = [ChartJob("company_comparison", f"{symbol}_company_comparison", comparison(symbol)) for symbol in ("AAPL", "MSFT", "NVDA")]
+    jobs.append(ChartJob("qualitative_summary", "AAPL_qualitative_summary", QualitativeData("AAPL", BUSINESS_INFO)))
+    jobs.append(ChartJob("candlesticks", "AAPL_candlesticks", None))
+
+    paths = render_charts(jobs, str(tmp_path / "charts"), max_workers=2)
+    assert list(paths) == ["AAPL_company_comparison", "MSFT_company_comparison", "NVDA_company_comparison", "AAPL_qualitative_summary"]
+    for path in paths.values():
+        with open(path, "rb") as f:
+            assert f.read(4) == b"\x89PNG"
+    assert sorted(os.listdir(tmp_path / "charts")) == sorted(f"{name}.png" for name in paths)
+
+
+def test_load_chart_jobs(monkeypatch):
+    """Test that the data of every chart is loaded before rendering, and a failing load leaves out only its chart."""
+    monkeypatch.setattr(visualization_functions, "comparison_peers", lambda symbol, competitor=None, as_of=None: (["MSFT"], "MSFT"))
+    comparison_data = Mock(side_effect=lambda symbol, peers, years, label, as_of: comparison(symbol))
+    monkeypatch.setattr(visualization_functions, "comparison_data", comparison_data)
+    monkeypatch.setattr(batch_charts, "extract_business_info", Mock(side_effect=[BUSINESS_INFO, RuntimeError("Polygon.io error")]))
+
+    context = RunContext(2022, 2022, as_of="2022-12-31")
+    jobs = load_chart_jobs(["aapl", "", "TSLA"], years=[2022], max_workers=1, context=context)
+    assert comparison_data.call_args.args[4] == "2022-12-31"
+    assert batch_charts.extract_business_info.call_args.args[1] == "2022-12-31"
+    assert [job.name for job in jobs] == ["AAPL_company_comparison", "AAPL_qualitative_summary", "TSLA_company_comparison"]
+    assert jobs[0].data.symbol == "AAPL" and jobs[1].data.business_info == BUSINESS_INFO
+
+
+def test_render_chart_reuses_figure():
+    """Test that a process draws every chart of a kind on the same figure, including the no-data message."""
+    render_chart("company_comparison", comparison("AAPL"))
+    figure = chart_figures._figures["company_comparison"]
+    empty = ComparisonData("ZZZ", "peers", [2022], np.full((3, 2, 1), np.nan), np.full((4, 2, 1), np.nan))
+    assert render_chart("company_comparison", empty).startswith(b"\x89PNG")
+    assert chart_figures._figures["company_comparison"] is figure
+    with pytest.raises(ValueError):
+        render_chart("candlesticks", None)
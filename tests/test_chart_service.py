@@ -0,0 +1,97 @@
+"""
+test_chart_service.py
+This module contains the unit tests for the memoized chart service:
+charts are rendered once per key and data version, served by URL by the cache service,
+and drawn on reused figures without leaking any.
+Each test uses a temporary database file and chart directory.
+"""
+import json
+import sqlite3
+import matplotlib.pyplot as plt
+import pytest
+from unittest.mock import Mock, patch
+from fastapi.testclient import TestClient
+import database.routes
+from database.db import DB
+from database.init_db import init_db
+from database.routes import app
+from finance.point_in_time import RunContext
+from utils import visualization_functions
+from utils.chart_service import ChartService, chart_url
+
+
+def fake_response(url, **kwargs):
+    """Returns the mocked API response of the given endpoint: the same fundamentals for every known ticker."""
+    if url.rstrip("/").split("/")[-1] not in ("AAPL", "MSFT", "GOOGL"):
+        return "[]"
+    if "historical-market-capitalization" in url:
+        return json.dumps([{"marketCap": 6000}])
+    if "income-statement" in url:
+        return json.dumps([{"calendarYear": "2022", "revenue": 1000, "grossProfit": 500, "operatingIncome": 300, "netIncome": 200}])
+    if "ratios" in url:
+        return json.dumps([{"calendarYear": "2022", "priceEarningsRatio": 20, "priceToSalesRatio": 4}])
+    return "{}"
+
+
+@pytest.fixture
+def service(tmp_path, monkeypatch):
+    """Fixture to create a chart service with a fake renderer and the peer group MSFT, GOOGL."""
+    db_name = str(tmp_path / "cache.db")
+    init_db(db_name)
+    renders = Mock(return_value=b"\x89PNG fake")
+    monkeypatch.setattr(visualization_functions, "comparison_peers", lambda symbol, competitor=None, as_of=None: (["MSFT", "GOOGL"], "Peer median (2)"))
+    monkeypatch.setattr(visualization_functions, "render_company_comparison", renders)
+    service = ChartService(str(tmp_path / "charts"), db_name)
+    service.renders = renders
+    return service
+
+
+def log_call(db_name, url):
+    db = DB(sqlite3, db_name)
+    db.execute("INSERT INTO API_calls (params, url, response) VALUES (?, ?, ?)", ("{}", url, "[]"))
+    db.commit()
+    db.close()
+
+
+def test_charts_are_memoized_by_data_version(service):
+    """Test that a chart is rendered once, and again only when the data of the company or of its peers changes."""
+    chart_id = service.company_comparison("AAPL", years=[2022, 2023])
+    assert service.company_comparison("AAPL", years=[2022, 2023]) == chart_id
+    assert service.renders.call_count == 1
+    assert open(service.path(chart_id), "rb").read() == b"\x89PNG fake"
+    assert chart_url(chart_id) == f"http://localhost:8000/charts/{chart_id}.png"
+
+    log_call(service.db_name, "https://financialmodelingprep.com/api/v3/ratios/TSLA?apikey=secret")
+    assert service.company_comparison("AAPL", years=[2022, 2023]) == chart_id
+    log_call(service.db_name, "https://financialmodelingprep.com/api/v3/ratios/GOOGL?apikey=secret")
+    assert service.company_comparison("AAPL", years=[2022, 2023]) != chart_id
+    assert service.company_comparison("AAPL", years=[2023]) != chart_id
+    assert service.renders.call_count == 3
+    assert service.path("../secret") is None
+
+
+def test_chart_routes(service, monkeypatch):
+    """Test that the cache service renders a chart on request and serves its image by URL."""
+    monkeypatch.setattr(database.routes.chart_service, "get_chart_service", lambda: service)
+    client = TestClient(app)
+
+    response = client.get("/charts/company_comparison/aapl", params={"start_year": 2022, "end_year": 2023})
+    assert response.status_code == 200 and response.headers["content-type"] == "image/png"
+    assert response.content == b"\x89PNG fake"
+    assert service.renders.call_args.args[0] == "AAPL" and service.renders.call_args.args[2] == [2022, 2023]
+    # The data is charted as of the end of the requested start year, not of the app's default start year
+    client.get("/charts/company_comparison/aapl", params={"start_year": 2023, "end_year": 2024})
+    assert service.renders.call_args.args[4] == RunContext.for_years(2023, 2024).as_of
+    assert client.get("/charts/0123456789abcdef0123456789abcdef.png").status_code == 404
+
+
+def test_render_reuses_figures():
+    """Test that the charts, including the no-data message, are drawn on one reused figure per chart kind."""
+    cache = Mock(side_effect=fake_response)
+    with patch("finance.profit_margin.cached_api_request", cache), patch("finance.profit_multipliers.cached_api_request", cache):
+        png = visualization_functions.render_company_comparison("AAPL", ["MSFT", "GOOGL"], [2022], "Peer median (2)")
+        figures = len(plt.get_fignums())
+        visualization_functions.render_company_comparison("ZZZ", [], [2022], "peers")
+        visualization_functions.render_company_comparison("AAPL", ["MSFT"], [2022], "MSFT")
+    assert png.startswith(b"\x89PNG")
+    assert len(plt.get_fignums()) == figures
@@ -0,0 +1,108 @@
+"""
+test_columnar_export.py
+This module contains the unit tests for the Parquet export of the cached fundamentals:
+the parsing of the cached responses into typed rows, the incremental export partitioned by ticker and year,
+the partition-pruned reads, and the export run by the routes after a call is logged.
+Each test uses a temporary database file and export directory.
+"""
+import json
+import os
+import sqlite3
+import pytest
+from datetime import date
+from fastapi.testclient import TestClient
+import database.routes
+from database.columnar_export import classify_url, export_new_responses, extract_rows, read_dataset
+from database.db import DB
+from database.init_db import init_db
+from database.routes import app
+
+INCOME_URL = "https://financialmodelingprep.com/api/v3/income-statement/AAPL?apikey=secret"
+PRICES_URL = "https://financialmodelingprep.com/api/v3/historical-price-full/MSFT?apikey=secret"
+
+INCOME_RESPONSE = json.dumps([
+    {"date": "2023-09-30", "calendarYear": "2023", "period": "FY", "fillingDate": "2023-11-03", "revenue": 383285000000, "netIncome": 96995000000},
+    {"date": "2022-09-24", "calendarYear": "2022", "period": "FY", "fillingDate": "2022-10-28", "revenue": 394328000000, "netIncome": None},
+])
+PRICES_RESPONSE = json.dumps({"symbol": "MSFT", "historical": [
+    {"date": "2023-01-03", "open": 243.08, "close": 239.58, "volume": 25740000},
+    {"date": "2022-12-30", "open": 238.21, "close": 239.82, "volume": 21938500},
+]})
+
+
+@pytest.fixture
+def db(tmp_path):
+    """Fixture to create a cache database in a temporary file."""
+    db_name = str(tmp_path / "cache.db")
+    init_db(db_name)
+    db = DB(sqlite3, db_name)
+    yield db
+    db.close()
+
+
+def log_call(db, url, response):
+    db.execute("INSERT INTO API_calls (params, url, response) VALUES (?, ?, ?)", ("{}", url, response))
+    db.commit()
+
+
+def test_extract_rows():
+    """Test that responses are parsed into typed rows by fiscal or calendar year, and other urls are skipped."""
+    assert classify_url(INCOME_URL) == ("income_statement", "AAPL")
+    assert classify_url("https://api.polygon.io/v2/reference/news") is None
+
+    dataset, ticker, rows = extract_rows(INCOME_URL, INCOME_RESPONSE)
+    assert (dataset, ticker) == ("income_statement", "AAPL")
+    assert rows[0]["date"] == date(2023, 9, 30) and rows[0]["year"] == 2023 and rows[0]["revenue"] == 383285000000.0
+    assert rows[1]["net_income"] is None
+
+    _, _, prices = extract_rows(PRICES_URL, PRICES_RESPONSE)
+    assert [row["year"] for row in prices] == [2023, 2022]
+    assert extract_rows(INCOME_URL, json.dumps({"Error Message": "Limit Reach"})) is None
+
+
+def test_incremental_export(db, tmp_path):
+    """Test that each export parses only the new calls, and a newer response replaces the rows of the same record."""
+    export_dir = str(tmp_path / "export")
+    log_call(db, INCOME_URL, INCOME_RESPONSE)
+    log_call(db, PRICES_URL, PRICES_RESPONSE)
+    assert export_new_responses(db, export_dir) == {"income_statement": 2, "price_history": 2}
+    assert os.path.exists(os.path.join(export_dir, "income_statement", "symbol=AAPL", "year=2022", "part-0.parquet"))
+    assert export_new_responses(db, export_dir) == {}
+
+    restated = json.loads(INCOME_RESPONSE)
+    restated[1]["netIncome"] = 99803000000
+    log_call(db, INCOME_URL, json.dumps(restated[1:]))
+    assert export_new_responses(db, export_dir) == {"income_statement": 1}
+
+    table = read_dataset("income_statement", export_dir=export_dir)
+    assert table.num_rows == 2
+    rows = {row["year"]: row for row in table.to_pylist()}
+    assert rows[2022]["net_income"] == 99803000000.0 and rows[2022]["symbol"] == "AAPL"
+
+
+def test_read_dataset_prunes_partitions(db, tmp_path):
+    """Test that reads are limited to the requested symbols, years and columns."""
+    export_dir = str(tmp_path / "export")
+    log_call(db, INCOME_URL, INCOME_RESPONSE)
+    log_call(db, PRICES_URL, PRICES_RESPONSE)
+    export_new_responses(db, export_dir)
+
+    table = read_dataset("price_history", symbols=["msft"], years=[2022], columns=["date", "close"], export_dir=export_dir)
+    assert table.column_names == ["symbol", "year", "date", "close"]
+    assert table.to_pylist() == [{"symbol": "MSFT", "year": 2022, "date": date(2022, 12, 30), "close": 239.82}]
+    assert read_dataset("income_statement", symbols=["MSFT"], export_dir=export_dir).num_rows == 0
+    assert read_dataset("ratios", export_dir=export_dir).num_rows == 0
+    with pytest.raises(ValueError):
+        read_dataset("dividends", export_dir=export_dir)
+
+
+def test_log_api_call_exports_fundamentals(db, tmp_path, monkeypatch):
+    """Test that the routes export the fundamentals after logging a call."""
+    db_name = db.connector.execute("PRAGMA database_list").fetchone()[2]
+    export_dir = str(tmp_path / "export")
+    monkeypatch.setattr(database.routes, "get_db", lambda: DB(sqlite3, db_name))
+    monkeypatch.setattr(database.routes, "COLUMNAR_EXPORT_DIR", export_dir)
+
+    response = TestClient(app).post("/log_api_call", json={"url": INCOME_URL, "params": {}, "response": INCOME_RESPONSE})
+    assert response.status_code == 200
+    assert read_dataset("income_statement", years=[2023], export_dir=export_dir).num_rows == 1
@@ -0,0 +1,105 @@
+"""
+test_competition_jobs.py
+This module contains the unit tests for the background competition jobs:
+the discussions run on worker threads, their messages are stored in the run store as they arrive,
+and the runs queue when every worker is busy.
+The discussions are mocked, and each test uses a temporary database file.
+"""
+import threading
+import pytest
+from group_chats import competition
+from group_chats.competition import CompetitionJobs
+from finance.point_in_time import RunContext
+from database import run_store
+from database.run_store import JUDGES_HOUSE_ID, RunStore
+
+
+@pytest.fixture
+def store(tmp_path, monkeypatch):
+    """Fixture to create a run store in a temporary database, and mock the agents of the discussions."""
+    store = RunStore(str(tmp_path / "runs.db"))
+    monkeypatch.setattr(run_store, "get_run_store", lambda: store)
+    # The mocked agents are the run id and the context their tools are bound to
+    monkeypatch.setattr(competition, "InitAgents", lambda context: context)
+    monkeypatch.setattr(competition, "InitJudgeAgent", lambda run_id, context: (run_id, context))
+    return store
+
+
+def mock_discussions(monkeypatch, house_started=None, release=None):
+    """Mocks the discussions of the houses and of the judges; they pass their messages to on_message."""
+    bound_agents = []
+
+    async def house_discussion(init_agents, stocks, budget, name, start_year, on_message=None):
+        bound_agents.append(init_agents)
+        if house_started:
+            house_started.set()
+        if release:
+            release.wait(5)
+        on_message({"role": "user", "content": f"Analyze {stocks}"})
+        on_message({"role": "Liquidity_Analyst", "content": f"{name}: Allocation: 20%"})
+        on_message({"role": "Manager", "content": "TaskResult(messages=[...])"})
+        return {"summary": f"{name} invests 20%"}
+
+    async def judges_discussion(init_judges, stocks, budget, names, start_year, end_year, summary, on_message=None):
+        bound_agents.append(init_judges)
+        on_message({"role": "Judge_Manager", "content": f"Verdict on: {summary}"})
+        return {"summary": "House 1 wins"}
+
+    monkeypatch.setattr(competition, "init_investment_house_discussion", house_discussion)
+    monkeypatch.setattr(competition, "init_judges_discussion", judges_discussion)
+    return bound_agents
+
+
+def test_competition_job_stores_messages(store, monkeypatch):
+    """Test that a job runs both houses and the judges in the background, and stores their messages under its run id."""
+    bound_agents = mock_discussions(monkeypatch)
+    jobs = CompetitionJobs(max_workers=1)
+    run_id = jobs.submit(["aapl", " MSFT", ""], 100000, 2022, 2024)
+
+    assert jobs.wait(run_id, timeout=5) == "completed"
+    assert not jobs.is_active(run_id)
+    run = store.get_run(run_id)
+    assert run["status"] == "completed" and run["stocks"] == "AAPL,MSFT" and run["finished_at"]
+
+    house1 = store.get_messages(run_id, house_id=1)
+    assert [msg["content"] for msg in house1] == ["Analyze ['AAPL', 'MSFT']", "Investment House 1: Allocation: 20%"]
+    judges = store.get_messages(run_id, house_id=JUDGES_HOUSE_ID)
+    assert judges[0]["content"] == "Verdict on: Investment House 1 invests 20%\n\nInvestment House 2 invests 20%"
+    # The tools are bound to the job's run and years: the judges read the discussions of this run, not of the latest one
+    context = RunContext.for_years(2022, 2024)
+    assert bound_agents == [context, context, (run_id, context)]
+    jobs.shutdown()
+
+
+def test_runs_queue_for_a_worker(store, monkeypatch):
+    """Test that a run waits as queued while the only worker is busy, and its messages are readable while it runs."""
+    house_started, release = threading.Event(), threading.Event()
+    mock_discussions(monkeypatch, house_started, release)
+    jobs = CompetitionJobs(max_workers=1)
+    first = jobs.submit(["AAPL"], 100000, 2022, 2024)
+    second = jobs.submit(["MSFT"], 100000, 2022, 2024)
+
+    assert house_started.wait(5)
+    assert store.get_run(first)["status"] == "running"
+    assert store.get_run(second)["status"] == "queued" and jobs.is_active(second)
+
+    release.set()
+    assert jobs.wait(first, timeout=5) == "completed" and jobs.wait(second, timeout=5) == "completed"
+    jobs.shutdown()
+
+
+def test_failed_competition(store, monkeypatch):
+    """Test that a failing discussion marks the run as failed and keeps the messages stored before the error."""
+    async def failing_discussion(init_agents, stocks, budget, name, start_year, on_message=None):
+        on_message({"role": "Liquidity_Analyst", "content": "The quick ratio is 1.2"})
+        raise RuntimeError("OpenAI API error")
+
+    monkeypatch.setattr(competition, "init_investment_house_discussion", failing_discussion)
+    jobs = CompetitionJobs(max_workers=1)
+    run_id = jobs.submit(["AAPL"], 100000, 2022, 2024)
+
+    assert jobs.wait(run_id, timeout=5) == "failed"
+    assert store.get_run(run_id)["status"] == "failed"
+    assert [msg["content"] for msg in store.get_messages(run_id)] == ["The quick ratio is 1.2"]
+    assert jobs.wait("unknown") is None
+    jobs.shutdown()
@@ -0,0 +1,90 @@
+"""
+test_consensus.py
+This module contains the unit tests for the allocation extractor and the consensus termination condition.
+"""
+import pytest
+from autogen_agentchat.messages import TextMessage
+from group_chats.consensus import ALL_STOCKS, ConsensusTermination, extract_allocations
+
+AGENTS = ["Liquidity_Analyst", "Historical_Analyst", "Solid_Analyst"]
+
+
+def test_extract_allocation_ignores_metrics():
+    """Test that percentages of metrics are ignored and the allocation line is parsed."""
+    text = "**Analysis:** The gross margin grew to 43.3% in 2022.\n**Allocation:** 15% of the budget."
+    assert extract_allocations(text, ["AAPL"]) == {"AAPL": 15.0}
+
+
+def test_extract_allocation_under_header():
+    """Test that the percentages listed under an allocation header are assigned to their stocks."""
+    text = "**Final Allocation**\n- AAPL: 20%\n- MSFT: 10%\n\nThe margin is 30%."
+    assert extract_allocations(text, ["AAPL", "MSFT"]) == {"AAPL": 20.0, "MSFT": 10.0}
+
+
+def test_extract_allocation_last_statement_wins():
+    """Test that an agent changing its mind within a message keeps the last allocation."""
+    text = "I first suggested allocating 30% of the budget.\nAfter the debate, my final recommendation is 20%."
+    assert extract_allocations(text, ["AAPL"]) == {"AAPL": 20.0}
+
+
+def test_extract_allocation_ranges_and_unnamed():
+    """Test that ranges are not decisions, and unnamed allocations of several stocks use the ALL key."""
+    assert extract_allocations("I suggest a compromise allocation of 10%-20%.", ["AAPL"]) == {}
+    assert extract_allocations("Allocation: 12%", ["AAPL", "MSFT"]) == {ALL_STOCKS: 12.0}
+
+
+def test_extract_allocation_requires_allocation_wording():
+    """Test that metrics on lines that recommend or invest are not votes, only percentages stated as allocations."""
+    text = "I recommend AAPL, whose net margin is 25%.\nWe should invest: the operating margin rose to 30%."
+    assert extract_allocations(text, ["AAPL"]) == {}
+    text = "I recommend investing, the margin is 30%, with an allocation of 15% of the budget."
+    assert extract_allocations(text, ["AAPL"]) == {"AAPL": 15.0}
+
+
+def test_extract_allocation_ignores_limits():
+    """Test that a limit on the allocation is not a vote, only the recommended percentage."""
+    text = "The budget allocation should not exceed 30%. I recommend 15%."
+    assert extract_allocations(text, ["AAPL"]) == {"AAPL": 15.0}
+    assert extract_allocations("I would allocate at most 25% of the budget.", ["AAPL"]) == {}
+    assert extract_allocations("We recommend a buy given the operating margin of 30%.", ["AAPL"]) == {}
+
+
+def test_extract_allocation_several_symbols_on_a_line():
+    """Test that a line allocating several stocks gives one vote per stock."""
+    expected = {"AAPL": 20.0, "MSFT": 10.0}
+    assert extract_allocations("I allocate 20% of the budget to AAPL and 10% to MSFT.", ["AAPL", "MSFT"]) == expected
+    assert extract_allocations("Final allocation: AAPL 20%, MSFT: 10%.", ["AAPL", "MSFT"]) == expected
+    assert extract_allocations("Final allocation: AAPL 20%, MSFT's margin is 30%.", ["AAPL", "MSFT"]) == {"AAPL": 20.0}
+
+
+@pytest.mark.asyncio
+async def test_consensus_terminates_when_all_agree():
+    """Test that the condition stops only when every required agent recommends the same allocation."""
+    condition = ConsensusTermination(AGENTS, symbols=["AAPL"])
+    assert await condition([TextMessage(source="Liquidity_Analyst", content="Allocation: 20%"),
+                            TextMessage(source="Historical_Analyst", content="Allocation: 20%")]) is None
+    assert await condition([TextMessage(source="Solid_Analyst", content="Allocation: 10%")]) is None
+
+    stop = await condition([TextMessage(source="Solid_Analyst", content="I agree, final allocation: 20%")])
+    assert stop is not None and stop.content == "Consensus reached: AAPL: 20%"
+    assert condition.terminated
+
+
+@pytest.mark.asyncio
+async def test_consensus_ignores_other_agents_and_resets():
+    """Test that agents outside the required list don't count, and reset clears the allocations."""
+    condition = ConsensusTermination(AGENTS[:1], symbols=["AAPL"])
+    assert await condition([TextMessage(source="Manager", content="Allocation: 20%")]) is None
+    assert await condition([TextMessage(source="Liquidity_Analyst", content="Allocation: 20%")]) is not None
+
+    await condition.reset()
+    assert not condition.terminated and condition.allocations == {}
+
+
+@pytest.mark.asyncio
+async def test_consensus_tolerance():
+    """Test that allocations within the tolerance are considered equal."""
+    condition = ConsensusTermination(AGENTS[:2], symbols=["AAPL"], tolerance=1)
+    stop = await condition([TextMessage(source="Liquidity_Analyst", content="Allocation: 20%"),
+                            TextMessage(source="Historical_Analyst", content="Allocation: 20.5%")])
+    assert stop is not None
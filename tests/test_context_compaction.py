@@ -0,0 +1,81 @@
+"""
+test_context_compaction.py
+This module contains the unit tests for the compacting model context of the group chat.
+It checks that the task and the recent turns are kept verbatim, that older turns are summarized,
+that tool calls stay next to their results, and that the token budget is respected.
+"""
+import pytest
+from autogen_core import FunctionCall
+from autogen_core.models import AssistantMessage, FunctionExecutionResult, FunctionExecutionResultMessage, UserMessage
+from group_chats.context_compaction import (SUMMARY_SOURCE, CompactingChatCompletionContext, context_for_agent,
+                                            count_message_tokens, summarize_message)
+
+
+def turn(index: int, length: int = 50) -> UserMessage:
+    """Returns a chat message of another agent."""
+    return UserMessage(content=f"message {index} " + "word " * length, source=f"Agent_{index}")
+
+
+async def filled_context(messages, **kwargs) -> CompactingChatCompletionContext:
+    context = CompactingChatCompletionContext(**kwargs)
+    for message in messages:
+        await context.add_message(message)
+    return context
+
+
+@pytest.mark.asyncio
+async def test_short_history_is_unchanged():
+    """Test that a history within the window and the budget is returned as is."""
+    messages = [turn(i) for i in range(4)]
+    context = await filled_context(messages, recent_messages=8)
+    assert await context.get_messages() == messages
+
+
+@pytest.mark.asyncio
+async def test_older_turns_are_summarized():
+    """Test that the task and the recent turns are verbatim and the older turns become one summary message."""
+    messages = [UserMessage(content="Analyze AAPL", source="user")] + [turn(i) for i in range(1, 21)]
+    context = await filled_context(messages, recent_messages=4, token_budget=100000)
+    result = await context.get_messages()
+
+    assert result[0] == messages[0]
+    assert result[1].source == SUMMARY_SOURCE
+    assert result[1].content.count("\n- Agent_") == 16
+    assert result[2:] == messages[-4:]
+
+
+@pytest.mark.asyncio
+async def test_tool_result_keeps_its_call():
+    """Test that the recent window never starts with a tool result separated from its call."""
+    call = AssistantMessage(content=[FunctionCall(id="1", name="historical_func", arguments="{}")], source="Historical")
+    tool_result = FunctionExecutionResultMessage(content=[FunctionExecutionResult(content="x " * 500, call_id="1", name="historical_func")])
+    messages = [UserMessage(content="task", source="user")] + [turn(i) for i in range(1, 6)] + [call, tool_result, turn(6), turn(7)]
+    context = await filled_context(messages, recent_messages=3, token_budget=100000)
+    result = await context.get_messages()
+
+    assert result[2] == call and result[3] == tool_result
+
+
+@pytest.mark.asyncio
+async def test_token_budget_is_respected():
+    """Test that the verbatim window and the summary shrink until the messages fit the budget."""
+    messages = [UserMessage(content="task", source="user")] + [turn(i, length=200) for i in range(1, 30)]
+    context = await filled_context(messages, recent_messages=8, token_budget=600)
+    result = await context.get_messages()
+
+    assert count_message_tokens(result) <= 600
+    assert result[-1] == messages[-1]
+    assert "earlier messages omitted" in result[1].content
+
+
+def test_summarize_message_truncates():
+    """Test that a summary line is limited to the configured number of characters."""
+    line = summarize_message(turn(1, length=500), max_chars=40)
+    assert line.startswith("- Agent_1: message 1 word")
+    assert line.endswith(" ...") and len(line) < 60
+
+
+def test_context_for_agent_budget():
+    """Test that the agents get their configured token budget, and others the default."""
+    assert context_for_agent("Manager").token_budget == 10000
+    assert context_for_agent("Unknown_Agent").token_budget == 6000
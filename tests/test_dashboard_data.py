@@ -0,0 +1,126 @@
+"""
+test_dashboard_data.py
+This module contains the unit tests for the data of the dashboard page:
+the compact metric and price arrays, the tables the Streamlit charts are drawn from,
+and the data version that invalidates the cached entries of a ticker.
+The cached requests of the finance modules are mocked.
+"""
+import json
+import sqlite3
+import numpy as np
+import pytest
+from unittest.mock import Mock, patch
+from database.db import DB
+from database.init_db import init_db
+from utils import chart_service, dashboard_data
+
+# symbol: (revenue, operating income, net income, P/E) of 2022
+FUNDAMENTALS = {
+    "AAPL": (1000, 300, 250, 20),
+    "MSFT": (1000, 400, 300, 30),
+    "GOOGL": (1000, 250, 200, 18),
+}
+PRICES = [
+    {"date": "2023-01-03", "close": 125.0},
+    {"date": "2022-12-30", "close": 130.0},
+    {"date": "2022-01-03", "close": 182.0},
+    {"date": "2021-12-31", "close": 177.5},
+    {"date": "2022-06-01", "close": None},
+]
+
+
+def fake_response(url, **kwargs):
+    """Returns the mocked API response of the given endpoint and symbol."""
+    symbol = url.rstrip("/").split("/")[-1]
+    if "related-companies" in url:
+        return json.dumps({"results": [{"ticker": ticker} for ticker in FUNDAMENTALS]})
+    if "historical-price-full" in url:
+        return json.dumps({"symbol": symbol, "historical": PRICES if symbol == "AAPL" else []})
+    if symbol not in FUNDAMENTALS:
+        return "[]"
+    revenue, operating_income, net_income, pe = FUNDAMENTALS[symbol]
+    if "historical-market-capitalization" in url:
+        return json.dumps([{"marketCap": 6000}])
+    if "income-statement" in url:
+        return json.dumps([{"calendarYear": "2022", "revenue": revenue, "grossProfit": revenue / 2,
+                            "operatingIncome": operating_income, "netIncome": net_income}])
+    if "ratios" in url:
+        return json.dumps([{"calendarYear": "2022", "priceEarningsRatio": pe}])
+    return "{}"
+
+
+@pytest.fixture
+def mock_cache():
+    """Fixture to mock the cached requests of the finance modules."""
+    mock = Mock(side_effect=fake_response)
+    modules = ["finance.profit_margin", "finance.profit_multipliers", "finance.LLM_get_financial", "finance.judge_profit"]
+    patches = [patch(f"{module}.cached_api_request", mock) for module in modules]
+    for p in patches:
+        p.start()
+    yield mock
+    for p in patches:
+        p.stop()
+
+
+def test_metrics_tables(mock_cache):
+    """Test that the metrics are float32 (symbols, years) arrays and the tables of a year and a metric are shaped from them."""
+    symbols, years = ["AAPL", "MSFT", "TSLA"], [2021, 2022]
+    metrics = dashboard_data.load_metrics(symbols, years)
+    assert set(metrics) == set(dashboard_data.METRIC_LABELS)
+    assert all(values.shape == (3, 2) and values.dtype == np.float32 for values in metrics.values())
+
+    table = dashboard_data.metrics_frame(metrics, symbols, years, 2022)
+    assert list(table.index) == symbols
+    assert table.loc["MSFT", "Operating margin (%)"] == pytest.approx(40.0)
+    assert table.loc["AAPL", "P/E"] == pytest.approx(20.0)
+    assert np.isnan(table.loc["TSLA", "Net margin (%)"])
+
+    history = dashboard_data.metric_history_frame(metrics, "net_margin", symbols, years)
+    assert list(history.index) == ["2021", "2022"] and list(history.columns) == symbols
+    assert np.isnan(history.loc["2021", "AAPL"]) and history.loc["2022", "AAPL"] == pytest.approx(25.0)
+
+
+def test_load_peer_group(mock_cache):
+    """Test that the peer group leaves out the symbol itself and has its medians and percentiles per year."""
+    peer_group = dashboard_data.load_peer_group("AAPL", [2022])
+    assert peer_group["peers"] == ["MSFT", "GOOGL"]
+    assert list(peer_group["metrics"].index) == [("AAPL", "2022"), ("MSFT", "2022"), ("GOOGL", "2022")]
+    assert peer_group["medians"].loc["2022", "Operating margin (%)"] == pytest.approx(32.5)
+    assert peer_group["percentiles"].loc["2022", "Operating margin (%)"] == pytest.approx(50.0)
+
+
+def test_load_peer_group_without_peers(mock_cache):
+    """Test that a symbol without related companies has no peer group."""
+    mock_cache.side_effect = lambda url, **kwargs: json.dumps({"results": []}) if "related-companies" in url else "[]"
+    assert dashboard_data.load_peer_group("AAPL", [2022]) is None
+
+
+def test_price_history(mock_cache):
+    """Test that the prices are filtered by year, sorted by date, and rebased to 100 at their first date."""
+    history = dashboard_data.load_price_history("AAPL", 2022, 2022)
+    assert history["date"].dtype == np.dtype("datetime64[D]") and history["close"].dtype == np.float32
+    assert [str(date) for date in history["date"]] == ["2022-01-03", "2022-12-30"]
+    assert dashboard_data.load_price_history("MSFT", 2022, 2022) is None
+    assert dashboard_data.load_price_history("AAPL", 2019, 2020) is None
+
+    prices = {"AAPL": history, "MSFT": {"date": history["date"], "close": np.array([250.0, 200.0], dtype=np.float32)}}
+    rebased = dashboard_data.price_frame(prices)
+    assert list(rebased.columns) == ["AAPL", "MSFT"]
+    assert rebased["AAPL"].iloc[0] == pytest.approx(100.0) and rebased["MSFT"].iloc[1] == pytest.approx(80.0)
+    assert dashboard_data.price_frame(prices, rebase=False)["AAPL"].iloc[1] == pytest.approx(130.0)
+
+
+def test_data_version_changes_with_new_responses(tmp_path, monkeypatch):
+    """Test that a new cached response of a ticker changes its data version only."""
+    db_name = str(tmp_path / "cache.db")
+    init_db(db_name)
+    monkeypatch.setattr(chart_service, "get_chart_service", lambda: chart_service.ChartService(str(tmp_path / "charts"), db_name))
+
+    before = dashboard_data.data_version(["AAPL"]), dashboard_data.data_version(["MSFT"])
+    db = DB(sqlite3, db_name)
+    db.execute("INSERT INTO API_calls (params, url, response) VALUES (?, ?, ?)",
+               ("{}", "https://financialmodelingprep.com/api/v3/income-statement/AAPL", "[]"))
+    db.commit()
+    db.close()
+    assert dashboard_data.data_version(["AAPL"]) != before[0]
+    assert dashboard_data.data_version(["MSFT"]) == before[1]
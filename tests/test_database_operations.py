@@ -8,6 +8,7 @@ Covered Tests:
 3. FastAPI Endpoints:
    - `/log_api_call`: Tests logging API calls with valid and invalid data.
    - `/get_api_call`: Checks retrieval of logged API calls.
+   - `/acquire_api_lock`, `/release_api_lock`: Checks the lock rows used to coalesce requests across processes.
 4. Error Handling:
    - Missing fields in requests.
    - Large payload handling.
@@ -185,6 +186,47 @@ def test_process_event_large_payload():
     assert response.status_code == 200
 
 
+@pytest.fixture
+def test_locks_table():
+    """
+    Pytest fixture to create an empty API_locks table in the test database.
+    """
+    db = get_test_db()
+    TableMethods(db).create_table("API_locks", {
+        "key": "TEXT PRIMARY KEY",
+        "owner": "TEXT NOT NULL",
+        "expires_at": "REAL NOT NULL"
+    })
+    db.execute("DELETE FROM API_locks")
+    db.commit()
+    yield
+    db.close()
+
+
+def test_acquire_api_lock_single_owner(test_locks_table):
+    """
+    Test that only one owner can hold the lock row of a request until it is released.
+    """
+    first = client.post("/acquire_api_lock", json={"key": "request-key", "owner": "process-1"})
+    second = client.post("/acquire_api_lock", json={"key": "request-key", "owner": "process-2"})
+    assert first.json()["acquired"] is True
+    assert second.json()["acquired"] is False
+
+    released = client.post("/release_api_lock", json={"key": "request-key", "owner": "process-1"})
+    assert released.json()["released"] is True
+    third = client.post("/acquire_api_lock", json={"key": "request-key", "owner": "process-2"})
+    assert third.json()["acquired"] is True
+
+
+def test_acquire_api_lock_expired(test_locks_table):
+    """
+    Test that an expired lock row can be taken by another owner.
+    """
+    client.post("/acquire_api_lock", json={"key": "request-key", "owner": "process-1", "ttl_seconds": -1})
+    response = client.post("/acquire_api_lock", json={"key": "request-key", "owner": "process-2"})
+    assert response.json()["acquired"] is True
+
+
 def pytest_sessionfinish(session, exitstatus):
     """
     Remove the temporary database file after all tests have completed.
@@ -0,0 +1,78 @@
+"""
+test_decision_record.py
+This module contains the unit tests for the structured decision record of an investment house.
+"""
+from group_chats.decision_record import DecisionRecord, rationale_excerpt
+
+VOTERS = ["Liquidity_Analyst", "Solid_Analyst"]
+
+
+def record() -> DecisionRecord:
+    return DecisionRecord(house="Investment House 1", symbols=["AAPL"], budget=100000, voters=VOTERS, manager="Manager")
+
+
+def test_rationale_excerpt():
+    """Test that the excerpt is the sentence with the reasoning, without markdown."""
+    text = "**Analysis:** Liquidity is strong. I recommend buying because the quick ratio is 1.2. **Allocation:** 20%"
+    assert rationale_excerpt(text) == "I recommend buying because the quick ratio is 1.2."
+    assert rationale_excerpt("x" * 50 + " " + "y" * 300, max_chars=60).endswith(" ...")
+
+
+def test_votes_keep_latest_allocation():
+    """Test that each voter's latest allocation is kept, and messages of other agents are only counted."""
+    decision = record()
+    decision.update("Liquidity_Analyst", "I recommend buying. Allocation: 30%")
+    decision.update("Google_Search_Analyst", "Search results: revenue grew 8%.")
+    decision.update("Liquidity_Analyst", "After the debate I lower my allocation to 20%")
+
+    assert decision.votes["Liquidity_Analyst"].allocations == {"AAPL": 20.0}
+    assert decision.votes["Liquidity_Analyst"].turn == 3
+    assert "Google_Search_Analyst" not in decision.votes
+    assert decision.message_count == 3
+
+
+def test_consensus_and_rendering():
+    """Test the final allocation of a consensus and its text rendering for the judges."""
+    decision = record()
+    decision.update("Liquidity_Analyst", "Allocation: 20%")
+    decision.update("Solid_Analyst", "I agree with the allocation of 20%")
+    decision.update("Manager", "All agents agree on 20%. TERMINATE")
+    decision.stop_reason = "Consensus reached: AAPL: 20%"
+
+    assert decision.is_consensus()
+    assert decision.final_allocations() == {"AAPL": 20.0}
+    text = str(decision)
+    assert "Final allocation: AAPL 20% ($20,000.00) - consensus of all key agents" in text
+    assert "- Solid_Analyst: AAPL 20% - I agree with the allocation of 20%" in text
+    assert text.endswith("Stopped: Consensus reached: AAPL: 20%")
+
+
+def test_no_consensus_uses_median():
+    """Test that without consensus the final allocation is the median of the latest votes."""
+    decision = DecisionRecord("House", ["AAPL"], 1000, voters=VOTERS + ["Pro_Investment_Analyst"])
+    decision.update("Liquidity_Analyst", "Allocation: 10%")
+    decision.update("Solid_Analyst", "Allocation: 0%")
+    decision.update("Pro_Investment_Analyst", "Allocation: 40%")
+
+    assert not decision.is_consensus()
+    assert decision.final_allocations() == {"AAPL": 10.0}
+    assert decision.to_dict()["consensus"] is False
+
+
+def test_consensus_within_tolerance():
+    """Test that the record agrees with ConsensusTermination: votes within its tolerance are a consensus."""
+    decision = DecisionRecord("House", ["AAPL"], 1000, voters=VOTERS, tolerance=1)
+    decision.update("Liquidity_Analyst", "Allocation: 20%")
+    decision.update("Solid_Analyst", "Allocation: 20.5%")
+    assert decision.is_consensus()
+    assert decision.final_allocations() == {"AAPL": 20.0}
+
+    decision.tolerance = 0
+    assert not decision.is_consensus()
+
+
+def test_missing_votes():
+    """Test the rendering when no allocation was given."""
+    text = str(record())
+    assert "Final allocation: no allocation was given" in text
+    assert "- Liquidity_Analyst: no allocation" in text
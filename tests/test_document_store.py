@@ -0,0 +1,104 @@
+"""
+test_document_store.py
+This module contains the unit tests for the full-text store of news articles and business descriptions,
+filled from the cached API responses as they are logged, and for the agents' offline news search.
+Each test uses a temporary database file.
+"""
+import json
+import sqlite3
+import pytest
+from fastapi.testclient import TestClient
+import database.routes
+from database.db import DB
+from database.document_store import KIND_DESCRIPTION, KIND_NEWS, DocumentStore, classify_url, extract_documents
+from database.routes import app
+from finance import LLM_get_qualitative
+from finance.point_in_time import RunContext
+
+NEWS_URL = "https://api.polygon.io/v2/reference/news?published_utc=2022&apiKey=secret"
+DETAILS_URL = "https://api.polygon.io/v3/reference/tickers/AAPL?apiKey=secret"
+
+NEWS_RESPONSE = json.dumps({"results": [
+    {
+        "id": "a1",
+        "title": "Apple faces supply chain problems in China",
+        "description": "Factory shutdowns delay iPhone shipments.",
+        "published_utc": "2022-11-06T12:00:00Z",
+        "publisher": {"name": "Reuters"},
+        "article_url": "https://example.com/a1",
+        "tickers": ["AAPL", "FOXCY"],
+    },
+    {
+        "id": "a2",
+        "title": "Apple settles lawsuit",
+        "description": "The lawsuit over batteries is settled.",
+        "published_utc": "2023-03-01T09:00:00Z",
+        "publisher": {"name": "Bloomberg"},
+        "article_url": "https://example.com/a2",
+        "tickers": ["AAPL"],
+    },
+]})
+DETAILS_RESPONSE = json.dumps({"results": {
+    "ticker": "AAPL", "name": "Apple Inc.", "description": "Apple designs smartphones and wearables.", "list_date": "1980-12-12"
+}})
+
+
+@pytest.fixture
+def store(tmp_path):
+    """Fixture to create a document store in a temporary database."""
+    return DocumentStore(str(tmp_path / "documents.db"))
+
+
+def test_classify_url():
+    """Test that only the Polygon news and ticker-details endpoints hold documents."""
+    assert classify_url(NEWS_URL) == KIND_NEWS
+    assert classify_url(DETAILS_URL) == KIND_DESCRIPTION
+    assert classify_url("https://api.polygon.io/vX/reference/financials?ticker=AAPL") is None
+    assert classify_url("https://financialmodelingprep.com/api/v3/profile/AAPL") is None
+
+
+def test_extract_documents():
+    """Test that articles are split per ticker and descriptions are keyed by ticker."""
+    news = extract_documents(NEWS_URL, {"ticker": "AAPL", "limit": 2}, NEWS_RESPONSE)
+    assert [(doc["doc_key"], doc["ticker"]) for doc in news] == [("a1", "AAPL"), ("a1", "FOXCY"), ("a2", "AAPL")]
+    assert news[0]["source"] == "Reuters" and news[0]["published"] == "2022-11-06T12:00:00Z"
+
+    description, = extract_documents(DETAILS_URL, {}, DETAILS_RESPONSE)
+    assert (description["ticker"], description["title"]) == ("AAPL", "Apple Inc.")
+    assert extract_documents(NEWS_URL, {}, "not json") == []
+    assert extract_documents(DETAILS_URL, {}, json.dumps({"status": "NOT_FOUND"})) == []
+
+
+def test_log_api_call_indexes_documents(store, monkeypatch):
+    """Test that logging a cached response indexes its documents once, searchable by ticker and date."""
+    monkeypatch.setattr(database.routes, "get_db", lambda: DB(sqlite3, store.db_name))
+    client = TestClient(app)
+    for _ in range(2):
+        response = client.post("/log_api_call", json={"url": NEWS_URL, "params": {"ticker": "AAPL"}, "response": NEWS_RESPONSE})
+        assert response.status_code == 200
+    client.post("/log_api_call", json={"url": DETAILS_URL, "params": {}, "response": DETAILS_RESPONSE})
+    assert store.count() == 4 and store.count("foxcy") == 1
+
+    results = store.search("supply chain", ticker="AAPL")
+    assert [doc["title"] for doc in results] == ["Apple faces supply chain problems in China"]
+    assert store.search("lawsuit", published_before="2022-12-31") == []
+    assert store.search("lawsuit")[0]["source"] == "Bloomberg"
+    assert store.search("smartphones", kind=KIND_DESCRIPTION, published_before="2022-12-31")[0]["ticker"] == "AAPL"
+
+
+def test_backfill_and_news_tool(store, monkeypatch):
+    """Test that responses cached before the store existed are indexed, and the agents' tool searches up to the start year."""
+    db = DB(sqlite3, store.db_name)
+    db.execute("INSERT INTO API_calls (params, url, response) VALUES (?, ?, ?)", (json.dumps({"ticker": "AAPL"}), NEWS_URL, NEWS_RESPONSE))
+    db.commit()
+    db.close()
+    assert store.backfill() == 3
+    assert store.backfill() == 0
+
+    monkeypatch.setattr("database.document_store.get_document_store", lambda: store)
+    context = RunContext(2022, 2024)
+    result = LLM_get_qualitative.search_company_news(context, "iPhone shipments", "AAPL")
+    assert result.startswith("- 2022-11-06 AAPL Apple faces supply chain problems in China (Reuters): ")
+    assert LLM_get_qualitative.search_company_news(context, "lawsuit") == "No archived news found for 'lawsuit'."
+    # The articles published after the start year of the run are left out
+    assert LLM_get_qualitative.search_company_news(RunContext(2021, 2024), "iPhone shipments", "AAPL") == "No archived news found for 'iPhone shipments'."
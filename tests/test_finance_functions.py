@@ -5,20 +5,35 @@ validate financial functions.
 It ensures that functions analyzing financial and qualitative data work correctly by
 mocking external dependencies to provide controlled test conditions.
 """
+import asyncio
 import json
 import pytest
-from finance.agents_functions import historical_func, competative_func, qualitative_func
+from finance.async_agents_functions import historical_func, competative_func, qualitative_func
+from finance.point_in_time import RunContext
+from finance.tool_results import CompetitiveResult, HistoricalResult, QualitativeResult
 from finance.profit_margin import calculate_profit_margins
-from finance.profit_multipliers import price_to_EBIT_ratio, ratios
+from finance.profit_multipliers import market_cap, price_to_EBIT_ratio, ratios
 from finance.LLM_get_financial import get_related_companies, quick_ratio
 from finance.LLM_get_qualitative import extract_business_info, get_company_data
+from database.snapshots import SnapshotStore
 from unittest.mock import Mock
 
+# The run of the agents' tools
+CONTEXT = RunContext(2022, 2023)
+
+
+@pytest.fixture(autouse=True)
+def snapshot_store(tmp_path, monkeypatch):
+    """Fixture to keep the point-in-time snapshots of the tests in a temporary database."""
+    store = SnapshotStore(str(tmp_path / "snapshots.db"))
+    monkeypatch.setattr("database.snapshots.get_snapshot_store", lambda: store)
+    return store
+
 
 @pytest.fixture
 def mock_requests_get(mocker):
-    """Fixture to mock requests.get"""
-    return mocker.patch('requests.get')
+    """Fixture to mock the GET requests of the shared HTTP client"""
+    return mocker.patch('database.http_client.HttpClient.get')
 
 
 @pytest.fixture
@@ -31,51 +46,49 @@ def test_historical_func():
     """Test the historical_func function with valid input data to ensure it returns the expected results.""" 
     symbols = ["AAPL", "GOOGL"]
     years = [2022, 2023]
-    result = historical_func(symbols, years)
-    assert isinstance(result, dict)
-    assert "AAPL" in result and "GOOGL" in result
-    assert all(year in result["AAPL"] for year in years)
-    assert all("profit_margins" in result["AAPL"][year] for year in years)
+    result = asyncio.run(historical_func(CONTEXT, symbols, years))
+    assert isinstance(result, HistoricalResult)
+    assert result.symbols() == ["AAPL", "GOOGL"]
+    assert all(result.row("AAPL", year) is not None for year in years)
+    assert "gross%" in str(result) or "No historical data" in str(result)
 
 
 def test_historical_func_empty():
-    """Test the historical_func function with empty input data to ensure it returns an empty dictionary."""
-    result = historical_func([], [])
-    assert result == {}
+    """Test the historical_func function with empty input data to ensure it returns an empty result."""
+    result = asyncio.run(historical_func(CONTEXT, [], []))
+    assert result == HistoricalResult()
 
 
 def test_competative_func():
     """Test the competative_func function with valid input data to ensure it returns the expected results."""
     symbol = "AAPL"
     years = [2022, 2023]
-    result = competative_func(symbol, years)
-    assert isinstance(result, dict)
-    assert "AAPL" in result
-    assert all(year in result["AAPL"] for year in years)
-    assert all("price_to_EBIT_ratio" in result["AAPL"][year] for year in years)
+    result = asyncio.run(competative_func(CONTEXT, symbol, years))
+    assert isinstance(result, CompetitiveResult)
+    assert "AAPL" in result.symbols()
+    assert all(result.row("AAPL", year) is not None for year in years)
 
 
 def test_competative_func_invalid():
     """Test the competative_func function with an invalid symbol to ensure it returns the expected results."""
-    result = competative_func("INVALID", [2022])
-    assert isinstance(result, dict)
-    assert "INVALID" in result
+    result = asyncio.run(competative_func(CONTEXT, "INVALID", [2022]))
+    assert isinstance(result, CompetitiveResult)
+    assert "INVALID" in result.symbols()
 
 
 def test_qualitative_func():
     """Test the qualitative_func function with valid input data to ensure it returns the expected results."""
     symbols = ["AAPL", "GOOGL"]
-    result = qualitative_func(symbols, 2022)
-    assert isinstance(result, dict)
-    assert "AAPL" in result and "GOOGL" in result
-    assert "business_info" in result["AAPL"]
-    assert "company_data" in result["AAPL"]
+    result = asyncio.run(qualitative_func(CONTEXT, symbols))
+    assert isinstance(result, QualitativeResult)
+    assert result.symbols() == ["AAPL", "GOOGL"]
+    assert str(result).startswith("AAPL: ")
 
 
 def test_qualitative_func_empty():
-    """Test the qualitative_func function with empty input data to ensure it returns an empty dictionary."""
-    result = qualitative_func([])
-    assert result == {}
+    """Test the qualitative_func function with empty input data to ensure it returns an empty result."""
+    result = asyncio.run(qualitative_func(CONTEXT, []))
+    assert result == QualitativeResult()
 
 
 def test_calculate_profit_margins_no_revenue(mock_fetch_income_statement):
@@ -118,6 +131,15 @@ def test_calculate_profit_margins_missing_fields(mock_fetch_income_statement):
     assert result == expected_result
 
 
+def test_market_cap(mocker):
+    """Test the market cap of a year, and None when the response has none"""
+    cached = mocker.patch("finance.profit_multipliers.cached_api_request", return_value=json.dumps([{"marketCap": 1000000000}]))
+    assert market_cap("GOOG", 2022) == 1000000000
+    assert cached.call_args.kwargs["params"]["from"] == "2022-01-01"
+    cached.return_value = json.dumps([])
+    assert market_cap("GOOG", 2022) is None
+
+
 def test_price_to_EBIT_ratio_no_market_cap(mock_requests_get):
     """Test when market capitalization data is unavailable"""
     mock_requests_get.side_effect = [
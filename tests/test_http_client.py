@@ -0,0 +1,106 @@
+"""
+test_http_client.py
+This module contains the unit tests for the shared HTTP client.
+It checks the per-host session pooling, the timeouts, and the retries on 429/5xx responses
+and connection errors. Sessions are mocked so no request reaches the network.
+"""
+import pytest
+import requests
+from unittest.mock import Mock, patch
+from database.http_client import OTHER_HOSTS_MAX_SESSIONS, HttpClient
+
+
+def make_response(status_code, headers=None):
+    return Mock(status_code=status_code, headers=headers or {})
+
+
+@pytest.fixture
+def mock_sleep():
+    """Fixture to skip the backoff delays."""
+    with patch("database.http_client.time.sleep") as mock_sleep:
+        yield mock_sleep
+
+
+def test_session_per_host():
+    """Test that requests to the same host share a session and other hosts get their own."""
+    client = HttpClient()
+    fmp = client.session("https://financialmodelingprep.com/api/v3/ratios/AAPL")
+    assert fmp is client.session("https://financialmodelingprep.com/api/v3/income-statement/AAPL")
+    assert fmp is not client.session("https://api.polygon.io/v3/reference/tickers/AAPL")
+
+
+def test_other_hosts_sessions_are_bounded():
+    """Test that only the most recently used sessions of hosts other than the APIs are kept, and the API sessions stay."""
+    client = HttpClient()
+    fmp = client.session("https://financialmodelingprep.com/api/v3/ratios/AAPL")
+    first = client.session("https://site0.example.com/article")
+    for i in range(1, OTHER_HOSTS_MAX_SESSIONS + 5):
+        client.session(f"https://site{i}.example.com/article")
+    assert len(client._other_sessions) == OTHER_HOSTS_MAX_SESSIONS
+    assert first is not client.session("https://site0.example.com/article")
+    assert fmp is client.session("https://financialmodelingprep.com/api/v3/income-statement/AAPL")
+
+
+def test_request_uses_timeouts():
+    """Test that every request is sent with the configured connect and read timeouts."""
+    client = HttpClient(connect_timeout=2, read_timeout=7)
+    session = client.session("http://example.com")
+    with patch.object(session, "request", return_value=make_response(200)) as mock_request:
+        client.get("http://example.com/api", params={"a": 1})
+    mock_request.assert_called_once_with("GET", "http://example.com/api", timeout=(2, 7), params={"a": 1})
+
+
+def test_retry_on_server_error(mock_sleep):
+    """Test that 5xx responses are retried until a successful response."""
+    client = HttpClient(max_retries=3)
+    session = client.session("http://example.com")
+    with patch.object(session, "request", side_effect=[make_response(503), make_response(502), make_response(200)]) as mock_request:
+        response = client.get("http://example.com/api")
+    assert response.status_code == 200
+    assert mock_request.call_count == 3
+    assert mock_sleep.call_count == 2
+
+
+def test_retry_after_is_respected(mock_sleep):
+    """Test that the Retry-After header of a 429 response sets the backoff delay."""
+    client = HttpClient(max_retries=1)
+    session = client.session("http://example.com")
+    with patch.object(session, "request", side_effect=[make_response(429, {"Retry-After": "4"}), make_response(200)]):
+        client.get("http://example.com/api")
+    mock_sleep.assert_called_once_with(4.0)
+
+
+def test_retries_exhausted_returns_last_response(mock_sleep):
+    """Test that the last failed response is returned once the retries are exhausted."""
+    client = HttpClient(max_retries=2)
+    session = client.session("http://example.com")
+    with patch.object(session, "request", return_value=make_response(500)) as mock_request:
+        response = client.get("http://example.com/api")
+    assert response.status_code == 500
+    assert mock_request.call_count == 3
+
+
+def test_connection_error_raised_after_retries(mock_sleep):
+    """Test that connection errors are retried and re-raised when the retries are exhausted."""
+    client = HttpClient(max_retries=1)
+    session = client.session("http://example.com")
+    with patch.object(session, "request", side_effect=requests.exceptions.ConnectionError("refused")) as mock_request:
+        with pytest.raises(requests.exceptions.ConnectionError):
+            client.get("http://example.com/api")
+    assert mock_request.call_count == 2
+
+
+def test_no_retries_override(mock_sleep):
+    """Test that retries=0 sends a single request."""
+    client = HttpClient(max_retries=3)
+    session = client.session("http://example.com")
+    with patch.object(session, "request", return_value=make_response(503)) as mock_request:
+        client.post("http://example.com/log_api_call", json={}, retries=0)
+    mock_request.assert_called_once()
+
+
+def test_backoff_is_bounded():
+    """Test that the jittered backoff never exceeds the exponential bound or the maximum delay."""
+    client = HttpClient(backoff_base=1, backoff_max=5)
+    assert all(0 <= client.retry_delay(1) <= 2 for _ in range(20))
+    assert all(0 <= client.retry_delay(10) <= 5 for _ in range(20))
@@ -0,0 +1,128 @@
+"""
+test_job_service.py
+This module contains the unit tests for the job service of the competitions:
+the /jobs endpoints, the server-sent events of a job, the persistent queue of the runs table
+and the worker pool that claims and runs the queued competitions.
+The discussions are mocked, and each test uses a temporary database file.
+"""
+import json
+import threading
+import time
+import pytest
+from fastapi.testclient import TestClient
+from group_chats import competition
+from group_chats.competition_workers import CompetitionWorkerPool, work
+import database.routes
+from database import run_store
+from database.routes import app
+from database.run_store import JUDGES_HOUSE_ID, RunStore
+
+
+@pytest.fixture
+def store(tmp_path, monkeypatch):
+    """Fixture to create a run store in a temporary database, and mock the discussions of the competitions."""
+    store = RunStore(str(tmp_path / "runs.db"))
+    monkeypatch.setattr(run_store, "get_run_store", lambda: store)
+    monkeypatch.setattr(database.routes, "JOB_POLL_SECONDS", 0.05)
+
+    async def mock_competition(run_id, stocks, budget, start_year, end_year):
+        competition.message_saver(run_id, 1)({"role": "Liquidity_Analyst", "content": f"{','.join(stocks)}: Allocation: 20%"})
+        competition.message_saver(run_id, JUDGES_HOUSE_ID)({"role": "Judge_Manager", "content": "House 1 wins"})
+        return {"summary": "House 1 wins"}
+
+    monkeypatch.setattr(competition, "run_competition", mock_competition)
+    return store
+
+
+def parse_events(text: str) -> list:
+    """Returns the (id, event, data) of the server-sent events of a stream."""
+    events = []
+    for block in text.strip().split("\n\n"):
+        fields = dict(line.split(": ", 1) for line in block.split("\n"))
+        events.append((fields.get("id"), fields["event"], json.loads(fields["data"])))
+    return events
+
+
+def test_submit_and_get_job(store):
+    """Test that a submitted job is queued in the runs table, and its status is returned by id."""
+    client = TestClient(app)
+    response = client.post("/jobs", json={"stocks": ["aapl", " msft", ""], "budget": 50000, "start_year": 2022, "end_year": 2024})
+    assert response.status_code == 200
+    job_id = response.json()["data"]["job_id"]
+
+    job = client.get(f"/jobs/{job_id}").json()["data"]
+    assert job["status"] == "queued" and job["stocks"] == "AAPL,MSFT" and job["budget"] == 50000
+    assert [job["run_id"] for job in client.get("/jobs").json()["data"]] == [job_id]
+
+    assert client.get("/jobs/unknown").status_code == 404
+    assert client.get("/jobs/unknown/events").status_code == 404
+    assert client.post("/jobs", json={"stocks": [" "]}).status_code == 400
+    assert client.post("/jobs", json={"stocks": ["AAPL"], "start_year": 2024, "end_year": 2022}).status_code == 400
+
+
+def test_worker_runs_the_queue_in_order(store):
+    """Test that a worker claims the queued runs oldest first, runs them, and stops when asked."""
+    first = store.create_run(["AAPL"], status="queued")
+    second = store.create_run(["MSFT"], status="queued")
+    finished = store.create_run(["NVDA"])
+    store.finish_run(finished)
+
+    stop_event = threading.Event()
+    worker = threading.Thread(target=work, args=(stop_event, 0.01))
+    worker.start()
+    deadline = time.monotonic() + 5
+    while store.get_run(second)["status"] != "completed" and time.monotonic() < deadline:
+        time.sleep(0.01)
+    stop_event.set()
+    worker.join(5)
+
+    assert not worker.is_alive()
+    assert store.get_run(first)["finished_at"] <= store.get_run(second)["finished_at"]
+    assert [msg["content"] for msg in store.get_messages(second, house_id=1)] == ["MSFT: Allocation: 20%"]
+    assert store.claim_next_run() is None
+
+
+def test_a_run_is_claimed_once(store):
+    """Test that a queued run is claimed by one worker: the app's thread skips a run claimed by the job service."""
+    run_id = store.create_run(["AAPL"], status="queued")
+    assert store.claim_next_run()["run_id"] == run_id
+    assert not store.start_run(run_id)
+    assert competition.run_competition_job(run_id, ["AAPL"], 100000, 2022, 2024) == "running"
+    assert store.get_messages(run_id) == []
+
+
+def test_job_events(store):
+    """Test that the events of a job stream its messages as they are stored, and end with its final status."""
+    run_id = store.create_run(["AAPL"], status="queued")
+    client = TestClient(app)
+
+    def run_job():
+        time.sleep(0.2)
+        store.start_run(run_id)
+        competition.execute_run(run_id, ["AAPL"], 100000, 2022, 2024)
+
+    runner = threading.Thread(target=run_job)
+    runner.start()
+    with client.stream("GET", f"/jobs/{run_id}/events") as response:
+        assert response.headers["content-type"].startswith("text/event-stream")
+        events = parse_events(response.read().decode())
+    runner.join()
+
+    statuses = [data["status"] for _, event, data in events if event == "status"]
+    assert statuses[0] == "queued" and statuses[-1] == "completed"
+    messages = [(event_id, data["content"]) for event_id, event, data in events if event == "message"]
+    assert [content for _, content in messages] == ["AAPL: Allocation: 20%", "House 1 wins"]
+
+    # A reconnecting client resumes after the last message it received
+    with client.stream("GET", f"/jobs/{run_id}/events", headers={"Last-Event-ID": messages[0][0]}) as response:
+        events = parse_events(response.read().decode())
+    assert [(event, data.get("content", data.get("status"))) for _, event, data in events] == [("message", "House 1 wins"), ("status", "completed")]
+
+
+def test_worker_pool_processes(tmp_path):
+    """Test that the pool starts its worker processes on an empty queue and stops them without interrupting any run."""
+    pool = CompetitionWorkerPool(workers=2, db_name=str(tmp_path / "runs.db"), poll_seconds=0.05)
+    pool.start()
+    assert pool.alive() == 2
+    assert pool.stop(timeout=60) == []
+    assert pool.alive() == 0
@@ -7,6 +7,10 @@ import pytest
 import json
 from unittest.mock import patch
 from finance.judge_profit import judge_profit, get_historical_data, find_closest_price
+from finance.point_in_time import RunContext
+
+# The run judged by the tests: invested at the end of 2022, judged at the end of 2023
+CONTEXT = RunContext(2022, 2023)
 
 
 @pytest.fixture
@@ -85,7 +89,7 @@ def test_judge_profit_calculation(mock_get_historical_data, mock_historical_data
     mock_get_historical_data.return_value = mock_historical_data
     
     # Call the function with $10,000 investment
-    profit = judge_profit("GOOG", 10000)
+    profit = judge_profit(CONTEXT, "GOOG", 10000)
     
     # Calculate expected result manually:
     # $10,000 invested at $150 per share = 66 shares
@@ -96,6 +100,9 @@ def test_judge_profit_calculation(mock_get_historical_data, mock_historical_data
     # Assert the result is close to our expected value
     assert pytest.approx(profit, abs=0.01) == expected_profit
 
+    # The period is the one of the judged run: bought and valued at the end of 2023
+    assert pytest.approx(judge_profit(RunContext(2023, 2023), "GOOG", 10000), abs=0.01) == 0
+
 
 @patch('finance.judge_profit.get_historical_data')
 def test_judge_profit_uses_closest_date(mock_get_historical_data, mock_historical_data):
@@ -106,7 +113,7 @@ def test_judge_profit_uses_closest_date(mock_get_historical_data, mock_historica
     mock_get_historical_data.return_value = modified_data
     
     # Should not raise an error, should use closest date
-    result = judge_profit("GOOG", 10000)
+    result = judge_profit(CONTEXT, "GOOG", 10000)
     assert result is not None
 
 @patch('finance.judge_profit.get_historical_data')
@@ -117,7 +124,7 @@ def test_judge_profit_no_dates(mock_get_historical_data, mock_historical_data):
     mock_get_historical_data.return_value = modified_data
     
     with pytest.raises(ValueError, match="Could not retrieve stock prices"):
-        judge_profit("GOOOG", 10000)
+        judge_profit(CONTEXT, "GOOOG", 10000)
 
 
 @patch('finance.judge_profit.get_historical_data')
@@ -128,7 +135,7 @@ def test_judge_profit_no_historical_data(mock_get_historical_data):
     
     # Assert the function raises a ValueError
     with pytest.raises(ValueError, match="Could not retrieve historical data"):
-        judge_profit("GOOG", 10000)
+        judge_profit(CONTEXT, "GOOG", 10000)
 
 
 @patch('finance.judge_profit.get_historical_data')
@@ -143,7 +150,7 @@ def test_judge_profit_negative_return(mock_get_historical_data, mock_historical_
     mock_get_historical_data.return_value = modified_data
     
     # Call the function
-    profit = judge_profit("GOOG", 10000)
+    profit = judge_profit(CONTEXT, "GOOG", 10000)
     
     # Calculate expected result:
     # $10,000 invested at $150 per share = 66 shares
@@ -0,0 +1,99 @@
+"""
+test_metrics_batch.py
+This module contains the unit tests for the batch variants of the margin and multiple tools:
+the batch results are checked against the scalar tools on the same mocked API responses,
+including missing years and values, and the statements must be fetched once per symbol.
+"""
+import json
+import numpy as np
+import pytest
+from unittest.mock import AsyncMock, Mock, patch
+from finance import async_agents_functions
+from finance.agents_functions import batch_metrics
+from finance.metrics_batch import year_matrix
+from finance.profit_margin import calculate_profit_margins
+from finance.profit_multipliers import price_to_EBIT_ratio, ratios
+from finance.tool_results import MetricsRow
+
+INCOME_STATEMENTS = {
+    "AAPL": [
+        {"calendarYear": "2022", "revenue": 1000, "grossProfit": 400, "operatingIncome": 200, "netIncome": 100},
+        {"calendarYear": "2023", "revenue": 2000, "grossProfit": 900, "operatingIncome": 500, "netIncome": -300},
+    ],
+    "MSFT": [
+        {"calendarYear": "2023", "revenue": 0, "grossProfit": 10, "operatingIncome": 0, "netIncome": 5},
+    ],
+}
+RATIOS = {
+    "AAPL": [
+        {"calendarYear": "2022", "priceEarningsRatio": 20, "priceToBookRatio": 3, "priceEarningsToGrowthRatio": None, "priceToSalesRatio": 4},
+        {"calendarYear": "2023", "priceEarningsRatio": 25, "priceToBookRatio": 3.5, "priceEarningsToGrowthRatio": 1.1, "priceToSalesRatio": 5},
+    ],
+    "MSFT": {"Error Message": "Limit Reach"},
+}
+
+
+def fake_response(url, **kwargs):
+    """Returns the mocked API response of the given endpoint and symbol."""
+    symbol = url.rstrip("/").split("/")[-1]
+    if "historical-market-capitalization" in url:
+        return json.dumps([{"marketCap": 10000}])
+    if "income-statement" in url:
+        return json.dumps(INCOME_STATEMENTS.get(symbol, []))
+    if "ratios" in url:
+        return json.dumps(RATIOS.get(symbol, []))
+    return "{}"
+
+
+@pytest.fixture
+def mock_cache():
+    """Fixture to mock the sync and async cached requests of the margin and multiple modules."""
+    sync_mock, async_mock = Mock(side_effect=fake_response), AsyncMock(side_effect=fake_response)
+    patches = [patch(f"{module}.{name}", mock) for module in ("finance.profit_margin", "finance.profit_multipliers")
+               for name, mock in (("cached_api_request", sync_mock), ("async_cached_api_request", async_mock))]
+    for p in patches:
+        p.start()
+    yield sync_mock, async_mock
+    for p in patches:
+        p.stop()
+
+
+def test_year_matrix():
+    """Test that records are placed by calendar year, with NaN for the missing years, values and responses."""
+    matrix = year_matrix(json.dumps(INCOME_STATEMENTS["AAPL"]), [2021, 2023], ["revenue", "ebitda"])
+    assert np.isnan(matrix[:, 0]).all() and matrix[0, 1] == 2000 and np.isnan(matrix[1, 1])
+    assert np.isnan(year_matrix("not json", [2023], ["revenue"])).all()
+
+
+def test_batch_matches_scalar_tools(mock_cache):
+    """Test that every cell of the batch equals the row built from the scalar tools."""
+    symbols, years = ["AAPL", "MSFT", "NVDA"], [2021, 2022, 2023]
+    batch = batch_metrics(symbols, years)
+    assert batch.get("net_margin").shape == (3, 3)
+    for symbol in symbols:
+        for year in years:
+            expected = MetricsRow.from_tool_values(symbol, year, calculate_profit_margins(symbol, year),
+                                                   price_to_EBIT_ratio(symbol, year), ratios(symbol, year))
+            assert batch.row(symbol, year) == expected
+    assert batch.row("AAPL", 2023).net_margin == -15.0
+    assert batch.row("MSFT", 2023).gross_margin is None
+
+
+def test_batch_fetches_statements_once_per_symbol(mock_cache):
+    """Test that the statements are fetched once per symbol, and only the market cap once per year."""
+    sync_mock, _ = mock_cache
+    batch_metrics(["AAPL", "MSFT"], [2021, 2022, 2023])
+    urls = [call.kwargs["url"] for call in sync_mock.call_args_list]
+    assert sum("income-statement" in url for url in urls) == 4
+    assert sum("ratios" in url for url in urls) == 2
+    assert sum("historical-market-capitalization" in url for url in urls) == 6
+
+
+@pytest.mark.asyncio
+async def test_async_batch_matches_sync(mock_cache):
+    """Test that the async batch returns the same rows as the sync one."""
+    symbols, years = ["AAPL", "MSFT"], [2022, 2023]
+    assert (await async_agents_functions.batch_metrics(symbols, years)).rows() == batch_metrics(symbols, years).rows()
+    competitors = await async_agents_functions.batch_metrics(symbols, years, margins=False)
+    assert competitors.row("AAPL", 2022) == MetricsRow("AAPL", 2022, price_to_ebit=50.0, price_to_earning=20.0,
+                                                      price_to_book=3.0, price_to_sales=4.0)
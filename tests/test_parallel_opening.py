@@ -0,0 +1,62 @@
+"""
+test_parallel_opening.py
+This module contains the unit tests for the parallel opening phase of the house discussion.
+The analysts are replaced by fake agents, to check that they run concurrently and that failures are left to the group chat.
+"""
+import asyncio
+import time
+import pytest
+from autogen_agentchat.base import Response
+from autogen_agentchat.messages import TextMessage
+from group_chats.group_chat import run_parallel_opening
+
+
+class FakeAnalyst:
+    """Agent that answers the task after a delay, like an LLM and tool round trip."""
+
+    def __init__(self, name: str, delay: float = 0.2, error: Exception = None):
+        self.name = name
+        self.delay = delay
+        self.error = error
+        self.received = []
+        self.reset_count = 0
+
+    async def on_messages(self, messages, cancellation_token):
+        self.received.extend(messages)
+        await asyncio.sleep(self.delay)
+        if self.error:
+            raise self.error
+        return Response(chat_message=TextMessage(content=f"{self.name} analysis", source=self.name))
+
+    async def on_reset(self, cancellation_token):
+        self.reset_count += 1
+
+
+@pytest.mark.asyncio
+async def test_opening_runs_concurrently():
+    """Test that the analysts answer the task concurrently and their messages keep the agents' order."""
+    agents = [FakeAnalyst(f"Analyst_{i}") for i in range(4)]
+    task_message = TextMessage(content="Analyze AAPL", source="user")
+
+    start = time.monotonic()
+    messages = await run_parallel_opening(agents, task_message)
+
+    assert time.monotonic() - start < 0.6
+    assert [message.source for message in messages] == ["Analyst_0", "Analyst_1", "Analyst_2", "Analyst_3"]
+    assert all(agent.received == [task_message] for agent in agents)
+
+
+@pytest.mark.asyncio
+async def test_opening_resets_the_analysts():
+    """Test that the analysts are reset, since the group chat sends them the task and the opening again."""
+    agents = [FakeAnalyst("Analyst_0", delay=0), FakeAnalyst("Analyst_1", delay=0)]
+    await run_parallel_opening(agents, TextMessage(content="task", source="user"))
+    assert all(agent.reset_count == 1 for agent in agents)
+
+
+@pytest.mark.asyncio
+async def test_failed_analyst_is_left_out():
+    """Test that an analyst that fails is left out of the opening, so it speaks in the group chat instead."""
+    agents = [FakeAnalyst("Analyst_0", delay=0), FakeAnalyst("Analyst_1", delay=0, error=RuntimeError("rate limited"))]
+    messages = await run_parallel_opening(agents, TextMessage(content="task", source="user"))
+    assert [message.source for message in messages] == ["Analyst_0"]
@@ -0,0 +1,92 @@
+"""
+test_peer_group.py
+This module contains the unit tests for the peer-group competitive analysis:
+the vectorized peer medians and percentiles, and competative_func over a mocked peer group of related companies.
+"""
+import json
+import numpy as np
+import pytest
+from unittest.mock import AsyncMock, Mock, patch
+from finance.agents_functions import batch_metrics
+from finance.async_agents_functions import competative_func
+from finance.peer_group import peer_group_result, peer_medians, peer_percentiles
+from finance.point_in_time import RunContext
+
+PEERS = ["MSFT", "GOOGL", "META", "AMZN", "NVDA", "ORCL", "IBM"]
+# symbol: (revenue, operating income, net income, P/E) of 2022
+FUNDAMENTALS = {
+    "AAPL": (1000, 300, 250, 20),
+    "MSFT": (1000, 400, 300, 30),
+    "GOOGL": (1000, 250, 200, 18),
+    "META": (1000, 200, -50, -40),
+    "AMZN": (1000, 100, 80, 60),
+    "NVDA": (1000, 350, 280, 50),
+}
+
+
+def fake_response(url, **kwargs):
+    """Returns the mocked API response of the given endpoint and symbol."""
+    symbol = url.rstrip("/").split("/")[-1]
+    if "related-companies" in url:
+        return json.dumps({"results": [{"ticker": ticker} for ticker in ["AAPL"] + PEERS]})
+    if symbol not in FUNDAMENTALS:
+        return "[]"
+    revenue, operating_income, net_income, pe = FUNDAMENTALS[symbol]
+    if "historical-market-capitalization" in url:
+        return json.dumps([{"marketCap": 6000}])
+    if "income-statement" in url:
+        return json.dumps([{"calendarYear": "2022", "revenue": revenue, "grossProfit": revenue / 2,
+                            "operatingIncome": operating_income, "netIncome": net_income}])
+    if "ratios" in url:
+        return json.dumps([{"calendarYear": "2022", "priceEarningsRatio": pe}])
+    return "{}"
+
+
+@pytest.fixture
+def mock_cache():
+    """Fixture to mock the sync and async cached requests of the finance modules."""
+    sync_mock, async_mock = Mock(side_effect=fake_response), AsyncMock(side_effect=fake_response)
+    modules = ["finance.profit_margin", "finance.profit_multipliers", "finance.LLM_get_financial"]
+    patches = [patch(f"{module}.{name}", mock) for module in modules
+               for name, mock in (("cached_api_request", sync_mock), ("async_cached_api_request", async_mock))]
+    for p in patches:
+        p.start()
+    yield sync_mock
+    for p in patches:
+        p.stop()
+
+
+def test_peer_medians_and_percentiles():
+    """Test the medians and percentiles over the peers, with negative multiples ranking last and NaN left out."""
+    # One margin and one multiple; the company first, three peers, two years
+    values = np.array([
+        [[20.0, np.nan], [10.0, 5.0], [30.0, np.nan], [20.0, np.nan]],
+        [[15.0, 10.0], [-5.0, np.nan], [25.0, np.nan], [np.nan, np.nan]],
+    ])
+    medians = peer_medians(values)
+    assert medians[0].tolist() == [20.0, 5.0] and medians[1, 0] == 10.0 and np.isnan(medians[1, 1])
+
+    percentiles = peer_percentiles(values, np.array([True, False]))
+    assert percentiles[0, 0] == 50.0 and np.isnan(percentiles[0, 1])
+    assert percentiles[1, 0] == 100.0 and np.isnan(percentiles[1, 1])
+
+
+@pytest.mark.asyncio
+async def test_competative_func_peer_group(mock_cache):
+    """Test that competative_func compares the symbol with its top related companies, leaving out the symbol itself."""
+    result = await competative_func(RunContext(2022, 2024), "AAPL", [2022])
+    assert result.peers == PEERS[:5] and result.competitor == "MSFT"
+    assert result.symbols() == ["AAPL"] + PEERS[:5]
+
+    median, percentile = result.peer_medians[0], result.percentiles[0]
+    assert median.operating_margin == 25.0 and percentile.operating_margin == 60.0
+    # META's negative P/E is a loss and ranks below AAPL's
+    assert median.price_to_earning == 30.0 and percentile.price_to_earning == 80.0
+    assert "Peer median and AAPL percentile among its peers" in str(result)
+
+
+@pytest.mark.asyncio
+async def test_competative_func_matches_sync_batch(mock_cache):
+    """Test that competative_func returns the peer group of the sync batch of the pages on the same responses."""
+    expected = peer_group_result("AAPL", batch_metrics(["AAPL"] + PEERS[:5], [2022, 2023]))
+    assert await competative_func(RunContext(2022, 2024), "AAPL", [2022, 2023]) == expected
@@ -0,0 +1,102 @@
+"""
+test_prefetch.py
+This module contains the unit tests for the cache warm-up command.
+The finance functions are mocked so no request reaches the network or the caching service.
+"""
+import json
+import threading
+import pytest
+from finance.point_in_time import RunContext
+from finance.prefetch import COMPETITOR_DATASETS, DATASETS, format_coverage_report, prefetch_discussion_data, prefetch_tickers
+
+
+@pytest.fixture
+def mock_fetchers(mocker):
+    """Fixture to mock every finance function used by the prefetch."""
+    return {
+        "fetch_income_statement": mocker.patch("finance.prefetch.fetch_income_statement", return_value={"calendarYear": "2022"}),
+        "ratios": mocker.patch("finance.prefetch.ratios", return_value=json.dumps({"price_to_earning": 20})),
+        "price_to_EBIT_ratio": mocker.patch("finance.prefetch.price_to_EBIT_ratio", return_value="12.5"),
+        "market_cap": mocker.patch("finance.prefetch.market_cap", return_value=2.5e12),
+        "get_historical_data": mocker.patch("finance.prefetch.get_historical_data", return_value={"historical": [{"close": 1}]}),
+        "get_related_companies": mocker.patch("finance.prefetch.get_related_companies", return_value=["MSFT"]),
+        "extract_business_info": mocker.patch("finance.prefetch.extract_business_info", return_value=json.dumps({"businessDescription": "desc"})),
+        "get_company_data": mocker.patch("finance.prefetch.get_company_data", return_value=json.dumps({"1": {"Title": "news"}})),
+    }
+
+
+def test_prefetch_tickers_full_coverage(mock_fetchers):
+    """Test that every dataset is fetched for every symbol and reported as covered."""
+    coverage = prefetch_tickers(["AAPL", "GOOGL"], 2022, 2023)
+    assert set(coverage) == {"AAPL", "GOOGL"}
+    assert all(coverage[symbol][dataset] for symbol in coverage for dataset in DATASETS)
+
+
+def test_prefetch_tickers_fetches_every_year(mock_fetchers):
+    """Test that the per-year datasets are fetched for each year in the range."""
+    prefetch_tickers(["AAPL"], 2021, 2023, datasets=["ratios", "market_cap"])
+    assert mock_fetchers["ratios"].call_count == 3
+    assert mock_fetchers["price_to_EBIT_ratio"].call_count == 3
+
+
+def test_prefetch_tickers_failures(mock_fetchers):
+    """Test that failing or empty datasets are reported as missing instead of raising."""
+    mock_fetchers["get_related_companies"].side_effect = RuntimeError("Polygon.io error")
+    mock_fetchers["get_company_data"].return_value = json.dumps({"error": "Failed to parse API response as JSON"})
+
+    coverage = prefetch_tickers(["AAPL"], 2022, 2022)
+    assert coverage["AAPL"]["related_companies"] is False
+    assert coverage["AAPL"]["news"] is False
+    assert coverage["AAPL"]["ratios"] is True
+
+
+def test_prefetch_market_cap_coverage(mock_fetchers):
+    """Test that the market cap is covered by its own response, even when the Price/EBIT ratio is missing."""
+    mock_fetchers["price_to_EBIT_ratio"].return_value = None
+    assert prefetch_tickers(["AAPL"], 2022, 2022, datasets=["market_cap"])["AAPL"]["market_cap"] is True
+
+    mock_fetchers["market_cap"].return_value = None
+    assert prefetch_tickers(["AAPL"], 2022, 2022, datasets=["market_cap"])["AAPL"]["market_cap"] is False
+
+
+def test_prefetch_tickers_stop(mock_fetchers):
+    """Test that no fetch starts once the stop event is set, and the stopped datasets are left out of the coverage."""
+    stop = threading.Event()
+
+    def ratios(*args):
+        stop.set()
+        return json.dumps({"price_to_earning": 20})
+
+    mock_fetchers["ratios"].side_effect = ratios
+    coverage = prefetch_tickers(["AAPL", "MSFT"], 2022, 2022, datasets=["ratios", "news"], max_workers=1, stop=stop)
+    assert mock_fetchers["ratios"].call_count == 1
+    assert mock_fetchers["get_company_data"].call_count == 0
+    assert coverage["MSFT"] == {}
+
+    assert prefetch_discussion_data(["AAPL"], RunContext(2022, 2022), stop=stop) == {"AAPL": {}}
+    assert mock_fetchers["get_related_companies"].call_count == 0
+
+
+def test_prefetch_tickers_unknown_dataset(mock_fetchers):
+    """Test that an unknown dataset name raises a ValueError."""
+    with pytest.raises(ValueError, match="Unknown datasets"):
+        prefetch_tickers(["AAPL"], 2022, 2022, datasets=["balance_sheet"])
+
+
+def test_format_coverage_report():
+    """Test the coverage report totals."""
+    report = format_coverage_report({"AAPL": {"ratios": True, "news": False}})
+    assert "AAPL" in report
+    assert "Coverage: 1/2 (50.0%)" in report
+
+
+def test_prefetch_discussion_data_includes_competitor(mock_fetchers):
+    """Test that the speculative prefetch warms the competitor data used by competative_func."""
+    coverage = prefetch_discussion_data([" AAPL"], RunContext(2022, 2024, as_of="2022-12-31"))
+    assert set(coverage) == {"AAPL", "MSFT"}
+    assert set(coverage["MSFT"]) == set(COMPETITOR_DATASETS)
+    assert "price_history" not in coverage["AAPL"]
+    # The requests are the ones of the run's tools: as of its date, and the news of its start year
+    mock_fetchers["price_to_EBIT_ratio"].assert_any_call("MSFT", 2022, "2022-12-31")
+    mock_fetchers["ratios"].assert_any_call("AAPL", 2020, "2022-12-31")
+    mock_fetchers["get_company_data"].assert_called_once_with("AAPL", year=2022, as_of="2022-12-31")
@@ -0,0 +1,139 @@
+"""
+test_rate_limiter.py
+This module contains the unit tests for the upstream scheduler.
+It checks the token bucket refill, the per-provider quotas, the priority of interactive requests
+over prefetch traffic, the queue depth metric, and the buckets shared across processes through the database.
+"""
+import asyncio
+import threading
+import time
+import pytest
+from database.rate_limiter import INTERACTIVE, PREFETCH, SharedTokenBucket, TokenBucket, UpstreamScheduler, provider_for_url, request_priority
+
+FMP_URL = "https://financialmodelingprep.com/api/v3/ratios/AAPL"
+POLYGON_URL = "https://api.polygon.io/v3/reference/tickers/AAPL"
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+def test_token_bucket_refill():
+    """Test that the bucket allows a burst up to its capacity and then refills at its rate."""
+    clock = FakeClock()
+    bucket = TokenBucket(rate_per_second=1, capacity=2, clock=clock)
+    assert bucket.try_acquire() and bucket.try_acquire()
+    assert not bucket.try_acquire()
+    assert bucket.time_until_available() == pytest.approx(1.0)
+    clock.now = 1.0
+    assert bucket.try_acquire()
+
+
+def test_shared_buckets(tmp_path):
+    """Test that the schedulers of several processes take their tokens from the same bucket in the database."""
+    db_name = str(tmp_path / "buckets.db")
+    clock = FakeClock()
+    first = SharedTokenBucket("polygon", rate_per_second=1, capacity=2, db_name=db_name, clock=clock)
+    second = SharedTokenBucket("polygon", rate_per_second=1, capacity=2, db_name=db_name, clock=clock)
+    assert first.try_acquire() and second.try_acquire()
+    assert not first.try_acquire() and not second.try_acquire()
+    assert second.time_until_available() == pytest.approx(1.0)
+    clock.now = 1.0
+    assert second.try_acquire() and not first.try_acquire()
+
+    # The scheduler of another process sees the tokens taken by this one
+    scheduler = UpstreamScheduler({"polygon": 2}, db_name=db_name)
+    other = UpstreamScheduler({"polygon": 2}, db_name=db_name)
+    scheduler.acquire(POLYGON_URL)
+    assert other.stats()["polygon"]["tokens_available"] < 2
+
+
+def test_provider_for_url():
+    """Test that the providers are resolved from the URL host, and other hosts are not limited."""
+    assert provider_for_url(FMP_URL) == "fmp"
+    assert provider_for_url(POLYGON_URL) == "polygon"
+    assert provider_for_url("http://localhost:8000/get_api_call") is None
+
+
+def test_unlimited_host_does_not_wait():
+    """Test that requests to hosts without a quota never wait."""
+    scheduler = UpstreamScheduler({"polygon": 1})
+    start = time.monotonic()
+    for _ in range(5):
+        scheduler.acquire("http://localhost:8000/get_api_call")
+    assert time.monotonic() - start < 0.1
+
+
+def test_providers_have_separate_quotas():
+    """Test that exhausting one provider's quota does not delay another provider."""
+    scheduler = UpstreamScheduler({"polygon": 1, "fmp": 600})
+    scheduler.acquire(POLYGON_URL)
+    start = time.monotonic()
+    scheduler.acquire(FMP_URL)
+    assert time.monotonic() - start < 0.1
+    assert scheduler.stats()["polygon"]["tokens_available"] < 1
+
+
+def test_interactive_requests_served_before_prefetch():
+    """Test that an interactive request queued after a prefetch request gets the next token first."""
+    scheduler = UpstreamScheduler({"polygon": 300})  # one token every 0.2 seconds
+    scheduler._buckets["polygon"].tokens = 0
+    order = []
+
+    def request(priority):
+        with request_priority(priority):
+            scheduler.acquire(POLYGON_URL)
+        order.append(priority)
+
+    prefetch = threading.Thread(target=request, args=(PREFETCH,))
+    prefetch.start()
+    time.sleep(0.05)
+    assert scheduler.stats()["polygon"]["queued_by_priority"]["prefetch"] == 1
+    interactive = threading.Thread(target=request, args=(INTERACTIVE,))
+    interactive.start()
+    prefetch.join()
+    interactive.join()
+    assert order == [INTERACTIVE, PREFETCH]
+    assert scheduler.queue_depth() == 0
+
+
+@pytest.mark.asyncio
+async def test_acquire_async_waits_for_token():
+    """Test that async requests wait for the refill without blocking the event loop."""
+    scheduler = UpstreamScheduler({"polygon": 600})  # one token every 0.1 seconds
+    scheduler._buckets["polygon"].tokens = 0
+    ticks = []
+
+    async def ticker():
+        for _ in range(3):
+            ticks.append(1)
+            await asyncio.sleep(0.01)
+
+    start = time.monotonic()
+    await asyncio.gather(scheduler.acquire_async(POLYGON_URL), ticker())
+    assert time.monotonic() - start >= 0.09
+    assert len(ticks) == 3
+
+
+@pytest.mark.asyncio
+async def test_acquire_async_shared_bucket_off_the_loop(tmp_path):
+    """Test that the database I/O of the shared buckets runs in a worker thread, outside the scheduler lock."""
+    scheduler = UpstreamScheduler({"polygon": 60}, db_name=str(tmp_path / "buckets.db"))
+    bucket = scheduler._buckets["polygon"]
+    acquire = bucket.try_acquire
+    calls = []
+
+    def try_acquire():
+        # The lock is free while the bucket is used: another thread can queue meanwhile
+        calls.append((threading.get_ident(), scheduler._condition.acquire(blocking=False)))
+        scheduler._condition.release()
+        return acquire()
+
+    bucket.try_acquire = try_acquire
+    await scheduler.acquire_async(POLYGON_URL)
+    assert calls == [(calls[0][0], True)] and calls[0][0] != threading.get_ident()
+    assert scheduler.queue_depth() == 0
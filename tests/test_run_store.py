@@ -0,0 +1,146 @@
+"""
+test_run_store.py
+This module contains the unit tests for the SQLite run store and the judges' discussion tool that reads from it.
+Each test uses a temporary database file.
+"""
+import pytest
+from database.run_store import JUDGES_HOUSE_ID, RunStore
+from utils import judges_functions
+
+MESSAGES = [
+    {"role": "user", "content": "Analyze AAPL"},
+    {"role": "Liquidity_Analyst", "content": "The quick ratio is 1.2. Allocation: 20%"},
+    {"role": "Solid_Analyst", "content": "Too risky. Allocation: 5%"},
+    {"role": "Liquidity_Analyst", "content": "I keep 20%"},
+]
+
+
+@pytest.fixture
+def run_store(tmp_path):
+    """Fixture to create a run store in a temporary database."""
+    return RunStore(str(tmp_path / "runs.db"))
+
+
+def test_create_and_finish_run(run_store):
+    """Test that a run is created as running and finished with its status and totals."""
+    run_id = run_store.create_run(["AAPL", " MSFT"], 100000, 2022, 2024)
+    assert run_store.get_run(run_id)["status"] == "running"
+
+    run_store.add_messages(run_id, 1, MESSAGES)
+    run_store.finish_run(run_id)
+
+    run = run_store.get_run(run_id)
+    assert run["status"] == "completed" and run["finished_at"]
+    assert run["stocks"] == "AAPL,MSFT"
+    assert run["message_count"] == 4 and run["total_tokens"] > 0
+    assert run_store.latest_run_id() == run_id
+
+
+def test_messages_by_house_and_agent(run_store):
+    """Test that messages are kept in order per house and can be filtered by agent."""
+    run_id = run_store.create_run(["AAPL"])
+    run_store.add_messages(run_id, 1, MESSAGES[:2])
+    run_store.add_messages(run_id, 2, MESSAGES)
+    run_store.add_messages(run_id, 1, MESSAGES[2:])
+    run_store.add_messages(run_id, JUDGES_HOUSE_ID, [{"role": "Manager", "content": "House 1 wins"}])
+
+    house1 = run_store.get_messages(run_id, house_id=1)
+    assert [msg["seq"] for msg in house1] == [1, 2, 3, 4]
+    assert [msg["content"] for msg in house1] == [msg["content"] for msg in MESSAGES]
+
+    liquidity = run_store.get_messages(run_id, house_id=2, role="Liquidity_Analyst")
+    assert [msg["content"] for msg in liquidity] == ["The quick ratio is 1.2. Allocation: 20%", "I keep 20%"]
+    assert len(run_store.get_messages(run_id)) == 9
+
+
+def test_runs_are_isolated(run_store):
+    """Test that concurrent runs don't overwrite each other's messages."""
+    first = run_store.create_run(["AAPL"])
+    second = run_store.create_run(["MSFT"])
+    run_store.add_messages(first, 1, MESSAGES[:1])
+    run_store.add_messages(second, 1, MESSAGES)
+    assert len(run_store.get_messages(first, house_id=1)) == 1
+    assert [run["run_id"] for run in run_store.list_runs()] == [second, first]
+
+
+def test_judges_discussion_tool(run_store, monkeypatch):
+    """Test that the judges' tool returns the discussion of its run, without the task, filtered by agent."""
+    monkeypatch.setattr("database.run_store.get_run_store", lambda: run_store)
+    run_id = run_store.create_run(["AAPL"])
+    run_store.add_messages(run_id, 1, MESSAGES)
+    # A newer run of another session is not read
+    newer_run = run_store.create_run(["MSFT"])
+    run_store.add_messages(newer_run, 1, [{"role": "Liquidity_Analyst", "content": "MSFT is liquid"}])
+
+    discussion = judges_functions.get_investment_house_discussion(run_id, 1)
+    assert discussion.startswith("[Liquidity_Analyst]: The quick ratio is 1.2.")
+    assert "Analyze AAPL" not in discussion and "MSFT" not in discussion
+    assert judges_functions.get_investment_house_discussion(run_id, 1, "Solid_Analyst") == "[Solid_Analyst]: Too risky. Allocation: 5%"
+    assert judges_functions.get_investment_house_discussion(run_id, 2) == "No messages found in the discussion of House 2."
+    assert judges_functions.get_investment_house_discussion(run_id, 3) == "Invalid house ID. Please call with 1 or 2."
+    assert judges_functions.get_investment_house_discussion(None, 1) == "Discussion for House 1 not found."
+
+
+def test_judges_discussion_token_limit(run_store, monkeypatch):
+    """Test that the judges' tool stops at the token limit and says how many messages were left out."""
+    monkeypatch.setattr("database.run_store.get_run_store", lambda: run_store)
+    monkeypatch.setattr(judges_functions, "DISCUSSION_MAX_TOKENS", 12)
+    run_id = run_store.create_run(["AAPL"])
+    run_store.add_messages(run_id, 1, MESSAGES)
+
+    discussion = judges_functions.get_investment_house_discussion(run_id, 1)
+    assert discussion.endswith("more messages not shown]")
+
+
+SEARCH_MESSAGES = [
+    {"role": "user", "content": "Decide the allocation of AAPL"},
+    {"role": "Liquidity_Analyst", "content": "The quick ratio is 1.2, liquidity is healthy. Allocation: 20%"},
+    {"role": "Solid_Analyst", "content": "I recommend 10% because the margins are shrinking and the valuation is high."},
+    {"role": "Red_Flags_Analyst", "content": "No red flags in the filings."},
+]
+
+
+def test_search_messages_ranks_by_relevance(run_store):
+    """Test that the full-text search returns the most relevant messages of the run first, with a snippet."""
+    run_id = run_store.create_run(["AAPL"])
+    other_run = run_store.create_run(["AAPL"])
+    run_store.add_messages(run_id, 1, SEARCH_MESSAGES)
+    run_store.add_messages(other_run, 1, SEARCH_MESSAGES)
+
+    results = run_store.search_messages(run_id, "why are the margins shrinking?", exclude_roles=["user"])
+    assert [msg["role"] for msg in results] == ["Solid_Analyst"]
+    assert "margins" in results[0]["snippet"]
+
+    results = run_store.search_messages(run_id, "allocation liquidity", exclude_roles=["user"])
+    assert results[0]["role"] == "Liquidity_Analyst"
+    assert run_store.search_messages(run_id, "allocation")[0]["seq"] in (1, 2)
+    assert run_store.search_messages(run_id, "AND OR ( * ") == []
+
+
+def test_judges_search_tool(run_store, monkeypatch):
+    """Test that the judges' search tool searches its run, filters by the agent named in the question and keeps to the token budget."""
+    monkeypatch.setattr("database.run_store.get_run_store", lambda: run_store)
+    run_id = run_store.create_run(["AAPL"])
+    run_store.add_messages(run_id, 1, SEARCH_MESSAGES)
+    run_store.add_messages(run_id, 2, SEARCH_MESSAGES)
+    run_store.add_messages(run_id, JUDGES_HOUSE_ID, [{"role": "Manager", "content": "The allocation of House 1 is justified"}])
+    # A newer run of another session is not searched
+    newer_run = run_store.create_run(["MSFT"])
+    run_store.add_messages(newer_run, 1, [{"role": "Liquidity_Analyst", "content": "The dividends of MSFT were cut. Allocation: 5%"}])
+
+    passages = judges_functions.search_investment_house_discussion(run_id, "how did the Solid_Analyst justify the allocation", 1)
+    assert passages == "[House 1 - Solid_Analyst - message 3]: " + SEARCH_MESSAGES[2]["content"]
+
+    passages = judges_functions.search_investment_house_discussion(run_id, "allocation")
+    assert "House 1 - Liquidity_Analyst" in passages and "House 2 - Liquidity_Analyst" in passages
+    assert "Manager" not in passages and "Decide the allocation" not in passages
+
+    assert judges_functions.search_investment_house_discussion(run_id, "dividends") == "No passages found for 'dividends'."
+    assert judges_functions.search_investment_house_discussion(None, "dividends") == "No discussion found."
+
+    long_message = "The revenue grew steadily. " * 100 + "The dividends were cut last year."
+    run_store.add_messages(run_id, 2, [{"role": "Qualitative_Analyst", "content": long_message}])
+    monkeypatch.setattr(judges_functions, "SEARCH_MAX_TOKENS", 100)
+    passages = judges_functions.search_investment_house_discussion(run_id, "were the dividends cut", 2)
+    assert passages.startswith("[House 2 - Qualitative_Analyst - message 5]: ")
+    assert "dividends were cut" in passages and len(passages) < len(long_message)
@@ -0,0 +1,108 @@
+"""
+test_screener.py
+This module contains the unit tests for the cross-sectional screener over the Parquet export of the cache:
+the percentile ranks, the metrics computed as in the analysts' tools, the point-in-time cut and the top-N selection.
+Each test uses a temporary database file and export directory.
+"""
+import json
+import sqlite3
+import numpy as np
+import pytest
+from database.columnar_export import export_new_responses
+from database.db import DB
+from database.init_db import init_db
+from finance.screener import compute_metrics, percentile_ranks, screen
+
+FMP = "https://financialmodelingprep.com/api/v3"
+
+# symbol: (revenue, gross profit, operating income, net income, market cap, P/E, filing date)
+COMPANIES = {
+    "AAA": (100.0, 60.0, 30.0, 20.0, 600.0, 30.0, "2022-10-28"),
+    "BBB": (100.0, 40.0, 20.0, 10.0, 600.0, 60.0, "2022-11-15"),
+    "CCC": (100.0, 20.0, -5.0, -8.0, 300.0, -37.5, "2022-10-01"),
+    "DDD": (100.0, 70.0, 40.0, 30.0, 400.0, 13.3, "2023-02-20"),
+}
+
+
+@pytest.fixture
+def export_dir(tmp_path):
+    """Fixture to export the cached fundamentals of COMPANIES for 2022."""
+    db_name = str(tmp_path / "cache.db")
+    init_db(db_name)
+    db = DB(sqlite3, db_name)
+    for symbol, (revenue, gross, operating, net, market_cap, pe, filed) in COMPANIES.items():
+        income = [{"date": "2022-09-30", "calendarYear": "2022", "period": "FY", "fillingDate": filed, "revenue": revenue,
+                   "grossProfit": gross, "operatingIncome": operating, "netIncome": net}]
+        ratios = [{"date": "2022-09-30", "calendarYear": "2022", "period": "FY", "priceEarningsRatio": pe}]
+        market_caps = [{"symbol": symbol, "date": "2022-12-30", "marketCap": market_cap},
+                       {"symbol": symbol, "date": "2022-06-30", "marketCap": market_cap * 2}]
+        for url, response in ((f"{FMP}/income-statement/{symbol}", income), (f"{FMP}/ratios/{symbol}", ratios),
+                              (f"{FMP}/historical-market-capitalization/{symbol}", market_caps)):
+            db.execute("INSERT INTO API_calls (params, url, response) VALUES (?, ?, ?)", ("{}", url, json.dumps(response)))
+    db.commit()
+    export_dir = str(tmp_path / "export")
+    export_new_responses(db, export_dir)
+    db.close()
+    return export_dir
+
+
+def test_percentile_ranks():
+    """Test that higher values rank better, or lower positive multiples, with losses last and NaN kept."""
+    assert percentile_ranks(np.array([1.0, 3.0, np.nan, 2.0]), True)[[0, 1, 3]].tolist() == [0.0, 1.0, 0.5]
+    ranks = percentile_ranks(np.array([20.0, -5.0, 10.0, np.nan]), False)
+    assert ranks[:3].tolist() == [0.5, 0.0, 1.0] and np.isnan(ranks[3])
+
+
+def test_compute_metrics(export_dir):
+    """Test that margins and Price/EBIT are computed as in the analysts' tools, with the year's latest market cap."""
+    universe, metrics = compute_metrics(2022, export_dir=export_dir)
+    assert universe.tolist() == ["AAA", "BBB", "CCC", "DDD"]
+    assert metrics["gross_margin"].tolist() == [60.0, 40.0, 20.0, 70.0]
+    assert metrics["price_to_EBIT"].tolist() == [20.0, 30.0, -60.0, 10.0]
+
+    universe, metrics = compute_metrics(2022, ["ddd", "EEE"], export_dir=export_dir)
+    assert universe.tolist() == ["DDD", "EEE"] and np.isnan(metrics["net_margin"][1])
+
+
+def test_screen_top_n(export_dir):
+    """Test that the best tickers come first, and tickers filed after the as-of date lose their statements."""
+    result = screen(2022, top_n=2, export_dir=export_dir)
+    assert result.symbols() == ["DDD", "AAA"] and result.universe_size == 4
+    assert str(result).startswith("Top 2 of 4 tickers (2022)")
+
+    # DDD filed its statement in 2023 and its 2021 data is not cached, so it is not ranked
+    assert screen(2022, top_n=4, as_of="2022-12-31", export_dir=export_dir).symbols() == ["AAA", "BBB", "CCC"]
+    assert screen(2021, export_dir=export_dir).rows == []
+
+
+def test_screen_december_fiscal_year(tmp_path):
+    """Test that a company filing in the next year is ranked as of the year end, with its previous fiscal year."""
+    db_name = str(tmp_path / "cache.db")
+    init_db(db_name)
+    db = DB(sqlite3, db_name)
+    income = [
+        {"date": "2022-12-31", "calendarYear": "2022", "period": "FY", "fillingDate": "2023-02-03", "revenue": 200.0,
+         "grossProfit": 90.0, "operatingIncome": 50.0, "netIncome": 40.0},
+        {"date": "2021-12-31", "calendarYear": "2021", "period": "FY", "fillingDate": "2022-02-02", "revenue": 100.0,
+         "grossProfit": 50.0, "operatingIncome": 20.0, "netIncome": 10.0},
+    ]
+    ratios = [{"date": "2022-12-31", "calendarYear": "2022", "period": "FY", "priceEarningsRatio": 15.0},
+              {"date": "2021-12-31", "calendarYear": "2021", "period": "FY", "priceEarningsRatio": 25.0}]
+    market_caps = [{"symbol": "DEC", "date": "2022-12-30", "marketCap": 1000.0},
+                   {"symbol": "DEC", "date": "2021-12-31", "marketCap": 800.0}]
+    for url, response in ((f"{FMP}/income-statement/DEC", income), (f"{FMP}/ratios/DEC", ratios),
+                          (f"{FMP}/historical-market-capitalization/DEC", market_caps)):
+        db.execute("INSERT INTO API_calls (params, url, response) VALUES (?, ?, ?)", ("{}", url, json.dumps(response)))
+    db.commit()
+    export_dir = str(tmp_path / "export")
+    export_new_responses(db, export_dir)
+    db.close()
+
+    result = screen(2022, as_of="2022-12-31", export_dir=export_dir)
+    assert result.symbols() == ["DEC"]
+    metrics = result.rows[0].metrics
+    assert (metrics["gross_margin"], metrics["price_to_earning"], metrics["price_to_EBIT"]) == (50.0, 25.0, 40.0)
+
+    # Once the 2022 statement is filed, it is used
+    metrics = screen(2022, as_of="2023-06-30", export_dir=export_dir).rows[0].metrics
+    assert (metrics["gross_margin"], metrics["price_to_earning"], metrics["price_to_EBIT"]) == (45.0, 15.0, 20.0)
@@ -0,0 +1,97 @@
+"""
+test_single_flight.py
+This module contains the unit tests for the SingleFlight request coalescing.
+It checks that concurrent identical calls run once, across threads and asyncio tasks,
+and that the result or exception of the leader is shared with every waiter.
+"""
+import asyncio
+import threading
+import time
+import pytest
+from concurrent.futures import ThreadPoolExecutor
+from database.single_flight import SingleFlight
+
+
+def test_do_coalesces_threads():
+    """Test that concurrent threads with the same key run the function once."""
+    flight = SingleFlight()
+    calls = []
+
+    def slow_fetch():
+        calls.append(1)
+        time.sleep(0.2)
+        return "response"
+
+    with ThreadPoolExecutor(max_workers=5) as executor:
+        results = list(executor.map(lambda _: flight.do("key", slow_fetch), range(5)))
+
+    assert results == ["response"] * 5
+    assert len(calls) == 1
+    assert flight.in_flight() == 0
+
+
+def test_do_different_keys():
+    """Test that calls with different keys are not coalesced."""
+    flight = SingleFlight()
+    assert flight.do("a", lambda: 1) == 1
+    assert flight.do("b", lambda: 2) == 2
+
+
+def test_do_shares_exception():
+    """Test that the exception of the leader is raised for every waiter."""
+    flight = SingleFlight()
+    started = threading.Event()
+
+    def failing_fetch():
+        started.set()
+        time.sleep(0.2)
+        raise RuntimeError("upstream error")
+
+    def waiter():
+        started.wait()
+        return flight.do("key", lambda: "not called")
+
+    with ThreadPoolExecutor(max_workers=2) as executor:
+        leader = executor.submit(flight.do, "key", failing_fetch)
+        follower = executor.submit(waiter)
+        with pytest.raises(RuntimeError, match="upstream error"):
+            leader.result()
+        with pytest.raises(RuntimeError, match="upstream error"):
+            follower.result()
+
+
+@pytest.mark.asyncio
+async def test_do_async_coalesces_tasks():
+    """Test that concurrent asyncio tasks with the same key await the coroutine once."""
+    flight = SingleFlight()
+    calls = []
+
+    async def slow_fetch():
+        calls.append(1)
+        await asyncio.sleep(0.1)
+        return "response"
+
+    results = await asyncio.gather(*[flight.do_async("key", slow_fetch) for _ in range(5)])
+    assert results == ["response"] * 5
+    assert len(calls) == 1
+
+
+@pytest.mark.asyncio
+async def test_do_async_waits_on_thread_leader():
+    """Test that an asyncio task waits on a flight led by another thread."""
+    flight = SingleFlight()
+    started = threading.Event()
+
+    def slow_fetch():
+        started.set()
+        time.sleep(0.2)
+        return "from thread"
+
+    thread_result = asyncio.get_running_loop().run_in_executor(None, flight.do, "key", slow_fetch)
+    await asyncio.to_thread(started.wait)
+
+    async def not_called():
+        raise AssertionError("the async caller should wait on the thread leader")
+
+    assert await flight.do_async("key", not_called) == "from thread"
+    assert await thread_result == "from thread"
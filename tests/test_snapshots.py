@@ -0,0 +1,86 @@
+"""
+test_snapshots.py
+This module contains the unit tests for the point-in-time snapshots of the API responses:
+the filtering of the records available on an as-of date, the versioned snapshot store,
+and the point-in-time path of cached_api_request, with and without network.
+Each test uses a temporary database file.
+"""
+import json
+import pytest
+from unittest.mock import patch
+from database import api_utils
+from database.api_utils import async_cached_api_request, cached_api_request
+from database.snapshots import SnapshotMissingError, SnapshotStore, cutoff_date, point_in_time_filter
+
+INCOME_URL = "https://financialmodelingprep.com/api/v3/income-statement/MSFT"
+RATIOS_URL = "https://financialmodelingprep.com/api/v3/ratios/MSFT"
+NEWS_URL = "https://api.polygon.io/v2/reference/news?published_utc=2022"
+
+INCOME_RESPONSE = json.dumps([
+    {"calendarYear": "2023", "date": "2023-06-30", "fillingDate": "2023-07-27", "revenue": 211915},
+    {"calendarYear": "2022", "date": "2022-06-30", "fillingDate": "2022-07-28", "revenue": 198270},
+])
+
+
+@pytest.fixture
+def store(tmp_path, monkeypatch):
+    """Fixture to create a snapshot store in a temporary database, used by cached_api_request."""
+    store = SnapshotStore(str(tmp_path / "snapshots.db"))
+    monkeypatch.setattr("database.snapshots.get_snapshot_store", lambda: store)
+    return store
+
+
+def test_point_in_time_filter():
+    """Test that only the records available on the as-of date are kept, by filing date, reporting lag or publish date."""
+    as_of = cutoff_date(2022)
+    assert as_of == "2022-12-31"
+
+    income = json.loads(point_in_time_filter(INCOME_URL, INCOME_RESPONSE, as_of))
+    assert [record["calendarYear"] for record in income] == ["2022"]
+
+    ratios = json.dumps([{"calendarYear": "2022", "date": "2022-12-31"}, {"calendarYear": "2021", "date": "2021-12-31"}])
+    assert [record["calendarYear"] for record in json.loads(point_in_time_filter(RATIOS_URL, ratios, as_of))] == ["2021"]
+
+    news = json.dumps({"results": [{"title": "old", "published_utc": "2022-05-01T00:00:00Z"}, {"title": "new", "published_utc": "2023-01-02T00:00:00Z"}]})
+    assert [article["title"] for article in json.loads(point_in_time_filter(NEWS_URL, news, as_of))["results"]] == ["old"]
+
+    related = json.dumps({"results": [{"ticker": "AAPL"}]})
+    assert json.loads(point_in_time_filter("https://api.polygon.io/v1/related-companies/MSFT", related, as_of)) == {"results": [{"ticker": "AAPL"}]}
+    assert point_in_time_filter(INCOME_URL, json.dumps({"Error Message": "Limit Reach"}), as_of) is None
+    assert point_in_time_filter(INCOME_URL, "<html>", as_of) is None
+
+
+def test_snapshots_are_versioned_by_as_of_date(store):
+    """Test that each as-of date keeps its own snapshot and the first snapshot of a key is never replaced."""
+    assert store.put(INCOME_URL, {"period": "annual"}, "2022-12-31", "first") == "first"
+    assert store.put(INCOME_URL, {"period": "annual"}, "2022-12-31", "restated") == "first"
+    store.put(INCOME_URL, {"period": "annual"}, "2023-12-31", "later")
+    assert store.get(INCOME_URL, {"period": "annual"}, "2022-12-31") == "first"
+    assert store.get(INCOME_URL, {}, "2022-12-31") is None
+    assert store.as_of_dates() == ["2022-12-31", "2023-12-31"]
+
+
+def test_cached_api_request_as_of(store, monkeypatch):
+    """Test that a point-in-time request is filtered and snapshotted once, then served without any request."""
+    with patch.object(api_utils, "_fetch_with_cache", return_value=INCOME_RESPONSE) as fetch:
+        first = cached_api_request(INCOME_URL, as_of="2022-12-31")
+        second = cached_api_request(INCOME_URL, as_of="2022-12-31")
+    assert fetch.call_count == 1
+    assert first == second and [record["calendarYear"] for record in json.loads(first)] == ["2022"]
+
+    monkeypatch.setenv("SNAPSHOT_OFFLINE", "true")
+    with patch.object(api_utils, "_fetch_with_cache") as fetch:
+        # Offline replays need neither the network nor the API keys
+        assert cached_api_request(INCOME_URL, api_key_name="MISSING_API_KEY", as_of="2022-12-31") == first
+        with pytest.raises(SnapshotMissingError):
+            cached_api_request(INCOME_URL, as_of="2021-12-31")
+    fetch.assert_not_called()
+
+
+@pytest.mark.asyncio
+async def test_async_cached_api_request_as_of(store):
+    """Test that the async point-in-time request shares the snapshots of the sync one."""
+    store.put(NEWS_URL, {"ticker": "MSFT"}, "2022-12-31", '{"results": []}')
+    with patch.object(api_utils, "_afetch_with_cache") as fetch:
+        assert await async_cached_api_request(NEWS_URL, params={"ticker": "MSFT"}, as_of="2022-12-31") == '{"results": []}'
+    fetch.assert_not_called()
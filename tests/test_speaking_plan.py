@@ -0,0 +1,82 @@
+"""
+test_speaking_plan.py
+This module contains the unit tests for the rule-based speaker selection.
+It checks that the plan is followed without the LLM selector, and that open decisions fall back to it.
+"""
+from autogen_agentchat.messages import TextMessage
+from group_chats.speaking_plan import FINAL_ROUND_PATTERN, SpeakingPhase, SpeakingPlanSelector
+
+OPENING = ["Liquidity_Analyst", "Historical_Analyst", "Red_Flags_Analyst", "Manager"]
+FINAL_ROUND = ["Liquidity_Analyst", "Historical_Analyst"]
+
+
+def message(source: str, content: str = "My analysis.") -> TextMessage:
+    return TextMessage(source=source, content=content)
+
+
+def selector() -> SpeakingPlanSelector:
+    return SpeakingPlanSelector(
+        phases=[
+            SpeakingPhase(order=OPENING),
+            SpeakingPhase(order=FINAL_ROUND, trigger_source="Manager", trigger_pattern=FINAL_ROUND_PATTERN),
+        ],
+        open_decision_responders=["Search_Analyst"],
+    )
+
+
+def test_opening_follows_the_plan():
+    """Test that the opening order is followed from the task message on."""
+    select = selector()
+    thread = [message("user", "Analyze AAPL")]
+    assert select(thread) == "Liquidity_Analyst"
+    thread.append(message("Liquidity_Analyst"))
+    assert select(thread) == "Historical_Analyst"
+
+
+def test_search_request_falls_back_to_llm():
+    """Test that a request for a search is left to the LLM selector, and the plan resumes after the answer."""
+    select = selector()
+    thread = [message("user", "task"), message("Liquidity_Analyst"), message("Historical_Analyst"),
+              message("Red_Flags_Analyst", "Please ask the search_agent to verify the margins.")]
+    assert select(thread) is None
+    thread.append(message("Search_Analyst", "I will search for the 2022 margins."))
+    assert select(thread) == "Manager"
+
+
+def test_out_of_order_speaker_does_not_stall_the_plan():
+    """Test that an agent chosen by the LLM out of order is not selected again."""
+    select = selector()
+    thread = [message("user", "task"), message("Historical_Analyst")]
+    assert select(thread) == "Liquidity_Analyst"
+    thread.append(message("Liquidity_Analyst"))
+    assert select(thread) == "Red_Flags_Analyst"
+
+
+def test_debate_after_plan_falls_back_to_llm():
+    """Test that the LLM selector decides once the opening is complete."""
+    thread = [message("user", "task")] + [message(name) for name in OPENING]
+    assert selector()(thread) is None
+
+
+def test_final_round_is_triggered_by_manager():
+    """Test that the manager's call for final decisions starts the final round order."""
+    select = selector()
+    thread = [message("user", "task")] + [message(name) for name in OPENING[:-1]]
+    thread.append(message("Manager", "Everyone, please give your final decision and allocation."))
+    assert select(thread) == "Liquidity_Analyst"
+    thread += [message("Liquidity_Analyst"), message("Historical_Analyst")]
+    assert select(thread) is None
+
+
+def test_final_round_starts_once():
+    """Test that a later call for final decisions neither restarts the final round during it nor after it."""
+    select = selector()
+    thread = [message("user", "task")] + [message(name) for name in OPENING[:-1]]
+    thread.append(message("Manager", "Everyone, please give your final decision and allocation."))
+    thread.append(message("Liquidity_Analyst"))
+    thread.append(message("Manager", "Reminder: state your final allocation as a percentage."))
+    assert select(thread) == "Historical_Analyst"
+    thread.append(message("Historical_Analyst"))
+    assert select(thread) is None
+    thread.append(message("Manager", "Thanks, the final decisions are in."))
+    assert select(thread) is None
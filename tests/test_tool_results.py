@@ -0,0 +1,81 @@
+"""
+test_tool_results.py
+This module contains the unit tests for the typed tool results.
+It checks that the values returned by the finance functions are parsed once,
+and that the text sent to the agents is a compact table instead of nested JSON.
+"""
+import json
+from finance.tool_results import (CompanyProfile, CompetitiveResult, HistoricalResult, MetricsRow, QualitativeResult,
+                                  QuickRatioResult, SearchResult, SearchResults, format_table)
+
+PROFIT_MARGINS = json.dumps({"Gross Profit Margin (%)": 43.31, "Operating Profit Margin (%)": 30.29, "Net Profit Margin (%)": 25.31})
+RATIOS = json.dumps({"price_to_earning": 24.44, "price_to_book": 48.14, "price_earnings_to_growth": 3.1, "price_to_sales_ratio": 6.18})
+
+
+def test_metrics_row_from_tool_values():
+    """Test that the JSON strings and numeric strings of the finance functions are parsed into numbers."""
+    row = MetricsRow.from_tool_values("AAPL", 2022, PROFIT_MARGINS, "22.5", RATIOS)
+    assert row.gross_margin == 43.31
+    assert row.price_to_ebit == 22.5
+    assert row.price_to_sales == 6.18
+
+
+def test_metrics_row_error_values():
+    """Test that error dicts and missing values become empty cells."""
+    row = MetricsRow.from_tool_values("AAPL", 2022, {"error": "Revenue is zero or undefined."}, None, None)
+    assert row.is_empty()
+
+
+def test_historical_result_rendering():
+    """Test that the historical result is rendered as one fixed-width row per symbol and year."""
+    result = HistoricalResult([
+        MetricsRow.from_tool_values("AAPL", 2022, PROFIT_MARGINS, "22.5", RATIOS),
+        MetricsRow.from_tool_values("AAPL", 2023, None, None, RATIOS),
+    ])
+    lines = str(result).splitlines()
+    assert lines[0].split() == ["symbol", "year", "gross%", "oper%", "net%", "P/EBIT", "P/E", "P/B", "PEG", "P/S"]
+    assert lines[1].split() == ["AAPL", "2022", "43.31", "30.29", "25.31", "22.50", "24.44", "48.14", "3.10", "6.18"]
+    assert lines[2].split()[:3] == ["AAPL", "2023", "-"]
+    assert "{" not in str(result) and "\\" not in str(result)
+
+
+def test_historical_result_no_data():
+    """Test the rendering of a result without any value."""
+    result = HistoricalResult([MetricsRow("AAPL", 2022)])
+    assert str(result) == "No historical data available for the given symbols and years."
+
+
+def test_competitive_result_rendering():
+    """Test that the competitive result leaves out the margin columns it does not fetch."""
+    result = CompetitiveResult("AAPL", "MSFT", [MetricsRow.from_tool_values("MSFT", 2022, price_to_EBIT="30", ratios=RATIOS)])
+    lines = str(result).splitlines()
+    assert lines[0] == "AAPL vs MSFT"
+    assert "gross%" not in lines[1]
+    assert str(CompetitiveResult("AAPL", error="No related companies found")) == "AAPL: No related companies found"
+
+
+def test_qualitative_result_rendering():
+    """Test that the company profile keeps the description and the article headlines."""
+    business_info = json.dumps({"businessDescription": "Makes phones."})
+    company_data = json.dumps({"1": {"Title": "Earnings beat", "Description": "Revenue grew.", "Published Date": "2022-05-01T10:00:00Z",
+                                     "Source": "Reuters", "URL": "https://example.com"}})
+    result = QualitativeResult([CompanyProfile.from_tool_values("AAPL", business_info, company_data)])
+    assert str(result) == "AAPL: Makes phones.\n- 2022-05-01 Earnings beat (Reuters): Revenue grew."
+
+
+def test_quick_ratio_result():
+    """Test the quick ratio result with a value and with an error message."""
+    assert str(QuickRatioResult.from_tool_value("AAPL", 2022, "0.8512")) == "AAPL 2022 quick ratio: 0.85"
+    assert QuickRatioResult.from_tool_value("AAPL", 2022, "None").error == "No quick ratio available."
+
+
+def test_search_results_rendering():
+    """Test that the search results are numbered and empty results have a message."""
+    results = SearchResults([SearchResult("Title", "https://example.com", "snippet", "body")])
+    assert str(results) == "1. Title (https://example.com)\nsnippet\nbody"
+    assert str(SearchResults()) == "No search results found."
+
+
+def test_format_table_alignment():
+    """Test that the table columns are padded to the widest cell."""
+    assert format_table(["a", "bb"], [["ccc", "d"]]) == "a   bb\nccc d"
@@ -1,2 +1,2 @@
-from .judges_functions import get_investment_house_discussion
+from .judges_functions import get_investment_house_discussion, search_investment_house_discussion
 from .search import google_search
\ No newline at end of file
@@ -0,0 +1,49 @@
+"""
+async_search.py
+Async version of the Google search tool of the search agent.
+The search request and the page downloads go through the async HTTP client, and the result pages are fetched concurrently.
+"""
+import asyncio
+from database.http_client import get_async_http_client
+from finance.point_in_time import RunContext
+from finance.tool_results import SearchResult, SearchResults
+from utils.search import GOOGLE_SEARCH_URL, _page_text, _search_params
+
+
+async def google_search(context: RunContext, query: str, num_results: int = 2, max_chars: int = 500) -> SearchResults:
+    """
+    Perform a Google search and return the top results.
+    the query use the start year of the run, ensures that Google only returns articles published on or before December 31 of it.
+    The agents' tool is bound to the context of their run (see InitAgents).
+
+    Args:
+        context (RunContext): The run, whose start year limits the results
+        query (str): The search query
+        num_results (int): The number of search results to return
+        max_chars (int): The maximum number of characters to return from the page content
+
+    Returns:
+        SearchResults: The title, link, snippet, and body of each search result
+    """
+    params = _search_params(query, num_results, context.start_year)
+    response = await get_async_http_client().get(GOOGLE_SEARCH_URL, params=params)
+
+    if response.status_code != 200:
+        print(response.json())
+        raise Exception(f"Error in API request: {response.status_code}")
+
+    results = response.json().get("items", [])
+
+    async def get_page_content(url: str) -> str:
+        try:
+            response = await get_async_http_client().get(url, retries=0, timeout=(5, 10), follow_redirects=True)
+            return _page_text(response.content, max_chars)
+        except Exception as e:
+            print(f"Error fetching {url}: {str(e)}")
+            return ""
+
+    bodies = await asyncio.gather(*[get_page_content(item["link"]) for item in results])
+    return SearchResults([
+        SearchResult(title=item["title"], link=item["link"], snippet=item["snippet"], body=body)
+        for item, body in zip(results, bodies)
+    ])
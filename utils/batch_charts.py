@@ -0,0 +1,130 @@
+"""
+batch_charts.py
+Batch rendering of the report charts of many tickers.
+The data of every chart is loaded first, through the cache on a thread pool as the prefetch does. The CPU-bound
+drawing is then fanned out across a process pool: each worker draws from the preloaded data only (chart_figures.py)
+and writes its image to the output directory, so a report build uses every core.
+
+Usage (the caching service from Main.py must be running):
+    python -m utils.batch_charts AAPL MSFT NVDA --output report_charts --workers 8
+"""
+import argparse
+import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor, as_completed
+from dataclasses import dataclass
+from typing import Any, Dict, Iterable, List, Optional
+from config.app_constants import END_YEAR, REPORT_CHARTS_DIR, START_YEAR, TICKER_STOCKS
+from finance.LLM_get_qualitative import extract_business_info
+from finance.point_in_time import RunContext
+from utils import visualization_functions
+from utils.chart_figures import QualitativeData, RENDERERS, write_chart
+
+CHART_KINDS = list(RENDERERS)
+
+
+@dataclass
+class ChartJob:
+    kind: str
+    # The file name of the image, without the extension
+    name: str
+    # The ComparisonData or QualitativeData of the chart
+    data: Any
+
+
+def _load_company_comparison(symbol: str, years: List[int], context: RunContext) -> ChartJob:
+    peers, label = visualization_functions.comparison_peers(symbol, as_of=context.as_of)
+    return ChartJob("company_comparison", f"{symbol}_company_comparison",
+                    visualization_functions.comparison_data(symbol, peers, years, label, context.as_of))
+
+
+def _load_qualitative_summary(symbol: str, years: List[int], context: RunContext) -> ChartJob:
+    return ChartJob("qualitative_summary", f"{symbol}_qualitative_summary", QualitativeData(symbol, extract_business_info(symbol, context.as_of)))
+
+
+_LOADERS = {
+    "company_comparison": _load_company_comparison,
+    "qualitative_summary": _load_qualitative_summary,
+}
+
+
+def load_chart_jobs(symbols: Iterable[str], years: Optional[List[int]] = None, kinds: Iterable[str] = CHART_KINDS,
+                    max_workers: int = 8, context: Optional[RunContext] = None) -> List[ChartJob]:
+    """
+    Loads the data of the charts of every symbol through the cache.
+
+    Args:
+        symbols (Iterable[str]): The stock ticker symbols
+        years (List[int], optional): The years of the comparison charts, the analysis period by default
+        kinds (Iterable[str]): The chart kinds, all by default
+        max_workers (int): The number of concurrent loads
+        context (RunContext, optional): The run whose as-of date the data is loaded at, a run over the years by default
+
+    Returns:
+        List[ChartJob]: One job per symbol and kind, in that order; the charts whose data failed to load are left out
+    """
+    years = list(years) if years else list(range(START_YEAR, END_YEAR + 1))
+    context = context or RunContext.for_years(years[0], years[-1])
+    tasks = [(symbol.strip().upper(), kind) for symbol in symbols if symbol.strip() for kind in kinds]
+    jobs = {}
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        futures = {executor.submit(_LOADERS[kind], symbol, years, context): (symbol, kind) for symbol, kind in tasks}
+        for future in as_completed(futures):
+            symbol, kind = futures[future]
+            try:
+                jobs[(symbol, kind)] = future.result()
+            except Exception as e:
+                print(f"Error loading the {kind} chart of {symbol}: {str(e)}")
+    return [jobs[task] for task in tasks if task in jobs]
+
+
+def render_charts(jobs: List[ChartJob], output_dir: str = REPORT_CHARTS_DIR, max_workers: Optional[int] = None) -> Dict[str, str]:
+    """
+    Renders the charts on a process pool and writes them to the output directory.
+
+    Args:
+        jobs (List[ChartJob]): The charts, with their preloaded data
+        output_dir (str): The directory of the images
+        max_workers (int, optional): The number of worker processes, one per core by default
+
+    Returns:
+        Dict[str, str]: The path of the image of every rendered chart by name; the failed charts are reported and left out
+    """
+    os.makedirs(output_dir, exist_ok=True)
+    if not jobs:
+        return {}
+    workers = min(max_workers or os.cpu_count() or 1, len(jobs))
+    paths = {}
+    # Spawned workers do not inherit the threads and locks of the parent (the Streamlit and FastAPI threads)
+    with ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context("spawn")) as executor:
+        futures = {
+            executor.submit(write_chart, job.kind, job.data, os.path.join(output_dir, f"{job.name}.png")): job
+            for job in jobs
+        }
+        for future in as_completed(futures):
+            job = futures[future]
+            try:
+                paths[job.name] = future.result()
+            except Exception as e:
+                print(f"Error rendering the chart {job.name}: {str(e)}")
+    return {job.name: paths[job.name] for job in jobs if job.name in paths}
+
+
+def build_report_charts(symbols: Iterable[str], output_dir: str = REPORT_CHARTS_DIR, years: Optional[List[int]] = None,
+                        kinds: Iterable[str] = CHART_KINDS, max_workers: Optional[int] = None) -> Dict[str, str]:
+    """Loads and renders the report charts of every symbol. Returns the path of every image by chart name."""
+    return render_charts(load_chart_jobs(symbols, years, kinds), output_dir, max_workers)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Render the report charts of many tickers on every core.")
+    parser.add_argument("symbols", nargs="*", default=TICKER_STOCKS)
+    parser.add_argument("--output", default=REPORT_CHARTS_DIR)
+    parser.add_argument("--start-year", type=int, default=START_YEAR)
+    parser.add_argument("--end-year", type=int, default=END_YEAR)
+    parser.add_argument("--kinds", nargs="*", choices=CHART_KINDS, default=CHART_KINDS)
+    parser.add_argument("--workers", type=int, default=None)
+    args = parser.parse_args()
+
+    paths = build_report_charts(args.symbols, args.output, list(range(args.start_year, args.end_year + 1)), args.kinds, args.workers)
+    print(f"{len(paths)} charts written to {args.output}")
@@ -0,0 +1,188 @@
+"""
+chart_figures.py
+Drawing of the charts from preloaded data, with the object-oriented Figure API of matplotlib.
+Nothing here fetches data or touches pyplot, so the charts can be rendered in worker processes (see batch_charts.py).
+Each process reuses one Figure per chart kind, cleared between charts.
+"""
+import json
+import os
+import threading
+from dataclasses import dataclass
+from io import BytesIO
+from typing import List, Tuple
+import numpy as np
+from matplotlib.figure import Figure
+
+MARGIN_LABELS = ['Gross Margin', 'Operating Margin', 'Net Margin']
+VALUATION_LABELS = ['P/E Ratio', 'P/S Ratio', 'P/B Ratio', 'P/EBIT Ratio']
+
+
+@dataclass
+class ComparisonData:
+    symbol: str
+    competitor: str
+    years: List[int]
+    # (metric, company or competitor, year) arrays, NaN for the missing values,
+    # in the order of MARGIN_LABELS and VALUATION_LABELS
+    margins: np.ndarray
+    valuations: np.ndarray
+
+
+@dataclass
+class QualitativeData:
+    symbol: str
+    business_info: str
+
+
+# The figures are reused, so one chart is drawn at a time in a process
+_render_lock = threading.Lock()
+_figures = {}
+
+
+def _figure(name: str, figsize: Tuple[float, float]) -> Figure:
+    """Returns the figure of a chart kind, cleared and resized; it is reused instead of creating a figure per chart."""
+    fig = _figures.get(name)
+    if fig is None:
+        fig = _figures[name] = Figure()
+    fig.clear()
+    fig.set_size_inches(*figsize)
+    return fig
+
+
+def _png(fig: Figure) -> bytes:
+    buf = BytesIO()
+    fig.savefig(buf, format='png', dpi=100)
+    return buf.getvalue()
+
+
+def _message_chart(name: str, message: str) -> bytes:
+    """Renders a chart with only a message, on the figure of the chart kind."""
+    fig = _figure(name, (8, 4))
+    ax = fig.subplots()
+    ax.axis('off')
+    ax.text(0.5, 0.5, message, fontsize=12, ha='center', va='center', wrap=True)
+    return _png(fig)
+
+
+def _bar_comparison(ax, labels: List[str], values: List[np.ndarray], data: ComparisonData, ylabel: str, title: str):
+    x = np.arange(len(labels))
+    width = 0.35
+
+    ax.bar(x - width/2, [value[0] for value in values], width, label=data.symbol)
+    ax.bar(x + width/2, [value[1] for value in values], width, label=data.competitor)
+
+    ax.set_ylabel(ylabel)
+    ax.set_title(title)
+    ax.set_xticks(x)
+    ax.set_xticklabels(labels)
+    ax.legend()
+
+
+def _company_comparison(data: ComparisonData) -> bytes:
+    # Determine which years have data: a margin of both companies
+    available_years = [year for year, available in zip(data.years, (~np.isnan(data.margins)).any(axis=0).all(axis=0)) if available]
+    if not available_years:
+        # If no data is available, the same figure shows an error message
+        return _message_chart("company_comparison", f"No financial data available for comparison between {data.symbol} and {data.competitor}.")
+
+    fig = _figure("company_comparison", (10, 12))
+    axes = fig.subplots(2, 1)
+
+    # Use the most recent year with available data
+    latest_year = max(available_years)
+    latest = data.years.index(latest_year)
+
+    # Plot the margins available for both companies
+    margins = [(label, values) for label, values in zip(MARGIN_LABELS, data.margins[:, :, latest]) if not np.isnan(values).any()]
+    if margins:
+        _bar_comparison(axes[0], [label for label, _ in margins], [values for _, values in margins], data,
+                        'Percentage (%)', f'Profit Margins Comparison ({latest_year})')
+    else:
+        axes[0].axis('off')
+        axes[0].text(0.5, 0.5, "No margin data available for comparison", fontsize=12, ha='center', va='center')
+
+    # Plot the valuation metrics with a non-zero value for both companies
+    valuations = data.valuations[:, :, latest]
+    if not np.isnan(valuations).all():
+        valuations = [(label, values) for label, values in zip(VALUATION_LABELS, valuations) if not np.isnan(values).any() and values.all()]
+        if valuations:
+            _bar_comparison(axes[1], [label for label, _ in valuations], [values for _, values in valuations], data,
+                            'Ratio', f'Valuation Metrics Comparison ({latest_year})')
+        else:
+            axes[1].axis('off')
+            axes[1].text(0.5, 0.5, "No valuation metrics available for comparison", fontsize=12, ha='center', va='center')
+    else:
+        axes[1].axis('off')
+        axes[1].text(0.5, 0.5, "No valuation data available for comparison", fontsize=12, ha='center', va='center')
+
+    fig.tight_layout()
+    return _png(fig)
+
+
+def _qualitative_summary(data: QualitativeData) -> bytes:
+    try:
+        # Parse business info
+        info = json.loads(data.business_info)
+        description = info.get("businessDescription", "No description available")
+
+        # Extract up to 5 substantial sentences as key points
+        sentences = description.split('.')
+        key_points = [s.strip() for s in sentences if len(s.strip()) > 20][:5]
+
+        fig = _figure("qualitative_summary", (10, 6))
+        ax = fig.subplots()
+        ax.axis('off')
+        ax.text(0.5, 0.95, f"{data.symbol} Key Business Factors", fontsize=18, ha='center', weight='bold')
+
+        # Add key points as bullet points, limiting their length
+        y_pos = 0.85
+        for point in key_points:
+            if len(point) > 100:
+                point = point[:97] + "..."
+            ax.text(0.1, y_pos, f"• {point}", fontsize=12, ha='left', va='top', wrap=True)
+            y_pos -= 0.15
+
+        return _png(fig)
+    except Exception as e:
+        # If there's an error, create a simple error chart
+        return _message_chart("qualitative_summary", f"Error creating qualitative summary: {str(e)}")
+
+
+# Chart kind -> drawing function of its data
+RENDERERS = {
+    "company_comparison": _company_comparison,
+    "qualitative_summary": _qualitative_summary,
+}
+
+
+def render_chart(kind: str, data) -> bytes:
+    """
+    Renders a chart from its preloaded data.
+
+    Args:
+        kind (str): One of RENDERERS
+        data: The ComparisonData or QualitativeData of the chart
+
+    Returns:
+        bytes: The PNG image
+    """
+    if kind not in RENDERERS:
+        raise ValueError(f"Unknown chart kind '{kind}'. Expected one of {', '.join(RENDERERS)}")
+    with _render_lock:
+        return RENDERERS[kind](data)
+
+
+def write_chart(kind: str, data, path: str) -> str:
+    """
+    Renders a chart from its preloaded data and writes the image. Used by the worker processes of batch_charts.py.
+
+    Returns:
+        str: The path of the image
+    """
+    png = render_chart(kind, data)
+    # Readers never see a half-written file
+    temporary_path = f"{path}.{os.getpid()}.tmp"
+    with open(temporary_path, "wb") as f:
+        f.write(png)
+    os.replace(temporary_path, path)
+    return path
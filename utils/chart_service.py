@@ -0,0 +1,134 @@
+"""
+chart_service.py
+Memoized rendering of the charts of visualization_functions.py.
+A chart is rendered once per (kind, symbol, competitor, years, data version) and kept on disk as a PNG file named by
+the hash of its key. The cache service serves the files at /charts/<chart id>.png, so the agents receive a short URL
+instead of a base64 image. The data version is the as-of date of the run and the id of the latest cached API response
+of the charted tickers: a chart is rendered again only when its data changes.
+"""
+import hashlib
+import json
+import os
+import re
+import sqlite3
+import threading
+from collections import defaultdict
+from typing import Any, Callable, Iterable, List, Optional
+from config.app_constants import CHART_CACHE_DIR, CHART_SERVICE_URL, END_YEAR, START_YEAR
+from database.db import DB
+from finance.point_in_time import RunContext
+from utils import visualization_functions
+
+DB_NAME = "stock_trading.db"
+CHART_ID = re.compile(r"^[0-9a-f]{32}$")
+
+
+def chart_key(kind: str, *parts: Any) -> str:
+    """Returns the id of a chart: the hash of its kind and of the parts of its key."""
+    return hashlib.sha256(json.dumps([kind, *parts], default=str).encode("utf-8")).hexdigest()[:32]
+
+
+def chart_url(chart_id: str, base_url: str = CHART_SERVICE_URL) -> str:
+    """Returns the URL the cache service serves a chart at."""
+    return f"{base_url}/charts/{chart_id}.png"
+
+
+class ChartService:
+    def __init__(self, cache_dir: str = CHART_CACHE_DIR, db_name: str = DB_NAME):
+        self.cache_dir = cache_dir
+        self.db_name = db_name
+        # One lock per chart, so concurrent requests of the same chart render it once
+        self._locks = defaultdict(threading.Lock)
+        self._locks_guard = threading.Lock()
+
+    def _connect(self) -> DB:
+        return DB(sqlite3, self.db_name, timeout=30)
+
+    def data_version(self, symbols: Iterable[str], as_of: Optional[str] = None) -> str:
+        """
+        Returns the version of the cached data of the given tickers, as of a date.
+
+        Args:
+            symbols (Iterable[str]): The ticker symbols
+            as_of (str, optional): The as-of date of the data (YYYY-MM-DD), None for the latest data
+
+        Returns:
+            str: "<as-of date>:<id of the latest cached API response of the tickers>"
+        """
+        symbols = list(symbols)
+        latest_call_id = 0
+        if symbols:
+            # The ticker is the last segment of the path of the API urls, before the query string
+            conditions = " OR ".join(["url LIKE ? OR url LIKE ?"] * len(symbols))
+            params = [pattern for symbol in symbols for pattern in (f"%/{symbol}", f"%/{symbol}?%")]
+            db = self._connect()
+            try:
+                latest_call_id = db.execute(f"SELECT MAX(id) FROM API_calls WHERE {conditions}", params).fetchone()[0] or 0
+            except sqlite3.Error as e:
+                print(f"Error reading the data version of {', '.join(symbols)}: {str(e)}")
+            finally:
+                db.close()
+        return f"{as_of}:{latest_call_id}"
+
+    def path(self, chart_id: str) -> Optional[str]:
+        """Returns the file of a rendered chart, or None if the id is invalid or the chart was not rendered."""
+        if not CHART_ID.match(chart_id or ""):
+            return None
+        path = os.path.join(self.cache_dir, f"{chart_id}.png")
+        return path if os.path.exists(path) else None
+
+    def _memoize(self, chart_id: str, render: Callable[[], bytes]) -> str:
+        """Renders a chart unless its file exists. Returns its id."""
+        path = os.path.join(self.cache_dir, f"{chart_id}.png")
+        if os.path.exists(path):
+            return chart_id
+        with self._locks_guard:
+            lock = self._locks[chart_id]
+        with lock:
+            if not os.path.exists(path):
+                png = render()
+                os.makedirs(self.cache_dir, exist_ok=True)
+                # Readers never see a half-written file
+                temporary_path = f"{path}.{threading.get_ident()}.tmp"
+                with open(temporary_path, "wb") as f:
+                    f.write(png)
+                os.replace(temporary_path, path)
+        with self._locks_guard:
+            self._locks.pop(chart_id, None)
+        return chart_id
+
+    def company_comparison(self, symbol: str, competitor: Optional[str] = None, years: Optional[List[int]] = None,
+                           context: Optional[RunContext] = None) -> str:
+        """
+        Returns the id of the chart comparing a company with a competitor, or with its peer median.
+
+        Args:
+            symbol (str): The main company ticker symbol
+            competitor (str, optional): The competitor ticker symbol. If None, the peer group of related companies.
+            years (List[int], optional): The years of the comparison, the analysis period by default
+            context (RunContext, optional): The run whose as-of date the data is charted at, a run over the years by default
+
+        Returns:
+            str: The chart id
+        """
+        years = list(years) if years else list(range(START_YEAR, END_YEAR + 1))
+        as_of = (context or RunContext.for_years(years[0], years[-1])).as_of
+        peers, label = visualization_functions.comparison_peers(symbol, competitor, as_of)
+        chart_id = chart_key("company_comparison", symbol, peers, label, years, self.data_version([symbol] + peers, as_of))
+        return self._memoize(chart_id, lambda: visualization_functions.render_company_comparison(symbol, peers, years, label, as_of))
+
+    def qualitative_summary(self, symbol: str, business_info: str) -> str:
+        """Returns the id of the qualitative summary chart of a company; its data version is the business description."""
+        chart_id = chart_key("qualitative_summary", symbol, hashlib.sha256(business_info.encode("utf-8")).hexdigest())
+        return self._memoize(chart_id, lambda: visualization_functions.render_qualitative_summary(symbol, business_info))
+
+
+_chart_service = None
+
+
+def get_chart_service() -> ChartService:
+    """Returns the chart service of the application cache directory."""
+    global _chart_service
+    if _chart_service is None:
+        _chart_service = ChartService()
+    return _chart_service
@@ -0,0 +1,113 @@
+"""
+dashboard_data.py
+Data of the dashboard page (pages/dashboard.py), as compact column arrays the Streamlit charts draw client-side.
+Each loader fetches through the cache once; the page memoizes them with st.cache_data, keyed by the data version of
+the chart service, so a rerun redraws without fetching and new cached responses of a ticker invalidate its entries.
+"""
+from typing import Dict, List, Optional
+import numpy as np
+import pandas as pd
+from config.app_constants import PEER_GROUP_SIZE
+from finance.agents_functions import batch_metrics
+from finance.judge_profit import get_historical_data
+from finance.LLM_get_financial import get_related_companies
+from finance.peer_group import PEER_METRICS, compare_with_peers
+from finance.point_in_time import as_of_date
+from utils import chart_service
+
+# MetricsRow attribute -> label of the dashboard
+METRIC_LABELS = {
+    "gross_margin": "Gross margin (%)",
+    "operating_margin": "Operating margin (%)",
+    "net_margin": "Net margin (%)",
+    "price_to_ebit": "P/EBIT",
+    "price_to_earning": "P/E",
+    "price_to_book": "P/B",
+    "price_earnings_to_growth": "PEG",
+    "price_to_sales": "P/S",
+}
+
+
+def data_version(symbols: List[str]) -> str:
+    """Returns the version of the cached data of the tickers, the cache key of their dashboard entries."""
+    return chart_service.get_chart_service().data_version(symbols, as_of_date())
+
+
+def load_metrics(symbols: List[str], years: List[int]) -> Dict[str, np.ndarray]:
+    """
+    Loads the margins and multiples of every symbol and year.
+
+    Returns:
+        Dict[str, np.ndarray]: One float32 (symbols, years) matrix per metric of METRIC_LABELS, NaN for the missing values
+    """
+    batch = batch_metrics(symbols, years, as_of=as_of_date())
+    return {metric: batch.get(metric).astype(np.float32) for metric in METRIC_LABELS}
+
+
+def metrics_frame(metrics: Dict[str, np.ndarray], symbols: List[str], years: List[int], year: int) -> pd.DataFrame:
+    """Returns the metrics of a year as a table, one row per symbol and one column per metric."""
+    column = years.index(year)
+    return pd.DataFrame({METRIC_LABELS[metric]: values[:, column] for metric, values in metrics.items()}, index=pd.Index(symbols, name="symbol"))
+
+
+def metric_history_frame(metrics: Dict[str, np.ndarray], metric: str, symbols: List[str], years: List[int]) -> pd.DataFrame:
+    """Returns a metric over the years, one row per year and one column per symbol."""
+    return pd.DataFrame(metrics[metric].T, index=pd.Index([str(year) for year in years], name="year"), columns=symbols)
+
+
+def load_peer_group(symbol: str, years: List[int]) -> Optional[Dict[str, pd.DataFrame]]:
+    """
+    Loads the peer group of a symbol: its metrics, the peer medians and its percentiles among its peers.
+
+    Returns:
+        Optional[dict]: {"peers": [...], "metrics": DataFrame per company and year, "medians": DataFrame per year,
+        "percentiles": DataFrame per year}, or None if the symbol has no related companies
+    """
+    peers = [company for company in get_related_companies(symbol, n=PEER_GROUP_SIZE + 1, as_of=as_of_date()) if company != symbol][:PEER_GROUP_SIZE]
+    if not peers:
+        return None
+    batch = batch_metrics([symbol] + peers, years, as_of=as_of_date())
+    medians, percentiles = compare_with_peers(batch)
+
+    def frame(rows, index):
+        values = [[getattr(row, metric) for metric, _ in PEER_METRICS] for row in rows]
+        return pd.DataFrame(values, index=index, columns=[METRIC_LABELS[metric] for metric, _ in PEER_METRICS], dtype=np.float32)
+
+    rows = batch.rows()
+    by_year = pd.Index([str(year) for year in years], name="year")
+    return {
+        "peers": peers,
+        "metrics": frame(rows, pd.MultiIndex.from_tuples([(row.symbol, str(row.year)) for row in rows], names=["symbol", "year"])),
+        "medians": frame(medians, by_year),
+        "percentiles": frame(percentiles, by_year),
+    }
+
+
+def load_price_history(symbol: str, start_year: int, end_year: int) -> Optional[Dict[str, np.ndarray]]:
+    """
+    Loads the daily closing prices of a symbol between two years.
+
+    Returns:
+        Optional[dict]: {"date": datetime64[D] array, "close": float32 array} in date order, or None without prices
+    """
+    data = get_historical_data(symbol)
+    records = data.get("historical", []) if isinstance(data, dict) else []
+    dates = np.array([record.get("date", "")[:10] for record in records], dtype="datetime64[D]")
+    closes = np.array([record.get("close") if record.get("close") is not None else np.nan for record in records], dtype=np.float32)
+    years = dates.astype("datetime64[Y]").astype(int) + 1970
+    keep = (years >= start_year) & (years <= end_year) & ~np.isnan(closes)
+    if not keep.any():
+        return None
+    order = np.argsort(dates[keep])
+    return {"date": dates[keep][order], "close": closes[keep][order]}
+
+
+def price_frame(prices: Dict[str, Dict[str, np.ndarray]], rebase: bool = True) -> pd.DataFrame:
+    """
+    Returns the closing prices of several symbols, one column per symbol, rebased to 100 at their first date if asked.
+    """
+    series = {}
+    for symbol, history in prices.items():
+        close = history["close"] / history["close"][0] * 100 if rebase else history["close"]
+        series[symbol] = pd.Series(close, index=pd.DatetimeIndex(history["date"], name="date"))
+    return pd.DataFrame(series)
@@ -1,44 +1,127 @@
 """This module contains functions for the judge agents in the investment house competition."""
 import os
+import re
 import time
-import requests
 from bs4 import BeautifulSoup
 from dotenv import load_dotenv
-from config.app_constants import END_YEAR
-import streamlit as st
+from database.http_client import get_http_client
+from database import run_store
+from database.tokens import count_tokens
+from finance.point_in_time import RunContext
 
+# Maximum tokens of the discussion returned to the judges
+DISCUSSION_MAX_TOKENS = 3000
+# Passages and maximum tokens returned by the search over the discussions
+SEARCH_TOP_K = 5
+SEARCH_MAX_TOKENS = 1500
 
-def get_investment_house_discussion(house_id: int = None) -> str:
+
+def get_investment_house_discussion(run_id: str, house_id: int = None, agent: str = None) -> str:
     """
-    This function reads the content of a text file and returns it as a string.
-    if the file is not found, it returns a message indicating that no discussion was found.
+    This function returns the discussion of an investment house in a run from the run store.
+    Only the messages of the given agent are returned if an agent is given, and the discussion is limited
+    to DISCUSSION_MAX_TOKENS tokens.
+    if no discussion is found, it returns a message indicating that no discussion was found.
+    The judges' tool is bound to the run they judge (see InitJudgeAgent), so the model only passes the house and agent.
     
     Args:
+        run_id (str): The run of the discussion
         house_id (int): The ID of the investment house
+        agent (str, optional): The name of the agent whose messages to return, e.g. Liquidity_Analyst
 
     Returns:
-        str: The content of the text file
+        str: The messages of the discussion, one "[role]: content" entry per message
     """
     if house_id not in [1, 2]:
         return "Invalid house ID. Please call with 1 or 2."
-    
-    filename = f"house{house_id}_discussion.txt"
-    try:
-        with open(filename, "r", encoding="utf-8") as f:
-            content = f.read().strip()
-            if not content:
-                return f"Discussion file for House {house_id} is empty."
-            return content[:1000]
-    except FileNotFoundError:
-        return f"Discussion file for House {house_id} not found."
-    
 
-def google_search(query: str, num_results: int = 2, max_chars: int = 500) -> list:
+    if not run_id:
+        return f"Discussion for House {house_id} not found."
+
+    store = run_store.get_run_store()
+    messages = store.get_messages(run_id, house_id=house_id, role=agent)
+    messages = [msg for msg in messages if msg["role"] != "user"]
+    if not messages:
+        agent_text = f" from {agent}" if agent else ""
+        return f"No messages{agent_text} found in the discussion of House {house_id}."
+
+    entries = []
+    tokens = 0
+    for msg in messages:
+        if tokens + msg["tokens"] > DISCUSSION_MAX_TOKENS:
+            entries.append(f"[{len(messages) - len(entries)} more messages not shown]")
+            break
+        entries.append(f"[{msg['role']}]: {msg['content']}")
+        tokens += msg["tokens"]
+    return "\n\n".join(entries)
+
+
+def search_investment_house_discussion(run_id: str, query: str, house_id: int = None, top_k: int = SEARCH_TOP_K) -> str:
+    """
+    This function returns the passages of the houses' discussions in a run most relevant to a question,
+    ranked with BM25 over the full-text index of the run store, within SEARCH_MAX_TOKENS tokens.
+    If the question names an agent (e.g. "how did the Solid_Analyst justify the allocation"), only its messages are searched.
+    Messages that don't fit in the remaining tokens are replaced by a snippet around the matched words.
+    The judges' tool is bound to the run they judge (see InitJudgeAgent).
+
+    Args:
+        run_id (str): The run of the discussions
+        query (str): The question, in natural language
+        house_id (int, optional): The ID of the investment house (1 or 2). Both houses are searched if not given.
+        top_k (int): The maximum number of passages
+
+    Returns:
+        str: The passages, one "[House N - role - message seq]: text" entry per message
+    """
+    if house_id is not None and house_id not in [1, 2]:
+        return "Invalid house ID. Please call with 1 or 2, or without a house ID."
+
+    if not run_id:
+        return "No discussion found."
+
+    store = run_store.get_run_store()
+
+    # An agent named in the question filters the search, and its name is not searched for in the text
+    agent = None
+    for role in store.get_roles(run_id):
+        names = [role, role.replace("_", " ")]
+        if role != "user" and any(re.search(rf"\b{re.escape(name)}\b", query, re.IGNORECASE) for name in names):
+            agent = role
+            for name in names:
+                query = re.sub(rf"\b{re.escape(name)}\b", " ", query, flags=re.IGNORECASE)
+            break
+
+    # The judges' own discussion is not searched
+    houses = [house_id] if house_id is not None else [1, 2]
+    results = store.search_messages(run_id, query, house_id=house_id, role=agent, exclude_roles=["user"], limit=top_k * 2)
+    results = [msg for msg in results if msg["house_id"] in houses][:top_k]
+    if not results and agent:
+        results = [msg for msg in store.get_messages(run_id, house_id=house_id, role=agent) if msg["house_id"] in houses][:top_k]
+    if not results:
+        return f"No passages found for '{query.strip()}'."
+
+    entries = []
+    tokens = 0
+    for msg in results:
+        text, text_tokens = msg["content"], msg["tokens"]
+        if tokens + text_tokens > SEARCH_MAX_TOKENS and msg.get("snippet"):
+            text = msg["snippet"]
+            text_tokens = count_tokens(text)
+        if tokens + text_tokens > SEARCH_MAX_TOKENS:
+            break
+        entries.append(f"[House {msg['house_id']} - {msg['role']} - message {msg['seq']}]: {text}")
+        tokens += text_tokens
+    return "\n\n".join(entries)
+
+
+def google_search(context: RunContext, query: str, num_results: int = 2, max_chars: int = 500) -> list:
     """
     Perform a Google search and return the top results.
-    the query use START_YEAR, ensures that Google only returns articles published on or before December 31, START_YEAR.
+    the query use the end year of the run, ensures that Google only returns articles published on or before December 31 of it.
+    The judges' tool is bound to the context of their run (see InitJudgeAgent).
 
     Args:
+        context (RunContext): The judged run, whose end year limits the results
         query (str): The search query
         num_results (int): The number of search results to return
         max_chars (int): The maximum number of characters to return from the page content
@@ -53,14 +136,14 @@ def google_search(query: str, num_results: int = 2, max_chars: int = 500) -> lis
 
     if not api_key or not search_engine_id:
         raise ValueError("API key or Search Engine ID not found in environment variables")
-    before_year = st.session_state.get("END_YEAR", END_YEAR) 
+    before_year = context.end_year
     if before_year:
         query += f" before:{before_year}-12-31"
 
     url = "https://customsearch.googleapis.com/customsearch/v1"
     params = {"key": str(api_key), "cx": str(search_engine_id), "q": str(query), "num": str(num_results)}
 
-    response = requests.get(url, params=params)
+    response = get_http_client().get(url, params=params)
 
     if response.status_code != 200:
         print(response.json())
@@ -70,7 +153,7 @@ def google_search(query: str, num_results: int = 2, max_chars: int = 500) -> lis
 
     def get_page_content(url: str) -> str:
         try:
-            response = requests.get(url, timeout=10)
+            response = get_http_client().get(url, retries=0, timeout=(5, 10))
             soup = BeautifulSoup(response.content, "html.parser")
             text = soup.get_text(separator=" ", strip=True)
             words = text.split()
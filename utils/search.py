@@ -5,26 +5,17 @@ The function uses the Google Custom Search API to perform the search and the Bea
 """
 import os
 import time
-import requests
+from typing import Optional
 from bs4 import BeautifulSoup
 from dotenv import load_dotenv
-from config.app_constants import START_YEAR
-import streamlit as st
+from database.http_client import get_http_client
+from finance.tool_results import SearchResult, SearchResults
 
+GOOGLE_SEARCH_URL = "https://customsearch.googleapis.com/customsearch/v1"
 
-def google_search(query: str, num_results: int = 2, max_chars: int = 500) -> list:  # type: ignore[type-arg]
-    """
-    Perform a Google search and return the top results.
-    the query use START_YEAR, ensures that Google only returns articles published on or before December 31, START_YEAR.
 
-    Args:
-        query (str): The search query
-        num_results (int): The number of search results to return
-        max_chars (int): The maximum number of characters to return from the page content
-
-    Returns:
-        list: A list of dictionaries containing the title, link, snippet, and body of each search result
-    """
+def _search_params(query: str, num_results: int, before_year: Optional[int]) -> dict:
+    """Returns the Custom Search API params of the query, limited to results published before the given year ends."""
     load_dotenv()
 
     api_key = os.getenv("GOOGLE_API_KEY")
@@ -32,14 +23,41 @@ def google_search(query: str, num_results: int = 2, max_chars: int = 500) -> lis
 
     if not api_key or not search_engine_id:
         raise ValueError("API key or Search Engine ID not found in environment variables")
-    before_year = st.session_state.get("START_YEAR", START_YEAR) 
     if before_year:
         query += f" before:{before_year}-12-31"
 
-    url = "https://customsearch.googleapis.com/customsearch/v1"
-    params = {"key": str(api_key), "cx": str(search_engine_id), "q": str(query), "num": str(num_results)}
+    return {"key": str(api_key), "cx": str(search_engine_id), "q": str(query), "num": str(num_results)}
+
+
+def _page_text(content: bytes, max_chars: int) -> str:
+    """Returns the first words of the page text, up to max_chars characters."""
+    soup = BeautifulSoup(content, "html.parser")
+    text = soup.get_text(separator=" ", strip=True)
+    words = text.split()
+    page_text = ""
+    for word in words:
+        if len(page_text) + len(word) + 1 > max_chars:
+            break
+        page_text += " " + word
+    return page_text.strip()
 
-    response = requests.get(url, params=params)
+
+def google_search(query: str, num_results: int = 2, max_chars: int = 500, before_year: Optional[int] = None) -> SearchResults:
+    """
+    Perform a Google search and return the top results.
+    the query use before_year, ensures that Google only returns articles published on or before December 31, before_year.
+
+    Args:
+        query (str): The search query
+        num_results (int): The number of search results to return
+        max_chars (int): The maximum number of characters to return from the page content
+        before_year (int, optional): The last year of the results, None for no limit
+
+    Returns:
+        SearchResults: The title, link, snippet, and body of each search result
+    """
+    params = _search_params(query, num_results, before_year)
+    response = get_http_client().get(GOOGLE_SEARCH_URL, params=params)
 
     if response.status_code != 200:
         print(response.json())
@@ -49,16 +67,8 @@ def google_search(query: str, num_results: int = 2, max_chars: int = 500) -> lis
 
     def get_page_content(url: str) -> str:
         try:
-            response = requests.get(url, timeout=10)
-            soup = BeautifulSoup(response.content, "html.parser")
-            text = soup.get_text(separator=" ", strip=True)
-            words = text.split()
-            content = ""
-            for word in words:
-                if len(content) + len(word) + 1 > max_chars:
-                    break
-                content += " " + word
-            return content.strip()
+            response = get_http_client().get(url, retries=0, timeout=(5, 10))
+            return _page_text(response.content, max_chars)
         except Exception as e:
             print(f"Error fetching {url}: {str(e)}")
             return ""
@@ -67,8 +77,8 @@ def google_search(query: str, num_results: int = 2, max_chars: int = 500) -> lis
     for item in results:
         body = get_page_content(item["link"])
         enriched_results.append(
-            {"title": item["title"], "link": item["link"], "snippet": item["snippet"], "body": body}
+            SearchResult(title=item["title"], link=item["link"], snippet=item["snippet"], body=body)
         )
         time.sleep(1) 
 
-    return enriched_results
+    return SearchResults(enriched_results)
@@ -1,9 +1,12 @@
 """
 visualization_tools.py (Image-only)
-Simple wrapper functions for visualization that can be used by AutoGen agents
+Simple wrapper functions for visualization that can be used by AutoGen agents.
+The charts are memoized by the chart service and linked by URL, so no base64 image reaches the agents' context.
 """
 from finance.LLM_get_qualitative import extract_business_info
-from utils.visualization_functions import plot_company_comparison, plot_qualitative_summary
+from config.app_constants import END_YEAR, START_YEAR
+from finance.point_in_time import RunContext
+from utils.chart_service import chart_url, get_chart_service
 from typing import Optional
 
 def generate_competitive_analysis(stock_symbol: str) -> str:
@@ -17,11 +20,11 @@ def generate_competitive_analysis(stock_symbol: str) -> str:
         str: Markdown with embedded visualization
     """
     try:
-        # Generate the comparison chart
-        chart_url = plot_company_comparison(stock_symbol)
+        # Generate the comparison chart, or reuse it if its data did not change
+        chart_id = get_chart_service().company_comparison(stock_symbol)
         
         # Return only the image in markdown format
-        return f"![Competitive Analysis for {stock_symbol}]({chart_url})"
+        return f"![Competitive Analysis for {stock_symbol}]({chart_url(chart_id)})"
     except Exception as e:
         return f"Error generating competitive analysis: {str(e)}"
     
@@ -37,13 +40,13 @@ def generate_qualitative_summary(stock_symbol: str) -> str:
         str: Markdown with embedded visualization
     """
     try:
-        # Get business description
-        business_info = extract_business_info(stock_symbol)
+        # Get business description, as of the analysis period like the comparison chart
+        business_info = extract_business_info(stock_symbol, RunContext.for_years(START_YEAR, END_YEAR).as_of)
         
-        # Generate the qualitative summary chart
-        chart_url = plot_qualitative_summary(stock_symbol, business_info)
+        # Generate the qualitative summary chart, or reuse it if the description did not change
+        chart_id = get_chart_service().qualitative_summary(stock_symbol, business_info)
         
         # Return only the image in markdown format
-        return f"![Qualitative Summary for {stock_symbol}]({chart_url})"
+        return f"![Qualitative Summary for {stock_symbol}]({chart_url(chart_id)})"
     except Exception as e:
         return f"Error generating qualitative summary: {str(e)}"
\ No newline at end of file